@@ -1,10 +1,13 @@
-from typing import TypedDict, Annotated, List, Literal, Dict
+from typing import TypedDict, Annotated, List, Literal, Dict, Optional
 import json
 import asyncio
+import inspect
 import math
+import time
+from functools import lru_cache
 
 from langchain_openai import ChatOpenAI
-from langchain_core.messages import SystemMessage, HumanMessage, AIMessage, BaseMessage
+from langchain_core.messages import SystemMessage, HumanMessage, AIMessage, BaseMessage, RemoveMessage, ToolMessage
 from langchain_core.prompts import ChatPromptTemplate
 from langgraph.graph import StateGraph, START, END
 from langgraph.graph.message import add_messages
@@ -12,6 +15,31 @@ from langgraph.prebuilt import ToolNode
 from datetime import datetime, timezone
 
 from config import INSTRUCT_CONFIG, THINKING_CONFIG, RUNTIME_LIMITS, logger
+from mcp_client import tool_output_char_limit
+from log_miner import mine_log_templates
+from metric_analyzer import analyze_metric_output
+from k8s_parser import summarize_kubectl_output
+from trace_analyzer import analyze_trace_output
+from tool_output_store import FETCH_TOOL_NAME, build_fetch_tool
+from think_stream import ConsoleMirror, ThinkTagParser
+from metrics import CANCELLED_WORK, CONVERSATION_EVENTS, NODE_DURATION, get_llm_metrics_callbacks, metrics_enabled, observe_duration, timed_node
+from request_trace import get_llm_trace_callbacks, record_wait, trace_span
+from session_recorder import ReplayChatModel, get_recording_callbacks, get_replay_state, stage_scope
+from health_snapshot import (
+    describe_snapshot_for_prompt,
+    get_worker_snapshot,
+    lookup_snapshot,
+    relevant_snapshot_results,
+    render_snapshot_report,
+)
+from stream_channel import get_stream_queue
+from synthesis_policy import (
+    TIER_INSTRUCT,
+    TIER_TEMPLATE,
+    choose_synthesis_tier,
+    log_synthesis_result,
+    render_template_answer,
+)
 
 # =================================================================
 # 1. 상태(State) 정의
@@ -24,6 +52,12 @@ class AgentState(TypedDict):
     worker_plans: Dict[str, str]
     # [Workers] 각 Worker의 실행 결과 리스트
     worker_results: List[str]
+    # [Synthesizer] 요청별 추론 토큰 예산 (없으면 기본 SLO 등급, 0이면 무제한)
+    thinking_budget: Optional[int]
+    # [Memory] 멀티턴 대화에서 압축된 이전 턴 요약 (체크포인터로 다음 턴에 이어짐)
+    conversation_summary: str
+    # [Orchestrator] 다시 조회하지 않고 이전 턴 보고서를 재사용할 Worker (예: ["k8s"])
+    reuse_workers: List[str]
     
 # =================================================================
 # 2. 모델 초기화
@@ -35,40 +69,155 @@ import tiktoken
 # Thinking 과정을 실시간으로 보여주기 위한 콜백
 from langchain_core.callbacks import AsyncCallbackHandler
 
+class ThinkingBudgetExceeded(Exception):
+    """추론(<think>) 토큰이 예산을 넘었을 때 스트리밍을 끊기 위한 예외"""
+
+    def __init__(self, reasoning_tokens: int, reasoning_text: str):
+        super().__init__(f"thinking budget exceeded ({reasoning_tokens} tokens)")
+        self.reasoning_tokens = reasoning_tokens
+        self.reasoning_text = reasoning_text
+
+
 class AsyncThinkingStreamCallback(AsyncCallbackHandler):
-    def __init__(self, target_queue=None):
-        self.in_thinking = True # 기본적으로 생각 중이라고 가정 (첫 출력부터 숨김)
-        self.buffer = "" # 태그 감지를 위한 버퍼
+    # 예산 초과 예외가 LLM 호출자까지 전파되도록 설정 (기본값이면 콜백 예외가 로그만 남고 무시됨)
+    raise_error = True
+
+    def __init__(self, target_queue=None, thinking_budget: int = 0, start_in_thinking: bool = True,
+                 console_mirror: bool = None):
+        # [최적화] 꼬리 창(tail window)만 유지하는 스트리밍 태그 감지기 (전체 버퍼 재검색 제거)
+        # 기본적으로 생각 중이라고 가정 (첫 출력부터 숨김)
+        self.parser = ThinkTagParser(in_thinking=start_in_thinking)
         self.target_queue = target_queue
+        # [최적화] 콘솔 미러링은 선택 사항이며, 토큰마다가 아니라 모아서 출력
+        if console_mirror is None:
+            console_mirror = RUNTIME_LIMITS["stream_console_mirror"]
+        self.console = ConsoleMirror(enabled=console_mirror)
+        # [최적화] 추론 토큰 예산 (0이면 무제한)
+        self.thinking_budget = thinking_budget or 0
+        self.reasoning_tokens = 0
+        self.answer_tokens = 0
+        # 예산 초과 시 prefill에 쓸 추론 텍스트 (예산이 있을 때만 보관)
+        self._reasoning_parts = []
+
+    @property
+    def in_thinking(self) -> bool:
+        return self.parser.in_thinking
+
+    async def _emit(self, segments) -> bool:
+        emitted_answer = False
+        for is_reasoning, text in segments:
+            if is_reasoning:
+                if self.thinking_budget:
+                    self._reasoning_parts.append(text)
+                continue
+            emitted_answer = True
+            self.console.write(text)
+            if self.target_queue:
+                await self.target_queue.put(f"TOKEN:{text}")
+        return emitted_answer
 
     async def on_llm_new_token(self, token: str, **kwargs) -> None:
-        import sys
-        if not self.in_thinking:
-            # 이미 생각 끝났으면 바로 출력
-            sys.stdout.write(token)
-            sys.stdout.flush()
+        if await self._emit(self.parser.feed(token)) or not self.parser.in_thinking:
+            self.answer_tokens += 1
+            return
+
+        self.reasoning_tokens += 1
+        if self.thinking_budget and self.reasoning_tokens >= self.thinking_budget:
+            self.console.flush()
+            raise ThinkingBudgetExceeded(self.reasoning_tokens, "".join(self._reasoning_parts))
+
+    async def on_llm_end(self, response, **kwargs) -> None:
+        await self._emit(self.parser.flush())
+        self.console.flush()
+
+    async def on_llm_error(self, error, **kwargs) -> None:
+        self.console.flush()
+
+class AsyncAnswerStreamCallback(AsyncThinkingStreamCallback):
+    """
+    [최적화] Simple 경로 최종 답변 토큰 스트리밍
+    처음 holdback 글자까지만 모아 두다가, 그동안 tool_call 청크가 없으면 답변 턴으로 보고 이후 토큰은 바로 흘려보냅니다.
+    OpenAI 호환 스트림은 안내 문구("조회해 보겠습니다") 뒤에 tool_call이 이어질 수 있으므로, 흘려보낸 뒤에 tool_call이 나오면
+    이번 턴의 나머지를 버리고 앞 문구가 최종 답변이 아니라는 진행 표시(RETRACT_EVENT)를 보냅니다.
+    """
+
+    RETRACT_EVENT = "EVENT:↩️ [Simple] 위 문구는 도구 호출 전 안내입니다. 조회 결과로 답변을 이어갑니다."
+
+    def __init__(self, target_queue=None, holdback_chars: int = 40):
+        super().__init__(target_queue=target_queue, start_in_thinking=False)
+        self.holdback_chars = holdback_chars
+        self.suppressed = False
+        self.streamed = False
+        self.retracted = False
+        self._held = []
+        self._held_len = 0
+
+    async def _release(self, text: str) -> None:
+        self.streamed = True
+        await super().on_llm_new_token(text)
+
+    async def _suppress(self) -> None:
+        self.suppressed = True
+        self._held = []
+        if self.streamed and not self.retracted:
+            self.retracted = True
+            self.console.flush()
             if self.target_queue:
-                await self.target_queue.put(f"TOKEN:{token}")
+                await self.target_queue.put(self.RETRACT_EVENT)
+
+    async def on_llm_new_token(self, token: str, *, chunk=None, **kwargs) -> None:
+        if self.suppressed:
+            return
+        message = getattr(chunk, "message", None)
+        if getattr(message, "tool_call_chunks", None):
+            await self._suppress()
+            return
+        if not token:
             return
+        if self._held is not None:
+            self._held.append(token)
+            self._held_len += len(token)
+            if self._held_len < self.holdback_chars:
+                return
+            token = "".join(self._held)
+            self._held = None
+        await self._release(token)
 
-        # 태그 감지를 위해 버퍼에 추가
-        self.buffer += token
-        
-        # </think> 감지
-        if "</think>" in self.buffer:
-            self.in_thinking = False
-            # </think> 뒷부분을 찾아서 출력
-            parts = self.buffer.split("</think>")
-            if len(parts) > 1:
-                # 뒷부분만 출력 (앞부분은 버림)
-                chunk = parts[-1]
-                sys.stdout.write(chunk)
-                sys.stdout.flush()
-                if self.target_queue:
-                    await self.target_queue.put(f"TOKEN:{chunk}")
-            self.buffer = "" # 버퍼 초기화
-
-def get_instruct_model():
+    async def on_llm_end(self, response, **kwargs) -> None:
+        generations = getattr(response, "generations", None) or [[]]
+        message = getattr(generations[0][0], "message", None) if generations[0] else None
+        if getattr(message, "tool_calls", None):
+            # tool_call 청크 없이 완성 메시지에만 도구 호출이 담겨 오는 백엔드 대비
+            if not self.suppressed:
+                await self._suppress()
+        elif not self.suppressed and self._held:
+            await self._release("".join(self._held))
+        self._held = None
+        await super().on_llm_end(response, **kwargs)
+
+
+def get_observability_callbacks(model_name: str) -> list:
+    """/metrics 수집 + 요청 타임라인(LLM Span) + 세션 녹화 콜백"""
+    return (get_llm_metrics_callbacks(model_name) + get_llm_trace_callbacks(model_name)
+            + get_recording_callbacks(model_name))
+
+
+class CancellableChatOpenAI(ChatOpenAI):
+    """ainvoke 도중 요청이 취소되면 LangChain이 on_llm_error를 부르지 않아 진행 중 게이지/LLM Span이 열린 채 남습니다.
+    취소를 콜백에 알린 뒤 그대로 올립니다. (HTTP 연결은 취소와 함께 닫혀 백엔드도 생성을 중단)
+    """
+
+    async def _agenerate_with_cache(self, messages, stop=None, run_manager=None, **kwargs):
+        try:
+            return await super()._agenerate_with_cache(messages, stop=stop, run_manager=run_manager, **kwargs)
+        except asyncio.CancelledError as e:
+            if run_manager is not None:
+                await run_manager.on_llm_error(e)
+            raise
+
+
+def get_instruct_model(callbacks=None):
+    """callbacks를 넘기면 스트리밍 모드로 생성합니다. (Simple 경로 답변 토큰 스트리밍용)"""
     kwargs = {
         "model": INSTRUCT_CONFIG["model_name"],
         "api_key": INSTRUCT_CONFIG["api_key"],
@@ -78,24 +227,39 @@ def get_instruct_model():
         "request_timeout": 300,
         "max_retries": 3,
     }
+    if get_replay_state() is not None:
+        # 세션 재생 중: 실제 백엔드 대신 녹화 응답을 돌려주는 모델
+        return ReplayChatModel(model_name=INSTRUCT_CONFIG["model_name"], streaming=bool(callbacks),
+                               callbacks=list(callbacks or []) + get_observability_callbacks(INSTRUCT_CONFIG["model_name"]))
+    if callbacks:
+        kwargs["streaming"] = True
+    metrics_callbacks = get_observability_callbacks(INSTRUCT_CONFIG["model_name"])
+    if callbacks or metrics_callbacks:
+        kwargs["callbacks"] = list(callbacks or []) + metrics_callbacks
     max_output_tokens = INSTRUCT_CONFIG.get("max_output_tokens")
     if max_output_tokens is not None:
         kwargs["max_tokens"] = max_output_tokens
 
-    return ChatOpenAI(
+    return CancellableChatOpenAI(
         **kwargs
     )
 
-def get_thinking_model(stream_prefix=""):
+def get_thinking_model(stream_prefix="", callbacks=None, extra_body=None):
     """
     Thinking 모델은 시간이 오래 걸리므로 타임아웃을 길게 잡고,
     실시간으로 생각하는 과정을 보여주기 위해 스트리밍을 켭니다.
+    callbacks를 직접 넘기면 (추론 예산 등) 호출자가 콜백 상태를 참조할 수 있습니다.
     """
-    callbacks = []
+    if callbacks is None:
+        callbacks = []
+        if stream_prefix:
+            stream_queue = get_stream_queue()
+            callbacks = [AsyncThinkingStreamCallback(target_queue=stream_queue)]
     if stream_prefix:
         logger.debug(f"{stream_prefix} ") # 시작할 때
-        from config import stream_queue
-        callbacks = [AsyncThinkingStreamCallback(target_queue=stream_queue)]
+    if get_replay_state() is not None:
+        return ReplayChatModel(model_name=THINKING_CONFIG["model_name"], streaming=True,
+                               callbacks=list(callbacks) + get_observability_callbacks(THINKING_CONFIG["model_name"]))
 
     kwargs = {
         "model": THINKING_CONFIG["model_name"],
@@ -105,14 +269,88 @@ def get_thinking_model(stream_prefix=""):
         "temperature": THINKING_CONFIG["temperature"],
         "request_timeout": 3600,
         "streaming": True,
-        "callbacks": callbacks,
+        "callbacks": list(callbacks) + get_observability_callbacks(THINKING_CONFIG["model_name"]),
         "max_retries": 3,
     }
     max_output_tokens = THINKING_CONFIG.get("max_output_tokens")
     if max_output_tokens is not None:
         kwargs["max_tokens"] = max_output_tokens
+    if extra_body:
+        kwargs["extra_body"] = extra_body
+
+    return CancellableChatOpenAI(**kwargs)
+
 
-    return ChatOpenAI(**kwargs)
+# [최적화] 추론(Thinking) 토큰 예산
+# 요청별 thinking_budget(토큰) 또는 SLO 등급(fast/standard/deep, OpenAI 호환 reasoning_effort low/medium/high)으로 정합니다.
+_REASONING_EFFORT_TIERS = {"low": "fast", "medium": "standard", "high": "deep"}
+
+
+def resolve_thinking_budget(thinking_budget=None, slo_tier: str = None) -> int:
+    """요청 값에서 추론 토큰 예산을 결정합니다. (0이면 무제한)"""
+    if thinking_budget is not None:
+        try:
+            return max(int(thinking_budget), 0)
+        except (TypeError, ValueError):
+            logger.warning(f"⚠️ [ThinkingBudget] 잘못된 thinking_budget 값 무시: {thinking_budget}")
+    tiers = RUNTIME_LIMITS["thinking_budget_tiers"]
+    tier = _REASONING_EFFORT_TIERS.get(str(slo_tier or "").lower(), slo_tier)
+    if tier not in tiers:
+        tier = RUNTIME_LIMITS["thinking_budget_default_tier"]
+    return int(tiers.get(tier, 0) or 0)
+
+
+async def invoke_thinking_with_budget(messages: list, thinking_budget: int) -> AIMessage:
+    """
+    Thinking 모델을 추론 토큰 예산 안에서 호출합니다.
+    예산을 넘기면 스트림을 끊고, 지금까지의 추론을 </think>로 닫은 assistant 메시지를 prefill하여
+    답변 단계부터 이어서 생성합니다. (vLLM continue_final_message, thinking_prefill_supported일 때만.
+    아니면 추론 메모를 붙여 enable_thinking=False로 다시 호출)
+    """
+    stream_queue = get_stream_queue()
+    callback = AsyncThinkingStreamCallback(target_queue=stream_queue, thinking_budget=thinking_budget)
+    llm = get_thinking_model(stream_prefix="📝 [Synthesizing]", callbacks=[callback])
+    budget_exceeded = False
+    try:
+        response = await llm.ainvoke(messages)
+        reasoning_tokens, answer_tokens = callback.reasoning_tokens, callback.answer_tokens
+    except ThinkingBudgetExceeded as e:
+        budget_exceeded = True
+        reasoning_tokens = e.reasoning_tokens
+        logger.info(f"✂️ [Synthesizer] 추론 예산 {thinking_budget} 토큰 소진 -> 답변 단계로 전환")
+        await stream_queue.put(f"EVENT:✂️ [Synthesizer] 추론 예산({thinking_budget} 토큰) 소진, 답변 작성으로 전환")
+
+        reasoning_text = e.reasoning_text.replace("<think>", "").strip()
+        answer_callback = AsyncThinkingStreamCallback(target_queue=stream_queue, start_in_thinking=False)
+        if RUNTIME_LIMITS["thinking_budget_continuation"] == "prefill" and RUNTIME_LIMITS["thinking_prefill_supported"]:
+            prefill = (
+                f"<think>\n{reasoning_text}\n\n(추론 예산 소진: 지금까지의 분석으로 최종 답변을 작성합니다.)\n</think>\n\n"
+            )
+            continuation = messages + [AIMessage(content=prefill)]
+            extra_body = {"continue_final_message": True, "add_generation_prompt": False}
+        else:
+            # 백엔드가 prefill을 지원하지 않으면 추론 비활성화(chat_template_kwargs) + 지금까지의 추론을 전달
+            continuation = messages + [HumanMessage(content=(
+                f"[지금까지의 분석 메모]\n{reasoning_text}\n\n"
+                "추가 추론 없이 위 메모를 바탕으로 최종 답변만 바로 작성하세요."
+            ))]
+            extra_body = {"chat_template_kwargs": {"enable_thinking": False}}
+        answer_llm = get_thinking_model(callbacks=[answer_callback], extra_body=extra_body)
+        response = await answer_llm.ainvoke(continuation)
+        answer_tokens = answer_callback.answer_tokens
+
+    usage = {
+        "reasoning_tokens": reasoning_tokens,
+        "answer_tokens": answer_tokens,
+        "thinking_budget": thinking_budget,
+        "budget_exceeded": budget_exceeded,
+    }
+    response.response_metadata["thinking_usage"] = usage
+    logger.info(
+        f"🧠 [Synthesizer] 추론 {reasoning_tokens} 토큰 / 답변 {answer_tokens} 토큰 "
+        f"(예산 {thinking_budget or '무제한'}{', 조기 종료' if budget_exceeded else ''})"
+    )
+    return response
 
 # =================================================================
 # 3. 노드(Node) 정의
@@ -190,18 +428,26 @@ def remove_thinking_tags(text: str) -> str:
     return text
 
 
+@lru_cache(maxsize=8)
+def _get_token_encoding(model_name: str):
+    """모델별 tiktoken 인코딩을 한 번만 로드해 재사용합니다. (실패 시 None)"""
+    try:
+        return tiktoken.encoding_for_model(model_name)
+    except KeyError:
+        try:
+            return tiktoken.get_encoding("cl100k_base")
+        except Exception:
+            return None
+    except Exception:
+        return None
+
+
 def estimate_token_count(text: str, model_name: str) -> int:
     """가능하면 tokenizer로, 어려우면 보수적인 문자 길이 추정으로 토큰 수를 계산합니다."""
     if not text:
         return 0
 
-    try:
-        encoding = tiktoken.encoding_for_model(model_name)
-    except KeyError:
-        encoding = tiktoken.get_encoding("cl100k_base")
-    except Exception:
-        encoding = None
-
+    encoding = _get_token_encoding(model_name)
     if encoding is not None:
         return len(encoding.encode(text))
 
@@ -213,13 +459,7 @@ def trim_text_to_token_limit(text: str, max_tokens: int, model_name: str, suffix
     if max_tokens <= 0 or not text:
         return suffix.strip()
 
-    try:
-        encoding = tiktoken.encoding_for_model(model_name)
-    except KeyError:
-        encoding = tiktoken.get_encoding("cl100k_base")
-    except Exception:
-        encoding = None
-
+    encoding = _get_token_encoding(model_name)
     if encoding is not None:
         tokens = encoding.encode(text)
         if len(tokens) <= max_tokens:
@@ -233,6 +473,188 @@ def trim_text_to_token_limit(text: str, max_tokens: int, model_name: str, suffix
     return text[:max_chars].rstrip() + suffix
 
 
+def split_text_into_token_chunks(text: str, max_tokens: int, model_name: str) -> List[str]:
+    """
+    텍스트를 줄(레코드) 경계 기준으로 max_tokens 이하의 청크들로 나눕니다.
+    로그 한 줄/JSON 레코드 하나가 청크 사이에서 쪼개지지 않도록 하고,
+    한 줄이 단독으로 한도를 넘는 경우에만 토큰 단위로 강제 분할합니다.
+    """
+    if not text:
+        return []
+    max_tokens = max(max_tokens, 1)
+
+    encoding = _get_token_encoding(model_name)
+
+    def count(line: str) -> int:
+        if encoding is not None:
+            return len(encoding.encode(line))
+        return math.ceil(len(line) / 2)
+
+    def hard_split(line: str) -> List[str]:
+        if encoding is not None:
+            tokens = encoding.encode(line)
+            return [encoding.decode(tokens[i:i + max_tokens]) for i in range(0, len(tokens), max_tokens)]
+        step = max_tokens * 2
+        return [line[i:i + step] for i in range(0, len(line), step)]
+
+    chunks = []
+    current_lines = []
+    current_tokens = 0
+    for line in text.split("\n"):
+        # 줄바꿈 문자 1토큰 포함
+        line_tokens = count(line) + 1
+        if line_tokens > max_tokens:
+            if current_lines:
+                chunks.append("\n".join(current_lines))
+                current_lines, current_tokens = [], 0
+            chunks.extend(hard_split(line))
+            continue
+        if current_tokens + line_tokens > max_tokens and current_lines:
+            chunks.append("\n".join(current_lines))
+            current_lines, current_tokens = [], 0
+        current_lines.append(line)
+        current_tokens += line_tokens
+
+    if current_lines:
+        chunks.append("\n".join(current_lines))
+    return [chunk for chunk in chunks if chunk.strip()]
+
+
+# [최적화] 토큰 예산 배분기 (Synthesizer 입력 기준)
+# 문자 수 쿼터(worker_summary_quota/max_total_context)는 한글/영문 혼합 텍스트에서 토큰과 비례하지 않으므로,
+# THINKING 모델의 max_input_tokens에서 고정 프롬프트를 뺀 실제 여유 토큰을 Worker별로 나눠 씁니다.
+WORKER_RESULT_KEYS = {
+    "K8sSpecialist": "k8s",
+    "MetricSpecialist": "metric",
+    "LogSpecialist": "log",
+}
+# K8s(기본 상태) -> Metric(현상) -> Log(상세 원인) 순서로 배치
+WORKER_RESULT_ORDER = ["k8s", "metric", "log"]
+
+
+def map_worker_results(results: List[str]) -> Dict[str, str]:
+    """Worker 보고서 목록을 {k8s/metric/log: 보고서}로 분류합니다."""
+    mapped = {}
+    for res in results:
+        for worker_name, key in WORKER_RESULT_KEYS.items():
+            if f"[{worker_name}]" in res:
+                mapped[key] = res
+                break
+    return mapped
+
+
+def allocate_token_budgets(needs: Dict[str, int], total: int, weights: Dict[str, float]) -> Dict[str, int]:
+    """
+    가중치 기반 water-filling 배분.
+    필요량이 자기 몫보다 작은 항목은 필요량만 가져가고, 남은 예산은 나머지 항목에 가중치 비율로 재분배합니다.
+    """
+    budgets = {}
+    remaining = max(total, 0)
+    active = [k for k in needs if needs[k] > 0]
+    for k in needs:
+        if needs[k] <= 0:
+            budgets[k] = 0
+
+    while active:
+        weight_sum = sum(max(weights.get(k, 1.0), 0.01) for k in active)
+        shares = {k: remaining * max(weights.get(k, 1.0), 0.01) / weight_sum for k in active}
+        satisfied = [k for k in active if needs[k] <= shares[k]]
+        if not satisfied:
+            for k in active:
+                budgets[k] = int(shares[k])
+            break
+        for k in satisfied:
+            budgets[k] = needs[k]
+            remaining -= needs[k]
+            active.remove(k)
+    return budgets
+
+
+async def emit_final_answer(text: str) -> None:
+    """스트리밍 콜백을 거치지 않은 최종 답변을 콘솔과 UI 스트림에 한 번에 전달합니다."""
+    stream_queue = get_stream_queue()
+    if RUNTIME_LIMITS["stream_console_mirror"]:
+        sys.stdout.write(text)
+        sys.stdout.flush()
+    await stream_queue.put(f"FINAL:{text}")
+
+
+def build_synthesizer_prompt(question: str, worker_results_str: str) -> str:
+    return f"""
+    당신은 최종 답변을 정리하는 Synthesizer입니다.
+    Orchestrator가 작업자(Worker)들에게 지시를 내렸고, 그 결과가 아래와 같습니다.
+    이 내용을 종합하여 사용자의 질문에 대한 최종 진단과 답변을 작성하세요.
+    
+    [사용자 질문]
+    {question}
+    
+    [Worker 실행 결과 보고서]
+    {worker_results_str}
+    
+    [작성 규칙]
+    1. 각 전문가의 분석 결과를 인용하여 논리적으로 설명하세요.
+    2. 결과를 바탕으로 원인을 진단하고, 해결책을 제안하세요.
+    2-1. 단, 사용자의 질문이 "목록", "리스트", "이름만", "나열", "조회" 같은 단순 리소스 조회라면 진단문으로 과해석하지 말고 요청한 목록을 간단히 반환하세요.
+    2-2. 단순 목록 요청에서는 "클러스터가 건강하다", "수동 점검이 필요 없다" 같은 건강성 평가를 덧붙이지 마세요. 정말 필요한 경우에만 한 줄 덧붙이세요.
+    3. **핵심 분석 룰**: 도구 실행 결과가 "[빈 결과 반환...]" 형태로 왔다면, 절대 권한 부족이나 통신 장애로 오해하지 마세요! 오류 필터(예: Failed 파드 제한)에 걸리는 안 좋은 리소스가 아예 없어서 클러스터가 매우 건강하다는 뜻입니다. 이를 분석하여 사용자에게 "에러 파드가 하나도 없이 건강하다"고 보고하세요.
+    4. **추가 건강성 룰**: K8s 전문의 보고서가 단순히 파드 이름 목록(`pod/xxx`, `deployment/yyy` 등)만 나열하고 특별한 에러 메시지(CrashLoopBackOff, Pending, Failed 등)가 없다면, 그 리소스들은 정상적으로 띄워져 있는 것(Running)으로 확신하고 설명하세요. "상태를 명확히 알 수 없다"고 애매하게 답변하지 마세요.
+    5. 결과에 실제 에러 문구(Unauthorized, Connection Refused 등)나 알 수 없는 크래시 흔적이 있을 때만 수동 점검을 제안하세요.
+    """
+
+
+@lru_cache(maxsize=8)
+def _synthesizer_static_tokens(model_name: str) -> int:
+    """질문/결과를 뺀 Synthesizer 고정 프롬프트의 토큰 수 (모델별 1회만 계산)"""
+    return estimate_token_count(build_synthesizer_prompt("", ""), model_name)
+
+
+def get_synthesizer_results_budget(question: str) -> Optional[int]:
+    """Synthesizer 프롬프트에 Worker 결과로 넣을 수 있는 토큰 수. max_input_tokens 미설정 시 None."""
+    max_input_tokens = THINKING_CONFIG.get("max_input_tokens")
+    if not max_input_tokens:
+        return None
+    model_name = THINKING_CONFIG["model_name"]
+    reserved = (
+        _synthesizer_static_tokens(model_name)
+        + estimate_token_count(question, model_name)
+        + RUNTIME_LIMITS["token_budget_safety_margin"]
+    )
+    return max(max_input_tokens - reserved, 0)
+
+
+def plan_worker_token_budgets(question: str, worker_keys: List[str]) -> Dict[str, int]:
+    """
+    Worker 실행 전 요약 목표 크기를 정합니다.
+    실제 필요량은 아직 모르므로 worker_summary_max_tokens를 필요량으로 가정하고 배분합니다.
+    """
+    total = get_synthesizer_results_budget(question)
+    if total is None or not worker_keys:
+        return {}
+    needs = {key: RUNTIME_LIMITS["worker_summary_max_tokens"] for key in worker_keys}
+    return allocate_token_budgets(needs, total, RUNTIME_LIMITS["worker_budget_weights"])
+
+
+def describe_summary_length(token_budget: Optional[int], sample_text: str, model_name: str, divisor: int = 1) -> str:
+    """요약 프롬프트에 넣을 길이 제한 문구. 모델이 토큰 수를 세지 못하므로 실제 데이터의 문자/토큰 비율로 글자 수를 환산합니다.
+    divisor는 청크 부분 요약처럼 한도를 여러 요약이 나눠 쓸 때 사용합니다.
+    """
+    if not token_budget:
+        return f"{2000 // divisor:,}자"
+    token_budget = max(token_budget // divisor, 1)
+    sample = sample_text[:4000]
+    sample_tokens = estimate_token_count(sample, model_name)
+    chars_per_token = len(sample) / sample_tokens if sample_tokens else 2.0
+    return f"{int(token_budget * chars_per_token):,}자(약 {token_budget:,} 토큰)"
+
+
+DIAGNOSIS_KEYWORDS = [
+    "왜", "원인", "진단", "분석", "이상", "문제", "에러", "오류", "상태 어때",
+    "why", "diagnose", "analysis", "error", "issue", "problem",
+]
+# 진단 키워드 외에 여러 Worker가 필요한 포괄 요청 표현 (Lane 추정용)
+COMPLEX_HINT_KEYWORDS = ["전반", "전체적", "종합", "장애", "overall", "root cause", "troubleshoot"]
+
+
 def is_listing_request(text: str) -> bool:
     normalized = (text or "").lower().strip()
     listing_keywords = [
@@ -246,19 +668,25 @@ def is_listing_request(text: str) -> bool:
         "deployment", "deployments", "디플로이먼트",
         "node", "nodes", "노드",
     ]
-    diagnosis_keywords = [
-        "왜", "원인", "진단", "분석", "이상", "문제", "에러", "오류", "상태 어때",
-        "why", "diagnose", "analysis", "error", "issue", "problem",
-    ]
-
     has_listing = any(keyword in normalized for keyword in listing_keywords)
     has_resource = any(keyword in normalized for keyword in resource_keywords)
-    has_diagnosis = any(keyword in normalized for keyword in diagnosis_keywords)
+    has_diagnosis = any(keyword in normalized for keyword in DIAGNOSIS_KEYWORDS)
     return has_listing and has_resource and not has_diagnosis
 
-async def router_node(state: AgentState):
+
+def estimate_route(text: str) -> str:
+    """[Scheduler] LLM 호출 없이 질문 문구만으로 simple/complex를 추정합니다. (Lane 선택용, 실제 경로는 Router가 결정)"""
+    normalized = (text or "").lower()
+    if is_listing_request(normalized):
+        return "simple"
+    if any(keyword in normalized for keyword in DIAGNOSIS_KEYWORDS + COMPLEX_HINT_KEYWORDS):
+        return "complex"
+    return "simple"
+
+async def classify_request(messages: List[BaseMessage], context: str = "") -> str:
     """
-    [Router] Instruct 모델이 사용자 질문을 분석하여 모드를 결정합니다.
+    [Router] Instruct 모델이 사용자 질문을 분석하여 모드("simple"/"complex")를 결정합니다.
+    context: 멀티턴 후속 질문("그럼 그 파드 로그는?")을 해석할 이전 대화 (describe_router_context)
     """
     # Router는 짧으니까 타임아웃만 적용된 instruct 모델 사용
     instruct_llm = get_instruct_model()
@@ -266,13 +694,20 @@ async def router_node(state: AgentState):
     # [최적화] 메시지 최적화 (Router는 최신 메시지만 봐도 됨)
     # 하지만 문맥 파악을 위해 최근 5개 정도는 유지
     safe_messages = trim_messages_history(
-        state["messages"], keep_last=RUNTIME_LIMITS["router_keep_last"]
+        messages, keep_last=RUNTIME_LIMITS["router_keep_last"]
     )
     last_msg = safe_messages[-1]
 
     if is_listing_request(str(last_msg.content)):
         logger.info("🧭 [Router] 규칙 기반 분류: 목록/나열 요청으로 판단하여 SIMPLE 경로 선택")
-        return {"mode": "simple"}
+        return "simple"
+
+    context_section = ""
+    if context:
+        context_section = (
+            f"[이전 대화]\n{context}\n"
+            "    질문에 '그', '그럼', '방금' 같은 지시어가 있으면 이전 대화의 대상/작업을 이어받아 판단하세요.\n\n    "
+        )
     
     prompt = f"""
     당신은 사용자 의도를 분류하는 AI입니다.
@@ -284,7 +719,7 @@ async def router_node(state: AgentState):
        - "목록", "이름만", "나열", "조회"처럼 단순 리소스 목록을 요구하는 요청은 기본적으로 SIMPLE입니다.
     2. "COMPLEX": 복합적인 추론이 필요하거나, 원인 분석(Diagnosis), 에러(Error) 해결, 여러 단계의 도구 사용이 필요한 경우. 특히 "전반적으로 진단해줘" 와 같은 포괄적 분석 요청은 COMPLEX로 분류하되, "전체 클러스터에서 CPU 점유율 상위 3개 알려줘"와 같이 단순히 랭킹/통계만 묻는 경우에는 단일 도구(`vm_query`)로 즉시 조회가 가능하므로 "SIMPLE"로 분류하세요.
     
-    [사용자 질문]
+    {context_section}[사용자 질문]
     {last_msg.content}
     
     [응답 형식]
@@ -296,9 +731,195 @@ async def router_node(state: AgentState):
     
     # 안전장치
     if "COMPLEX" in mode:
-        return {"mode": "complex"}
+        return "complex"
     else:
-        return {"mode": "simple"}
+        return "simple"
+
+# -----------------------------------------------------------------
+# [Memory] 멀티턴 대화 압축
+# -----------------------------------------------------------------
+# 체크포인터(conversation_store)로 대화를 이어 쓰면 메시지가 턴마다 쌓입니다. (도구 결과, Worker 보고서 포함)
+# 이전 턴 토큰 합이 conversation_history_max_tokens를 넘을 때만 오래된 것부터 줄입니다.
+#   1. 최근 conversation_keep_turns 턴 밖의 도구 결과/Worker 보고서를 conversation_evidence_max_tokens로 절단 (LLM 호출 없음)
+#   2. 그래도 넘으면 최근 턴 밖의 턴들을 기존 요약에 합쳐 새 요약을 만들고(증분 요약) 메시지는 삭제
+#   3. 최근 턴만으로도 넘으면 최근 턴의 근거도 절단
+# 후속 질문은 요약 + 최근 턴의 근거로 답하거나, 모자란 부분만 다시 조회합니다.
+WORKERS_REPORT_PREFIX = "👷 [Workers]"
+
+
+def split_turns(messages: List[BaseMessage]) -> List[List[BaseMessage]]:
+    """사용자 질문(HumanMessage)마다 턴을 나눕니다. 마지막 턴이 현재 질문입니다."""
+    turns = []
+    for message in messages:
+        if isinstance(message, HumanMessage) or not turns:
+            turns.append([message])
+        else:
+            turns[-1].append(message)
+    return turns
+
+
+def current_turn_messages(messages: List[BaseMessage]) -> List[BaseMessage]:
+    """마지막 사용자 질문부터 끝까지 (이번 턴에 쌓인 메시지)"""
+    for index in range(len(messages) - 1, -1, -1):
+        if isinstance(messages[index], HumanMessage):
+            return messages[index:]
+    return messages
+
+
+def is_evidence_message(message: BaseMessage) -> bool:
+    """다음 턴에서 다시 쓸 수 있는 수집 근거 (도구 결과 또는 Worker 보고서)"""
+    if isinstance(message, ToolMessage):
+        return True
+    return isinstance(message, AIMessage) and str(message.content).startswith(WORKERS_REPORT_PREFIX)
+
+
+def count_messages_tokens(messages: List[BaseMessage], model_name: str) -> int:
+    return sum(estimate_token_count(str(message.content), model_name) for message in messages)
+
+
+def render_conversation(messages: List[BaseMessage]) -> str:
+    lines = []
+    for message in messages:
+        content = str(message.content).strip()
+        if isinstance(message, HumanMessage):
+            lines.append(f"[사용자] {content}")
+        elif isinstance(message, ToolMessage):
+            lines.append(f"[도구 결과: {message.name or 'tool'}]\n{content}")
+        elif isinstance(message, AIMessage):
+            for tool_call in message.tool_calls or []:
+                lines.append(f"[도구 호출] {tool_call['name']}({json.dumps(tool_call['args'], ensure_ascii=False)})")
+            if content:
+                lines.append(f"[에이전트] {content}")
+    return "\n".join(lines)
+
+
+def describe_conversation_context(state: AgentState) -> str:
+    """Orchestrator/Synthesizer 프롬프트에 넣을 이전 대화 (요약 + 남아 있는 이전 턴). 첫 턴이면 빈 문자열"""
+    messages = state["messages"]
+    previous = messages[:len(messages) - len(current_turn_messages(messages))]
+    summary = state.get("conversation_summary") or ""
+    parts = []
+    if summary:
+        parts.append(f"[이전 대화 요약]\n{summary}")
+    if previous:
+        parts.append(f"[최근 대화]\n{render_conversation(previous)}")
+    return "\n\n".join(parts)
+
+
+def describe_router_context(state: AgentState, max_chars: int = 300) -> str:
+    """Router용 이전 대화: 요약 + 최근 턴의 질문/최종 답변만 (도구 결과 제외, 항목당 max_chars). 첫 턴이면 빈 문자열"""
+    turns = split_turns(state["messages"])[:-1][-max(RUNTIME_LIMITS["conversation_keep_turns"], 1):]
+    summary = state.get("conversation_summary") or ""
+    lines = [f"[이전 대화 요약] {summary[:max_chars * 2]}"] if summary else []
+    for turn in turns:
+        for message in turn:
+            content = str(message.content).strip()
+            if isinstance(message, HumanMessage):
+                lines.append(f"[사용자] {content[:max_chars]}")
+            elif isinstance(message, AIMessage) and content and not message.tool_calls and not is_evidence_message(message):
+                lines.append(f"[에이전트] {content[:max_chars]}")
+    return "\n".join(lines)
+
+
+def trim_turn_evidence(turn: List[BaseMessage], max_tokens: int, model_name: str):
+    """턴의 도구 결과/Worker 보고서를 max_tokens로 절단합니다. (절단된 턴, 교체할 메시지 목록)"""
+    trimmed, changed = [], []
+    for message in turn:
+        if is_evidence_message(message) and estimate_token_count(str(message.content), model_name) > max_tokens:
+            # 같은 id로 돌려주면 add_messages가 기존 메시지를 교체
+            message = message.copy(update={"content": trim_text_to_token_limit(
+                str(message.content), max_tokens, model_name, "\n... (이전 턴 근거 절단)")})
+            changed.append(message)
+        trimmed.append(message)
+    return trimmed, changed
+
+
+async def summarize_conversation(summary: str, conversation_text: str) -> str:
+    """기존 요약에 밀려나는 턴을 합쳐 새 요약을 만듭니다. (실패하면 원문을 잘라서 대체)"""
+    model_name = INSTRUCT_CONFIG["model_name"]
+    max_tokens = RUNTIME_LIMITS["conversation_summary_max_tokens"]
+    prompt = f"""
+    당신은 K8s / Observability 진단 대화를 압축하는 요약기입니다.
+    [기존 요약]에 [새로 압축할 대화]를 합쳐 하나의 요약으로 갱신하세요.
+    
+    [기존 요약]
+    {summary or "(없음)"}
+    
+    [새로 압축할 대화]
+    {conversation_text}
+    
+    [작성 규칙]
+    1. 후속 질문에서 다시 조회하지 않고 재사용할 수 있도록 사용자가 물은 대상과 확인된 사실(리소스 이름, 네임스페이스, 상태, 에러 문구, 수치, 시각)을 보존하세요.
+    2. 인사말, 진행 과정, 도구 호출 방법은 빼세요.
+    3. {describe_summary_length(max_tokens, conversation_text, model_name)} 이내의 한국어 글머리표로 작성하세요.
+    """
+    new_summary = ""
+    try:
+        response = await get_instruct_model().ainvoke([HumanMessage(content=prompt)])
+        new_summary = remove_thinking_tags(str(response.content)).strip()
+    except Exception as e:
+        logger.warning(f"⚠️ [Memory] 이전 대화 요약 실패, 원문 절단으로 대체: {e}")
+    if not new_summary:
+        new_summary = "\n".join(part for part in (summary, conversation_text) if part)
+    return trim_text_to_token_limit(new_summary, max_tokens, model_name, "\n... (이전 대화 요약 절단)")
+
+
+async def compact_conversation_node(state: AgentState):
+    """[Memory] 이전 턴이 토큰 예산을 넘으면 근거 절단 → 증분 요약 순으로 줄입니다. (첫 턴이거나 예산 이내면 그대로)"""
+    previous = split_turns(state["messages"])[:-1]
+    if not previous:
+        return {}
+    model_name = INSTRUCT_CONFIG["model_name"]
+    budget = RUNTIME_LIMITS["conversation_history_max_tokens"]
+    before = count_messages_tokens([m for turn in previous for m in turn], model_name)
+    if before <= budget:
+        return {}
+
+    evidence_limit = RUNTIME_LIMITS["conversation_evidence_max_tokens"]
+    older_count = max(len(previous) - max(RUNTIME_LIMITS["conversation_keep_turns"], 0), 0)
+    updates = []
+    result = {}
+
+    # 1. 오래된 턴의 도구 결과 / Worker 보고서 절단
+    for index in range(older_count):
+        previous[index], changed = trim_turn_evidence(previous[index], evidence_limit, model_name)
+        updates.extend(changed)
+    total = count_messages_tokens([m for turn in previous for m in turn], model_name)
+
+    # 2. 오래된 턴을 요약에 합치고 메시지 삭제
+    if total > budget and older_count:
+        folded = [m for turn in previous[:older_count] for m in turn]
+        await get_stream_queue().put(f"EVENT:🗜️ [Memory] 이전 대화 {older_count}턴을 요약으로 압축")
+        result["conversation_summary"] = await summarize_conversation(
+            state.get("conversation_summary") or "", render_conversation(folded)
+        )
+        updates = [RemoveMessage(id=m.id) for m in folded]
+        previous = previous[older_count:]
+        total = count_messages_tokens([m for turn in previous for m in turn], model_name)
+        if metrics_enabled():
+            CONVERSATION_EVENTS.inc("summarized")
+
+    # 3. 최근 턴만으로도 넘으면 최근 턴의 근거도 절단
+    if total > budget:
+        for index in range(len(previous)):
+            previous[index], changed = trim_turn_evidence(previous[index], evidence_limit, model_name)
+            updates.extend(changed)
+        total = count_messages_tokens([m for turn in previous for m in turn], model_name)
+
+    if updates:
+        result["messages"] = updates
+    if not result:
+        # 최근 턴 자체가 예산보다 큼 (절단할 근거 없음)
+        return result
+    if metrics_enabled():
+        CONVERSATION_EVENTS.inc("compacted")
+    logger.info(f"🗜️ [Memory] 이전 대화 압축: {before} -> {total} 토큰 (예산 {budget}, 요약 "
+                f"{'갱신' if 'conversation_summary' in result else '유지'})")
+    return result
+
+async def router_node(state: AgentState):
+    """[Router] 이번 질문의 모드를 결정합니다. (멀티턴이면 이전 대화 맥락과 함께 분류)"""
+    return {"mode": await classify_request(state["messages"], describe_router_context(state))}
 
 # -----------------------------------------------------------------
 # [Simple Mode] 단순 실행
@@ -344,12 +965,37 @@ def select_simple_tools(user_input: str, tools: list) -> list:
     return fallback_tools or tools
 
 
+def describe_simple_conversation_rules(state: AgentState) -> str:
+    """[멀티턴] 이전 턴이 있으면 요약과 근거 재사용 규칙을 시스템 프롬프트 뒤에 붙입니다. (이전 턴 메시지는 대화 기록에 포함)"""
+    summary = state.get("conversation_summary") or ""
+    if not summary and len(split_turns(state["messages"])) < 2:
+        return ""
+    rules = """
+    4. 이전 대화에서 이미 조회한 결과(도구 결과 / Worker 보고서)로 답할 수 있으면 도구를 다시 호출하지 말고 그 결과를 인용해 답하세요.
+    5. 이전 결과에 없는 대상이나 최신 상태를 요구할 때만 필요한 도구를 호출하세요.
+    """
+    if summary:
+        rules += f"""
+    [이전 대화 요약]
+    {summary}
+    """
+    return rules
+
+
 async def simple_agent_node(state: AgentState, tools):
     """표준 ReAct 에이전트"""
-    instruct_llm = get_instruct_model()
+    stream_queue = get_stream_queue()
+    # [최적화] 최종 답변 턴이면 토큰을 바로 UI로 스트리밍 (도구 호출 턴은 콜백이 걸러냄)
+    answer_callback = None
+    if RUNTIME_LIMITS["simple_stream_enabled"]:
+        answer_callback = AsyncAnswerStreamCallback(
+            target_queue=stream_queue, holdback_chars=RUNTIME_LIMITS["simple_stream_holdback_chars"]
+        )
+    instruct_llm = get_instruct_model(callbacks=[answer_callback] if answer_callback else None)
     last_msg = state["messages"][-1]
     selected_tools = select_simple_tools(str(last_msg.content), tools)
     logger.info(f"🧰 [Simple] 도구 축소 적용: 전체 {len(tools)}개 -> 선택 {len(selected_tools)}개")
+    selected_tools = selected_tools + get_fetch_tools()
     llm_with_tools = instruct_llm.bind_tools(selected_tools)
     
     # 현재 시간 주입 (모델이 'now'를 모를 때 대비)
@@ -379,7 +1025,7 @@ async def simple_agent_node(state: AgentState, tools):
     1. 사용자의 요청이 단순하므로, 생각하지 말고 바로 도구를 호출하세요.
     2. 중복 실행을 피하고, 결과가 나오면 바로 요약해서 답변하세요.
     3. 무조건 한국어로 대답하세요.
-    """)
+    """ + describe_simple_conversation_rules(state))
 
     
     # [최적화] 메시지 정리
@@ -389,8 +1035,9 @@ async def simple_agent_node(state: AgentState, tools):
     messages = [sys_msg] + safe_messages
     
     # [최적화] Max Steps Check (무한 루프 방지)
-    # 현재 답변(AIMessage) 개수가 너무 많으면 강제 종료
-    ai_msg_count = sum(1 for m in state["messages"] if isinstance(m, AIMessage))
+    # 현재 답변(AIMessage) 개수가 너무 많으면 강제 종료 (멀티턴 대화에서는 이번 턴만 셈)
+    turn_messages = current_turn_messages(state["messages"])
+    ai_msg_count = sum(1 for m in turn_messages if isinstance(m, AIMessage))
     if ai_msg_count > RUNTIME_LIMITS["max_ai_steps"]:
         return {"messages": [AIMessage(content="⚠️ [System] 대화가 너무 길어져 안전을 위해 종료합니다. 현재까지의 정보로 답변해주세요.")]}
 
@@ -398,14 +1045,21 @@ async def simple_agent_node(state: AgentState, tools):
     
     # [최적화] 중복 호출 필터링 (무한 루프 방지)
     # 동일한 입력값으로 연속 호출 시 차단하고 사용자에게 알림
-    final_response = check_and_filter_duplicate_tools(state["messages"], response)
+    final_response = check_and_filter_duplicate_tools(turn_messages, response)
     if isinstance(final_response, AIMessage) and not final_response.tool_calls:
         preview = final_response.content
         if len(preview) > 1000:
             preview = preview[:1000] + "\n... (후략)"
         logger.info(f"✅ [Simple] 최종 응답:\n{preview}")
-        from config import stream_queue
-        await stream_queue.put("EVENT:✅ [Simple] 최종 응답 생성 완료")
+        if final_response is response and answer_callback and answer_callback.streamed:
+            # 콜백이 이미 전송했으므로 API 서버가 본문을 다시 보내지 않도록 표시
+            # (완료 EVENT도 답변 뒤에 붙어 보이므로 생략)
+            final_response.response_metadata["streamed_to_client"] = True
+        else:
+            await stream_queue.put("EVENT:✅ [Simple] 최종 응답 생성 완료")
+    elif final_response is response and answer_callback and answer_callback.retracted:
+        # 도구 호출 전 안내 문구는 이미 스트리밍 후 철회 표시까지 보냈으므로 API 서버가 다시 보내지 않도록 표시
+        final_response.response_metadata["streamed_to_client"] = True
     return {"messages": [final_response]}
 
 async def orchestrator_node(state: AgentState):
@@ -416,6 +1070,19 @@ async def orchestrator_node(state: AgentState):
     # 최신 메시지 위주로 분석
     last_msg = state["messages"][-1]
     
+    # [멀티턴] 이전 대화가 있으면 맥락과 이미 수집한 근거를 보여주고, 근거가 충분한 Worker는 "reuse"로 받아 다시 조회하지 않음
+    context = describe_conversation_context(state)
+    context_section = ""
+    if context:
+        context_section = f"""
+    [이전 대화 맥락]
+    {context}
+    
+    [근거 재사용 규칙]
+    - 위 대화에서 이미 수집한 근거(도구 결과 / Worker 보고서)로 충분한 전문가는 다시 지시하지 말고 "reuse" 목록에 키를 넣으세요. (예: "reuse": ["k8s", "metric"])
+    - 새로 확인해야 하는 부분만 해당 전문가에게 지시하세요.
+    """
+    
     prompt = f"""
     당신은 AIOps 시스템의 '지휘자(Orchestrator)'입니다.
     사용자의 요청을 해결하기 위해 하위 전문가(Worker)들에게 작업을 지시해야 합니다.
@@ -437,7 +1104,7 @@ async def orchestrator_node(state: AgentState):
        
     [사용자 질문]
     {last_msg.content}
-    
+    {context_section}
     [지시 작성 규칙]
     1. 각 전문가에게 시킬 일을 명확한 문장으로 작성하세요.
     2. **핵심 룰**: 사용자의 질문이 "전반적인 진단", "전체 상태 어때?" 처럼 포괄적인(COMPLEX) 경우, **반드시 K8s, Log, Metric 3명의 전문가를 모두 호출**하여 교차 검증할 수 있도록 입체적인 지시를 내리세요. 이때 로그 전문가에게는 **에러(`error`)뿐만 아니라 경고(`warn`)나 'cannot', 'fail'** 같은 이상 징후 키워드도 같이 찾아보라고 지시하세요.
@@ -474,8 +1141,18 @@ async def orchestrator_node(state: AgentState):
     except Exception as e:
         logger.warning(f"⚠️ [Orchestrator] JSON 파싱 실패: {e}")
     
+    # [멀티턴] 재사용할 이전 보고서는 지난 턴에 실제로 받은 Worker만 인정
+    reuse = worker_plans.pop("reuse", None) if isinstance(worker_plans, dict) else None
+    previous_results = map_worker_results(state.get("worker_results") or [])
+    reuse_workers = [
+        key for key in (reuse if isinstance(reuse, list) else [])
+        if key in previous_results and not worker_plans.get(key)
+    ]
+    if reuse_workers:
+        logger.info(f"♻️ [Orchestrator] 이전 턴 보고서 재사용: {reuse_workers}")
+    
     # [안전장치] 만약 파싱 실패하거나 계획이 비어있다면 -> K8s 전문가에게 전체 위임
-    if not worker_plans:
+    if not worker_plans and not reuse_workers:
         logger.warning("⚠️ [Orchestrator] 계획 수립 실패 또는 결과 없음 -> K8s Fallback 모드 작동")
         worker_plans = {
             "k8s": f"사용자의 다음 요청을 스스로 판단하여 해결하시오(Log/Metric 도구 사용 가능시 사용): {last_msg.content}",
@@ -485,6 +1162,7 @@ async def orchestrator_node(state: AgentState):
 
     return {
         "worker_plans": worker_plans, 
+        "reuse_workers": reuse_workers,
         "messages": [AIMessage(content=f"🧠 [Orchestrator] 작업 위임:\n{json.dumps(worker_plans, ensure_ascii=False, indent=2)}")]
     }
 
@@ -509,13 +1187,277 @@ def filter_tools(tools: list, category: str) -> list:
                  filtered.append(t)
     return filtered
 
-async def run_single_worker(worker_name: str, instruction: str, tools: list):
-    """단일 Worker 실행 함수 (독립된 LLM 호출)"""
+
+# [최적화] 도구 결과 로컬 후처리
+# LLM에 넘기기 전에 도구별 구조를 이용해 결과를 압축합니다. (요약 LLM 토큰 절약 + 절단으로 인한 유실 방지)
+def is_log_query_tool(tool_name: str) -> bool:
+    name = tool_name.lower()
+    return "log" in name and "query" in name
+
+
+def is_metric_query_tool(tool_name: str) -> bool:
+    name = tool_name.lower()
+    return "query" in name and not is_log_query_tool(tool_name) and any(k in name for k in ["vm", "prom", "metric"])
+
+
+def is_kubectl_tool(tool_name: str) -> bool:
+    name = tool_name.lower()
+    return "kubectl" in name and any(k in name for k in ["get", "describe", "event"])
+
+
+def is_trace_tool(tool_name: str) -> bool:
+    name = tool_name.lower()
+    return "trace" in name and "service" not in name
+
+
+def has_tool_output_postprocessor(tool_name: str) -> bool:
+    if RUNTIME_LIMITS["log_template_mining_enabled"] and is_log_query_tool(tool_name):
+        return True
+    if RUNTIME_LIMITS["metric_analysis_enabled"] and is_metric_query_tool(tool_name):
+        return True
+    if RUNTIME_LIMITS["k8s_output_parsing_enabled"] and is_kubectl_tool(tool_name):
+        return True
+    if RUNTIME_LIMITS["trace_analysis_enabled"] and is_trace_tool(tool_name):
+        return True
+    return False
+
+
+def postprocess_tool_output(tool_name: str, output: str) -> str:
+    if RUNTIME_LIMITS["log_template_mining_enabled"] and is_log_query_tool(tool_name):
+        compressed = mine_log_templates(
+            output,
+            similarity_threshold=RUNTIME_LIMITS["log_miner_similarity_threshold"],
+            max_templates=RUNTIME_LIMITS["log_miner_max_templates"],
+        )
+        if compressed is not output:
+            logger.info(f"🧬 [LogMiner] {tool_name} 결과 압축: {len(output)}자 -> {len(compressed)}자")
+        return compressed
+    if RUNTIME_LIMITS["metric_analysis_enabled"] and is_metric_query_tool(tool_name):
+        try:
+            analyzed = analyze_metric_output(
+                output,
+                top_k=RUNTIME_LIMITS["metric_top_k"],
+                z_threshold=RUNTIME_LIMITS["metric_zscore_threshold"],
+                downsample_points=RUNTIME_LIMITS["metric_downsample_points"],
+            )
+        except Exception as e:
+            logger.warning(f"⚠️ [MetricAnalyzer] {tool_name} 결과 분석 실패, 원문 사용: {e}")
+            analyzed = None
+        if analyzed:
+            logger.info(f"📊 [MetricAnalyzer] {tool_name} 결과 압축: {len(output)}자 -> {len(analyzed)}자")
+            return analyzed
+    if RUNTIME_LIMITS["k8s_output_parsing_enabled"] and is_kubectl_tool(tool_name):
+        try:
+            parsed = summarize_kubectl_output(
+                output,
+                restart_threshold=RUNTIME_LIMITS["k8s_restart_threshold"],
+                keep_healthy=RUNTIME_LIMITS["k8s_keep_healthy"],
+            )
+        except Exception as e:
+            logger.warning(f"⚠️ [KubectlParser] {tool_name} 결과 파싱 실패, 원문 사용: {e}")
+            parsed = None
+        if parsed:
+            logger.info(f"☸️ [KubectlParser] {tool_name} 결과 압축: {len(output)}자 -> {len(parsed)}자")
+            return parsed
+    if RUNTIME_LIMITS["trace_analysis_enabled"] and is_trace_tool(tool_name):
+        try:
+            report = analyze_trace_output(output, top_n=RUNTIME_LIMITS["trace_analysis_top_n"])
+        except Exception as e:
+            logger.warning(f"⚠️ [TraceAnalyzer] {tool_name} 결과 분석 실패, 원문 사용: {e}")
+            report = None
+        if report:
+            logger.info(f"🛰️ [TraceAnalyzer] {tool_name} 결과 압축: {len(output)}자 -> {len(report)}자")
+            return report
+    return output
+
+
+# [최적화] 잘린 도구 결과 재조회용 합성 도구
+# MCP 서버 도구가 아니므로 filter_tools 분류에는 넣지 않고 Simple 경로/Worker에 별도로 붙입니다.
+_fetch_tool = None
+
+def get_fetch_tools() -> list:
+    global _fetch_tool
+    if not RUNTIME_LIMITS["tool_output_spill_enabled"]:
+        return []
+    if _fetch_tool is None:
+        _fetch_tool = build_fetch_tool()
+    return [_fetch_tool]
+
+
+TRUNCATION_NOTICE_PREFIX = "\n... (⚠️ Output truncated"
+
+
+def fit_fetch_round_messages(messages: list, model_name: str) -> list:
+    """추가 조회 호출 입력이 max_input_tokens를 넘으면 도구 결과 본문을 균등하게 줄입니다. (끝의 ref 안내문은 유지)"""
+    max_input_tokens = INSTRUCT_CONFIG.get("max_input_tokens")
+    if not max_input_tokens or count_messages_tokens(messages, model_name) <= max_input_tokens:
+        return messages
+    tool_indexes = [i for i, m in enumerate(messages) if isinstance(m, ToolMessage)]
+    if not tool_indexes:
+        return messages
+    reserved = count_messages_tokens([m for m in messages if not isinstance(m, ToolMessage)], model_name)
+    per_message = max((max_input_tokens - reserved) // len(tool_indexes), 1)
+    fitted = list(messages)
+    for i in tool_indexes:
+        content = str(fitted[i].content)
+        body, notice = content, ""
+        if TRUNCATION_NOTICE_PREFIX in content:
+            body, notice = content.rsplit(TRUNCATION_NOTICE_PREFIX, 1)
+            notice = TRUNCATION_NOTICE_PREFIX + notice
+        suffix = "\n... (⚠️ max_input_tokens 보호 장치에 의해 절단됨)"
+        notice_tokens = estimate_token_count(notice + suffix, model_name)
+        body = trim_text_to_token_limit(body, max(per_message - notice_tokens, 1), model_name, suffix)
+        fitted[i] = fitted[i].copy(update={"content": body + notice})
+    return fitted
+
+
+async def run_worker_fetch_rounds(worker_name: str, llm, messages: list) -> List[str]:
+    """
+    Worker의 도구 결과 중 잘린 것이 있을 때, 모델이 fetch_tool_output으로
+    필요한 부분만 추가 조회하도록 제한된 횟수(worker_fetch_rounds)만큼 후속 호출을 수행합니다.
+    """
+    fetch_tool = get_fetch_tools()[0]
+    llm_with_fetch = llm.bind_tools([fetch_tool])
+    messages = list(messages) + [HumanMessage(content=(
+        f"위 도구 결과 중 잘린(⚠️ Output truncated) 부분에 지시 수행에 꼭 필요한 정보가 있다면 "
+        f"{FETCH_TOOL_NAME}를 호출하세요. 가능하면 grep 인자로 에러/경고 줄만 조회하세요. "
+        f"필요 없으면 도구를 호출하지 말고 '충분함'이라고만 답하세요."
+    ))]
+
+    extra_outputs = []
+    for _ in range(RUNTIME_LIMITS["worker_fetch_rounds"]):
+        async with get_fanout_llm_semaphore():
+            response = await llm_with_fetch.ainvoke(fit_fetch_round_messages(messages, INSTRUCT_CONFIG["model_name"]))
+        if not response.tool_calls:
+            break
+        messages.append(response)
+        for tc in response.tool_calls:
+            if tc["name"] == FETCH_TOOL_NAME:
+                try:
+                    res_str = str(await fetch_tool.ainvoke(tc["args"]))
+                except Exception as e:
+                    res_str = f"Error: {e}"
+            else:
+                res_str = f"Error: {tc['name']}은(는) 이 단계에서 사용할 수 없습니다."
+            messages.append(ToolMessage(content=res_str, tool_call_id=tc["id"]))
+            extra_outputs.append(f"Tool({FETCH_TOOL_NAME}) Output: {res_str}")
+        logger.info(f"💾 [{worker_name}] 잘린 결과 추가 조회 {len(response.tool_calls)}건")
+    return extra_outputs
+
+
+# [최적화] Worker 내부 fan-out LLM 호출 동시성 제한
+# 청크 요약(Map/Reduce)과 잘린 결과 추가 조회(fetch round)처럼 Worker 하나가 여러 LLM 호출을 만드는 경로만 공유합니다.
+# 라우터/지휘자/Worker 본 호출/심플 에이전트/종합 호출은 요청 단위 레인(scheduler)으로 제한되므로 여기서 잡지 않습니다.
+_fanout_llm_semaphore = None
+
+def get_fanout_llm_semaphore() -> asyncio.Semaphore:
+    global _fanout_llm_semaphore
+    if _fanout_llm_semaphore is None:
+        _fanout_llm_semaphore = asyncio.Semaphore(max(RUNTIME_LIMITS["llm_fanout_max_concurrency"], 1))
+    return _fanout_llm_semaphore
+
+
+def build_worker_summary_prompt(worker_name: str, instruction: str, raw_results: str, length_limit: str) -> str:
+    """Worker 도구 결과 요약 프롬프트 (단일 요약과 청크 Map 단계가 공유)"""
+    return f"""
+        당신은 {worker_name}의 요약 담당자입니다.
+        지휘자(Orchestrator)가 당신에게 내린 원래 임무는 다음과 같습니다:
+        <instruction>
+        {instruction}
+        </instruction>
+    
+        아래는 도구를 실행하여 얻은 날것의 데이터(Raw Data)입니다:
+        <raw_data>
+        {raw_results}
+        </raw_data>
+    
+        **[작업 지시]**
+        1. 오직 위의 <instruction>에 답하는 데 필요한 핵심 팩트만 <raw_data>에서 추출하세요.
+        2. 발견된 에러 문구, 경고, 실패 파드 이름은 절대 누락하지 말고 보존하세요.
+        3. 문장을 엄청 길게 풀어서 설명하지 마시고, "1. API 파드 Pending" 처럼 가독성이 좋은 개조식(Bullet points)으로 작성해주세요.
+        4. 출력 길이는 충분한 장애 진단 정보 제공을 위해 최대 **{length_limit}**까지 허용합니다. 단, 인사말(서론/결론)은 생략하세요.
+        5. 핵심 에러 원문(Stack Trace)만 예외적으로 그대로 붙여넣어 주세요.
+        """
+
+
+def build_partial_merge_prompt(worker_name: str, instruction: str, partials: List[str], length_limit: str) -> str:
+    """청크 부분 요약본 병합(Reduce) 프롬프트"""
+    joined = "\n\n".join(f"<partial>\n{p}\n</partial>" for p in partials)
+    return f"""
+        당신은 {worker_name}의 요약 담당자입니다.
+        지휘자(Orchestrator)가 당신에게 내린 원래 임무는 다음과 같습니다:
+        <instruction>
+        {instruction}
+        </instruction>
+
+        아래는 같은 도구 결과를 여러 조각으로 나눠 요약한 부분 요약본들입니다:
+        {joined}
+
+        **[작업 지시]**
+        1. 부분 요약본들을 하나로 합치세요. 같은 에러/경고는 한 줄로 병합하고 발생 횟수는 합산하세요.
+        2. 서로 다른 에러 문구, 경고, 실패 파드 이름은 하나도 빠뜨리지 말고 모두 남기세요.
+        3. "1. API 파드 Pending" 처럼 개조식으로 작성하고 최대 **{length_limit}**를 넘기지 마세요. 인사말(서론/결론)은 생략하세요.
+        """
+
+
+async def summarize_chunks_map_reduce(worker_name: str, instruction: str, raw_results: str, llm,
+                                      token_budget: Optional[int] = None) -> str:
+    """
+    [최적화] 대용량 도구 결과 청크 Map-Reduce 요약
+    raw 결과를 토큰 한도 청크로 나눠 병렬로 부분 요약(Map)한 뒤,
+    부분 요약들을 fan-in 단위로 묶어 하나가 남을 때까지 계층적으로 합칩니다(Reduce).
+    절단 없이 전체 데이터를 보면서도 총 소요 시간은 청크 1개 요약 시간에 가깝게 유지됩니다.
+    """
+    model_name = INSTRUCT_CONFIG["model_name"]
+    chunks = split_text_into_token_chunks(
+        raw_results, RUNTIME_LIMITS["chunk_summary_max_tokens"], model_name
+    )
+    fan_in = max(RUNTIME_LIMITS["chunk_summary_reduce_fan_in"], 2)
+    # 부분 요약은 fan_in개씩 합쳐지므로 한도를 나눠 주어 Reduce 입력이 최종 한도 수준에 머물게 함
+    length_limit = describe_summary_length(token_budget, raw_results, model_name)
+    partial_limit = length_limit
+    if len(chunks) > 1:
+        partial_limit = describe_summary_length(token_budget, raw_results, model_name, divisor=fan_in)
+    logger.info(f"🧩 [{worker_name}] 청크 요약 시작: {len(raw_results)}자 -> {len(chunks)}개 청크")
+
+    async def invoke_limited(prompt: str) -> str:
+        wait_start = time.time()
+        async with get_fanout_llm_semaphore():
+            record_wait("llm_fanout", wait_start, worker=worker_name)
+            response = await llm.ainvoke([HumanMessage(content=prompt)])
+        return response.content
+
+    partials = await asyncio.gather(
+        *[invoke_limited(build_worker_summary_prompt(
+            worker_name, instruction, f"(전체 도구 결과 중 {i + 1}/{len(chunks)}번째 조각)\n{chunk}", partial_limit
+        )) for i, chunk in enumerate(chunks)]
+    )
+
+    level = 0
+    while len(partials) > 1:
+        level += 1
+        groups = [partials[i:i + fan_in] for i in range(0, len(partials), fan_in)]
+        # 마지막 병합만 최종 한도, 중간 단계는 다음 병합의 입력이므로 부분 한도
+        level_limit = length_limit if len(groups) == 1 else partial_limit
+        partials = await asyncio.gather(
+            *[invoke_limited(build_partial_merge_prompt(worker_name, instruction, group, level_limit))
+              if len(group) > 1 else asyncio.sleep(0, result=group[0])
+              for group in groups]
+        )
+        logger.debug(f"   🧩 [{worker_name}] Reduce 단계 {level}: {len(groups)}개 그룹 -> {len(partials)}개 요약")
+
+    return partials[0] if partials else ""
+
+
+async def run_single_worker(worker_name: str, instruction: str, tools: list, token_budget: Optional[int] = None):
+    """단일 Worker 실행 함수 (독립된 LLM 호출)
+    token_budget: Synthesizer에서 이 Worker 보고서에 배정될 토큰 수 (요약 목표 크기로 사용)
+    """
     if not instruction or not tools:
         return f"[{worker_name}] 실행 안 함 (지시 없음 또는 도구 없음)"
         
     logger.info(f"👷 [{worker_name}] 시작: {instruction}")
-    from config import stream_queue
+    stream_queue = get_stream_queue()
     worker_node_map = {
         "K8sSpecialist": "worker_k8s",
         "MetricSpecialist": "worker_metric",
@@ -560,7 +1502,7 @@ async def run_single_worker(worker_name: str, instruction: str, tools: list):
     - **vm_metrics**: 특정 메트릭 이름을 검색할 때 유용합니다. (주의: 빈 인자로 호출 시 모든 메트릭 이름이 반환되어 데이터가 잘릴 수 있으므로, 구체적인 패턴 검색 시에만 사용)
     
     [VictoriaTraces(vtraces) 도구 가이드]
-    - **vtraces_traces**: TraceQL 또는 필터를 사용해 트레이스를 검색합니다.
+    - **vtraces_traces**: TraceQL 또는 필터를 사용해 트레이스를 검색합니다. (결과는 시스템이 critical path·에러 발원지 리포트로 자동 압축합니다)
     - **vtraces_services**: 트레이싱된 서비스 목록을 봅니다.
     - **vtraces_dependencies**: 서비스 간 의존성 그래프를 봅니다.
     """
@@ -568,11 +1510,15 @@ async def run_single_worker(worker_name: str, instruction: str, tools: list):
         special_instructions = """
     [Kubernetes(k8s) 도구 가이드]
     - **k8s_kubectl_get**: 리소스 목록 조회. 필터(fieldSelector)를 적극 활용해 데이터를 최소화하세요.
-      - **중요**: 대량 조회 시 반드시 `output="name"`이나 `output="custom-columns=NAME:.metadata.name,STATUS:.status.phase"`를 써서 데이터 양을 아끼세요.
+      - **중요**: 대량 조회 시 `output="custom-columns=NAME:.metadata.name,STATUS:.status.phase"`나 기본 표 출력을 쓰세요. 정상(Running/Ready, 재시작 0) 리소스는 시스템이 자동으로 걸러 건수만 전달하므로, 상태 정보가 빠지는 `output="name"`보다 유리합니다.
     - **k8s_kubectl_events** (이벤트 조회): 에러 원인을 찾을 때 `describe`보다 가볍고 빠른 이벤트를 우선 조회하세요. (예: `kubectl get events --field-selector type=Warning`)
     - **k8s_kubectl_describe**: 특정 단일 객체의 원인이 이벤트만으로 안 나올 때 최후의 수단으로만 사용하세요. (출력물이 너무 길어 시스템 속도를 크게 저하시킵니다)
     """
     
+    # [최적화] 백그라운드 헬스 스냅샷에서 출발 (Probe와 같은 조회는 다시 호출하지 않음)
+    snapshot_results = get_worker_snapshot(worker_name)
+    snapshot_section = describe_snapshot_for_prompt(snapshot_results) if snapshot_results else ""
+
     sys_msg = SystemMessage(content=f"""
     당신은 {worker_name}입니다.
     Orchestrator로부터 다음 지시를 받았습니다:
@@ -580,6 +1526,8 @@ async def run_single_worker(worker_name: str, instruction: str, tools: list):
     
     {special_instructions}
     
+    {snapshot_section}
+    
     당신에게 할당된 도구만을 사용하여 지시를 수행하세요.
     - 필요한 정보를 찾았다면 즉시 답변하세요.
     - 도구 실행 결과(Logs, Metrics 등)를 요약해서 보고하세요.
@@ -590,17 +1538,35 @@ async def run_single_worker(worker_name: str, instruction: str, tools: list):
         response = await llm_with_tools.ainvoke([sys_msg])
         
         # 2. 도구 실행 (Tool Call이 있다면)
-        if response.tool_calls:
+        if response.tool_calls or snapshot_results:
             # LangGraph ToolNode를 쓰지 않고 여기서 직접 호출해서 결과를 받음
             # (Worker 내부의 루프를 단순화하기 위함)
             # 하지만 여기서는 간단히 Tool 결과까지 포함해서 반환하도록 함.
             
+            # Worker가 직접 요청한 조회 결과(실시간 + 같은 조회의 스냅샷 대체)가 먼저, 나머지 스냅샷은 전용 한도로 뒤에 붙임
             tool_outputs = []
+            tool_messages = []
+            answered_snapshots = []
             for tc in response.tool_calls:
+                snapshot_hit = lookup_snapshot(tc["name"], tc["args"])
+                if snapshot_hit is not None:
+                    logger.debug(f"   🩺 [{worker_name}] 스냅샷으로 대체: {tc['name']} ({int(snapshot_hit.age)}초 전)")
+                    res_str = postprocess_tool_output(tc["name"], snapshot_hit.output)
+                    if snapshot_hit not in answered_snapshots:
+                        answered_snapshots.append(snapshot_hit)
+                        tool_outputs.append(f"Tool({tc['name']}) Output ({int(snapshot_hit.age)}초 전 스냅샷): {res_str}")
+                    tool_messages.append(ToolMessage(content=res_str, tool_call_id=tc["id"]))
+                    continue
                 # 도구 객체 찾기
                 selected_tool = next((t for t in tools if t.name == tc["name"]), None)
                 if selected_tool:
                     logger.debug(f"   🔨 [{worker_name}] 도구 실행: {tc['name']}")
+                    # 청크 요약 모드이거나 로컬 후처리가 가능한 도구라면 MCP 단계에서 자르지 않고 전체 결과를 받음
+                    # (Worker별 Task 안에서만 적용되므로 Simple 경로의 절단 한도에는 영향 없음)
+                    if RUNTIME_LIMITS["chunked_summary_enabled"] or has_tool_output_postprocessor(tc["name"]):
+                        tool_output_char_limit.set(RUNTIME_LIMITS["worker_tool_max_output_chars"])
+                    else:
+                        tool_output_char_limit.set(None)
                     # 동기/비동기 호출 처리 (LangChain Tool은 보통 run 또는 arun)
                     # 여기서는 간단히 tool.invoke 사용
                     try:
@@ -613,87 +1579,54 @@ async def run_single_worker(worker_name: str, instruction: str, tools: list):
                         res_str = str(res).strip()
                         if not res_str:
                             res_str = "[빈 결과 반환 - 이는 에러가 아니라, 필터 조건(예: Error 상태)에 해당하는 타겟 리소스가 클러스터 내에 단 하나도 없어서 완벽하게 건강함을 의미합니다.]"
+                        else:
+                            res_str = postprocess_tool_output(tc["name"], res_str)
                             
                         tool_outputs.append(f"Tool({tc['name']}) Output: {res_str}")
+                        tool_messages.append(ToolMessage(content=res_str, tool_call_id=tc["id"]))
                     except Exception as te:
                         tool_outputs.append(f"Tool({tc['name']}) Error: {te}")
+                        tool_messages.append(ToolMessage(content=f"Error: {te}", tool_call_id=tc["id"]))
+                else:
+                    tool_messages.append(ToolMessage(content=f"Error: unknown tool {tc['name']}", tool_call_id=tc["id"]))
+
+            # [최적화] 잘린 결과는 스크래치 저장소에 원문이 남아 있으므로, 필요한 부분만 추가 조회
+            if (
+                RUNTIME_LIMITS["worker_fetch_rounds"] > 0
+                and get_fetch_tools()
+                and any(f'{FETCH_TOOL_NAME}(ref="' in m.content for m in tool_messages)
+            ):
+                try:
+                    tool_outputs.extend(
+                        await run_worker_fetch_rounds(worker_name, llm, [sys_msg, response, *tool_messages])
+                    )
+                except Exception as fe:
+                    logger.warning(f"⚠️ [{worker_name}] 잘린 결과 추가 조회 실패: {fe}")
             
+            # 지시와 관련된 스냅샷만 (호출한 도구와 같은 종류의 Probe, 도구 호출 없이 답했으면 해당 분야 전체)
+            report_snapshots = [
+                r for r in relevant_snapshot_results(snapshot_results, response.tool_calls) if r not in answered_snapshots
+            ]
+            snapshot_report = render_snapshot_report(
+                report_snapshots, postprocess_tool_output, RUNTIME_LIMITS["health_snapshot_report_max_chars"]
+            )
+            if answered_snapshots or snapshot_report:
+                await stream_queue.put(
+                    f"EVENT:🩺 [{worker_name}] 헬스 스냅샷 {len(answered_snapshots) + len(report_snapshots)}건 사용"
+                )
+
             # 3. [최적화] Sub-Agent Summarization (Map-Reduce)
             # 도구 결과를 날것 그대로 보내지 않고, Orchestrator의 지시(instruction)에 맞춰 필터링/요약합니다.
             raw_results = "\n\n".join(tool_outputs)
+            report_input = "\n\n".join(part for part in (raw_results, snapshot_report) if part)
             
-            # 토큰 절약을 위해 날것의 데이터가 너무 길면 여기서도 1차 절단 (비상용)
-            max_raw_length = RUNTIME_LIMITS["worker_raw_result_max_chars"]
-            if len(raw_results) > max_raw_length:
-                if "K8sSpecialist" in worker_name:
-                    # K8s describe 결과는 맨 끝에 핵심인 'Events'가 있으므로 뒷부분 위주로 보존
-                    head_quota = min(2000, max_raw_length)
-                    tail_quota = max(0, max_raw_length - head_quota)
-                    original_raw_results = raw_results
-                    raw_results = original_raw_results[:head_quota]
-                    if tail_quota > 0:
-                        raw_results += "\n\n... (중략: 장황한 환경변수/볼륨 데이터 생략) ...\n\n" + original_raw_results[-tail_quota:]
-                elif "LogSpecialist" in worker_name:
-                    # 너무 많이 자르면(4000자) 핵심 에러가 유실될 부작용이 있으므로,
-                    # 여유를 두고 8000자로 늘립니다. (대신 파이프라인에서 limit: 50 등으로 걸러진 상태를 가정)
-                    raw_results = raw_results[:max_raw_length] + "\n... (로그 데이터 길어짐, 이하 생략)"
-                else:
-                    raw_results = raw_results[:max_raw_length] + "\n... (데이터 길어짐)"
-
-            summarize_prompt = f"""
-            당신은 {worker_name}의 요약 담당자입니다.
-            지휘자(Orchestrator)가 당신에게 내린 원래 임무는 다음과 같습니다:
-            <instruction>
-            {instruction}
-            </instruction>
-            
-            아래는 도구를 실행하여 얻은 날것의 데이터(Raw Data)입니다:
-            <raw_data>
-            {raw_results}
-            </raw_data>
-            
-            **[작업 지시]**
-            1. 오직 위의 <instruction>에 답하는 데 필요한 핵심 팩트만 <raw_data>에서 추출하세요.
-            2. 발견된 에러 문구, 경고, 실패 파드 이름은 절대 누락하지 말고 보존하세요.
-            3. 문장을 엄청 길게 풀어서 설명하지 마시고, "1. API 파드 Pending" 처럼 가독성이 좋은 개조식(Bullet points)으로 작성해주세요.
-            4. 출력 길이는 충분한 장애 진단 정보 제공을 위해 최대 **2,000자**까지 허용합니다. 단, 인사말(서론/결론)은 생략하세요.
-            5. 핵심 에러 원문(Stack Trace)만 예외적으로 그대로 붙여넣어 주세요.
-            """
-
-            max_input_tokens = INSTRUCT_CONFIG.get("max_input_tokens")
-            if max_input_tokens:
-                prompt_without_raw_data = summarize_prompt.replace(raw_results, "")
-                reserved_tokens = estimate_token_count(
-                    prompt_without_raw_data, INSTRUCT_CONFIG["model_name"]
-                )
-                available_tokens = max_input_tokens - reserved_tokens
-                if available_tokens < estimate_token_count(raw_results, INSTRUCT_CONFIG["model_name"]):
-                    raw_results = trim_text_to_token_limit(
-                        raw_results,
-                        max(available_tokens, 1),
-                        INSTRUCT_CONFIG["model_name"],
-                        "\n... (⚠️ max_input_tokens 보호 장치에 의해 절단됨)",
-                    )
-                    summarize_prompt = f"""
-            당신은 {worker_name}의 요약 담당자입니다.
-            지휘자(Orchestrator)가 당신에게 내린 원래 임무는 다음과 같습니다:
-            <instruction>
-            {instruction}
-            </instruction>
-            
-            아래는 도구를 실행하여 얻은 날것의 데이터(Raw Data)입니다:
-            <raw_data>
-            {raw_results}
-            </raw_data>
-            
-            **[작업 지시]**
-            1. 오직 위의 <instruction>에 답하는 데 필요한 핵심 팩트만 <raw_data>에서 추출하세요.
-            2. 발견된 에러 문구, 경고, 실패 파드 이름은 절대 누락하지 말고 보존하세요.
-            3. 문장을 엄청 길게 풀어서 설명하지 마시고, "1. API 파드 Pending" 처럼 가독성이 좋은 개조식(Bullet points)으로 작성해주세요.
-            4. 출력 길이는 충분한 장애 진단 정보 제공을 위해 최대 **2,000자**까지 허용합니다. 단, 인사말(서론/결론)은 생략하세요.
-            5. 핵심 에러 원문(Stack Trace)만 예외적으로 그대로 붙여넣어 주세요.
-            """
-            
+            model_name = INSTRUCT_CONFIG["model_name"]
+            length_limit = describe_summary_length(token_budget, report_input, model_name)
+            use_chunked_summary = (
+                RUNTIME_LIMITS["chunked_summary_enabled"]
+                and estimate_token_count(report_input, model_name) > RUNTIME_LIMITS["chunk_summary_max_tokens"]
+            )
+
             logger.debug(f"   📝 [{worker_name}] 도구 결과 요약 중... (Sub-Agent Summarization)")
             
             import time
@@ -702,20 +1635,72 @@ async def run_single_worker(worker_name: str, instruction: str, tools: list):
             
             async def poll_progress(coro):
                 t = asyncio.create_task(coro)
-                # 5초마다 상태(진행 시간) 출력 및 Queue로 전송(UI 스트리밍용)
-                while not t.done():
-                    try:
-                        await asyncio.wait_for(asyncio.shield(t), timeout=5.0)
-                    except asyncio.TimeoutError:
-                        elapsed = int(time.time() - start_time)
-                        m, s = divmod(elapsed, 60)
-                        ts = f"{m}m{s}s" if m > 0 else f"{s}s"
-                        msg = f"⏳ `[{worker_name}]` 계속 요약 중... (running for {ts})"
-                        logger.info(msg)
-                        await stream_queue.put(msg)
-                return t.result()
-                
-            summary_response = await poll_progress(llm.ainvoke([HumanMessage(content=summarize_prompt)]))
+                try:
+                    # 5초마다 상태(진행 시간) 출력 및 Queue로 전송(UI 스트리밍용)
+                    while not t.done():
+                        try:
+                            await asyncio.wait_for(asyncio.shield(t), timeout=5.0)
+                        except asyncio.TimeoutError:
+                            elapsed = int(time.time() - start_time)
+                            m, s = divmod(elapsed, 60)
+                            ts = f"{m}m{s}s" if m > 0 else f"{s}s"
+                            msg = f"⏳ `[{worker_name}]` 계속 요약 중... (running for {ts})"
+                            logger.info(msg)
+                            await stream_queue.put(msg)
+                    return t.result()
+                finally:
+                    # shield는 바깥 취소(클라이언트 연결 끊김)를 요약 Task로 전달하지 않으므로 직접 취소하고 정리될 때까지 대기
+                    if not t.done():
+                        t.cancel()
+                        await asyncio.gather(t, return_exceptions=True)
+
+            if use_chunked_summary:
+                # [최적화] 절단 대신 전체 데이터를 청크로 나눠 병렬 요약 (Map-Reduce)
+                summary_text = await poll_progress(
+                    summarize_chunks_map_reduce(worker_name, instruction, report_input, llm, token_budget)
+                )
+            else:
+                # 토큰 절약을 위해 날것의 데이터가 너무 길면 여기서도 1차 절단 (비상용)
+                max_raw_length = RUNTIME_LIMITS["worker_raw_result_max_chars"]
+                if len(raw_results) > max_raw_length:
+                    if "K8sSpecialist" in worker_name:
+                        # K8s describe 결과는 맨 끝에 핵심인 'Events'가 있으므로 뒷부분 위주로 보존
+                        # (kubectl 파서가 켜져 있으면 대부분 여기까지 오지 않으며, 파싱 불가 형식의 최후 방어선)
+                        head_quota = min(2000, max_raw_length)
+                        tail_quota = max(0, max_raw_length - head_quota)
+                        original_raw_results = raw_results
+                        raw_results = original_raw_results[:head_quota]
+                        if tail_quota > 0:
+                            raw_results += "\n\n... (중략: 장황한 환경변수/볼륨 데이터 생략) ...\n\n" + original_raw_results[-tail_quota:]
+                    elif "LogSpecialist" in worker_name:
+                        # 너무 많이 자르면(4000자) 핵심 에러가 유실될 부작용이 있으므로,
+                        # 여유를 두고 8000자로 늘립니다. (대신 파이프라인에서 limit: 50 등으로 걸러진 상태를 가정)
+                        raw_results = raw_results[:max_raw_length] + "\n... (로그 데이터 길어짐, 이하 생략)"
+                    else:
+                        raw_results = raw_results[:max_raw_length] + "\n... (데이터 길어짐)"
+                # 스냅샷은 자체 한도로 이미 줄였으므로 직접 조회 결과 절단 뒤에 붙임
+                raw_results = "\n\n".join(part for part in (raw_results, snapshot_report) if part)
+
+                summarize_prompt = build_worker_summary_prompt(worker_name, instruction, raw_results, length_limit)
+
+                max_input_tokens = INSTRUCT_CONFIG.get("max_input_tokens")
+                if max_input_tokens:
+                    prompt_without_raw_data = summarize_prompt.replace(raw_results, "")
+                    reserved_tokens = estimate_token_count(
+                        prompt_without_raw_data, INSTRUCT_CONFIG["model_name"]
+                    )
+                    available_tokens = max_input_tokens - reserved_tokens
+                    if available_tokens < estimate_token_count(raw_results, INSTRUCT_CONFIG["model_name"]):
+                        raw_results = trim_text_to_token_limit(
+                            raw_results,
+                            max(available_tokens, 1),
+                            INSTRUCT_CONFIG["model_name"],
+                            "\n... (⚠️ max_input_tokens 보호 장치에 의해 절단됨)",
+                        )
+                        summarize_prompt = build_worker_summary_prompt(worker_name, instruction, raw_results, length_limit)
+            
+                summary_response = await poll_progress(llm.ainvoke([HumanMessage(content=summarize_prompt)]))
+                summary_text = summary_response.content
             
             total_time = int(time.time() - start_time)
             msg_done = f"✅ `[{worker_name}]` 도구 결과 요약 완료! (총 {total_time}초 소요)"
@@ -723,7 +1708,7 @@ async def run_single_worker(worker_name: str, instruction: str, tools: list):
             await stream_queue.put(f'STATUS:{{"nodeId":"{worker_node_id}","status":"success"}}')
             await stream_queue.put(msg_done)
             
-            final_report = f"[{worker_name}] 집중 분석 결과:\n" + summary_response.content
+            final_report = f"[{worker_name}] 집중 분석 결과:\n" + summary_text
             return final_report
         else:
             await stream_queue.put(f'STATUS:{{"nodeId":"{worker_node_id}","status":"success"}}')
@@ -733,6 +1718,11 @@ async def run_single_worker(worker_name: str, instruction: str, tools: list):
         await stream_queue.put(f'STATUS:{{"nodeId":"{worker_node_id}","status":"error","error":{json.dumps(str(e), ensure_ascii=False)}}}')
         return f"[{worker_name}] 에러 발생: {e}"
 
+async def timed_worker(node_id: str, coro):
+    """Worker 실행 시간 기록 (세마포어 대기 이후 실제 실행 구간만 측정)"""
+    with observe_duration(NODE_DURATION, node_id), trace_span(f"node:{node_id}", "node"), stage_scope(node_id):
+        return await coro
+
 async def workers_node(state: AgentState, tools: list):
     """[Workers] Orchestrator의 계획을 받아 병렬로 작업을 수행합니다."""
     plans = state.get("worker_plans", {})
@@ -744,9 +1734,22 @@ async def workers_node(state: AgentState, tools: list):
     
     tasks = []
     
+    # [최적화] Synthesizer 토큰 예산을 미리 나눠 Worker 요약 목표 크기로 전달
+    metric_planned = bool(plans.get("metric") or plans.get("traces"))
+    planned_keys = [
+        key for key in WORKER_RESULT_ORDER
+        if (metric_planned if key == "metric" else plans.get(key))
+    ]
+    question = next(
+        (str(m.content) for m in reversed(state.get("messages", [])) if isinstance(m, HumanMessage)), ""
+    )
+    budgets = plan_worker_token_budgets(question, planned_keys)
+    if budgets:
+        logger.info(f"🎯 [Workers] 요약 토큰 예산: {budgets}")
+
     # 할 일 있는 Worker만 실행
     if plans.get("log"):
-        tasks.append(run_single_worker("LogSpecialist", plans["log"], log_tools))
+        tasks.append(timed_worker("worker_log", run_single_worker("LogSpecialist", plans["log"], log_tools, budgets.get("log"))))
         
     # metric이나 traces 키가 있으면 MetricSpecialist에게 할당 (두 지시가 다 있으면 합침)
     metric_instruction = ""
@@ -756,12 +1759,17 @@ async def workers_node(state: AgentState, tools: list):
         metric_instruction += plans["traces"] + "\n"
         
     if metric_instruction.strip():
-        tasks.append(run_single_worker("MetricSpecialist", metric_instruction.strip(), metric_tools))
+        tasks.append(timed_worker("worker_metric", run_single_worker(
+            "MetricSpecialist", metric_instruction.strip(), metric_tools, budgets.get("metric"))))
         
     if plans.get("k8s"):
-        tasks.append(run_single_worker("K8sSpecialist", plans["k8s"], k8s_tools))
+        tasks.append(timed_worker("worker_k8s", run_single_worker("K8sSpecialist", plans["k8s"], k8s_tools, budgets.get("k8s"))))
         
-    if not tasks:
+    # [멀티턴] Orchestrator가 재사용하기로 한 이전 턴 보고서 (체크포인터에 남아 있는 지난 worker_results)
+    previous_results = map_worker_results(state.get("worker_results") or [])
+    reused = [previous_results[key] for key in state.get("reuse_workers") or [] if key in previous_results]
+    
+    if not tasks and not reused:
         return {"worker_results": ["⚠️ 작업 지시 사항이 없습니다."]}
         
     # [최적화] API Rate Limit 및 Hang 방지를 위한 Semaphore 도입
@@ -769,191 +1777,167 @@ async def workers_node(state: AgentState, tools: list):
     sem = asyncio.Semaphore(2)
     
     async def run_with_semaphore(task_coro):
-        async with sem:
-            # 약간의 시차(Jitter)를 두어 API 융단폭격(Thundering Herd) 방지
-            await asyncio.sleep(0.5) 
-            return await task_coro
+        wait_start = time.time()
+        try:
+            async with sem:
+                record_wait("worker_semaphore", wait_start)
+                # 약간의 시차(Jitter)를 두어 API 융단폭격(Thundering Herd) 방지
+                await asyncio.sleep(0.5) 
+                return await task_coro
+        except asyncio.CancelledError:
+            # 요청 취소로 시작도 못 한 Worker는 코루틴만 닫음 (LLM/MCP 호출 없음)
+            if inspect.getcoroutinestate(task_coro) == inspect.CORO_CREATED:
+                task_coro.close()
+                if metrics_enabled():
+                    CANCELLED_WORK.inc("worker_not_started")
+            raise
 
     # 래핑된 태스크들로 병렬 실행
     safe_tasks = [run_with_semaphore(t) for t in tasks]
-    results = await asyncio.gather(*safe_tasks)
+    results = list(await asyncio.gather(*safe_tasks)) + reused
     
     # 결과 포맷팅
     formatted_results = "\n\n".join(results)
+    reuse_note = f", 이전 턴 보고서 재사용 {len(reused)}건" if reused else ""
     
+    # 보고서 본문도 메시지에 남겨 다음 턴(멀티턴 대화)에서 근거로 재사용
     return {
         "worker_results": results, 
-        "messages": [AIMessage(content=f"👷 [Workers] 작업 완료. (총 {len(results)}건 보고)")]
+        "messages": [AIMessage(
+            content=f"{WORKERS_REPORT_PREFIX} 작업 완료. (총 {len(results)}건 보고{reuse_note})\n\n{formatted_results}"
+        )]
     }
 
 async def synthesizer_node(state: AgentState):
-    """[Synthesizer] Thinking 모델이 도구 실행 결과를 종합하여 최종 답변을 작성합니다."""
-    # 스트리밍 끔 (안정성)
-    thinking_llm = get_thinking_model(stream_prefix="📝 [Synthesizing]")
-    from config import stream_queue
+    """[Synthesizer] 도구 실행 결과를 종합하여 최종 답변을 작성합니다. (난이도에 따라 template/instruct/thinking 선택)"""
+    stream_queue = get_stream_queue()
     await stream_queue.put('STATUS:{"nodeId":"synthesizer","status":"running"}')
     await stream_queue.put("EVENT:📝 [Synthesizer] 최종 종합 시작")
     
     # [최적화] 진단 우선순위 재정렬 및 균등 배분(Fair Share)
     # K8s(기본 상태) -> Metric(현상) -> Log(상세 원인) 순서로 중요도 배치
-    worker_results_dict = {}
-    for res in state.get("worker_results", []):
-        if "[K8sSpecialist]" in res: worker_results_dict["k8s"] = res
-        elif "[MetricSpecialist]" in res: worker_results_dict["metric"] = res
-        elif "[LogSpecialist]" in res: worker_results_dict["log"] = res
-
-    # 각 전문가별 최대 할당 글자 수 (이미 요약본이므로 2,000자면 충분)
-    quota = RUNTIME_LIMITS["worker_summary_quota"]
-    ordered_results = []
-    
-    # 1순위: K8s (기반 정보)
-    if "k8s" in worker_results_dict:
-        res = worker_results_dict["k8s"]
-        if len(res) > quota:
-            res = res[:quota] + "\n... (⚠️ 요약본이 너무 길어 절단됨)"
-        ordered_results.append(res)
-
-    # 2순위: Metric (수치적 징후)
-    if "metric" in worker_results_dict:
-        res = worker_results_dict["metric"]
-        if len(res) > quota:
-            res = res[:quota] + "\n... (⚠️ 요약본이 너무 길어 절단됨)"
-        ordered_results.append(res)
-
-    # 3순위: Log (상세 발생 원인)
-    if "log" in worker_results_dict:
-        res = worker_results_dict["log"]
-        if len(res) > quota:
-            res = res[:quota] + "\n... (⚠️ 요약본이 너무 길어 절단됨)"
-        ordered_results.append(res)
-
-    worker_results_str = "\n\n".join(ordered_results)
-    
-    # [최적화] 전역 컨텍스트 가드 (최종 안전장치) - 요약본이므로 10,000자면 충분
-    max_total_context = RUNTIME_LIMITS["max_total_context"]
-    if len(worker_results_str) > max_total_context:
-        worker_results_str = worker_results_str[:max_total_context] + "\n\n... (⚠️ 전역 보호 장치에 의해 하단 절단됨)"
-    
-    logger.debug(f"   📝 [Synthesizer] 각 전문가의 요약본 취합 완료 (총 길이: {len(worker_results_str)}자)")
+    worker_results_dict = map_worker_results(state.get("worker_results", []))
 
-    prompt = f"""
-    당신은 최종 답변을 정리하는 Synthesizer입니다.
-    Orchestrator가 작업자(Worker)들에게 지시를 내렸고, 그 결과가 아래와 같습니다.
-    이 내용을 종합하여 사용자의 질문에 대한 최종 진단과 답변을 작성하세요.
-    
-    [사용자 질문]
-    {state['messages'][-1].content}
-    
-    [Worker 실행 결과 보고서]
-    {worker_results_str}
-    
-    [작성 규칙]
-    1. 각 전문가의 분석 결과를 인용하여 논리적으로 설명하세요.
-    2. 결과를 바탕으로 원인을 진단하고, 해결책을 제안하세요.
-    2-1. 단, 사용자의 질문이 "목록", "리스트", "이름만", "나열", "조회" 같은 단순 리소스 조회라면 진단문으로 과해석하지 말고 요청한 목록을 간단히 반환하세요.
-    2-2. 단순 목록 요청에서는 "클러스터가 건강하다", "수동 점검이 필요 없다" 같은 건강성 평가를 덧붙이지 마세요. 정말 필요한 경우에만 한 줄 덧붙이세요.
-    3. **핵심 분석 룰**: 도구 실행 결과가 "[빈 결과 반환...]" 형태로 왔다면, 절대 권한 부족이나 통신 장애로 오해하지 마세요! 오류 필터(예: Failed 파드 제한)에 걸리는 안 좋은 리소스가 아예 없어서 클러스터가 매우 건강하다는 뜻입니다. 이를 분석하여 사용자에게 "에러 파드가 하나도 없이 건강하다"고 보고하세요.
-    4. **추가 건강성 룰**: K8s 전문의 보고서가 단순히 파드 이름 목록(`pod/xxx`, `deployment/yyy` 등)만 나열하고 특별한 에러 메시지(CrashLoopBackOff, Pending, Failed 등)가 없다면, 그 리소스들은 정상적으로 띄워져 있는 것(Running)으로 확신하고 설명하세요. "상태를 명확히 알 수 없다"고 애매하게 답변하지 마세요.
-    5. 결과에 실제 에러 문구(Unauthorized, Connection Refused 등)나 알 수 없는 크래시 흔적이 있을 때만 수동 점검을 제안하세요.
-    """
+    # 이번 턴의 사용자 질문 (마지막 메시지는 Workers 보고서이므로 HumanMessage에서 찾음)
+    user_question = next(
+        (str(m.content) for m in reversed(state["messages"]) if isinstance(m, HumanMessage)), ""
+    )
+    # [멀티턴] 이전 대화가 있으면 질문 앞에 맥락을 붙임 (결과 토큰 예산에서도 함께 차감)
+    context = describe_conversation_context(state)
+    question = f"{context}\n\n[현재 질문]\n{user_question}" if context else user_question
+    results_budget = get_synthesizer_results_budget(question)
+    ordered_results = []
 
-    max_input_tokens = THINKING_CONFIG.get("max_input_tokens")
-    if max_input_tokens:
-        prompt_without_results = f"""
-    당신은 최종 답변을 정리하는 Synthesizer입니다.
-    Orchestrator가 작업자(Worker)들에게 지시를 내렸고, 그 결과가 아래와 같습니다.
-    이 내용을 종합하여 사용자의 질문에 대한 최종 진단과 답변을 작성하세요.
-    
-    [사용자 질문]
-    {state['messages'][-1].content}
-    
-    [Worker 실행 결과 보고서]
-    
-    [작성 규칙]
-    1. 각 전문가의 분석 결과를 인용하여 논리적으로 설명하세요.
-    2. 결과를 바탕으로 원인을 진단하고, 해결책을 제안하세요.
-    2-1. 단, 사용자의 질문이 "목록", "리스트", "이름만", "나열", "조회" 같은 단순 리소스 조회라면 진단문으로 과해석하지 말고 요청한 목록을 간단히 반환하세요.
-    2-2. 단순 목록 요청에서는 "클러스터가 건강하다", "수동 점검이 필요 없다" 같은 건강성 평가를 덧붙이지 마세요. 정말 필요한 경우에만 한 줄 덧붙이세요.
-    3. **핵심 분석 룰**: 도구 실행 결과가 "[빈 결과 반환...]" 형태로 왔다면, 절대 권한 부족이나 통신 장애로 오해하지 마세요! 오류 필터(예: Failed 파드 제한)에 걸리는 안 좋은 리소스가 아예 없어서 클러스터가 매우 건강하다는 뜻입니다. 이를 분석하여 사용자에게 "에러 파드가 하나도 없이 건강하다"고 보고하세요.
-    4. **추가 건강성 룰**: K8s 전문의 보고서가 단순히 파드 이름 목록(`pod/xxx`, `deployment/yyy` 등)만 나열하고 특별한 에러 메시지(CrashLoopBackOff, Pending, Failed 등)가 없다면, 그 리소스들은 정상적으로 띄워져 있는 것(Running)으로 확신하고 설명하세요. "상태를 명확히 알 수 없다"고 애매하게 답변하지 마세요.
-    5. 결과에 실제 에러 문구(Unauthorized, Connection Refused 등)나 알 수 없는 크래시 흔적이 있을 때만 수동 점검을 제안하세요.
-    """
-        reserved_tokens = estimate_token_count(
-            prompt_without_results, THINKING_CONFIG["model_name"]
+    if results_budget is not None:
+        # [최적화] 토큰 예산 배분: 실제 필요량(요약본 토큰 수) 기준 water-filling
+        # 짧은 보고서가 남긴 예산은 긴 보고서에 재분배되므로 고정 쿼터보다 절단이 줄어듭니다.
+        model_name = THINKING_CONFIG["model_name"]
+        needs = {
+            key: estimate_token_count(worker_results_dict[key], model_name)
+            for key in WORKER_RESULT_ORDER if key in worker_results_dict
+        }
+        budgets = allocate_token_budgets(needs, results_budget, RUNTIME_LIMITS["worker_budget_weights"])
+        logger.info(
+            f"🎯 [Synthesizer] 토큰 예산 {results_budget}: "
+            + ", ".join(f"{key} {needs[key]}->{budgets[key]}" for key in needs)
         )
-        available_tokens = max_input_tokens - reserved_tokens
-        if available_tokens < estimate_token_count(
-            worker_results_str, THINKING_CONFIG["model_name"]
-        ):
-            worker_results_str = trim_text_to_token_limit(
-                worker_results_str,
-                max(available_tokens, 1),
-                THINKING_CONFIG["model_name"],
-                "\n\n... (⚠️ max_input_tokens 보호 장치에 의해 절단됨)",
-            )
-            prompt = f"""
-    당신은 최종 답변을 정리하는 Synthesizer입니다.
-    Orchestrator가 작업자(Worker)들에게 지시를 내렸고, 그 결과가 아래와 같습니다.
-    이 내용을 종합하여 사용자의 질문에 대한 최종 진단과 답변을 작성하세요.
-    
-    [사용자 질문]
-    {state['messages'][-1].content}
-    
-    [Worker 실행 결과 보고서]
-    {worker_results_str}
+        for key in needs:
+            ordered_results.append(trim_text_to_token_limit(
+                worker_results_dict[key],
+                budgets[key],
+                model_name,
+                "\n... (⚠️ 토큰 예산 초과로 절단됨)",
+            ))
+        worker_results_str = "\n\n".join(ordered_results)
+    else:
+        # max_input_tokens 미설정 시 기존 문자 수 쿼터 사용
+        # 각 전문가별 최대 할당 글자 수 (이미 요약본이므로 2,000자면 충분)
+        quota = RUNTIME_LIMITS["worker_summary_quota"]
+        for key in WORKER_RESULT_ORDER:
+            if key in worker_results_dict:
+                res = worker_results_dict[key]
+                if len(res) > quota:
+                    res = res[:quota] + "\n... (⚠️ 요약본이 너무 길어 절단됨)"
+                ordered_results.append(res)
+
+        worker_results_str = "\n\n".join(ordered_results)
+
+        # [최적화] 전역 컨텍스트 가드 (최종 안전장치) - 요약본이므로 10,000자면 충분
+        max_total_context = RUNTIME_LIMITS["max_total_context"]
+        if len(worker_results_str) > max_total_context:
+            worker_results_str = worker_results_str[:max_total_context] + "\n\n... (⚠️ 전역 보호 장치에 의해 하단 절단됨)"
     
-    [작성 규칙]
-    1. 각 전문가의 분석 결과를 인용하여 논리적으로 설명하세요.
-    2. 결과를 바탕으로 원인을 진단하고, 해결책을 제안하세요.
-    2-1. 단, 사용자의 질문이 "목록", "리스트", "이름만", "나열", "조회" 같은 단순 리소스 조회라면 진단문으로 과해석하지 말고 요청한 목록을 간단히 반환하세요.
-    2-2. 단순 목록 요청에서는 "클러스터가 건강하다", "수동 점검이 필요 없다" 같은 건강성 평가를 덧붙이지 마세요. 정말 필요한 경우에만 한 줄 덧붙이세요.
-    3. **핵심 분석 룰**: 도구 실행 결과가 "[빈 결과 반환...]" 형태로 왔다면, 절대 권한 부족이나 통신 장애로 오해하지 마세요! 오류 필터(예: Failed 파드 제한)에 걸리는 안 좋은 리소스가 아예 없어서 클러스터가 매우 건강하다는 뜻입니다. 이를 분석하여 사용자에게 "에러 파드가 하나도 없이 건강하다"고 보고하세요.
-    4. **추가 건강성 룰**: K8s 전문의 보고서가 단순히 파드 이름 목록(`pod/xxx`, `deployment/yyy` 등)만 나열하고 특별한 에러 메시지(CrashLoopBackOff, Pending, Failed 등)가 없다면, 그 리소스들은 정상적으로 띄워져 있는 것(Running)으로 확신하고 설명하세요. "상태를 명확히 알 수 없다"고 애매하게 답변하지 마세요.
-    5. 결과에 실제 에러 문구(Unauthorized, Connection Refused 등)나 알 수 없는 크래시 흔적이 있을 때만 수동 점검을 제안하세요.
-    """
+    logger.debug(f"   📝 [Synthesizer] 각 전문가의 요약본 취합 완료 (총 길이: {len(worker_results_str)}자)")
+
+    prompt = build_synthesizer_prompt(question, worker_results_str)
     
     # [최적화] Synthesizer는 직전 맥락(질문)을 포함
     messages = [HumanMessage(content=prompt)]
-    
-    response = await thinking_llm.ainvoke(messages)
-    
-    # [최적화] 태그 제거 후 저장
-    response.content = remove_thinking_tags(response.content)
+
+    # [최적화] 적응형 모델 선택: 에러 징후가 없거나 단순 목록이면 Thinking 모델을 건너뜀
+    listing = is_listing_request(user_question)
+    result_tokens = estimate_token_count(worker_results_str, THINKING_CONFIG["model_name"])
+    decision = choose_synthesis_tier(worker_results_dict, result_tokens, listing)
+    await stream_queue.put(f"EVENT:🧭 [Synthesizer] {decision.tier} 모델로 종합 ({decision.reason})")
+    start_time = time.time()
+
+    if decision.tier == TIER_TEMPLATE:
+        answer = render_template_answer(worker_results_dict, WORKER_RESULT_ORDER, listing)
+        response = AIMessage(content=answer)
+        await emit_final_answer(answer)
+    elif decision.tier == TIER_INSTRUCT:
+        response = await get_instruct_model().ainvoke(messages)
+        response.content = remove_thinking_tags(response.content)
+        await emit_final_answer(response.content)
+    else:
+        # Thinking 모델은 스트리밍 콜백으로 답변 토큰을 바로 전송 (요청별 추론 토큰 예산 적용)
+        thinking_budget = state.get("thinking_budget")
+        if thinking_budget is None:
+            thinking_budget = resolve_thinking_budget()
+        response = await invoke_thinking_with_budget(messages, thinking_budget)
+        # [최적화] 태그 제거 후 저장
+        response.content = remove_thinking_tags(response.content)
+
+    log_synthesis_result(decision, time.time() - start_time)
     
     return {"messages": [response]}
 
 # =================================================================
 # 4. 그래프 생성 함수
 # =================================================================
-def create_agent_app(tools: list):
+def create_agent_app(tools: list, checkpointer=None):
+    """checkpointer(conversation_store)를 넘기면 thread_id별로 대화 상태를 이어 쓰는 멀티턴 그래프"""
     workflow = StateGraph(AgentState)
     
     # 노드 등록
-    workflow.add_node("router", router_node)
+    # (노드 실행 시간은 timed_node로 감싸 /metrics의 agent_node_duration_seconds에 기록)
+    workflow.add_node("memory", timed_node("memory", compact_conversation_node))
+    workflow.add_node("router", timed_node("router", router_node))
     
     # 1. Simple Path 노드
     async def simple_agent_wrapper(state):
         return await simple_agent_node(state, tools)
-    workflow.add_node("simple_agent", simple_agent_wrapper)
+    workflow.add_node("simple_agent", timed_node("simple_agent", simple_agent_wrapper))
     
     # 2. Complex Path 노드들 (Orchestrator-Workers)
     async def orchestrator_wrapper(state):
         return await orchestrator_node(state)
-    workflow.add_node("orchestrator", orchestrator_wrapper)
+    workflow.add_node("orchestrator", timed_node("orchestrator", orchestrator_wrapper))
     
     async def workers_wrapper(state):
         return await workers_node(state, tools)
-    workflow.add_node("workers", workers_wrapper)
+    workflow.add_node("workers", timed_node("workers", workers_wrapper))
     
-    workflow.add_node("synthesizer", synthesizer_node)
+    workflow.add_node("synthesizer", timed_node("synthesizer", synthesizer_node))
     
     # 3. 도구 실행 노드 (Simple Mode용)
-    workflow.add_node("tools", ToolNode(tools))
+    workflow.add_node("tools", ToolNode(tools + get_fetch_tools()))
 
     # --- 엣지(Edge) 연결 ---
     
-    # 시작 -> 라우터
-    workflow.add_edge(START, "router")
+    # 시작 -> 이전 대화 압축 -> 라우터
+    workflow.add_edge(START, "memory")
+    workflow.add_edge("memory", "router")
     
     # 라우터 -> 분기
     def route_decision(state):
@@ -980,4 +1964,4 @@ def create_agent_app(tools: list):
     # Synthesizer -> END
     workflow.add_edge("synthesizer", END)
 
-    return workflow.compile()
+    return workflow.compile(checkpointer=checkpointer)
@@ -0,0 +1,174 @@
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+from config import RUNTIME_LIMITS, logger
+from metrics import ANSWER_CACHE_LOOKUPS, metrics_enabled
+
+# =================================================================
+# 최종 답변 캐시 (같은 질문 반복 대응)
+# -----------------------------------------------------------------
+# 대시보드/온콜 엔지니어가 "클러스터 전체 상태 진단해줘" 같은 질문을 분당 여러 번 보내면
+# 매번 router → orchestrator → workers → synthesizer 전체가 다시 돕니다.
+# 정규화한 질문(+추론 예산)을 키로 최종 답변을 보관하고, 경로별 신선도(TTL) 안에서는 그래프를 건너뜁니다.
+#   - simple(목록 조회)  : answer_cache_ttl_simple_seconds (기본 60초)
+#   - complex(진단/분석) : answer_cache_ttl_complex_seconds (기본 20초, 상태가 빨리 바뀌므로 짧게)
+# 항목 수는 answer_cache_max_entries로 제한하며 LRU 순서로 밀어냅니다.
+# 캐시 응답에는 데이터 나이를 알리는 안내 문구 + (JSON) cached/cache_age_s + (HTTP) X-Cache/Age 헤더를 붙입니다.
+# 나이와 TTL은 답변을 저장한 시각이 아니라 요청이 시작된 시각(도구 조회 이전)부터 셉니다.
+# complex 경로는 실행에만 수십 초가 걸리므로, 저장 시각 기준이면 데이터 나이를 그만큼 적게 알리게 됩니다.
+# =================================================================
+
+_PUNCT_TAIL = re.compile(r"[\s?!.。…~]+$")
+_SPACES = re.compile(r"\s+")
+
+# 스트리밍 재생 시 한 Chunk 크기 (UI 렌더링이 점진적으로 보이도록만 나눔, 인위적 지연 없음)
+REPLAY_CHUNK_CHARS = 64
+
+
+def normalize_question(text: str) -> str:
+    """대소문자/전각/공백/끝 문장부호 차이를 무시한 질문 키"""
+    normalized = unicodedata.normalize("NFKC", text or "").lower().strip()
+    normalized = _SPACES.sub(" ", normalized)
+    return _PUNCT_TAIL.sub("", normalized)
+
+
+def make_cache_key(user_input: str, thinking_budget: Optional[int]) -> str:
+    # 추론 예산이 다르면 답변 깊이가 다르므로 별도 항목
+    return f"{normalize_question(user_input)}|{thinking_budget}"
+
+
+class CachedAnswer:
+    __slots__ = ("key", "route", "answer", "extra", "stored_at", "expires_at", "hits")
+
+    def __init__(self, key: str, route: str, answer: str, extra: Dict, ttl: float, requested_at: Optional[float] = None):
+        self.key = key
+        self.route = route
+        self.answer = answer
+        self.extra = extra
+        # 답변 근거 데이터의 기준 시각 (요청 시작, 없으면 저장 시각)
+        self.stored_at = requested_at if requested_at is not None else time.time()
+        self.expires_at = self.stored_at + ttl
+        self.hits = 0
+
+    @property
+    def age(self) -> float:
+        return time.time() - self.stored_at
+
+    def notice(self) -> str:
+        return f"⚡ [캐시] {int(self.age)}초 전에 조회한 결과입니다.\n\n"
+
+    def replay_chunks(self) -> List[str]:
+        text = self.notice() + self.answer
+        return [text[i:i + REPLAY_CHUNK_CHARS] for i in range(0, len(text), REPLAY_CHUNK_CHARS)]
+
+
+class AnswerCache:
+    """경로별 TTL + 항목 수 제한 LRU"""
+
+    def __init__(self, max_entries: Optional[int] = None):
+        self._max_entries = max_entries
+        self._entries: "OrderedDict[str, CachedAnswer]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def max_entries(self) -> int:
+        return self._max_entries if self._max_entries is not None else RUNTIME_LIMITS["answer_cache_max_entries"]
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str) -> Optional[CachedAnswer]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry.expires_at <= time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            entry.hits += 1
+            return entry
+
+    def put(self, key: str, route: str, answer: str, extra: Optional[Dict] = None,
+            requested_at: Optional[float] = None) -> Optional[CachedAnswer]:
+        ttl = route_ttl(route)
+        if ttl <= 0 or not answer:
+            return None
+        entry = CachedAnswer(key, route, answer, extra or {}, ttl, requested_at)
+        if entry.expires_at <= time.time():
+            # 실행이 TTL보다 오래 걸렸으면 저장 시점에 이미 신선하지 않음
+            return None
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return entry
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+def route_ttl(route: str) -> float:
+    if route == "complex":
+        return RUNTIME_LIMITS["answer_cache_ttl_complex_seconds"]
+    return RUNTIME_LIMITS["answer_cache_ttl_simple_seconds"]
+
+
+answer_cache = AnswerCache()
+
+
+def answer_cache_enabled() -> bool:
+    return RUNTIME_LIMITS["answer_cache_enabled"]
+
+
+def wants_fresh(data: dict, headers) -> bool:
+    """요청 본문 no_cache=true 또는 Cache-Control: no-cache 이면 캐시를 건너뛰고 새로 실행"""
+    if data.get("no_cache"):
+        return True
+    cache_control = (headers.get("cache-control") or "").lower()
+    return "no-cache" in cache_control or "no-store" in cache_control
+
+
+def lookup_answer(key: str, bypass: bool = False) -> Optional[CachedAnswer]:
+    if not answer_cache_enabled():
+        return None
+    if bypass:
+        result, entry = "bypass", None
+    else:
+        entry = answer_cache.get(key)
+        result = "hit" if entry is not None else "miss"
+    if metrics_enabled():
+        ANSWER_CACHE_LOOKUPS.inc(result)
+    if entry is not None:
+        logger.info(f"⚡ [AnswerCache] 캐시 적중 ({entry.route}, {entry.age:.1f}초 전 답변, 적중 {entry.hits}회)")
+    return entry
+
+
+def is_cacheable_answer(message) -> bool:
+    """오류/중단 안내나 도구 호출이 남은 메시지는 보관하지 않습니다."""
+    content = getattr(message, "content", "")
+    if not isinstance(content, str) or not content.strip():
+        return False
+    if getattr(message, "tool_calls", None):
+        return False
+    return not content.lstrip().startswith(("⚠️", "❌", "✅ [System]"))
+
+
+def store_answer(key: Optional[str], route: Optional[str], message, requested_at: Optional[float] = None) -> None:
+    """key가 None이면(대화 맥락이 있는 요청) 보관하지 않습니다.
+    requested_at(time.time())은 요청 시작 시각으로, 캐시 나이와 TTL의 기준이 됩니다.
+    """
+    if not answer_cache_enabled() or not key or not route or not is_cacheable_answer(message):
+        return
+    extra = {}
+    thinking_usage = getattr(message, "response_metadata", {}).get("thinking_usage")
+    if thinking_usage:
+        extra["thinking_usage"] = thinking_usage
+    if answer_cache.put(key, route, message.content, extra, requested_at) is not None:
+        logger.debug(f"⚡ [AnswerCache] 답변 저장 ({route}, TTL {route_ttl(route)}초, 항목 {len(answer_cache)}개)")
@@ -1,6 +1,7 @@
 import asyncio
-from fastapi import FastAPI, Request
-from fastapi.responses import StreamingResponse
+from fastapi import FastAPI, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from starlette.background import BackgroundTask
 import uvicorn
 from langchain_core.messages import HumanMessage
 import json
@@ -9,25 +10,90 @@ import warnings
 # Pydantic 필드 이름 충돌 경고 무시
 warnings.filterwarnings("ignore", category=UserWarning, module="pydantic")
 
-from config import MCP_SERVERS, logger
+from config import MCP_SERVERS, RUNTIME_LIMITS, logger
 from mcp_client import MCPClient
-from agent_graph import create_agent_app
+from agent_graph import create_agent_app, estimate_route, resolve_thinking_budget
+from tool_output_store import tool_output_scope
+from metrics import (
+    CANCELLED_WORK, CONTENT_TYPE_LATEST, HEALTH_SNAPSHOT_AGE, MCP_SESSION_UP, MCP_TOOLS_LOADED, QUEUE_DEPTH, REGISTRY,
+    SCHEDULER_LANE_ACTIVE,
+    metrics_enabled, render_latest, track_inflight,
+)
+from request_trace import get_trace, list_traces, new_request_id, request_trace_scope
+from session_recorder import session_recording_scope
+from answer_cache import lookup_answer, make_cache_key, store_answer, wants_fresh
+from health_snapshot import health_snapshot, health_snapshot_enabled, run_health_snapshot_loop
+from scheduler import LaneFullError, request_scheduler, scheduler_enabled
+from stream_channel import get_stream_queue, pending_stream_events, stream_queue_scope
+from shared_tool_cache import SharedToolCache, shared_tool_cache_scope
+from conversation_store import (
+    ConversationRequest,
+    close_conversation_store,
+    conversation_enabled,
+    get_conversation_store,
+    parse_conversation,
+)
+from sse_encoding import (
+    FINISH_STOP_CHUNK,
+    OPENAI_DONE_CHUNK,
+    OpenAIStreamEncoder,
+    make_all_idle_chunks,
+    make_data_status,
+    make_text_chunk,
+    new_completion_id,
+)
 
 from contextlib import asynccontextmanager
+from typing import Dict, List, Optional
+import time
 
 
-STREAM_NODE_IDS = [
-    "start",
-    "router",
-    "simple_agent",
-    "orchestrator",
-    "worker_k8s",
-    "worker_metric",
-    "worker_log",
-    "synthesizer",
-    "agent",
-    "end",
-]
+# 토큰 Flush 간격 (초): 모은 토큰을 이 주기로 한 번에 송출
+STREAM_CHAT_FLUSH_INTERVAL = 0.1
+OPENAI_FLUSH_INTERVAL = 0.05
+
+def stream_headers(request_id: str, cache_status: str = "MISS", age: int = None, conversation_id: str = None):
+    headers = {
+        "Cache-Control": "no-cache",
+        "Connection": "keep-alive",
+        "X-Accel-Buffering": "no", # Nginx/K8s Ingress의 SSE 버퍼링 강제 비활성화
+        "X-Request-Id": request_id,
+        "X-Cache": cache_status,
+    }
+    if age is not None:
+        headers["Age"] = str(age)
+    if conversation_id:
+        headers["X-Conversation-Id"] = conversation_id
+    return headers
+
+
+# 답변 캐시 적중 시 스트리밍 재생 (그래프 실행 없이 같은 프로토콜로 바로 전송)
+def replay_stream_chat(cached):
+    for chunk in make_all_idle_chunks():
+        yield chunk
+    yield make_data_status("start", "success")
+    yield make_data_status("router", "success")
+    yield make_data_status("simple_agent" if cached.route == "simple" else "synthesizer", "success")
+    yield make_data_status("agent", "success")
+    yield make_data_status("end", "success")
+    for piece in cached.replay_chunks():
+        yield make_text_chunk(piece)
+    yield FINISH_STOP_CHUNK
+
+
+def replay_openai_stream(cached, encoder: OpenAIStreamEncoder):
+    for piece in cached.replay_chunks():
+        yield encoder.chunk(piece)
+    yield encoder.stop_chunk
+    yield OPENAI_DONE_CHUNK
+
+
+def request_thinking_budget(data: dict) -> int:
+    """요청 본문의 thinking_budget / slo_tier / reasoning_effort(OpenAI 호환)로 추론 토큰 예산을 정합니다."""
+    return resolve_thinking_budget(
+        data.get("thinking_budget"),
+        data.get("slo_tier") or data.get("reasoning_effort"),
+    )
 
 
 def collect_all_tools(clients_dict):
@@ -37,10 +103,147 @@ def collect_all_tools(clients_dict):
     return all_tools
 
 
+@asynccontextmanager
+async def request_scope(request_id: str, endpoint: str, user_input: str, inputs: dict):
+    """요청 하나의 타임라인 / 도구 결과 저장소 / 동시 요청 수 / 세션 녹화 범위"""
+    async with request_trace_scope(request_id, endpoint, user_input):
+        with tool_output_scope(request_id), track_inflight(endpoint):
+            async with session_recording_scope(request_id, endpoint, user_input, inputs,
+                                               lambda: collect_all_tools(mcp_clients)):
+                yield
+
+
+def admit_request(inputs: dict):
+    """[최적화] 질문 문구로 Lane(simple/complex)을 추정해 자리를 잡습니다. 대기열이 가득 차면 LaneFullError.
+    LLM을 부르지 않으므로 거절될 요청에 Router 비용이 들지 않습니다. 실제 경로는 Lane 슬롯 안에서 그래프의 Router가
+    (요청 타임라인/녹화 범위 안에서, 멀티턴이면 이전 대화와 함께) 결정합니다.
+    """
+    if not scheduler_enabled():
+        return None
+    return request_scheduler.reserve(estimate_route(str(inputs["messages"][-1].content)))
+
+
+def lane_full_response(error: LaneFullError, request_id: str):
+    return JSONResponse(
+        status_code=429,
+        content={"error": str(error), "lane": error.lane, "retry_after": error.retry_after},
+        headers={"Retry-After": str(error.retry_after), "X-Request-Id": request_id},
+    )
+
+
+@asynccontextmanager
+async def lane_slot(ticket, notify: bool = False):
+    """Lane 실행 슬롯을 기다렸다가 끝나면 반납 (request_scope 안에서 쓰면 대기 구간이 타임라인에 남음)"""
+    if ticket is None:
+        yield
+        return
+    try:
+        if notify and ticket.granted_at is None:
+            await get_stream_queue().put(f"EVENT:🚦 `[Scheduler]` {ticket.lane.name} 대기열에서 순서를 기다리는 중...")
+        await ticket.wait()
+        yield
+    finally:
+        ticket.release()
+
+
+async def cancel_graph_task(graph_task):
+    """끝나지 않은 그래프 Task를 취소하고 정리될 때까지 기다립니다.
+    취소는 Worker Task(gather), 요약 Task, LLM 스트림(HTTP 연결 종료), 대기 중인 MCP 호출까지 전파됩니다.
+    """
+    if graph_task is None or graph_task.done():
+        return
+    graph_task.cancel()
+    if metrics_enabled():
+        CANCELLED_WORK.inc("request")
+    await asyncio.gather(graph_task, return_exceptions=True)
+
+
+class ClientDisconnected(asyncio.CancelledError):
+    """응답을 받을 클라이언트가 떠나 요청을 취소함 (타임라인에는 cancelled로 기록)"""
+
+
+async def wait_disconnect(request: Request):
+    """http.disconnect 메시지가 올 때까지 대기 (요청당 Watcher Task 하나로 사용)"""
+    while (await request.receive())["type"] != "http.disconnect":
+        pass
+
+
+async def run_until_disconnect(request: Request, coro):
+    """[최적화] 일반 JSON 엔드포인트: 응답을 기다리던 클라이언트가 떠나면 그래프 실행을 취소합니다."""
+    task = asyncio.create_task(coro)
+    watcher = asyncio.create_task(wait_disconnect(request))
+    try:
+        await asyncio.wait({task, watcher}, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        watcher.cancel()
+        await cancel_graph_task(task)
+    if task.cancelled():
+        raise ClientDisconnected()
+    return task.result()
+
+
+class StreamEventReader:
+    """[최적화] SSE 생성기용 stream_queue 소비자
+    - 연결 끊김은 Watcher Task 하나가 감지 (메시지마다 request.is_disconnected()를 부르지 않음)
+    - 큐에 이미 쌓인 메시지는 한 번에 꺼내 묶음으로 반환 → 생성기는 묶음당 한 번만 write
+    - 대기는 get Task를 재사용하는 asyncio.wait 하나 (메시지마다 wait_for 타이머/Task를 만들지 않음)
+    """
+
+    def __init__(self, request: Optional[Request], queue: asyncio.Queue):
+        self._queue = queue
+        # request가 없으면(WebSocket 질문) 끊김 감지는 호출자 Task 취소로 대신함
+        if request is not None:
+            self._watcher = asyncio.create_task(wait_disconnect(request))
+        else:
+            self._watcher = asyncio.get_running_loop().create_future()
+        self._getter: Optional[asyncio.Task] = None
+
+    @property
+    def disconnected(self) -> bool:
+        return self._watcher.done()
+
+    def _drain(self, batch: List[str]) -> List[str]:
+        # EOF 뒤로는 꺼내지 않음
+        while batch[-1] != "EOF":
+            try:
+                batch.append(self._queue.get_nowait())
+            except asyncio.QueueEmpty:
+                break
+        return batch
+
+    async def next_batch(self, timeout: Optional[float]) -> Optional[List[str]]:
+        """쌓인 메시지 묶음을 반환합니다. timeout 동안 아무것도 없으면 [], 연결이 끊겼으면 None"""
+        if self.disconnected:
+            return None
+        if self._getter is None:
+            try:
+                return self._drain([self._queue.get_nowait()])
+            except asyncio.QueueEmpty:
+                self._getter = asyncio.ensure_future(self._queue.get())
+        done, _ = await asyncio.wait(
+            {self._getter, self._watcher}, timeout=timeout, return_when=asyncio.FIRST_COMPLETED
+        )
+        if self._watcher in done:
+            return None
+        if self._getter not in done:
+            # 타임아웃: get Task는 다음 호출에서 그대로 이어서 기다림
+            return []
+        first, self._getter = self._getter.result(), None
+        return self._drain([first])
+
+    def close(self) -> None:
+        self._watcher.cancel()
+        if self._getter is not None:
+            self._getter.cancel()
+
+
 async def rebuild_agent_app(reason: str):
-    global agent_app
+    global agent_app, conversation_agent_app
     all_tools = collect_all_tools(mcp_clients)
     agent_app = create_agent_app(all_tools)
+    if conversation_enabled():
+        # 대화 저장소는 그대로 두고 그래프만 다시 만들므로 도구 목록이 바뀌어도 대화는 이어짐
+        conversation_agent_app = create_agent_app(all_tools, checkpointer=get_conversation_store())
     logger.info(
         f"🔁 [System] MCP tool set 갱신 완료 ({reason}) - 서버 {len(mcp_clients)}개, 도구 {len(all_tools)}개 사용 가능"
     )
@@ -64,11 +267,43 @@ async def reconcile_mcp_clients():
             except Exception as e:
                 logger.warning(f"⚠️ [System] MCP 백그라운드 재연결 실패 ({name}): {e}")
 
+def select_agent_app(conversation: ConversationRequest):
+    """conversation_id가 있으면 체크포인터가 붙은 멀티턴 그래프, 없으면 기존 그래프"""
+    return conversation_agent_app if conversation.conversation_id else agent_app
+
+
+def answer_cache_lookup(user_input: str, thinking_budget, conversation: ConversationRequest, bypass: bool):
+    """(캐시 키, 적중 항목). 이전 대화에 따라 답이 달라지는 요청은 캐시 키 없이 조회/저장을 건너뜀"""
+    if conversation.has_context:
+        return None, lookup_answer(None, bypass=True)
+    cache_key = make_cache_key(user_input, thinking_budget)
+    return cache_key, lookup_answer(cache_key, bypass=bypass)
+
+
+def collect_runtime_gauges():
+    """/metrics 스크레이프 시점에 큐 길이와 MCP 세션 상태를 채웁니다."""
+    from agent_graph import get_fanout_llm_semaphore
+    QUEUE_DEPTH.set("stream_queue", value=pending_stream_events())
+    fanout_semaphore = get_fanout_llm_semaphore()
+    QUEUE_DEPTH.set("llm_fanout_waiters", value=len(getattr(fanout_semaphore, "_waiters", None) or ()))
+    for server_conf in MCP_SERVERS:
+        client = mcp_clients.get(server_conf["name"])
+        MCP_SESSION_UP.set(server_conf["name"], value=1 if client and client.session else 0)
+        MCP_TOOLS_LOADED.set(server_conf["name"], value=len(client.tools) if client else 0)
+    for name, lane in request_scheduler.lanes.items():
+        QUEUE_DEPTH.set(f"lane_{name}", value=len(lane.waiters))
+        SCHEDULER_LANE_ACTIVE.set(name, value=lane.active)
+    for probe in health_snapshot.probes():
+        HEALTH_SNAPSHOT_AGE.set(probe.name, value=probe.age)
+
+
+REGISTRY.add_collector(collect_runtime_gauges)
+
 # FastAPI 앱의 생명주기(Lifecycle) 관리
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """서버 기동 시 초기화 및 종료 시 정리 로직"""
-    global agent_app, mcp_clients, mcp_reconcile_task
+    global agent_app, mcp_clients, mcp_reconcile_task, health_snapshot_task
     
     logger.info("🚀 [System] FastAPI 기반 MCP Agent 기동 시작...")
     mcp_clients = {}
@@ -92,19 +327,24 @@ async def lifespan(app: FastAPI):
     await rebuild_agent_app(reason="startup")
     logger.info("✅ API Server: Agent initialized with tools.")
     mcp_reconcile_task = asyncio.create_task(reconcile_mcp_clients())
+    if health_snapshot_enabled():
+        # 재연결로 mcp_clients 항목이 교체되므로 매 Probe마다 현재 dict를 조회
+        health_snapshot_task = asyncio.create_task(run_health_snapshot_loop(lambda: mcp_clients))
     
     yield  # 서버 실행 중 (이 시점에 요청을 받습니다)
     
     # 2. 종료 시: MCP 연결 정리
     logger.info("🧹 연결 종료 중...")
-    if mcp_reconcile_task and not mcp_reconcile_task.done():
-        mcp_reconcile_task.cancel()
-        try:
-            await mcp_reconcile_task
-        except asyncio.CancelledError:
-            pass
+    for task in (mcp_reconcile_task, health_snapshot_task):
+        if task and not task.done():
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
     for client in mcp_clients.values():
         await client.cleanup()
+    close_conversation_store()
     logger.info("👋 Bye!")
 
 # FastAPI 앱 생성
@@ -112,33 +352,424 @@ app = FastAPI(title="K8s MCP Agent API", lifespan=lifespan)
 
 # 전역 변수로 에이전트 앱과 클라이언트 관리
 agent_app = None
+conversation_agent_app = None
 mcp_clients = {}
 mcp_reconcile_task = None
+health_snapshot_task = None
+
+# ========================================================
+# Prometheus 메트릭
+# ========================================================
+@app.get("/metrics")
+async def metrics_endpoint():
+    """노드/MCP 도구/LLM 지연 히스토그램, 토큰 카운터, 처리 중 요청/큐/세션 게이지 (Prometheus 텍스트 포맷)"""
+    if not metrics_enabled():
+        return Response(status_code=404)
+    return Response(content=render_latest(), media_type=CONTENT_TYPE_LATEST)
+
+# ========================================================
+# 요청 단위 실행 타임라인 (디버그)
+# ========================================================
+@app.get("/debug/requests")
+async def debug_requests_endpoint():
+    """최근 요청 목록 (링 버퍼, 최신순). 응답 헤더 X-Request-Id로 개별 요청을 찾을 수 있습니다."""
+    return {"requests": list_traces()}
+
+
+@app.get("/debug/requests/{request_id}")
+async def debug_request_detail_endpoint(request_id: str):
+    """요청 하나의 Span 트리를 시작 시각 기준 Waterfall(JSON)로 반환"""
+    trace = get_trace(request_id)
+    if trace is None:
+        return JSONResponse(status_code=404, content={"error": f"request_id={request_id} 기록 없음 (링 버퍼에서 밀려났거나 비활성화)"})
+    return trace.waterfall()
+
+
+@app.get("/debug/health_snapshot")
+async def debug_health_snapshot_endpoint():
+    """백그라운드 Probe별 최신 결과와 나이 (진단 Worker가 출발점으로 쓰는 데이터)"""
+    return health_snapshot.to_dict()
+
+
+@app.get("/debug/scheduler")
+async def debug_scheduler_endpoint():
+    """Lane별 실행/대기 수와 한도, 평균 처리 시간"""
+    return request_scheduler.to_dict()
+
+
+@app.get("/debug/conversations")
+async def debug_conversations_endpoint():
+    """멀티턴 대화 저장소의 보관 대화 수, 진행 중인 턴, 로드/LRU 제외/만료 횟수"""
+    if not conversation_enabled():
+        return {"enabled": False}
+    return {"enabled": True, **get_conversation_store().to_dict()}
 
 # ========================================================
 # 자체 Web을 위한 일반 API 엔드포인트
 # ========================================================
 @app.post("/api/chat")
-async def chat_endpoint(request: Request):
+async def chat_endpoint(request: Request, response: Response):
     """일반적인 자체 개발 웹페이지에서 호출하기 쉬운 모드"""
+    requested_at = time.time()
     data = await request.json()
     user_input = data.get("message", "")
+    request_id = new_request_id()
+    response.headers["X-Request-Id"] = request_id
     
     logger.info(f"User > {user_input}")
     logger.debug("--- 🔄 처리 중... ---")
     
     # LangGraph 실행 및 최종 결과만 반환 (스트리밍이 아닐 경우)
-    inputs = {"messages": [HumanMessage(content=user_input)]}
-    current_agent_app = agent_app
-    result = await current_agent_app.ainvoke(inputs)
+    inputs = {"messages": [HumanMessage(content=user_input)], "thinking_budget": request_thinking_budget(data)}
+    conversation = parse_conversation(data, request.headers)
+    if conversation.conversation_id:
+        response.headers["X-Conversation-Id"] = conversation.conversation_id
+    # [최적화] 같은 질문이 신선도(TTL) 안에 다시 오면 그래프를 건너뛰고 보관된 답변 반환
+    cache_key, cached = answer_cache_lookup(
+        user_input, inputs["thinking_budget"], conversation, wants_fresh(data, request.headers)
+    )
+    if cached is not None:
+        response.headers["X-Cache"] = "HIT"
+        response.headers["Age"] = str(int(cached.age))
+        return {"reply": cached.notice() + cached.answer, "cached": True, "cache_age_s": round(cached.age, 1),
+                **cached.extra}
+    response.headers["X-Cache"] = "MISS"
+    try:
+        ticket = admit_request(inputs)
+    except LaneFullError as e:
+        return lane_full_response(e, request_id)
+
+    current_agent_app = select_agent_app(conversation)
+
+    async def run_turn():
+        # 같은 대화의 이전 턴이 진행 중이면 끝날 때까지 기다린 뒤 이어서 실행
+        async with conversation.turn(inputs) as graph_config:
+            return await current_agent_app.ainvoke(inputs, config=graph_config)
+
+    # 요청 단위 스크래치 저장소 (잘린 도구 결과 원문 보관, 요청 종료 시 삭제)
+    try:
+        async with request_scope(request_id, "/api/chat", user_input, inputs), lane_slot(ticket):
+            result = await run_until_disconnect(request, run_turn())
+    except ClientDisconnected:
+        logger.warning(f"⚠️ [API] 클라이언트 연결 끊김, 작업 취소 ({request_id})")
+        # 499 Client Closed Request (받을 클라이언트는 없지만 접근 로그에 남김)
+        return Response(status_code=499)
+    store_answer(cache_key, result.get("mode"), result["messages"][-1], requested_at)
     
     # 결과 파싱하여 반환
     final_message = result["messages"][-1].content
+    thinking_usage = result["messages"][-1].response_metadata.get("thinking_usage")
+    if thinking_usage:
+        return {"reply": final_message, "thinking_usage": thinking_usage}
     return {"reply": final_message}
 
+# ========================================================
+# 자동화용 배치 질문 API (NDJSON 스트리밍)
+# ========================================================
+def parse_batch_questions(data: dict) -> List[dict]:
+    """questions: ["질문", ...] 또는 [{"id": ..., "message" | "messages": ..., "thinking_budget": ...}, ...]
+    질문별 thinking_budget / slo_tier가 없으면 배치 본문의 값을 사용합니다.
+    """
+    questions = []
+    for index, item in enumerate(data.get("questions") or []):
+        if isinstance(item, str):
+            item = {"message": item}
+        messages = item.get("messages") or []
+        user_input = messages[-1]["content"] if messages else item.get("message", "")
+        questions.append({
+            "index": index,
+            "id": str(item.get("id", index)),
+            "input": user_input,
+            "thinking_budget": request_thinking_budget({**data, **item}),
+        })
+    return questions
+
+
+def elapsed_ms(since: float) -> float:
+    return round((time.perf_counter() - since) * 1000, 1)
+
+
+async def run_batch_question(question: dict, shared_cache: SharedToolCache, bypass_cache: bool) -> dict:
+    """배치 질문 하나를 실행하고 NDJSON 한 줄(dict)을 돌려줍니다. (실패도 예외 대신 status로 표시)"""
+    started = time.perf_counter()
+    request_id = new_request_id()
+    line = {"type": "result", "id": question["id"], "index": question["index"], "request_id": request_id}
+    user_input = question["input"]
+    cache_key = make_cache_key(user_input, question["thinking_budget"])
+    cached = lookup_answer(cache_key, bypass=bypass_cache)
+    if cached is not None:
+        line.update(status="ok", mode=cached.route, reply=cached.answer, cached=True,
+                    cache_age_s=int(cached.age), timings={"total_ms": elapsed_ms(started)})
+        return line
+
+    inputs = {"messages": [HumanMessage(content=user_input)], "thinking_budget": question["thinking_budget"]}
+    try:
+        ticket = admit_request(inputs)
+    except LaneFullError as e:
+        line.update(status="rejected", error=str(e), lane=e.lane, retry_after=e.retry_after,
+                    timings={"total_ms": elapsed_ms(started)})
+        return line
+    admitted = time.perf_counter()
+    run_started = admitted
+
+    current_agent_app = agent_app
+    try:
+        # 진행 이벤트를 읽을 스트림이 없으므로 요청 전용 큐로 받고 버림
+        with stream_queue_scope(), shared_tool_cache_scope(shared_cache):
+            async with request_scope(request_id, "/api/batch", user_input, inputs), lane_slot(ticket):
+                run_started = time.perf_counter()
+                result = await current_agent_app.ainvoke(inputs)
+    except Exception as e:
+        logger.error(f"❌ [Batch] 질문 {question['id']} 실행 실패: {e}")
+        line.update(status="error", error=str(e), timings={"total_ms": elapsed_ms(started)})
+        return line
+    # 공유 도구 결과는 배치 안의 다른 질문이 먼저 조회했을 수 있으므로 배치 시작 시각 기준
+    store_answer(cache_key, result.get("mode"), result["messages"][-1], shared_cache.started_at)
+
+    final_message = result["messages"][-1]
+    line.update(status="ok", mode=result.get("mode"), reply=final_message.content, cached=False)
+    thinking_usage = final_message.response_metadata.get("thinking_usage")
+    if thinking_usage:
+        line["thinking_usage"] = thinking_usage
+    line["timings"] = {
+        "admit_ms": round((admitted - started) * 1000, 1),  # Lane 추정 + 자리 확보
+        "queue_ms": round((run_started - admitted) * 1000, 1),  # Lane 대기열
+        "run_ms": elapsed_ms(run_started),
+        "total_ms": elapsed_ms(started),
+    }
+    return line
+
+
+@app.post("/api/batch")
+async def batch_endpoint(request: Request):
+    """[최적화] 관련 질문 N개를 한 번에 받아 스케줄러 Lane 한도 안에서 동시에 실행합니다.
+    같은 배치의 질문끼리는 MCP 도구 결과를 공유하고, 끝나는 순서대로 NDJSON 한 줄씩 돌려준 뒤 summary 줄로 끝냅니다.
+    """
+    data = await request.json()
+    questions = parse_batch_questions(data)
+    if not questions:
+        return JSONResponse(status_code=400, content={"error": "questions가 비어 있습니다."})
+    max_questions = RUNTIME_LIMITS["batch_max_questions"]
+    if len(questions) > max_questions:
+        return JSONResponse(
+            status_code=400,
+            content={"error": f"한 배치에 최대 {max_questions}개 질문까지 보낼 수 있습니다. ({len(questions)}개 요청)"},
+        )
+    batch_id = new_request_id()
+    bypass_cache = wants_fresh(data, request.headers)
+    logger.info(f"[Batch] {batch_id} 질문 {len(questions)}개 접수")
+
+    async def ndjson_generator():
+        started = time.perf_counter()
+        shared_cache = SharedToolCache(batch_id)
+        tasks = [asyncio.create_task(run_batch_question(q, shared_cache, bypass_cache)) for q in questions]
+        watcher = asyncio.create_task(wait_disconnect(request))
+        counts: Dict[str, int] = {}
+        try:
+            pending = set(tasks)
+            while pending:
+                done, pending = await asyncio.wait(pending | {watcher}, return_when=asyncio.FIRST_COMPLETED)
+                if watcher in done:
+                    logger.warning(f"⚠️ [Batch] {batch_id} 클라이언트 연결 끊김, 남은 질문 {len(pending)}개 취소")
+                    return
+                pending.discard(watcher)
+                out = []
+                for task in done:
+                    line = task.result()
+                    counts[line["status"]] = counts.get(line["status"], 0) + 1
+                    out.append(json.dumps(line, ensure_ascii=False) + "\n")
+                yield "".join(out).encode("utf-8")
+            summary = {
+                "type": "summary",
+                "batch_id": batch_id,
+                "questions": len(questions),
+                **counts,
+                "wall_ms": elapsed_ms(started),
+                "tool_cache": shared_cache.stats,
+            }
+            logger.info(f"[Batch] {batch_id} 완료: {counts}, {summary['wall_ms']}ms, 도구 공유 {shared_cache.stats}")
+            yield (json.dumps(summary, ensure_ascii=False) + "\n").encode("utf-8")
+        finally:
+            watcher.cancel()
+            # 연결이 끊겼으면 아직 실행 중인 질문(그래프/LLM/MCP 호출)까지 취소
+            await asyncio.gather(*(cancel_graph_task(task) for task in tasks))
+            shared_cache.close()
+
+    return StreamingResponse(
+        ndjson_generator(),
+        media_type="application/x-ndjson",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no", "X-Request-Id": batch_id},
+    )
+
+
 # ========================================================
 # 커스텀 React Flow 대시보드 연동을 위한 전용 SSE 스트리밍
 # ========================================================
+async def dashboard_stream(request: Optional[Request], request_id: str, endpoint: str, user_input: str,
+                           inputs: dict, cache_key: Optional[str], ticket, conversation: ConversationRequest,
+                           keepalive: Optional[bytes] = b" \n"):
+    """Vercel AI SDK Data Stream(0:/8:/d:) Chunk 묶음을 bytes로 내보냅니다. (/api/stream_chat, /ws/chat 공용)
+    request가 있으면 HTTP 연결 끊김을 감지하고, keepalive가 None이면 대기 중 Keep-Alive를 보내지 않습니다.
+    """
+    requested_at = time.time()
+    current_agent_app = select_agent_app(conversation)
+    # 요청 전용 진행 이벤트 큐 (동시 스트림끼리 이벤트/EOF가 섞이지 않음)
+    stream_queue = asyncio.Queue()
+    graph_task = None
+    synthesizer_started = False
+    simple_path = False
+    graph_failed = False
+
+    async def run_graph():
+        nonlocal synthesizer_started, simple_path, graph_failed
+        route, final_message = None, None
+        cancelled = False
+        try:
+            for chunk in make_all_idle_chunks():
+                await stream_queue.put(chunk)
+            await stream_queue.put(make_data_status("start", "success"))
+            await stream_queue.put(make_data_status("router", "running"))
+
+            with stream_queue_scope(stream_queue):
+                async with request_scope(request_id, endpoint, user_input, inputs), \
+                        lane_slot(ticket, notify=True), conversation.turn(inputs) as graph_config:
+                    async for event in current_agent_app.astream(inputs, config=graph_config):
+                        for key, value in event.items():
+                            if key == "router":
+                                route = value.get("mode")
+                                await stream_queue.put(make_data_status("router", "success"))
+                            elif key == "orchestrator":
+                                await stream_queue.put(make_data_status("orchestrator", "running"))
+                            elif key == "workers":
+                                await stream_queue.put(make_data_status("orchestrator", "success"))
+                                if not synthesizer_started:
+                                    await stream_queue.put(make_data_status("synthesizer", "running"))
+                                    synthesizer_started = True
+                            elif key == "synthesizer":
+                                final_message = value["messages"][-1]
+                                if not synthesizer_started:
+                                    await stream_queue.put(make_data_status("synthesizer", "running"))
+                                    synthesizer_started = True
+                            elif key == "simple_agent":
+                                simple_path = True
+                                await stream_queue.put(make_data_status("router", "success"))
+                                await stream_queue.put(make_data_status("simple_agent", "running"))
+                                last_message = value["messages"][-1]
+                                final_message = last_message
+                                msg = last_message.content
+                                await stream_queue.put(make_data_status("simple_agent", "success"))
+                                await stream_queue.put(make_data_status("agent", "success"))
+                                await stream_queue.put(make_data_status("end", "success"))
+                                # 토큰 스트리밍으로 이미 보낸 텍스트(답변 또는 철회한 안내 문구)는 다시 보내지 않음
+                                if msg and not last_message.response_metadata.get("streamed_to_client"):
+                                    await stream_queue.put(make_text_chunk(msg))
+            store_answer(cache_key, route, final_message, requested_at)
+
+        except asyncio.CancelledError:
+            cancelled = True
+            raise
+        except Exception as e:
+            graph_failed = True
+            logger.error(f"❌ [Graph] 실행 중 오류 발생: {e}")
+            await stream_queue.put(make_data_status("agent", "error", error=str(e)))
+            await stream_queue.put(make_data_status("end", "error", error=str(e)))
+        finally:
+            # 취소된 요청은 읽을 소비자가 없으므로 EOF를 넣지 않음
+            if not cancelled:
+                await stream_queue.put("EOF")
+
+    graph_task = asyncio.create_task(run_graph())
+    reader = StreamEventReader(request, stream_queue)
+    token_buffer = ""
+    last_flush = time.monotonic()
+
+    try:
+        finished = False
+        while not finished:
+            # 토큰이 쌓여 있으면 다음 Flush 시각까지만, 없으면 Keep-Alive 주기(2초)까지 대기 (Keep-Alive가 없으면 무기한)
+            if token_buffer:
+                timeout = max(STREAM_CHAT_FLUSH_INTERVAL - (time.monotonic() - last_flush), 0)
+            else:
+                timeout = 2.0 if keepalive is not None else None
+            batch = await reader.next_batch(timeout)
+            if batch is None:
+                logger.warning("⚠️ [API] 클라이언트 연결 끊김")
+                break
+
+            out = []
+            if not batch:
+                if token_buffer:
+                    out.append(make_text_chunk(token_buffer))
+                    token_buffer = ""
+                    last_flush = time.monotonic()
+                elif keepalive is not None:
+                    out.append(keepalive)
+
+            for msg in batch:
+                if msg == "EOF":
+                    if token_buffer:
+                        out.append(make_text_chunk(token_buffer))
+                        token_buffer = ""
+                    if not simple_path and not graph_failed:
+                        if synthesizer_started:
+                            out.append(make_data_status("synthesizer", "success"))
+                        out.append(make_data_status("agent", "success"))
+                        out.append(make_data_status("end", "success"))
+                    out.append(FINISH_STOP_CHUNK)
+                    finished = True
+                    break
+
+                elif isinstance(msg, bytes):
+                    # run_graph가 미리 인코딩해 넣은 0:/8: Chunk는 그대로 전달
+                    out.append(msg)
+
+                elif msg.startswith("TOKEN:"):
+                    # 토큰은 모아 두었다가 묶음 처리 후 한 번에 Flush
+                    token_buffer += msg[6:]
+
+                elif msg.startswith("FINAL:"):
+                    text = msg.replace("FINAL:", "", 1)
+                    if text:
+                        out.append(make_data_status("agent", "success"))
+                        out.append(make_data_status("end", "success"))
+                        out.append(make_text_chunk(text))
+
+                elif msg.startswith("STATUS:"):
+                    try:
+                        status_obj = json.loads(msg.replace("STATUS:", "", 1))
+                        out.append(make_data_status(
+                            status_obj["nodeId"],
+                            status_obj["status"],
+                            error=status_obj.get("error"),
+                        ))
+                    except Exception as status_parse_error:
+                        logger.warning(f"⚠️ [API] STATUS 이벤트 파싱 실패: {status_parse_error}")
+
+                else:
+                    if msg.startswith("EVENT:"):
+                        # 앞서 받은 토큰이 진행 메시지 뒤로 밀리지 않도록 먼저 Flush
+                        if token_buffer:
+                            out.append(make_text_chunk(token_buffer))
+                            token_buffer = ""
+                        action_text = msg.replace("EVENT:", "", 1).strip()
+                        out.append(make_text_chunk(f"[과정] {action_text}\n"))
+
+            if token_buffer and not finished:
+                now = time.monotonic()
+                if now - last_flush >= STREAM_CHAT_FLUSH_INTERVAL:
+                    out.append(make_text_chunk(token_buffer))
+                    token_buffer = ""
+                    last_flush = now
+
+            if out:
+                # 묶음 단위로 한 번만 write
+                yield b"".join(out)
+    finally:
+        # 어떤 이유로든 스트림이 끝나면(연결 끊김, 서버 종료) 그래프와 하위 LLM 스트림/Worker/MCP 호출까지 정리
+        reader.close()
+        await cancel_graph_task(graph_task)
+
+
 @app.post("/api/stream_chat")
 async def react_flow_stream_endpoint(request: Request):
     """React Flow 기반의 2D 시각화 대시보드와 통신하기 위한 Vercel AI SDK Data Stream 호환 엔드포인트"""
@@ -147,170 +778,178 @@ async def react_flow_stream_endpoint(request: Request):
     user_input = messages[-1]["content"] if messages else data.get("message", "")
     
     logger.info(f"[ReactFlow UI] User > {user_input}")
+    request_id = new_request_id()
+    thinking_budget = request_thinking_budget(data)
+    conversation = parse_conversation(data, request.headers)
+    cache_key, cached = answer_cache_lookup(
+        user_input, thinking_budget, conversation, wants_fresh(data, request.headers)
+    )
+    if cached is not None:
+        return StreamingResponse(
+            replay_stream_chat(cached),
+            media_type="text/event-stream",
+            headers=stream_headers(request_id, "HIT", int(cached.age)),
+        )
+    inputs = {"messages": [HumanMessage(content=user_input)], "thinking_budget": thinking_budget}
+    try:
+        ticket = admit_request(inputs)
+    except LaneFullError as e:
+        return lane_full_response(e, request_id)
 
-    async def stream_generator():
-        current_agent_app = agent_app
-        inputs = {"messages": [HumanMessage(content=user_input)]}
-        from config import stream_queue
-        
-        # Vercel AI SDK 호환 Data Stream Chunk 생성 함수
-        def make_text_chunk(text: str):
-            return f'0:{json.dumps(text, ensure_ascii=False)}\n'
-            
-        def make_data_status(node_id: str, status: str, node_type: str = "agent", error: str = None):
-            data_obj = {
-                "type": "data-node-execution-status",
-                "data": {
-                    "nodeId": node_id,
-                    "nodeType": node_type,
-                    "status": status,
-                }
-            }
-            if error:
-                data_obj["data"]["error"] = error
-            return f'8:[{json.dumps(data_obj, ensure_ascii=False)}]\n'
+    return StreamingResponse(
+        dashboard_stream(request, request_id, "/api/stream_chat", user_input, inputs, cache_key, ticket,
+                         conversation),
+        media_type="text/event-stream",
+        headers=stream_headers(request_id, conversation_id=conversation.conversation_id),
+        # 생성기가 시작되기 전에 연결이 끊겨도 Lane 자리는 반납
+        background=BackgroundTask(ticket.release) if ticket else None,
+    )
 
-        def make_all_idle_chunks():
-            return [make_data_status(node_id, "idle") for node_id in STREAM_NODE_IDS if node_id != "start"]
-        
-        import asyncio
-        graph_task = None
-        synthesizer_started = False
-        simple_path = False
-        graph_failed = False
-        
-        async def run_graph():
-            nonlocal synthesizer_started, simple_path, graph_failed
+# ========================================================
+# React Flow 대시보드용 WebSocket (연결 하나로 여러 질문 다중화)
+# ========================================================
+# 대시보드는 세션을 계속 열어 두고 질문을 여러 번 보내므로, 질문마다 HTTP 연결을 새로 맺고
+# 2초마다 Keep-Alive 패딩을 보내는 SSE 대신 WebSocket 하나에서 요청 ID로 구분해 주고받습니다.
+#
+# 클라이언트 → 서버 (JSON 텍스트 프레임)
+#   {"type": "chat", "id": "q1", "messages": [...], "thinking_budget": ..., "no_cache": false, "conversation_id": ...}
+#   {"type": "cancel", "id": "q1"}
+#   {"type": "subscribe", "topic": "health_snapshot"} / {"type": "unsubscribe", "topic": "health_snapshot"}
+# 서버 → 클라이언트
+#   바이너리 프레임: b"<id>\n" + /api/stream_chat과 같은 Data Stream 줄(0:/8:/d:) 묶음
+#                    → 대시보드는 기존 Data Stream 파서를 id별로 그대로 사용
+#   텍스트 프레임(JSON): accepted / rejected / cancelled / error / snapshot
+# ========================================================
+WS_OUTBOUND_QUEUE_SIZE = 256
+WS_SNAPSHOT_TOPIC = "health_snapshot"
+
+
+def ws_frame(frame_type: str, **fields) -> str:
+    return json.dumps({"type": frame_type, **fields}, ensure_ascii=False, separators=(",", ":"))
+
+
+@app.websocket("/ws/chat")
+async def dashboard_websocket_endpoint(websocket: WebSocket):
+    await websocket.accept()
+    # 송신은 Writer Task 하나가 전담 (질문 Task들이 동시에 send하지 않도록, 느린 클라이언트면 질문 쪽이 기다림)
+    outbound: asyncio.Queue = asyncio.Queue(maxsize=WS_OUTBOUND_QUEUE_SIZE)
+    questions: Dict[str, asyncio.Task] = {}
+    snapshot_task: Optional[asyncio.Task] = None
+
+    async def writer():
+        while True:
+            frame = await outbound.get()
+            if isinstance(frame, bytes):
+                await websocket.send_bytes(frame)
+            else:
+                await websocket.send_text(frame)
+
+    async def run_question(question_id: str, data: dict):
+        messages = data.get("messages", [])
+        user_input = messages[-1]["content"] if messages else data.get("message", "")
+        logger.info(f"[ReactFlow WS] User > {user_input}")
+        request_id = new_request_id()
+        prefix = f"{question_id}\n".encode("utf-8")
+        thinking_budget = request_thinking_budget(data)
+        conversation = parse_conversation(data)
+        cache_key, cached = answer_cache_lookup(user_input, thinking_budget, conversation, bool(data.get("no_cache")))
+        if cached is not None:
+            await outbound.put(ws_frame("accepted", id=question_id, request_id=request_id, cache="HIT",
+                                        age=int(cached.age)))
+            await outbound.put(prefix + b"".join(replay_stream_chat(cached)))
+            return
+        inputs = {"messages": [HumanMessage(content=user_input)], "thinking_budget": thinking_budget}
+        try:
+            ticket = admit_request(inputs)
+        except LaneFullError as e:
+            await outbound.put(ws_frame("rejected", id=question_id, request_id=request_id, error=str(e),
+                                        lane=e.lane, retry_after=e.retry_after))
+            return
+        try:
+            await outbound.put(ws_frame("accepted", id=question_id, request_id=request_id, cache="MISS",
+                                        lane=ticket.lane.name if ticket else None))
+            async for chunk in dashboard_stream(None, request_id, "/ws/chat", user_input, inputs, cache_key,
+                                                ticket, conversation, keepalive=None):
+                await outbound.put(prefix + chunk)
+        finally:
+            # 그래프가 시작되기 전에 취소돼도 Lane 자리는 반납
+            if ticket is not None:
+                ticket.release()
+
+    def start_question(question_id: str, data: dict):
+        async def runner():
             try:
-                for chunk in make_all_idle_chunks():
-                    await stream_queue.put(chunk)
-                await stream_queue.put(make_data_status("start", "success"))
-                await stream_queue.put(make_data_status("router", "running"))
-                
-                async for event in current_agent_app.astream(inputs):
-                    for key, value in event.items():
-                        if key == "router":
-                            await stream_queue.put(make_data_status("router", "success"))
-                        elif key == "orchestrator":
-                            await stream_queue.put(make_data_status("orchestrator", "running"))
-                        elif key == "workers":
-                            await stream_queue.put(make_data_status("orchestrator", "success"))
-                            if not synthesizer_started:
-                                await stream_queue.put(make_data_status("synthesizer", "running"))
-                                synthesizer_started = True
-                        elif key == "synthesizer":
-                            if not synthesizer_started:
-                                await stream_queue.put(make_data_status("synthesizer", "running"))
-                                synthesizer_started = True
-                        elif key == "simple_agent":
-                            simple_path = True
-                            await stream_queue.put(make_data_status("router", "success"))
-                            await stream_queue.put(make_data_status("simple_agent", "running"))
-                            msg = value["messages"][-1].content
-                            await stream_queue.put(make_data_status("simple_agent", "success"))
-                            await stream_queue.put(make_data_status("agent", "success"))
-                            await stream_queue.put(make_data_status("end", "success"))
-                            if msg:
-                                await stream_queue.put(make_text_chunk(msg))
-                            
+                await run_question(question_id, data)
+            except asyncio.CancelledError:
+                if not outbound.full():
+                    outbound.put_nowait(ws_frame("cancelled", id=question_id))
+                raise
             except Exception as e:
-                graph_failed = True
-                logger.error(f"❌ [Graph] 실행 중 오류 발생: {e}")
-                await stream_queue.put(make_data_status("agent", "error", error=str(e)))
-                await stream_queue.put(make_data_status("end", "error", error=str(e)))
+                logger.error(f"❌ [API] WebSocket 질문 처리 실패 ({question_id}): {e}")
+                await outbound.put(ws_frame("error", id=question_id, error=str(e)))
             finally:
-                await stream_queue.put("EOF")
+                questions.pop(question_id, None)
 
-        graph_task = asyncio.create_task(run_graph())
-        import time
-        token_buffer = ""
-        last_flush = time.time()
+        questions[question_id] = asyncio.create_task(runner())
 
-        while True:
-            if await request.is_disconnected():
-                logger.warning("⚠️ [API] 클라이언트 연결 끊김")
-                if graph_task and not graph_task.done():
-                    graph_task.cancel()
-                break
+    async def push_snapshots():
+        queue = health_snapshot.subscribe()
+        try:
+            # 구독 시점의 스냅샷을 먼저 보내고 이후 갱신만 Push
+            for result in health_snapshot.probes():
+                await outbound.put(ws_frame("snapshot", probe=result.to_dict()))
+            while True:
+                result = await queue.get()
+                await outbound.put(ws_frame("snapshot", probe=result.to_dict()))
+        finally:
+            health_snapshot.unsubscribe(queue)
 
+    writer_task = asyncio.create_task(writer())
+    try:
+        while True:
+            raw = await websocket.receive_text()
             try:
-                msg = await asyncio.wait_for(stream_queue.get(), timeout=2.0)
-            except asyncio.TimeoutError:
-                if token_buffer:
-                    yield make_text_chunk(token_buffer)
-                    token_buffer = ""
-                    last_flush = time.time()
-                yield " \n"
+                data = json.loads(raw)
+                msg_type = data.get("type", "chat")
+            except (ValueError, AttributeError):
+                await outbound.put(ws_frame("error", error="JSON 객체 프레임이어야 합니다."))
                 continue
+            question_id = str(data.get("id") or new_request_id())
 
-            if msg == "EOF":
-                if token_buffer:
-                    yield make_text_chunk(token_buffer)
-                if not simple_path and not graph_failed:
-                    if synthesizer_started:
-                        yield make_data_status("synthesizer", "success")
-                    yield make_data_status("agent", "success")
-                    yield make_data_status("end", "success")
-                yield 'd:{"finishReason":"stop"}\n'
-                break
-                
-            elif msg.startswith("0:") or msg.startswith("8:"):
-                yield msg
-                
-            elif msg.startswith("TOKEN:"):
-                chunk = msg.replace("TOKEN:", "", 1)
-                if not chunk:
-                    continue
-                token_buffer += chunk
-                now = time.time()
-                if now - last_flush >= 0.1:
-                    yield make_text_chunk(token_buffer)
-                    token_buffer = ""
-                    last_flush = now
-                    
-            elif msg.startswith("FINAL:"):
-                text = msg.replace("FINAL:", "", 1)
-                if text:
-                    yield make_data_status("agent", "success")
-                    yield make_data_status("end", "success")
-                    yield make_text_chunk(text)
-
-            elif msg.startswith("STATUS:"):
-                try:
-                    status_obj = json.loads(msg.replace("STATUS:", "", 1))
-                    yield make_data_status(
-                        status_obj["nodeId"],
-                        status_obj["status"],
-                        error=status_obj.get("error"),
-                    )
-                except Exception as status_parse_error:
-                    logger.warning(f"⚠️ [API] STATUS 이벤트 파싱 실패: {status_parse_error}")
-
+            if msg_type == "chat":
+                if question_id in questions:
+                    await outbound.put(ws_frame("error", id=question_id, error="이미 진행 중인 id입니다."))
+                elif len(questions) >= RUNTIME_LIMITS["websocket_max_inflight"]:
+                    await outbound.put(ws_frame("rejected", id=question_id, lane=None, retry_after=1,
+                                                error="연결당 동시 질문 수를 초과했습니다."))
+                else:
+                    start_question(question_id, data)
+            elif msg_type == "cancel":
+                task = questions.get(question_id)
+                if task is not None:
+                    task.cancel()
+            elif msg_type == "subscribe" and data.get("topic") == WS_SNAPSHOT_TOPIC:
+                if snapshot_task is None:
+                    snapshot_task = asyncio.create_task(push_snapshots())
+            elif msg_type == "unsubscribe" and data.get("topic") == WS_SNAPSHOT_TOPIC:
+                if snapshot_task is not None:
+                    snapshot_task.cancel()
+                    snapshot_task = None
             else:
-                if msg.startswith("EVENT:"):
-                    action_text = msg.replace("EVENT:", "", 1).strip()
-                    
-                    target_node = "tools" # Default
-                    if "LogSpecialist" in action_text:
-                        target_node = "worker_log"
-                    elif "MetricSpecialist" in action_text:
-                        target_node = "worker_metric"
-                    elif "K8sSpecialist" in action_text:
-                        target_node = "worker_k8s"
-                    elif "synthesizer" in action_text.lower():
-                        target_node = "synthesizer"
-                        
-                    yield make_text_chunk(f"[과정] {action_text}\n")
+                await outbound.put(ws_frame("error", id=question_id, error=f"알 수 없는 type: {msg_type}"))
+    except WebSocketDisconnect:
+        logger.info(f"🔌 [API] WebSocket 연결 종료 (진행 중 질문 {len(questions)}개 취소)")
+    finally:
+        # 연결이 끊기면 진행 중인 질문(그래프/LLM/MCP 호출)까지 모두 취소
+        pending = list(questions.values())
+        if snapshot_task is not None:
+            pending.append(snapshot_task)
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+        writer_task.cancel()
+        await asyncio.gather(writer_task, return_exceptions=True)
 
-    return StreamingResponse(
-        stream_generator(), 
-        media_type="text/event-stream",
-        headers={
-            "Cache-Control": "no-cache",
-            "Connection": "keep-alive",
-            "X-Accel-Buffering": "no"
-        }
-    )
 
 # ========================================================
 # OpenWebUI 연동을 위한 OpenAI 호환 API (스트리밍 지원)
@@ -318,6 +957,7 @@ async def react_flow_stream_endpoint(request: Request):
 @app.post("/v1/chat/completions")
 async def openai_compatible_endpoint(request: Request):
     """OpenWebUI 등 OpenAI 규격을 요구하는 클라이언트를 위한 엔드포인트"""
+    requested_at = time.time()
     data = await request.json()
     
     # messages 배열에서 마지막 사용자의 질문을 추출
@@ -326,21 +966,33 @@ async def openai_compatible_endpoint(request: Request):
     model_name = data.get("model", "qwen-k8s-agent")
     
     logger.info(f"[OpenWebUI] User > {user_input}")
+    request_id = new_request_id()
+    thinking_budget = request_thinking_budget(data)
+    # 이전 대화: conversation_id가 있으면 저장된 대화를 이어 쓰고, 없으면 messages의 이전 턴을 토큰 예산만큼 함께 넘김
+    conversation = parse_conversation(data, request.headers)
+    cache_key, cached = answer_cache_lookup(
+        user_input, thinking_budget, conversation, wants_fresh(data, request.headers)
+    )
+    if cached is not None:
+        return StreamingResponse(
+            replay_openai_stream(cached, OpenAIStreamEncoder(model_name, new_completion_id(request_id))),
+            media_type="text/event-stream",
+            headers=stream_headers(request_id, "HIT", int(cached.age)),
+        )
+    inputs = {"messages": [HumanMessage(content=user_input)], "thinking_budget": thinking_budget}
+    try:
+        ticket = admit_request(inputs)
+    except LaneFullError as e:
+        return lane_full_response(e, request_id)
 
     async def stream_generator():
-        current_agent_app = agent_app
-        inputs = {"messages": [HumanMessage(content=user_input)]}
-        from config import stream_queue
+        current_agent_app = select_agent_app(conversation)
+        # 요청 전용 진행 이벤트 큐
+        stream_queue = asyncio.Queue()
         
-        # 내부 진행 상황을 OpenWebUI에도 보여주기 위한 헬퍼 함수
-        def make_chunk(text):
-            chunk = {
-                "id": "chatcmpl-123",
-                "object": "chat.completion.chunk",
-                "model": model_name,
-                "choices": [{"index": 0, "delta": {"content": text}, "finish_reason": None}]
-            }
-            return f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n"
+        # 내부 진행 상황을 OpenWebUI에도 보여주기 위한 헬퍼 함수 (envelope는 스트림당 한 번만 직렬화)
+        encoder = OpenAIStreamEncoder(model_name, new_completion_id(request_id))
+        make_chunk = encoder.chunk
         
         # OpenWebUI 호환성을 위한 "단일 Think Block" 전송 헬퍼
         # 여러 번 열고 닫으면 렌더러에 심한 렉이 걸리므로, 한 번만 열고 내부에서 줄바꿈을 통해 추가합니다.
@@ -349,137 +1001,155 @@ async def openai_compatible_endpoint(request: Request):
         # 1. LangGraph의 astream 이벤트 스트림
         # 2. 백그라운드 Worker의 진행 상태를 담는 stream_queue 
         
-        import asyncio
         queue_task = None
         graph_task = None
         
         async def run_graph():
+            route, final_message = None, None
+            cancelled = False
             try:
-                async for event in current_agent_app.astream(inputs):
-                    for key, value in event.items():
-                        if key == "router":
-                            await stream_queue.put("EVENT:🔄 `[System]` 라우터 모드 결정 중...")
-                        elif key == "orchestrator":
-                            await stream_queue.put("EVENT:📋 `[System]` 작업 계획 수립 중...")
-                        elif key == "workers":
-                            results = value.get("worker_results", [])
-                            await stream_queue.put(f"EVENT:👷 `[System]` {len(results)}개 병렬 작업 실행 완료.")
-                        elif key == "synthesizer":
-                            pass
-                        elif key == "simple_agent":
-                            msg = value["messages"][-1].content
-                            await stream_queue.put(f"FINAL:{msg}")
+                with stream_queue_scope(stream_queue):
+                    async with request_scope(request_id, "/v1/chat/completions", user_input, inputs), \
+                            lane_slot(ticket, notify=True), conversation.turn(inputs) as graph_config:
+                        async for event in current_agent_app.astream(inputs, config=graph_config):
+                            for key, value in event.items():
+                                if key == "router":
+                                    route = value.get("mode")
+                                    await stream_queue.put("EVENT:🔄 `[System]` 라우터 모드 결정 중...")
+                                elif key == "orchestrator":
+                                    await stream_queue.put("EVENT:📋 `[System]` 작업 계획 수립 중...")
+                                elif key == "workers":
+                                    results = value.get("worker_results", [])
+                                    await stream_queue.put(f"EVENT:👷 `[System]` {len(results)}개 병렬 작업 실행 완료.")
+                                elif key == "synthesizer":
+                                    final_message = value["messages"][-1]
+                                elif key == "simple_agent":
+                                    last_message = value["messages"][-1]
+                                    final_message = last_message
+                                    # 토큰 스트리밍으로 이미 보낸 텍스트(답변 또는 철회한 안내 문구)는 다시 보내지 않음
+                                    if not last_message.response_metadata.get("streamed_to_client"):
+                                        await stream_queue.put(f"FINAL:{last_message.content}")
+                store_answer(cache_key, route, final_message, requested_at)
+            except asyncio.CancelledError:
+                cancelled = True
+                raise
             except Exception as e:
                 logger.error(f"❌ [Graph] 실행 중 오류 발생: {e}")
                 # 에러 발생 시 UI에 명시적으로 알림
                 await stream_queue.put(f"FINAL:\n\n⚠️ **에이전트 실행 중 오류가 발생하여 중단되었습니다:**\n```\n{str(e)}\n```")
             finally:
-                # 정상/비정상 종료 상관없이 반드시 스트림 종료 시그널 전송
-                await stream_queue.put("EOF")
+                # 정상/비정상 종료 상관없이 스트림 종료 시그널 전송 (취소된 요청은 읽을 소비자가 없으므로 제외)
+                if not cancelled:
+                    await stream_queue.put("EOF")
 
         graph_task = asyncio.create_task(run_graph())
-        
+        reader = StreamEventReader(request, stream_queue)
+
         has_started_thinking = False
         has_finished_thinking = False
-        import time
         token_buffer = ""
-        last_flush_time = time.time()
-
-        while True:
-            # 클라이언트 연결 끊김(새로고침, 중지버튼, 타임아웃 재시도 등) 감지
-            if await request.is_disconnected():
-                logger.warning("⚠️ [API] 클라이언트(OpenWebUI) 연결이 끊어졌습니다. 작업을 취소합니다.")
-                if graph_task and not graph_task.done():
-                    graph_task.cancel()
-                break
+        last_flush_time = time.monotonic()
 
-            try:
-                # 잔여 토큰이 있으면 짧게 대기, 없으면 5초 대기(Keep-Alive용)
-                timeout_val = 0.05 if token_buffer else 5.0
-                msg = await asyncio.wait_for(stream_queue.get(), timeout=timeout_val)
-            except asyncio.TimeoutError:
+        try:
+            finished = False
+            while not finished:
+                # 잔여 토큰이 있으면 다음 Flush 시각까지만, 없으면 5초 대기(Keep-Alive용)
                 if token_buffer:
-                    yield make_chunk(token_buffer)
-                    token_buffer = ""
-                    last_flush_time = time.time()
+                    timeout_val = max(OPENAI_FLUSH_INTERVAL - (time.monotonic() - last_flush_time), 0)
                 else:
-                    yield ": keep-alive\n\n"
-                continue
+                    timeout_val = 5.0
+                batch = await reader.next_batch(timeout_val)
+                # 클라이언트 연결 끊김(새로고침, 중지버튼, 타임아웃 재시도 등) 감지
+                if batch is None:
+                    logger.warning("⚠️ [API] 클라이언트(OpenWebUI) 연결이 끊어졌습니다. 작업을 취소합니다.")
+                    break
+
+                out = []
+                if not batch:
+                    if token_buffer:
+                        out.append(make_chunk(token_buffer))
+                        token_buffer = ""
+                        last_flush_time = time.monotonic()
+                    else:
+                        out.append(b": keep-alive\n\n")
+
+                for msg in batch:
+                    if msg == "EOF":
+                        if token_buffer:
+                            out.append(make_chunk(token_buffer))
+                            token_buffer = ""
+                        if has_started_thinking and not has_finished_thinking:
+                            out.append(make_chunk("\n</think>\n\n"))
+                        finished = True
+                        break
+
+                    elif msg.startswith("EVENT:"):
+                        if token_buffer:
+                            out.append(make_chunk(token_buffer))
+                            token_buffer = ""
+
+                        text = msg.replace("EVENT:", "", 1)
+                        if not has_started_thinking:
+                            out.append(make_chunk("<think>\n" + text + "\n"))
+                            has_started_thinking = True
+                        else:
+                            out.append(make_chunk(text + "\n"))
+
+                    elif msg.startswith("TOKEN:"):
+                        if has_started_thinking and not has_finished_thinking:
+                            out.append(make_chunk("\n</think>\n\n"))
+                            has_finished_thinking = True
+
+                        # 브라우저 UI 렉(Lag)을 방지하기 위해 토큰을 모읍니다.
+                        token_buffer += msg[6:]
+
+                    elif msg.startswith("FINAL:"):
+                        if token_buffer:
+                            out.append(make_chunk(token_buffer))
+                            token_buffer = ""
+
+                        if has_started_thinking and not has_finished_thinking:
+                            out.append(make_chunk("\n</think>\n\n"))
+                            has_finished_thinking = True
+
+                        out.append(make_chunk(msg.replace("FINAL:", "", 1)))
+
+                    else:
+                        if token_buffer:
+                            out.append(make_chunk(token_buffer))
+                            token_buffer = ""
+
+                        if not has_started_thinking:
+                            out.append(make_chunk("<think>\n" + msg + "\n"))
+                            has_started_thinking = True
+                        else:
+                            out.append(make_chunk(msg + "\n"))
 
-            if msg == "EOF":
-                if token_buffer:
-                    yield make_chunk(token_buffer)
-                    token_buffer = ""
-                if has_started_thinking and not has_finished_thinking:
-                    yield make_chunk("\n</think>\n\n")
-                break
-                
-            elif msg.startswith("EVENT:"):
-                if token_buffer:
-                    yield make_chunk(token_buffer)
-                    token_buffer = ""
-                    
-                text = msg.replace("EVENT:", "", 1)
-                if not has_started_thinking:
-                    yield make_chunk("<think>\n" + text + "\n")
-                    has_started_thinking = True
-                else:
-                    yield make_chunk(text + "\n")
-                    
-            elif msg.startswith("TOKEN:"):
-                if has_started_thinking and not has_finished_thinking:
-                    yield make_chunk("\n</think>\n\n")
-                    has_finished_thinking = True
-                
-                # 브라우저 UI 렉(Lag)을 방지하기 위해 토큰을 모읍니다.
-                token_buffer += msg.replace("TOKEN:", "", 1)
-                now = time.time()
                 # 0.05초(초당 20프레임) 간격으로 모아서 화면에 송출합니다.
-                if now - last_flush_time >= 0.05:
-                    yield make_chunk(token_buffer)
-                    token_buffer = ""
-                    last_flush_time = now
-                
-            elif msg.startswith("FINAL:"):
-                if token_buffer:
-                    yield make_chunk(token_buffer)
-                    token_buffer = ""
-                    
-                if has_started_thinking and not has_finished_thinking:
-                    yield make_chunk("\n</think>\n\n")
-                    has_finished_thinking = True
-                    
-                yield make_chunk(msg.replace("FINAL:", "", 1))
-                
-            else:
-                if token_buffer:
-                    yield make_chunk(token_buffer)
-                    token_buffer = ""
-                    
-                if not has_started_thinking:
-                    yield make_chunk("<think>\n" + msg + "\n")
-                    has_started_thinking = True
-                else:
-                    yield make_chunk(msg + "\n")
-                
-        # 스트리밍 종료
-        end_chunk = {
-            "id": "chatcmpl-123",
-            "object": "chat.completion.chunk",
-            "model": model_name,
-            "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]
-        }
-        yield f"data: {json.dumps(end_chunk, ensure_ascii=False)}\n\n"
-        yield "data: [DONE]\n\n"
+                if token_buffer and not finished:
+                    now = time.monotonic()
+                    if now - last_flush_time >= OPENAI_FLUSH_INTERVAL:
+                        out.append(make_chunk(token_buffer))
+                        token_buffer = ""
+                        last_flush_time = now
+
+                if out:
+                    yield b"".join(out)
+
+            # 스트리밍 종료
+            yield encoder.stop_chunk
+            yield OPENAI_DONE_CHUNK
+        finally:
+            # 어떤 이유로든 스트림이 끝나면(연결 끊김, 서버 종료) 그래프와 하위 LLM 스트림/Worker/MCP 호출까지 정리
+            reader.close()
+            await cancel_graph_task(graph_task)
 
     return StreamingResponse(
         stream_generator(), 
         media_type="text/event-stream",
-        headers={
-            "Cache-Control": "no-cache",
-            "Connection": "keep-alive",
-            "X-Accel-Buffering": "no" # Nginx/K8s Ingress의 SSE 버퍼링 강제 비활성화
-        }
+        headers=stream_headers(request_id, conversation_id=conversation.conversation_id),
+        # 생성기가 시작되기 전에 연결이 끊겨도 Lane 자리는 반납
+        background=BackgroundTask(ticket.release) if ticket else None,
     )
 
 if __name__ == "__main__":
@@ -0,0 +1,238 @@
+"""
+에이전트 API 부하 생성기 / 지연 리포트
+
+/api/chat, /api/stream_chat, /v1/chat/completions에 목표 동시성으로 요청을 보내고
+엔드포인트별 p50/p95/p99 지연, 첫 토큰 시간(TTFT), 첫 바이트 시간, 처리량, 에러율을 출력합니다.
+
+TTFT 기준 (스트리밍 엔드포인트):
+  - /api/stream_chat      : "[과정]" 진행 메시지를 제외한 첫 번째 답변 텍스트 청크(0:)
+  - /v1/chat/completions  : <think> 진행 블록이 닫힌 뒤(또는 블록 없이) 처음 나온 content
+  - /api/chat             : 스트리밍이 아니므로 전체 응답 시간과 같음
+
+사용법 (벤치마크 구성은 benchmarks/README.md 참고):
+    python benchmarks/loadgen.py --endpoints chat stream openai --concurrency 8 --requests 64
+    python benchmarks/loadgen.py --endpoints openai --concurrency 16 --duration 60 --json-out result.json
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+from typing import Dict, List, Optional
+
+import httpx
+
+ENDPOINTS = {
+    "chat": "/api/chat",
+    "stream": "/api/stream_chat",
+    "openai": "/v1/chat/completions",
+}
+
+DEFAULT_PROMPTS = [
+    # simple 경로 (목록 조회)
+    "payments 네임스페이스 파드 목록 보여줘",
+    "네임스페이스 목록 이름만 나열해줘",
+    # complex 경로 (Orchestrator -> Workers -> Synthesizer)
+    "payments 네임스페이스 billing 파드가 계속 재시작되는 원인을 진단해줘",
+    "클러스터 전반적으로 에러가 있는지 진단해줘",
+]
+
+
+class Sample:
+    __slots__ = ("endpoint", "ok", "latency", "ttft", "ttfb", "error", "status")
+
+    def __init__(self, endpoint: str):
+        self.endpoint = endpoint
+        self.ok = False
+        self.latency: Optional[float] = None
+        self.ttft: Optional[float] = None
+        self.ttfb: Optional[float] = None
+        self.error: Optional[str] = None
+        self.status: Optional[int] = None
+
+
+def percentile(values: List[float], pct: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = (len(ordered) - 1) * pct / 100
+    low = int(rank)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+
+def build_body(endpoint: str, prompt: str) -> dict:
+    if endpoint == "chat":
+        return {"message": prompt}
+    if endpoint == "stream":
+        return {"messages": [{"role": "user", "content": prompt}]}
+    return {"model": "qwen-k8s-agent", "stream": True, "messages": [{"role": "user", "content": prompt}]}
+
+
+def is_answer_line(endpoint: str, line: str, state: dict) -> bool:
+    """스트림 한 줄이 (진행 메시지가 아닌) 답변 텍스트인지 판단합니다."""
+    if endpoint == "stream":
+        if not line.startswith("0:"):
+            return False
+        try:
+            text = json.loads(line[2:])
+        except ValueError:
+            return False
+        return bool(text.strip()) and not text.startswith("[과정]")
+
+    if not line.startswith("data: ") or line == "data: [DONE]":
+        return False
+    try:
+        delta = json.loads(line[6:])["choices"][0]["delta"]
+    except (ValueError, KeyError, IndexError):
+        return False
+    content = delta.get("content") or ""
+    if not content:
+        return False
+    if "<think>" in content:
+        state["thinking"] = True
+    if state.get("thinking"):
+        if "</think>" in content:
+            state["thinking"] = False
+            return bool(content.split("</think>", 1)[1].strip())
+        return False
+    return True
+
+
+async def run_one(client: httpx.AsyncClient, base_url: str, endpoint: str, prompt: str) -> Sample:
+    sample = Sample(endpoint)
+    url = base_url.rstrip("/") + ENDPOINTS[endpoint]
+    start = time.perf_counter()
+    try:
+        if endpoint == "chat":
+            response = await client.post(url, json=build_body(endpoint, prompt))
+            sample.status = response.status_code
+            sample.ttfb = sample.ttft = time.perf_counter() - start
+            response.raise_for_status()
+            if not response.json().get("reply"):
+                raise ValueError("빈 reply")
+        else:
+            state: Dict[str, bool] = {}
+            async with client.stream("POST", url, json=build_body(endpoint, prompt)) as response:
+                sample.status = response.status_code
+                response.raise_for_status()
+                async for line in response.aiter_lines():
+                    now = time.perf_counter() - start
+                    if sample.ttfb is None and line.strip():
+                        sample.ttfb = now
+                    if sample.ttft is None and is_answer_line(endpoint, line, state):
+                        sample.ttft = now
+                    if "⚠️ **에이전트 실행 중 오류" in line or '"status": "error"' in line:
+                        sample.error = "agent error"
+            if sample.ttft is None and sample.error is None:
+                sample.error = "답변 토큰 없음"
+        sample.ok = sample.error is None
+    except Exception as e:
+        sample.error = f"{type(e).__name__}: {e}"[:200]
+    sample.latency = time.perf_counter() - start
+    return sample
+
+
+async def run_load(args) -> List[Sample]:
+    prompts = DEFAULT_PROMPTS
+    if args.prompts:
+        with open(args.prompts, "r", encoding="utf-8") as f:
+            prompts = [line.strip() for line in f if line.strip()]
+    rng = random.Random(args.seed)
+    jobs: asyncio.Queue = asyncio.Queue()
+    if args.duration is None:
+        for i in range(args.requests):
+            jobs.put_nowait((args.endpoints[i % len(args.endpoints)], rng.choice(prompts)))
+    deadline = time.perf_counter() + args.duration if args.duration else None
+    samples: List[Sample] = []
+    counter = 0
+
+    async def worker(client: httpx.AsyncClient):
+        nonlocal counter
+        while True:
+            if deadline is not None:
+                if time.perf_counter() >= deadline:
+                    return
+                endpoint = args.endpoints[counter % len(args.endpoints)]
+                counter += 1
+                prompt = rng.choice(prompts)
+            else:
+                try:
+                    endpoint, prompt = jobs.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+            samples.append(await run_one(client, args.base_url, endpoint, prompt))
+
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(timeout=args.timeout, limits=limits) as client:
+        await asyncio.gather(*(worker(client) for _ in range(args.concurrency)))
+    return samples
+
+
+def summarize(samples: List[Sample], wall: float) -> Dict[str, dict]:
+    report = {}
+    for endpoint in sorted({s.endpoint for s in samples}):
+        group = [s for s in samples if s.endpoint == endpoint]
+        ok = [s for s in group if s.ok]
+        latencies = [s.latency for s in ok]
+        ttfts = [s.ttft for s in ok if s.ttft is not None]
+        ttfbs = [s.ttfb for s in ok if s.ttfb is not None]
+        errors: Dict[str, int] = {}
+        for s in group:
+            if not s.ok:
+                errors[s.error or "unknown"] = errors.get(s.error or "unknown", 0) + 1
+        report[ENDPOINTS[endpoint]] = {
+            "requests": len(group),
+            "ok": len(ok),
+            "error_rate": round(1 - len(ok) / len(group), 4) if group else 0.0,
+            "throughput_rps": round(len(ok) / wall, 3) if wall else 0.0,
+            "latency_s": {f"p{p}": percentile(latencies, p) for p in (50, 95, 99)},
+            "ttft_s": {f"p{p}": percentile(ttfts, p) for p in (50, 95, 99)},
+            "ttfb_s": {f"p{p}": percentile(ttfbs, p) for p in (50, 95, 99)},
+            "errors": errors,
+        }
+    return report
+
+
+def print_report(report: Dict[str, dict], wall: float, concurrency: int):
+    def fmt(value):
+        return f"{value:7.2f}" if value is not None else "      -"
+
+    print(f"\nwall {wall:.1f}s, concurrency {concurrency}")
+    print(f"{'endpoint':<22} {'req':>5} {'err%':>6} {'rps':>7} | {'lat p50':>7} {'p95':>7} {'p99':>7} | "
+          f"{'ttft p50':>8} {'p95':>7} {'p99':>7} | {'ttfb p50':>8}")
+    for endpoint, row in report.items():
+        lat, ttft, ttfb = row["latency_s"], row["ttft_s"], row["ttfb_s"]
+        print(f"{endpoint:<22} {row['requests']:>5} {row['error_rate'] * 100:>5.1f}% {row['throughput_rps']:>7.2f} | "
+              f"{fmt(lat['p50'])} {fmt(lat['p95'])} {fmt(lat['p99'])} | "
+              f"{fmt(ttft['p50']):>8} {fmt(ttft['p95'])} {fmt(ttft['p99'])} | {fmt(ttfb['p50']):>8}")
+        for error, count in row["errors"].items():
+            print(f"    ✗ {count}× {error}")
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--base-url", default="http://127.0.0.1:8000")
+    ap.add_argument("--endpoints", nargs="+", choices=list(ENDPOINTS), default=list(ENDPOINTS))
+    ap.add_argument("--concurrency", type=int, default=4)
+    ap.add_argument("--requests", type=int, default=32, help="총 요청 수 (--duration 미지정 시)")
+    ap.add_argument("--duration", type=float, default=None, help="지정하면 이 시간(초) 동안 계속 요청")
+    ap.add_argument("--prompts", default=None, help="한 줄에 질문 하나인 텍스트 파일")
+    ap.add_argument("--timeout", type=float, default=600.0)
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--json-out", default=None)
+    args = ap.parse_args()
+
+    start = time.perf_counter()
+    samples = asyncio.run(run_load(args))
+    wall = time.perf_counter() - start
+    report = summarize(samples, wall)
+    print_report(report, wall, args.concurrency)
+    if args.json_out:
+        with open(args.json_out, "w", encoding="utf-8") as f:
+            json.dump({"wall_s": wall, "concurrency": args.concurrency, "endpoints": report}, f,
+                      ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
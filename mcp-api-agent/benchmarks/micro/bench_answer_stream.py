@@ -0,0 +1,56 @@
+"""Simple 경로 답변 토큰 스트리밍 콜백 (토큰마다 도는 holdback 판정 + 도구 호출 턴 철회)"""
+import asyncio
+from types import SimpleNamespace
+
+from langchain_core.messages import AIMessage, AIMessageChunk
+
+from agent_graph import AsyncAnswerStreamCallback
+
+ANSWER_TOKENS = ["파드0는 ", "정상입니다. "] * 200
+PREAMBLE_TOKENS = ["payments ", "네임스페이스의 ", "파드 ", "목록을 ", "조회해 ", "보겠습니다. ", "잠시만 ", "기다려 ", "주세요. "]
+TOOL_CALL_CHUNK = {"name": "k8s_kubectl_get", "args": "{}", "id": "call_1", "index": 0}
+
+
+def _chunk(token: str, tool_call: bool = False):
+    message = AIMessageChunk(content=token, tool_call_chunks=[TOOL_CALL_CHUNK] if tool_call else [])
+    return SimpleNamespace(message=message)
+
+
+def _result(tool_call: bool):
+    tool_calls = [{"name": "k8s_kubectl_get", "args": {}, "id": "call_1"}] if tool_call else []
+    return SimpleNamespace(generations=[[SimpleNamespace(message=AIMessage(content="", tool_calls=tool_calls))]])
+
+
+async def _run_turn(tokens, tool_call: bool):
+    """토큰을 하나씩 넣으면서 첫 TOKEN이 큐에 나온 시점(몇 번째 토큰 뒤인지)을 기록합니다."""
+    queue: asyncio.Queue = asyncio.Queue()
+    callback = AsyncAnswerStreamCallback(target_queue=queue, holdback_chars=40)
+    first_token_at = None
+    for index, token in enumerate(tokens):
+        await callback.on_llm_new_token(token, chunk=_chunk(token))
+        if first_token_at is None and not queue.empty():
+            first_token_at = index + 1
+    if tool_call:
+        await callback.on_llm_new_token("", chunk=_chunk("", tool_call=True))
+    await callback.on_llm_end(_result(tool_call))
+    events = []
+    while not queue.empty():
+        events.append(queue.get_nowait())
+    return callback, first_token_at, events
+
+
+def bench_answer_stream_400_tokens(benchmark):
+    callback, first_token_at, events = benchmark(lambda: asyncio.run(_run_turn(ANSWER_TOKENS, tool_call=False)))
+    # 첫 토큰이 전체 생성이 끝나기 훨씬 전에 나가야 함 (TTFT < 전체 지연)
+    assert first_token_at is not None and first_token_at < len(ANSWER_TOKENS) // 10
+    assert callback.streamed and not callback.retracted
+    assert "".join(e[len("TOKEN:"):] for e in events) == "".join(ANSWER_TOKENS)
+
+
+def bench_answer_stream_tool_call_after_preamble(benchmark):
+    callback, _, events = benchmark(lambda: asyncio.run(_run_turn(PREAMBLE_TOKENS, tool_call=True)))
+    # holdback을 넘긴 안내 문구는 이미 나갔으므로 철회 표시로 끝나야 함
+    assert callback.retracted and events[-1] == AsyncAnswerStreamCallback.RETRACT_EVENT
+    # holdback 안에서 도구 호출이 보이면 아무것도 나가지 않음
+    callback, first_token_at, events = asyncio.run(_run_turn(PREAMBLE_TOKENS[:3], tool_call=True))
+    assert first_token_at is None and events == [] and not callback.streamed
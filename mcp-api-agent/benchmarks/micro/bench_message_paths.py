@@ -0,0 +1,37 @@
+"""대화 기록 축소 / 중복 도구 호출 차단 / Simple 경로 도구 선택"""
+from langchain_core.messages import AIMessage
+
+from agent_graph import check_and_filter_duplicate_tools, select_simple_tools, trim_messages_history
+
+
+def bench_trim_messages_history_60_turns(benchmark, message_history):
+    trimmed = benchmark(trim_messages_history, message_history, 15)
+    assert len(trimmed) == 16
+
+
+def bench_check_and_filter_duplicate_tools(benchmark, message_history):
+    last_query = message_history[-2].tool_calls[0]["args"]["query"]
+
+    def fresh_call():
+        # 직전 호출 중복 1건 + 배치 내 중복 1건 + 새 호출 2건 (tool_calls를 바꾸므로 매 라운드 새로 만듦)
+        new_msg = AIMessage(content="", tool_calls=[
+            {"name": "vlogs_query", "args": {"query": last_query}, "id": "new_0"},
+            {"name": "vm_query", "args": {"query": "topk(10, rate(container_cpu_usage_seconds_total[5m]))"}, "id": "new_1"},
+            {"name": "vm_query", "args": {"query": "topk(10, rate(container_cpu_usage_seconds_total[5m]))"}, "id": "new_2"},
+            {"name": "k8s_kubectl_get", "args": {"resourceType": "pods", "namespace": "payments"}, "id": "new_3"},
+        ])
+        return (message_history, new_msg), {}
+
+    result = benchmark.pedantic(check_and_filter_duplicate_tools, setup=fresh_call, rounds=2000)
+    assert len(result.tool_calls) == 2
+
+
+def bench_select_simple_tools_200_catalog(benchmark, tool_catalog_200):
+    selected = benchmark(select_simple_tools, "payments 네임스페이스 파드 CPU 사용량과 에러 로그 보여줘", tool_catalog_200)
+    assert 0 < len(selected) <= len(tool_catalog_200)
+
+
+def bench_select_simple_tools_fallback_200_catalog(benchmark, tool_catalog_200):
+    # 키워드가 없으면 k8s 도구 전체로 fallback
+    selected = benchmark(select_simple_tools, "지금 몇 시야?", tool_catalog_200)
+    assert selected
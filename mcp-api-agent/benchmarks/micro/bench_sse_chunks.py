@@ -0,0 +1,35 @@
+"""스트리밍 엔드포인트의 SSE / Data Stream Chunk 생성 (토큰마다 호출)"""
+from sse_encoding import OpenAIStreamEncoder, make_all_idle_chunks, make_data_status, make_text_chunk
+
+TOKEN = "파드가 "
+PROGRESS_LINE = "[과정] 🔍 LogSpecialist: vlogs_query 실행 중 (namespace:payments level:error)\n"
+
+
+def bench_make_text_chunk_token(benchmark):
+    assert benchmark(make_text_chunk, TOKEN).startswith(b"0:")
+
+
+def bench_make_text_chunk_progress_line(benchmark):
+    assert benchmark(make_text_chunk, PROGRESS_LINE).endswith(b"\n")
+
+
+def bench_make_data_status(benchmark):
+    assert benchmark(make_data_status, "worker_log", "running").startswith(b"8:")
+
+
+def bench_make_all_idle_chunks(benchmark):
+    assert len(benchmark(make_all_idle_chunks)) > 1
+
+
+def bench_make_openai_chunk_token(benchmark):
+    encoder = OpenAIStreamEncoder("qwen-k8s-agent")
+    assert benchmark(encoder.chunk, TOKEN).startswith(b"data: ")
+
+
+def bench_openai_stream_1000_tokens(benchmark):
+    # 답변 1,000 토큰 스트림 한 번에 해당하는 Chunk 생성 비용 (스트림마다 인코더 한 개)
+    def stream():
+        encoder = OpenAIStreamEncoder("qwen-k8s-agent")
+        return sum(len(encoder.chunk(TOKEN)) for _ in range(1000))
+
+    assert benchmark(stream) > 0
@@ -0,0 +1,54 @@
+"""스트리밍 엔드포인트의 stream_queue 소비 (토큰마다 도는 SSE 생성기 루프)"""
+import asyncio
+
+from starlette.requests import Request
+
+from api_server import StreamEventReader
+
+TOKEN_MSG = "TOKEN:파드가 "
+
+
+def _idle_request() -> Request:
+    # 연결이 끊기지 않는 클라이언트 (receive가 영원히 대기)
+    never = asyncio.Event()
+
+    async def receive():
+        await never.wait()
+
+    return Request({"type": "http", "method": "POST", "headers": []}, receive)
+
+
+async def _consume(tokens: int, burst: int) -> int:
+    queue: asyncio.Queue = asyncio.Queue()
+
+    async def produce():
+        # LLM 콜백처럼 이벤트 루프 한 바퀴마다 burst개씩 넣음
+        for _ in range(0, tokens, burst):
+            for _ in range(burst):
+                queue.put_nowait(TOKEN_MSG)
+            await asyncio.sleep(0)
+        queue.put_nowait("EOF")
+
+    reader = StreamEventReader(_idle_request(), queue)
+    producer = asyncio.create_task(produce())
+    received = 0
+    try:
+        while True:
+            batch = await reader.next_batch(0.1)
+            received += len(batch)
+            if batch and batch[-1] == "EOF":
+                break
+    finally:
+        reader.close()
+        await producer
+    return received
+
+
+def bench_stream_event_reader_1000_tokens(benchmark):
+    # 토큰이 한 개씩 도착하는 경우
+    assert benchmark(lambda: asyncio.run(_consume(1000, 1))) == 1001
+
+
+def bench_stream_event_reader_1000_tokens_burst(benchmark):
+    # 네트워크 한 번 읽기에 여러 Chunk가 들어와 큐에 쌓이는 경우 (묶음 Drain)
+    assert benchmark(lambda: asyncio.run(_consume(1000, 8))) == 1001
@@ -0,0 +1,27 @@
+"""Synthesizer 등급 판정 (Worker 보고서 에러 징후 탐지 / 템플릿 답변)"""
+from synthesis_policy import TIER_TEMPLATE, choose_synthesis_tier, find_error_lines, render_template_answer
+
+
+def bench_find_error_lines_worker_reports(benchmark, worker_report_lines):
+    lines = worker_report_lines["incident"] + worker_report_lines["clear"]
+
+    def scan_all():
+        return [find_error_lines(line) for line in lines]
+
+    hits = dict(zip(lines, benchmark(scan_all)))
+    # 장애 줄을 "징후 없음"으로 보면 템플릿 답변으로 빠지므로 줄마다 확인
+    assert [line for line in worker_report_lines["incident"] if not hits[line]] == []
+    assert [line for line in worker_report_lines["clear"] if hits[line]] == []
+
+
+def bench_choose_synthesis_tier_incident(benchmark, worker_report_lines):
+    for line in worker_report_lines["incident"]:
+        decision = choose_synthesis_tier({"k8s": f"[k8s] 집중 분석 결과: {line}"}, 50, listing=False)
+        assert decision.tier != TIER_TEMPLATE, line
+
+    report = {"k8s": "[k8s] 집중 분석 결과: " + "\n".join(worker_report_lines["clear"])}
+    decision = benchmark(choose_synthesis_tier, report, 50, False)
+    assert decision.tier == TIER_TEMPLATE
+    # 템플릿 답변은 휴리스틱 판정을 "이상 없음"으로 단정하지 않음
+    answer = render_template_answer(report, ["k8s"], listing=False)
+    assert "발견되지 않았습니다" not in answer.splitlines()[0]
@@ -0,0 +1,55 @@
+"""토큰 추정 / 절단 / Thinking 태그 제거 / 라우팅 규칙 (요청마다 여러 번 호출되는 텍스트 경로)"""
+from agent_graph import (
+    INSTRUCT_CONFIG,
+    THINKING_CONFIG,
+    _get_token_encoding,
+    estimate_token_count,
+    is_listing_request,
+    remove_thinking_tags,
+    trim_text_to_token_limit,
+)
+
+INSTRUCT_MODEL = INSTRUCT_CONFIG["model_name"]
+THINKING_MODEL = THINKING_CONFIG["model_name"]
+
+
+def tokenizer_kind(model_name: str) -> str:
+    # tiktoken 인코딩 파일을 못 받는 환경(오프라인)에서는 문자 길이 추정으로 fallback → 수치 비교 시 함께 확인
+    return "tiktoken" if _get_token_encoding(model_name) is not None else "char-fallback"
+
+
+def bench_estimate_token_count_log_50k(benchmark, mixed_log_50k):
+    benchmark.extra_info["tokenizer"] = tokenizer_kind(INSTRUCT_MODEL)
+    count = benchmark(estimate_token_count, mixed_log_50k, INSTRUCT_MODEL)
+    assert count > 0
+
+
+def bench_trim_text_to_token_limit_log_50k(benchmark, mixed_log_50k):
+    # Worker 요약 프롬프트에 넣기 전 3,000 토큰으로 자르는 경로
+    benchmark.extra_info["tokenizer"] = tokenizer_kind(INSTRUCT_MODEL)
+    trimmed = benchmark(trim_text_to_token_limit, mixed_log_50k, 3000, INSTRUCT_MODEL, "\n...(생략)")
+    assert len(trimmed) < len(mixed_log_50k)
+
+
+def bench_trim_text_under_limit_log_50k(benchmark, mixed_log_50k):
+    # 한도 안쪽 입력: 인코딩 후 그대로 반환 (대부분의 도구 결과가 여기에 해당)
+    benchmark.extra_info["tokenizer"] = tokenizer_kind(INSTRUCT_MODEL)
+    text = benchmark(trim_text_to_token_limit, mixed_log_50k, 1_000_000, INSTRUCT_MODEL, "")
+    assert text is mixed_log_50k
+
+
+def bench_remove_thinking_tags_long_stream(benchmark, thinking_stream):
+    answer = benchmark(remove_thinking_tags, thinking_stream)
+    assert "<think>" not in answer
+
+
+def bench_estimate_token_count_thinking_stream(benchmark, thinking_stream):
+    benchmark.extra_info["tokenizer"] = tokenizer_kind(THINKING_MODEL)
+    assert benchmark(estimate_token_count, thinking_stream, THINKING_MODEL) > 0
+
+
+def bench_is_listing_request_prompts(benchmark, listing_prompts):
+    def classify_all():
+        return [is_listing_request(prompt) for prompt in listing_prompts]
+
+    assert any(benchmark(classify_all))
@@ -0,0 +1,145 @@
+"""
+마이크로 벤치마크 공용 입력 데이터
+
+요청마다 도는 텍스트 처리 함수들에 운영 환경과 비슷한 크기의 입력을 넣습니다.
+  - mixed_log_50k    : 한국어/영어가 섞인 VictoriaLogs 스타일 로그 5만 자
+  - thinking_stream  : <think> 블록(수천 토큰)이 여러 번 들어간 Thinking 모델 응답
+  - tool_catalog_200 : k8s/vlogs/vm/vtraces 접두어를 가진 도구 200개
+  - message_history  : 도구 호출/결과가 반복되는 ReAct 대화 60턴
+  - worker_report_lines : 장애 징후가 있는 줄 / 부정 표현으로 징후가 없는 줄 (Synthesizer 등급 판정 입력)
+입력은 고정 seed로 만들어 실행마다 같은 값을 씁니다.
+"""
+import os
+import random
+import sys
+
+import pytest
+
+# mcp-api-agent 디렉터리의 모듈을 import (config.py 또는 CONFIG_FILE_PATH 필요)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage, ToolMessage  # noqa: E402
+from langchain_core.tools import StructuredTool  # noqa: E402
+from pydantic import create_model  # noqa: E402
+
+BASELINE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines")
+
+
+@pytest.hookimpl(tryfirst=True)
+def pytest_configure(config):
+    # 저장된 기준선(--benchmark-save / --benchmark-compare)은 실행 위치와 관계없이 baselines/에 둡니다.
+    if config.getoption("benchmark_storage", None) == "file://./.benchmarks":
+        config.option.benchmark_storage = f"file://{BASELINE_DIR}"
+
+
+_LOG_TEMPLATES = [
+    '{{"_time":"2026-10-19T08:{m:02d}:{s:02d}Z","level":"error","namespace":"payments","pod":"billing-7c9f8d6b5-{pod}",'
+    '"_msg":"DB 연결 실패: dial tcp 10.0.{a}.{b}:5432: connect: connection refused (재시도 {n}회)"}}',
+    '{{"_time":"2026-10-19T08:{m:02d}:{s:02d}Z","level":"warn","namespace":"orders","pod":"frontend-{pod}",'
+    '"_msg":"upstream 응답 지연 {n}ms, request_id={pod}{a}{b} path=/api/v1/orders/{n}"}}',
+    '{{"_time":"2026-10-19T08:{m:02d}:{s:02d}Z","level":"info","namespace":"kube-system","pod":"coredns-{pod}",'
+    '"_msg":"[INFO] 10.244.{a}.{b}:{n} - \\"A IN postgres.payments.svc.cluster.local. udp\\" NOERROR"}}',
+    '{{"_time":"2026-10-19T08:{m:02d}:{s:02d}Z","level":"error","namespace":"payments","pod":"billing-7c9f8d6b5-{pod}",'
+    '"_msg":"java.lang.OutOfMemoryError: Java heap space at com.example.billing.Invoice.render(Invoice.java:{n})"}}',
+]
+
+_THINK_WORDS = [
+    "파드가", "재시작을", "반복하는", "원인은", "메모리", "한도", "초과로", "보입니다.",
+    "the", "container", "was", "OOMKilled", "after", "heap", "growth,", "so", "check", "limits.",
+]
+
+
+@pytest.fixture(scope="session")
+def mixed_log_50k() -> str:
+    rng = random.Random(41)
+    lines, size = [], 0
+    while size < 50_000:
+        line = rng.choice(_LOG_TEMPLATES).format(
+            m=rng.randrange(60), s=rng.randrange(60), pod=f"{rng.randrange(16**5):05x}",
+            a=rng.randrange(256), b=rng.randrange(256), n=rng.randrange(10_000),
+        )
+        lines.append(line)
+        size += len(line) + 1
+    return "\n".join(lines)[:50_000]
+
+
+@pytest.fixture(scope="session")
+def thinking_stream() -> str:
+    rng = random.Random(42)
+    parts = []
+    for _ in range(4):
+        reasoning = " ".join(rng.choice(_THINK_WORDS) for _ in range(1500))
+        answer = " ".join(rng.choice(_THINK_WORDS) for _ in range(150))
+        parts.append(f"<think>\n{reasoning}\n</think>\n\n{answer}\n")
+    return "".join(parts)
+
+
+def _make_tool(name: str) -> StructuredTool:
+    InputModel = create_model(f"{name}_input", query=(str, ...), limit=(int, None))
+
+    async def _run(**kwargs):
+        return ""
+
+    return StructuredTool.from_function(
+        func=None, coroutine=_run, name=name, description=f"[{name.split('_')[0]}] {name} 도구", args_schema=InputModel,
+    )
+
+
+@pytest.fixture(scope="session")
+def tool_catalog_200() -> list:
+    servers = ["k8s", "vlogs", "vm", "vtraces"]
+    verbs = ["get", "describe", "list", "query", "stats", "hits", "series", "labels", "logs", "events"]
+    return [_make_tool(f"{servers[i % 4]}_{verbs[(i // 4) % len(verbs)]}_{i:03d}") for i in range(200)]
+
+
+@pytest.fixture(scope="session")
+def message_history(mixed_log_50k) -> list:
+    messages = [SystemMessage(content="당신은 빠르고 정확한 K8s 및 Observability 관리자입니다."),
+                HumanMessage(content="payments 네임스페이스 billing 파드가 계속 재시작되는 원인을 진단해줘")]
+    for turn in range(60):
+        call_id = f"call_{turn:03d}"
+        messages.append(AIMessage(content="", tool_calls=[
+            {"name": "vlogs_query", "args": {"query": f"namespace:payments level:error | limit {turn}"}, "id": call_id},
+        ]))
+        messages.append(ToolMessage(content=mixed_log_50k[turn * 500:(turn + 1) * 500], tool_call_id=call_id))
+    return messages
+
+
+@pytest.fixture(scope="session")
+def listing_prompts() -> list:
+    return [
+        "payments 네임스페이스 파드 목록 보여줘",
+        "네임스페이스 목록 이름만 나열해줘",
+        "payments 네임스페이스 billing 파드가 계속 재시작되는 원인을 진단해줘",
+        "show me all services in kube-system",
+        "클러스터 전반적으로 에러가 있는지 진단해줘",
+        "CPU 사용량 상위 3개 파드 알려줘",
+        "list deployments in orders namespace",
+        "왜 frontend 파드가 Pending 상태야?",
+    ]
+
+
+@pytest.fixture(scope="session")
+def worker_report_lines() -> dict:
+    # incident: 실제 장애 (주변에 "no", "0"이 있어도 징후로 잡혀야 함) / clear: 징후 표현에 부정 표현이 직접 붙은 줄
+    return {
+        "incident": [
+            "CrashLoopBackOff: no such file",
+            "Pod Pending; no nodes available",
+            "5xx error rate 0.5%",
+            "no errors except OOMKilled on db-0",
+            "에러율 0.5%",
+            "Warning 이벤트 3건",
+            "billing 파드 재시작 12회 (OOMKilled)",
+        ],
+        "clear": [
+            "에러 없음",
+            "에러나 경고 징후는 발견되지 않았습니다.",
+            "Warning 이벤트 0건",
+            "errors: none",
+            "No errors found",
+            "재시작 0회",
+            "CrashLoopBackOff 파드 없음",
+            "Pending pods: 0",
+        ],
+    }
@@ -0,0 +1,125 @@
+"""
+녹화 세션 재생 / 성능 회귀 비교
+
+session_record_dir로 녹화한 요청(*.jsonl.gz)을 현재 코드의 에이전트 그래프로 다시 실행합니다.
+LLM 응답과 MCP 도구 원본 결과는 녹화본에서 돌려주므로 vLLM/클러스터 없이 돌아가며,
+도구 결과 절단 / 프롬프트 / 동시성 설정 변경이 소요 시간과 토큰 사용량에 주는 영향을 비교할 수 있습니다.
+
+  --timing fast      : 녹화된 지연을 건너뛰고 최대한 빠르게 (프롬프트 크기/호출 수 비교용)
+  --timing recorded  : LLM 첫 토큰/생성 시간과 도구 지연을 녹화대로 재현 (벽시계 시간 비교용)
+
+사용법 (mcp-api-agent 디렉터리에서):
+    python benchmarks/replay_session.py replay recordings/ --timing recorded --json-out after.json
+    python benchmarks/replay_session.py diff before.json after.json --fail-on wall_s=10 prompt_tokens_est=5
+"""
+import argparse
+import asyncio
+import glob
+import json
+import os
+import sys
+from typing import Dict, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+DIFF_METRICS = ("wall_s", "prompt_tokens_est", "completion_tokens", "llm_calls", "tool_calls")
+
+
+def find_recordings(paths: List[str]) -> List[str]:
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(sorted(glob.glob(os.path.join(path, "*.jsonl.gz")) + glob.glob(os.path.join(path, "*.jsonl"))))
+        else:
+            files.append(path)
+    return files
+
+
+async def replay_all(files: List[str], timing: str) -> List[dict]:
+    from session_recorder import load_recording, replay_session
+
+    reports = []
+    for path in files:
+        report = await replay_session(load_recording(path), timing=timing)
+        report["file"] = os.path.basename(path)
+        reports.append(report)
+        print(f"▶ {report['file']}: {report['wall_s']:.2f}s (녹화 {report['recorded']['wall_s'] or 0:.2f}s), "
+              f"LLM {report['llm_calls']}회 (녹화 {report['recorded']['llm_calls']}회, 매칭 실패 {report['llm_miss']}), "
+              f"도구 {report['tool_calls']}회 (매칭 실패 {report['tool_miss']}), "
+              f"프롬프트 ~{report['prompt_tokens_est']} tok (녹화 ~{report['recorded']['prompt_tokens_est']})")
+    return reports
+
+
+def totals(reports: List[dict]) -> Dict[str, float]:
+    return {metric: round(sum(r.get(metric) or 0 for r in reports), 4) for metric in DIFF_METRICS}
+
+
+def cmd_replay(args) -> int:
+    files = find_recordings(args.paths)
+    if not files:
+        print("녹화 파일이 없습니다.", file=sys.stderr)
+        return 1
+    reports = asyncio.run(replay_all(files, args.timing))
+    summary = {"timing": args.timing, "sessions": len(reports), "totals": totals(reports), "reports": reports}
+    print(f"\n합계 ({len(reports)}개 세션): " + ", ".join(f"{k}={v}" for k, v in summary["totals"].items()))
+    if args.json_out:
+        with open(args.json_out, "w", encoding="utf-8") as f:
+            json.dump(summary, f, ensure_ascii=False, indent=2)
+    return 0
+
+
+def parse_thresholds(items: List[str]) -> Dict[str, float]:
+    thresholds = {}
+    for item in items or []:
+        metric, _, pct = item.partition("=")
+        if metric not in DIFF_METRICS or not pct:
+            raise SystemExit(f"--fail-on 형식: metric=pct (metric: {', '.join(DIFF_METRICS)})")
+        thresholds[metric] = float(pct)
+    return thresholds
+
+
+def cmd_diff(args) -> int:
+    with open(args.before, "r", encoding="utf-8") as f:
+        before = json.load(f)["totals"]
+    with open(args.after, "r", encoding="utf-8") as f:
+        after = json.load(f)["totals"]
+    thresholds = parse_thresholds(args.fail_on)
+    failed = []
+    print(f"{'metric':<20} {'before':>12} {'after':>12} {'change':>9}")
+    for metric in DIFF_METRICS:
+        old, new = before.get(metric) or 0, after.get(metric) or 0
+        change = (new - old) / old * 100 if old else (0.0 if new == old else float("inf"))
+        mark = ""
+        if metric in thresholds and change > thresholds[metric]:
+            failed.append(metric)
+            mark = f"  ✗ (> +{thresholds[metric]:g}%)"
+        print(f"{metric:<20} {old:>12g} {new:>12g} {change:>+8.1f}%{mark}")
+    if failed:
+        print(f"\n회귀 감지: {', '.join(failed)}")
+        return 1
+    return 0
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = ap.add_subparsers(dest="command", required=True)
+
+    replay = sub.add_parser("replay", help="녹화 세션 재생")
+    replay.add_argument("paths", nargs="+", help="녹화 파일 또는 디렉터리")
+    replay.add_argument("--timing", choices=["fast", "recorded"], default="fast")
+    replay.add_argument("--json-out", default=None)
+    replay.set_defaults(func=cmd_replay)
+
+    diff = sub.add_parser("diff", help="재생 리포트 두 개 비교 (CI용)")
+    diff.add_argument("before")
+    diff.add_argument("after")
+    diff.add_argument("--fail-on", nargs="*", default=[], metavar="METRIC=PCT",
+                      help="증가율이 PCT%%를 넘으면 종료 코드 1 (예: wall_s=10 prompt_tokens_est=5)")
+    diff.set_defaults(func=cmd_diff)
+
+    args = ap.parse_args()
+    sys.exit(args.func(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,267 @@
+"""
+오프라인 벤치마크용 Stub OpenAI 호환 LLM 서버
+
+vLLM 대신 /v1/chat/completions를 흉내 냅니다. 프롬프트를 보고 에이전트의 각 단계
+(Router / Orchestrator / Worker 도구 호출 / 요약 / Synthesizer)에 맞는 응답을 스크립트대로 돌려주며,
+prefill 지연(첫 토큰까지 시간)과 토큰 생성 속도를 설정해 실제 모델 서버의 타이밍을 재현합니다.
+
+사용법 (mcp-api-agent 디렉터리에서):
+    python benchmarks/stub_llm_server.py                                  # 127.0.0.1:19100
+    python benchmarks/stub_llm_server.py --ttft-ms 400 --tokens-per-sec 40 --reasoning-tokens 300
+    python benchmarks/stub_llm_server.py --script my_script.json          # 응답 스크립트 일부 덮어쓰기
+
+스크립트(JSON) 키 (모두 선택):
+    router          : "auto" | "SIMPLE" | "COMPLEX"   (auto = 진단/원인/에러 키워드가 있으면 COMPLEX)
+    plan            : Orchestrator가 돌려줄 Worker 계획 dict
+    tool_calls      : {도구 이름 접두어: {"name": 도구 이름, "arguments": {...}}}  (바인딩된 도구 중 첫 매칭 사용)
+    answer          : 최종 답변/요약 텍스트
+    reasoning       : Thinking 모델(<think>) 추론 텍스트 한 조각 (reasoning_tokens만큼 반복)
+    tool_preamble   : 도구 호출 응답 앞에 붙일 안내 문구 (텍스트 뒤에 tool_call이 이어지는 스트림 재현)
+"""
+import argparse
+import asyncio
+import json
+import re
+import time
+import uuid
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+DEFAULT_SCRIPT = {
+    "router": "auto",
+    "plan": {
+        "k8s": "전체 네임스페이스의 비정상 파드(Pending/CrashLoopBackOff)와 재시작 횟수를 조회해.",
+        "log": "최근 1시간 error/warn 로그를 limit 50으로 조회하고 | collapse_nums 를 붙여.",
+        "metric": "CPU 사용량 Top 10 파드를 topk(10, ...)로 조회해.",
+    },
+    "tool_calls": {
+        "k8s_kubectl_get": {"name": "k8s_kubectl_get", "arguments": {"resourceType": "pods", "allNamespaces": True}},
+        "vlogs_query": {"name": "vlogs_query", "arguments": {"query": "level:error | collapse_nums", "limit": 50}},
+        "vm_query": {"name": "vm_query", "arguments": {"query": "topk(10, rate(container_cpu_usage_seconds_total[5m]))"}},
+        "vtraces_traces": {"name": "vtraces_traces", "arguments": {"service": "gateway", "limit": 5}},
+    },
+    "answer": (
+        "1. payments/billing-7c9f8d6b5-x2k4p 파드가 CrashLoopBackOff 상태이며 23회 재시작했습니다. "
+        "2. 같은 시간대에 postgres.payments.svc:5432 connection refused 에러 로그가 반복됩니다. "
+        "3. billing 컨테이너 CPU 사용량이 1.92 core로 다른 파드 대비 이상치입니다. "
+        "조치: postgres 서비스 엔드포인트와 billing 메모리/DB 설정을 확인하세요."
+    ),
+    "reasoning": "사용자의 질문과 전문가 보고서를 비교하며 원인 후보를 좁혀 봅니다. ",
+    # 도구 호출 응답 앞에 붙일 안내 문구 (실제 모델처럼 텍스트 뒤에 tool_call이 이어지는 스트림 재현용)
+    "tool_preamble": "",
+}
+
+_COMPLEX_HINTS = re.compile(r"(진단|원인|에러|오류|장애|왜|분석|diagnos|root cause|error)", re.IGNORECASE)
+
+
+class StubBehavior:
+    def __init__(self, args, script: dict):
+        self.ttft = args.ttft_ms / 1000
+        self.tokens_per_sec = args.tokens_per_sec
+        self.reasoning_tokens = args.reasoning_tokens
+        self.thinking_models = set(args.thinking_models)
+        self.script = script
+
+    # ---------------------------------------------------------------
+    # 요청 분류
+    # ---------------------------------------------------------------
+    def plan_response(self, body: dict) -> dict:
+        """{"content": str, "tool_calls": [...], "reasoning": bool} 형태로 이번 응답을 정합니다."""
+        messages = body.get("messages", [])
+        last = messages[-1] if messages else {}
+        text = last.get("content") or ""
+        if isinstance(text, list):
+            text = " ".join(part.get("text", "") for part in text if isinstance(part, dict))
+        tools = [t.get("function", {}).get("name", "") for t in body.get("tools") or []]
+        has_tool_result = any(m.get("role") == "tool" for m in messages)
+
+        if '"SIMPLE" 또는 "COMPLEX"' in text:
+            mode = self.script["router"]
+            if mode == "auto":
+                question = text.split("[사용자 질문]")[-1].split("[응답 형식]")[0]
+                mode = "COMPLEX" if _COMPLEX_HINTS.search(question) else "SIMPLE"
+            return {"content": mode, "tool_calls": []}
+
+        if "지휘자(Orchestrator)" in text:
+            plan = json.dumps(self.script["plan"], ensure_ascii=False, indent=2)
+            return {"content": f"```json\n{plan}\n```", "tool_calls": []}
+
+        if tools and not has_tool_result:
+            call = self._pick_tool_call(tools)
+            if call:
+                return {"content": self.script["tool_preamble"], "tool_calls": [call]}
+
+        return {
+            "content": self.script["answer"],
+            "tool_calls": [],
+            "reasoning": body.get("model") in self.thinking_models,
+        }
+
+    def _pick_tool_call(self, tools: list):
+        # fetch_tool_output 같은 시스템 도구는 고르지 않음
+        candidates = [t for t in tools if not t.startswith("fetch_")]
+        for prefix, call in self.script["tool_calls"].items():
+            for tool in candidates:
+                if tool.startswith(prefix):
+                    return {"name": tool, "arguments": call.get("arguments", {})}
+        if candidates:
+            return {"name": candidates[0], "arguments": {}}
+        return None
+
+    # ---------------------------------------------------------------
+    # 토큰화 / 타이밍
+    # ---------------------------------------------------------------
+    @staticmethod
+    def tokenize(text: str) -> list:
+        # 공백 단위로 쪼개 대략 단어당 1토큰으로 흉내
+        return re.findall(r"\S+\s*|\s+", text)
+
+    def reasoning_text(self) -> str:
+        piece_tokens = max(len(self.tokenize(self.script["reasoning"])), 1)
+        repeat = max(self.reasoning_tokens // piece_tokens, 1)
+        return "<think>\n" + self.script["reasoning"] * repeat + "\n</think>\n\n"
+
+    async def token_delay(self, count: int = 1):
+        if self.tokens_per_sec > 0:
+            await asyncio.sleep(count / self.tokens_per_sec)
+
+    async def generate(self, tokens: int):
+        await asyncio.sleep(self.ttft)
+        await self.token_delay(tokens)
+
+    def tokens_done(self, tokens: int, started: float) -> int:
+        """non-stream 생성이 started부터 지금까지 만들었을 토큰 수"""
+        if self.tokens_per_sec <= 0:
+            return tokens
+        elapsed = time.perf_counter() - started - self.ttft
+        return max(0, min(tokens, int(elapsed * self.tokens_per_sec)))
+
+
+def make_completion_id() -> str:
+    return f"chatcmpl-{uuid.uuid4().hex[:24]}"
+
+
+def build_app(behavior: StubBehavior) -> FastAPI:
+    app = FastAPI(title="stub-llm")
+    # aborted / tokens_skipped: 클라이언트가 중간에 끊어 생성하지 않은 호출/토큰 수 (취소 전파 효과 측정용)
+    stats = {"requests": 0, "streamed": 0, "tool_calls": 0,
+             "tokens_generated": 0, "aborted": 0, "tokens_skipped": 0}
+
+    def record_generation(total: int, generated: int):
+        stats["tokens_generated"] += generated
+        if generated < total:
+            stats["aborted"] += 1
+            stats["tokens_skipped"] += total - generated
+
+    @app.get("/v1/models")
+    async def models():
+        names = sorted(behavior.thinking_models | {"qwen-custom"})
+        return {"object": "list", "data": [{"id": name, "object": "model"} for name in names]}
+
+    @app.get("/stats")
+    async def get_stats():
+        return stats
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        plan = behavior.plan_response(body)
+        stats["requests"] += 1
+        stats["tool_calls"] += len(plan["tool_calls"])
+        content = plan["content"]
+        if plan.get("reasoning"):
+            content = behavior.reasoning_text() + content
+        prompt_tokens = sum(len(str(m.get("content") or "")) for m in body.get("messages", [])) // 3
+        completion_tokens = len(behavior.tokenize(content)) + 8 * len(plan["tool_calls"])
+        model = body.get("model", "stub")
+        completion_id = make_completion_id()
+        created = int(time.time())
+        tool_calls = [
+            {"id": f"call_{uuid.uuid4().hex[:12]}", "type": "function",
+             "function": {"name": call["name"], "arguments": json.dumps(call["arguments"], ensure_ascii=False)}}
+            for call in plan["tool_calls"]
+        ]
+        usage = {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                 "total_tokens": prompt_tokens + completion_tokens}
+
+        if not body.get("stream"):
+            # vLLM처럼 응답을 기다리던 클라이언트가 끊으면 생성을 중단
+            started = time.perf_counter()
+            generation = asyncio.create_task(behavior.generate(completion_tokens))
+            while not generation.done():
+                await asyncio.wait({generation}, timeout=0.05)
+                if not generation.done() and await request.is_disconnected():
+                    generation.cancel()
+                    record_generation(completion_tokens, behavior.tokens_done(completion_tokens, started))
+                    return JSONResponse(status_code=499, content={})
+            record_generation(completion_tokens, completion_tokens)
+            message = {"role": "assistant", "content": content or None}
+            if tool_calls:
+                message["tool_calls"] = tool_calls
+            return JSONResponse({
+                "id": completion_id, "object": "chat.completion", "created": created, "model": model,
+                "choices": [{"index": 0, "message": message,
+                             "finish_reason": "tool_calls" if tool_calls else "stop"}],
+                "usage": usage,
+            })
+
+        stats["streamed"] += 1
+        include_usage = (body.get("stream_options") or {}).get("include_usage")
+
+        def chunk(delta: dict, finish_reason=None) -> str:
+            payload = {"id": completion_id, "object": "chat.completion.chunk", "created": created, "model": model,
+                       "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}]}
+            return f"data: {json.dumps(payload, ensure_ascii=False)}\n\n"
+
+        async def stream():
+            generated = 0
+            try:
+                await asyncio.sleep(behavior.ttft)
+                yield chunk({"role": "assistant", "content": ""})
+                for token in behavior.tokenize(content):
+                    await behavior.token_delay()
+                    generated += 1
+                    yield chunk({"content": token})
+                for index, call in enumerate(tool_calls):
+                    await behavior.token_delay(8)
+                    generated += 8
+                    yield chunk({"tool_calls": [dict(call, index=index)]})
+            finally:
+                # 연결이 끊기면 Starlette가 생성기를 취소하므로 여기서 생성량을 집계
+                record_generation(completion_tokens, generated)
+            yield chunk({}, finish_reason="tool_calls" if tool_calls else "stop")
+            if include_usage:
+                payload = {"id": completion_id, "object": "chat.completion.chunk", "created": created,
+                           "model": model, "choices": [], "usage": usage}
+                yield f"data: {json.dumps(payload)}\n\n"
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(stream(), media_type="text/event-stream")
+
+    return app
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=19100)
+    ap.add_argument("--ttft-ms", type=float, default=200.0, help="prefill 지연 (첫 토큰까지 시간)")
+    ap.add_argument("--tokens-per-sec", type=float, default=60.0, help="토큰 생성 속도 (0이면 지연 없음)")
+    ap.add_argument("--reasoning-tokens", type=int, default=200, help="Thinking 모델 응답 앞에 붙일 추론 토큰 수")
+    ap.add_argument("--thinking-models", nargs="+", default=["qwen-thinking"],
+                    help="<think> 블록을 붙여 응답할 모델 이름 (THINKING_CONFIG.model_name)")
+    ap.add_argument("--script", default=None, help="DEFAULT_SCRIPT를 덮어쓸 JSON 파일")
+    args = ap.parse_args()
+
+    script = dict(DEFAULT_SCRIPT)
+    if args.script:
+        with open(args.script, "r", encoding="utf-8") as f:
+            script.update(json.load(f))
+    print(f"🧪 stub LLM http://{args.host}:{args.port}/v1 (ttft={args.ttft_ms}ms, {args.tokens_per_sec} tok/s)")
+    uvicorn.run(build_app(StubBehavior(args, script)), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
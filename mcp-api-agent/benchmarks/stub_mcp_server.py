@@ -0,0 +1,112 @@
+"""
+오프라인 벤치마크용 Stub MCP SSE 서버
+
+fixtures/mcp_payloads.json에 기록된 k8s / vlogs / vm / vtraces 도구 정의와 응답을
+서버별 포트에서 MCP(SSE) 프로토콜로 그대로 돌려줍니다. 네트워크/클러스터 없이 에이전트 전체 경로를 돌릴 수 있습니다.
+
+사용법 (mcp-api-agent 디렉터리에서):
+    python benchmarks/stub_mcp_server.py                       # k8s:19101 vlogs:19102 vm:19103 vtraces:19104
+    python benchmarks/stub_mcp_server.py --latency-ms 150 --jitter-ms 50 --scale 20
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+
+import mcp.types as types
+import uvicorn
+from mcp.server.lowlevel import Server
+from mcp.server.sse import SseServerTransport
+
+FIXTURE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "mcp_payloads.json")
+DEFAULT_PORTS = {"k8s": 19101, "vlogs": 19102, "vm": 19103, "vtraces": 19104}
+
+
+def scale_payload(text: str, scale: int) -> str:
+    """표/로그 줄을 scale배로 늘려 대형 클러스터 응답을 흉내 냅니다. (한 줄짜리 JSON 문서는 그대로 둠)"""
+    if scale <= 1 or "\n" not in text.strip():
+        return text
+    lines = text.splitlines()
+    first = lines[0].split()
+    header = lines[:1] if first and first[0].isupper() else []  # kubectl 표 헤더(NAMESPACE ...)는 한 번만
+    return "\n".join(header + lines[len(header):] * scale)
+
+
+def build_server(name: str, tools: dict, latency_ms: float, jitter_ms: float, scale: int) -> Server:
+    server = Server(f"stub-{name}")
+
+    @server.list_tools()
+    async def list_tools():
+        return [
+            types.Tool(name=tool_name, description=spec["description"], inputSchema=spec["inputSchema"])
+            for tool_name, spec in tools.items()
+        ]
+
+    @server.call_tool()
+    async def call_tool(tool_name: str, arguments: dict):
+        spec = tools.get(tool_name)
+        if spec is None:
+            raise ValueError(f"unknown tool: {tool_name}")
+        delay = max(latency_ms + random.uniform(-jitter_ms, jitter_ms), 0) / 1000
+        if delay:
+            await asyncio.sleep(delay)
+        return [types.TextContent(type="text", text=scale_payload(spec["response"], scale))]
+
+    return server
+
+
+def build_asgi_app(server: Server):
+    """/sse (GET) + /messages/ (POST)만 처리하는 최소 ASGI 앱"""
+    sse = SseServerTransport("/messages/")
+
+    async def app(scope, receive, send):
+        if scope["type"] == "lifespan":
+            while True:
+                message = await receive()
+                if message["type"] == "lifespan.startup":
+                    await send({"type": "lifespan.startup.complete"})
+                elif message["type"] == "lifespan.shutdown":
+                    await send({"type": "lifespan.shutdown.complete"})
+                    return
+        path = scope.get("path", "")
+        if path == "/sse":
+            async with sse.connect_sse(scope, receive, send) as streams:
+                await server.run(streams[0], streams[1], server.create_initialization_options())
+        elif path.startswith("/messages/"):
+            await sse.handle_post_message(scope, receive, send)
+        else:
+            await send({"type": "http.response.start", "status": 404, "headers": []})
+            await send({"type": "http.response.body", "body": b"not found"})
+
+    return app
+
+
+async def serve_all(args):
+    with open(args.fixtures, "r", encoding="utf-8") as f:
+        fixtures = json.load(f)
+    servers = []
+    for offset, name in enumerate(args.servers):
+        port = args.base_port + offset if args.base_port is not None else DEFAULT_PORTS.get(name, 19110 + offset)
+        app = build_asgi_app(build_server(name, fixtures[name], args.latency_ms, args.jitter_ms, args.scale))
+        config = uvicorn.Config(app, host=args.host, port=port, log_level="warning")
+        servers.append(uvicorn.Server(config))
+        print(f"🧪 stub MCP [{name}] http://{args.host}:{port}/sse ({len(fixtures[name])} tools)")
+    await asyncio.gather(*(s.serve() for s in servers))
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--base-port", type=int, default=None, help="지정하면 서버 순서대로 base-port, base-port+1, ...")
+    ap.add_argument("--servers", nargs="+", default=list(DEFAULT_PORTS))
+    ap.add_argument("--fixtures", default=FIXTURE_PATH)
+    ap.add_argument("--latency-ms", type=float, default=50.0, help="도구 호출 평균 지연")
+    ap.add_argument("--jitter-ms", type=float, default=20.0)
+    ap.add_argument("--scale", type=int, default=1, help="표/로그 응답 줄 수 배율 (절단/청크 요약 경로 부하용)")
+    args = ap.parse_args()
+    asyncio.run(serve_all(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""
+<think> 태그 감지 벤치마크
+
+긴 합성 추론 스트림(수천~수만 토큰)을 흘려 보내며
+  - legacy : 기존 AsyncThinkingStreamCallback 방식 (토큰마다 전체 버퍼에 append 후 "</think>" 재검색)
+  - parser : think_stream.ThinkTagParser (태그 길이만큼의 꼬리 창만 유지)
+의 토큰당 처리 시간을 비교합니다. 콘솔 출력/큐 전송 비용은 제외하고 태그 감지 로직만 측정합니다.
+
+사용법 (mcp-api-agent 디렉터리에서):
+    python benchmarks/think_stream_bench.py
+    python benchmarks/think_stream_bench.py --tokens 2000 8000 32000 --repeat 5
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from think_stream import ThinkTagParser  # noqa: E402
+
+_WORDS = ["파드", "재시작", "원인", "메트릭", "분석", "the", "pod", "is", "OOMKilled", "<", "/", "think", ">", "\n"]
+
+
+def make_stream(reasoning_tokens: int, answer_tokens: int = 200, blocks: int = 1, seed: int = 0) -> list:
+    """추론 블록 blocks개 + 답변으로 이루어진 토큰 리스트. 태그는 일부러 여러 토큰에 걸쳐 쪼갭니다."""
+    rng = random.Random(seed)
+    per_block = max(reasoning_tokens // blocks, 1)
+    tokens = []
+    for b in range(blocks):
+        if b > 0:
+            tokens += ["<th", "ink>"]
+        tokens += [rng.choice(_WORDS) + " " for _ in range(per_block)]
+        tokens += ["</", "thi", "nk>"]
+        tokens += [rng.choice(_WORDS[:9]) + " " for _ in range(answer_tokens // blocks)]
+    return tokens
+
+
+def legacy_detect(tokens: list) -> str:
+    """기존 콜백의 태그 감지 로직 (첫 번째 </think> 이후만 답변으로 취급)"""
+    in_thinking = True
+    buffer = ""
+    answer = []
+    for token in tokens:
+        if not in_thinking:
+            answer.append(token)
+            continue
+        buffer += token
+        if "</think>" in buffer:
+            in_thinking = False
+            answer.append(buffer.split("</think>")[-1])
+            buffer = ""
+    return "".join(answer)
+
+
+def parser_detect(tokens: list) -> str:
+    parser = ThinkTagParser(in_thinking=True)
+    answer = []
+    for token in tokens:
+        for is_reasoning, text in parser.feed(token):
+            if not is_reasoning:
+                answer.append(text)
+    for is_reasoning, text in parser.flush():
+        if not is_reasoning:
+            answer.append(text)
+    return "".join(answer)
+
+
+def measure(fn, tokens: list, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(tokens)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--tokens", type=int, nargs="+", default=[1000, 4000, 16000, 64000])
+    ap.add_argument("--repeat", type=int, default=3)
+    args = ap.parse_args()
+
+    # 정확성: 단일 블록에서는 두 방식의 답변이 같아야 하고, 다중 블록은 parser만 올바르게 처리
+    single = make_stream(500)
+    assert legacy_detect(single) == parser_detect(single), "단일 think 블록 결과 불일치"
+    multi = make_stream(600, blocks=3)
+    assert "think>" not in parser_detect(multi), "다중 think 블록에서 태그가 답변에 섞임"
+
+    print(f"{'reasoning tokens':>16} | {'legacy ms':>10} | {'parser ms':>10} | {'legacy us/tok':>13} | {'parser us/tok':>13} | speedup")
+    for n in args.tokens:
+        tokens = make_stream(n)
+        legacy = measure(legacy_detect, tokens, args.repeat)
+        parser = measure(parser_detect, tokens, args.repeat)
+        print(
+            f"{n:>16} | {legacy * 1e3:>10.2f} | {parser * 1e3:>10.2f} | "
+            f"{legacy / len(tokens) * 1e6:>13.2f} | {parser / len(tokens) * 1e6:>13.2f} | {legacy / parser:>6.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -43,6 +43,19 @@ def _env_float(name: str, default: Optional[float] = None) -> Optional[float]:
         return default
 
 
+def _env_bool(name: str, default: Optional[bool] = None) -> Optional[bool]:
+    value = os.getenv(name)
+    if value is None or value == "":
+        return default
+    normalized = value.strip().lower()
+    if normalized in ("1", "true", "yes", "on"):
+        return True
+    if normalized in ("0", "false", "no", "off"):
+        return False
+    logger.warning(f"Invalid boolean for {name}: {value}. Using default={default}")
+    return default
+
+
 def _env_str(name: str, default: Optional[str] = None) -> Optional[str]:
     value = os.getenv(name)
     if value is None or value == "":
@@ -94,6 +107,108 @@ DEFAULT_RUNTIME_LIMITS = {
     "max_total_context": 10000,
     "mcp_tool_max_output_chars": 10000,
     "worker_raw_result_max_chars": 8000,
+    # Worker 내부 fan-out LLM 호출(청크 요약, 잘린 결과 추가 조회) 동시 실행 상한. 요청 단위 호출은 scheduler 레인이 제한
+    "llm_fanout_max_concurrency": 4,
+    # 대용량 도구 결과를 절단 대신 청크 단위 Map-Reduce 요약으로 처리할지 여부
+    "chunked_summary_enabled": False,
+    "chunk_summary_max_tokens": 3000,
+    "chunk_summary_reduce_fan_in": 4,
+    # 청크 요약 모드에서 Worker가 MCP 도구 결과를 받을 때 허용하는 최대 글자 수
+    "worker_tool_max_output_chars": 200000,
+    # 로그 도구 결과를 로컬 템플릿 마이닝(Drain)으로 압축할지 여부
+    "log_template_mining_enabled": True,
+    "log_miner_similarity_threshold": 0.5,
+    "log_miner_max_templates": 100,
+    # 메트릭 쿼리 결과(JSON)를 로컬 통계 표로 변환할지 여부
+    "metric_analysis_enabled": True,
+    "metric_top_k": 10,
+    "metric_zscore_threshold": 3.0,
+    # range 결과 추이를 몇 개 포인트로 축소해 보여줄지 (0이면 추이 생략)
+    "metric_downsample_points": 0,
+    # kubectl 결과를 구조화 파싱하여 정상 리소스(Running/Ready, 재시작 없음)를 걸러낼지 여부
+    "k8s_output_parsing_enabled": True,
+    "k8s_restart_threshold": 0,
+    "k8s_keep_healthy": False,
+    # 트레이스 조회 결과를 로컬 critical path 리포트로 변환할지 여부
+    "trace_analysis_enabled": True,
+    "trace_analysis_top_n": 5,
+    # 잘린 도구 결과 원문을 요청 단위 임시 파일에 보관하고 fetch_tool_output 도구로 재조회할지 여부
+    "tool_output_spill_enabled": True,
+    # 요청 하나가 보관할 수 있는 최대 크기 (바이트, 기본 64MB)
+    "tool_output_store_max_bytes": 67108864,
+    # 임시 파일 경로 (비우면 시스템 임시 디렉터리)
+    "tool_output_spill_dir": "",
+    # Worker가 잘린 결과를 추가 조회하는 후속 LLM 호출 최대 횟수 (0이면 비활성화)
+    "worker_fetch_rounds": 1,
+    # THINKING max_input_tokens가 설정된 경우, Synthesizer 입력을 토큰 예산으로 Worker별 배분 (우선순위 가중치)
+    "worker_budget_weights": {"k8s": 1.5, "metric": 1.25, "log": 1.0},
+    # Worker 요약 목표 크기의 상한 (토큰)
+    "worker_summary_max_tokens": 1500,
+    # 토크나이저 오차 대비 여유분 (토큰)
+    "token_budget_safety_margin": 256,
+    # Worker 보고서에 에러 징후가 없거나 단순 목록 요청이면 Thinking 모델 대신 template/instruct로 종합
+    "adaptive_synthesis_enabled": True,
+    # 에러 징후가 없고 보고서가 이 토큰 수 이하면 LLM 호출 없이 템플릿으로 답변
+    "synthesis_template_max_tokens": 300,
+    # 에러 징후 줄 수/보고서 토큰 수가 아래 이하면 Instruct 모델로 종합
+    "synthesis_instruct_max_error_lines": 0,
+    "synthesis_instruct_max_tokens": 3000,
+    # Synthesizer Thinking 모델의 추론(<think>) 토큰 예산 (SLO 등급별, 0이면 무제한)
+    # 요청 본문의 thinking_budget(토큰) / slo_tier / reasoning_effort(low|medium|high)로 요청별 지정 가능
+    "thinking_budget_tiers": {"fast": 1024, "standard": 4096, "deep": 0},
+    # 요청에 지정이 없으면 무제한(deep). 예산은 클라이언트가 요청별로 선택
+    "thinking_budget_default_tier": "deep",
+    # 예산 소진 시 답변 단계 전환 방식: "prefill"(vLLM continue_final_message) 또는 "no_think"(enable_thinking=False 재호출)
+    "thinking_budget_continuation": "prefill",
+    # 백엔드가 continue_final_message(assistant 메시지 이어쓰기)를 지원할 때만 true (vLLM). false면 prefill 대신 no_think로 전환
+    "thinking_prefill_supported": False,
+    # 답변 토큰을 서버 콘솔(stdout)에도 출력할지 여부 (CLI용, 서버 운영 시 false 권장)
+    "stream_console_mirror": True,
+    # Simple 경로 최종 답변 토큰 스트리밍 (처음 N글자까지 tool_call이 없으면 답변 턴으로 보고 이후 토큰은 바로 전송)
+    "simple_stream_enabled": True,
+    "simple_stream_holdback_chars": 40,
+    # /metrics (Prometheus 텍스트 포맷) 수집 여부
+    "metrics_enabled": True,
+    # 요청 단위 실행 타임라인 (/debug/requests)
+    "request_trace_enabled": True,
+    "request_trace_buffer_size": 200,
+    "request_trace_max_spans": 2000,
+    "request_trace_otlp_path": "",
+    # 세션 녹화 (benchmarks/replay_session.py로 재생). 비워두면 녹화하지 않음
+    "session_record_dir": "",
+    "session_record_sample_rate": 1.0,
+    # 최종 답변 캐시 (같은 질문 반복 시 그래프 생략). TTL 0이면 해당 경로는 캐시하지 않음
+    "answer_cache_enabled": True,
+    "answer_cache_max_entries": 256,
+    "answer_cache_ttl_simple_seconds": 60,
+    "answer_cache_ttl_complex_seconds": 20,
+    # [최적화] 백그라운드 클러스터 헬스 스냅샷 (진단 Worker가 사전 수집 결과에서 출발). 켜면 유휴 상태에서도 주기적으로 MCP Probe 호출
+    "health_snapshot_enabled": False,
+    "health_snapshot_interval_seconds": 60,
+    "health_snapshot_max_age_seconds": 180,
+    "health_snapshot_probe_timeout_seconds": 20,
+    "health_snapshot_report_max_chars": 3000,
+    "health_snapshot_probes": [],
+    # [최적화] SIMPLE / COMPLEX 요청 Lane별 동시 실행 수와 대기열 (가득 차면 429 + Retry-After)
+    "scheduler_enabled": True,
+    "scheduler_simple_max_concurrency": 8,
+    "scheduler_simple_max_queue": 64,
+    "scheduler_complex_max_concurrency": 4,
+    "scheduler_complex_max_queue": 16,
+    # [최적화] WebSocket(/ws/chat) 연결 하나에서 동시에 진행할 수 있는 질문 수
+    "websocket_max_inflight": 8,
+    # [최적화] /api/batch 질문 묶음 (배치 범위 도구 결과 공유)
+    "batch_max_questions": 16,
+    "batch_tool_cache_enabled": True,
+    # [최적화] 멀티턴 대화 (conversation_id / X-Conversation-Id). 대화 수 LRU + TTL, 이전 턴은 토큰 예산을 넘으면 요약으로 압축
+    "conversation_enabled": True,
+    "conversation_max_sessions": 256,
+    "conversation_ttl_seconds": 3600,
+    "conversation_sqlite_path": "",
+    "conversation_history_max_tokens": 6000,
+    "conversation_keep_turns": 2,
+    "conversation_evidence_max_tokens": 800,
+    "conversation_summary_max_tokens": 600,
 }
 
 # 설정 변수 할당
@@ -156,6 +271,71 @@ RUNTIME_LIMITS["worker_summary_quota"] = _env_int("WORKER_SUMMARY_QUOTA", RUNTIM
 RUNTIME_LIMITS["max_total_context"] = _env_int("MAX_TOTAL_CONTEXT", RUNTIME_LIMITS["max_total_context"])
 RUNTIME_LIMITS["mcp_tool_max_output_chars"] = _env_int("MCP_TOOL_MAX_OUTPUT_CHARS", RUNTIME_LIMITS["mcp_tool_max_output_chars"])
 RUNTIME_LIMITS["worker_raw_result_max_chars"] = _env_int("WORKER_RAW_RESULT_MAX_CHARS", RUNTIME_LIMITS["worker_raw_result_max_chars"])
+RUNTIME_LIMITS["llm_fanout_max_concurrency"] = _env_int("LLM_FANOUT_MAX_CONCURRENCY", RUNTIME_LIMITS["llm_fanout_max_concurrency"])
+RUNTIME_LIMITS["chunked_summary_enabled"] = _env_bool("CHUNKED_SUMMARY_ENABLED", RUNTIME_LIMITS["chunked_summary_enabled"])
+RUNTIME_LIMITS["chunk_summary_max_tokens"] = _env_int("CHUNK_SUMMARY_MAX_TOKENS", RUNTIME_LIMITS["chunk_summary_max_tokens"])
+RUNTIME_LIMITS["chunk_summary_reduce_fan_in"] = _env_int("CHUNK_SUMMARY_REDUCE_FAN_IN", RUNTIME_LIMITS["chunk_summary_reduce_fan_in"])
+RUNTIME_LIMITS["worker_tool_max_output_chars"] = _env_int("WORKER_TOOL_MAX_OUTPUT_CHARS", RUNTIME_LIMITS["worker_tool_max_output_chars"])
+RUNTIME_LIMITS["log_template_mining_enabled"] = _env_bool("LOG_TEMPLATE_MINING_ENABLED", RUNTIME_LIMITS["log_template_mining_enabled"])
+RUNTIME_LIMITS["log_miner_similarity_threshold"] = _env_float("LOG_MINER_SIMILARITY_THRESHOLD", RUNTIME_LIMITS["log_miner_similarity_threshold"])
+RUNTIME_LIMITS["log_miner_max_templates"] = _env_int("LOG_MINER_MAX_TEMPLATES", RUNTIME_LIMITS["log_miner_max_templates"])
+RUNTIME_LIMITS["metric_analysis_enabled"] = _env_bool("METRIC_ANALYSIS_ENABLED", RUNTIME_LIMITS["metric_analysis_enabled"])
+RUNTIME_LIMITS["metric_top_k"] = _env_int("METRIC_TOP_K", RUNTIME_LIMITS["metric_top_k"])
+RUNTIME_LIMITS["metric_zscore_threshold"] = _env_float("METRIC_ZSCORE_THRESHOLD", RUNTIME_LIMITS["metric_zscore_threshold"])
+RUNTIME_LIMITS["metric_downsample_points"] = _env_int("METRIC_DOWNSAMPLE_POINTS", RUNTIME_LIMITS["metric_downsample_points"])
+RUNTIME_LIMITS["k8s_output_parsing_enabled"] = _env_bool("K8S_OUTPUT_PARSING_ENABLED", RUNTIME_LIMITS["k8s_output_parsing_enabled"])
+RUNTIME_LIMITS["k8s_restart_threshold"] = _env_int("K8S_RESTART_THRESHOLD", RUNTIME_LIMITS["k8s_restart_threshold"])
+RUNTIME_LIMITS["k8s_keep_healthy"] = _env_bool("K8S_KEEP_HEALTHY", RUNTIME_LIMITS["k8s_keep_healthy"])
+RUNTIME_LIMITS["trace_analysis_enabled"] = _env_bool("TRACE_ANALYSIS_ENABLED", RUNTIME_LIMITS["trace_analysis_enabled"])
+RUNTIME_LIMITS["trace_analysis_top_n"] = _env_int("TRACE_ANALYSIS_TOP_N", RUNTIME_LIMITS["trace_analysis_top_n"])
+RUNTIME_LIMITS["tool_output_spill_enabled"] = _env_bool("TOOL_OUTPUT_SPILL_ENABLED", RUNTIME_LIMITS["tool_output_spill_enabled"])
+RUNTIME_LIMITS["tool_output_store_max_bytes"] = _env_int("TOOL_OUTPUT_STORE_MAX_BYTES", RUNTIME_LIMITS["tool_output_store_max_bytes"])
+RUNTIME_LIMITS["tool_output_spill_dir"] = _env_str("TOOL_OUTPUT_SPILL_DIR", RUNTIME_LIMITS["tool_output_spill_dir"])
+RUNTIME_LIMITS["worker_fetch_rounds"] = _env_int("WORKER_FETCH_ROUNDS", RUNTIME_LIMITS["worker_fetch_rounds"])
+RUNTIME_LIMITS["worker_summary_max_tokens"] = _env_int("WORKER_SUMMARY_MAX_TOKENS", RUNTIME_LIMITS["worker_summary_max_tokens"])
+RUNTIME_LIMITS["token_budget_safety_margin"] = _env_int("TOKEN_BUDGET_SAFETY_MARGIN", RUNTIME_LIMITS["token_budget_safety_margin"])
+RUNTIME_LIMITS["adaptive_synthesis_enabled"] = _env_bool("ADAPTIVE_SYNTHESIS_ENABLED", RUNTIME_LIMITS["adaptive_synthesis_enabled"])
+RUNTIME_LIMITS["synthesis_template_max_tokens"] = _env_int("SYNTHESIS_TEMPLATE_MAX_TOKENS", RUNTIME_LIMITS["synthesis_template_max_tokens"])
+RUNTIME_LIMITS["synthesis_instruct_max_error_lines"] = _env_int("SYNTHESIS_INSTRUCT_MAX_ERROR_LINES", RUNTIME_LIMITS["synthesis_instruct_max_error_lines"])
+RUNTIME_LIMITS["synthesis_instruct_max_tokens"] = _env_int("SYNTHESIS_INSTRUCT_MAX_TOKENS", RUNTIME_LIMITS["synthesis_instruct_max_tokens"])
+RUNTIME_LIMITS["thinking_budget_default_tier"] = _env_str("THINKING_BUDGET_DEFAULT_TIER", RUNTIME_LIMITS["thinking_budget_default_tier"])
+RUNTIME_LIMITS["thinking_budget_continuation"] = _env_str("THINKING_BUDGET_CONTINUATION", RUNTIME_LIMITS["thinking_budget_continuation"])
+RUNTIME_LIMITS["thinking_prefill_supported"] = _env_bool("THINKING_PREFILL_SUPPORTED", RUNTIME_LIMITS["thinking_prefill_supported"])
+RUNTIME_LIMITS["stream_console_mirror"] = _env_bool("STREAM_CONSOLE_MIRROR", RUNTIME_LIMITS["stream_console_mirror"])
+RUNTIME_LIMITS["simple_stream_enabled"] = _env_bool("SIMPLE_STREAM_ENABLED", RUNTIME_LIMITS["simple_stream_enabled"])
+RUNTIME_LIMITS["simple_stream_holdback_chars"] = _env_int("SIMPLE_STREAM_HOLDBACK_CHARS", RUNTIME_LIMITS["simple_stream_holdback_chars"])
+RUNTIME_LIMITS["metrics_enabled"] = _env_bool("METRICS_ENABLED", RUNTIME_LIMITS["metrics_enabled"])
+RUNTIME_LIMITS["request_trace_enabled"] = _env_bool("REQUEST_TRACE_ENABLED", RUNTIME_LIMITS["request_trace_enabled"])
+RUNTIME_LIMITS["request_trace_buffer_size"] = _env_int("REQUEST_TRACE_BUFFER_SIZE", RUNTIME_LIMITS["request_trace_buffer_size"])
+RUNTIME_LIMITS["request_trace_max_spans"] = _env_int("REQUEST_TRACE_MAX_SPANS", RUNTIME_LIMITS["request_trace_max_spans"])
+RUNTIME_LIMITS["request_trace_otlp_path"] = _env_str("REQUEST_TRACE_OTLP_PATH", RUNTIME_LIMITS["request_trace_otlp_path"])
+RUNTIME_LIMITS["session_record_dir"] = _env_str("SESSION_RECORD_DIR", RUNTIME_LIMITS["session_record_dir"])
+RUNTIME_LIMITS["session_record_sample_rate"] = _env_float("SESSION_RECORD_SAMPLE_RATE", RUNTIME_LIMITS["session_record_sample_rate"])
+RUNTIME_LIMITS["answer_cache_enabled"] = _env_bool("ANSWER_CACHE_ENABLED", RUNTIME_LIMITS["answer_cache_enabled"])
+RUNTIME_LIMITS["answer_cache_max_entries"] = _env_int("ANSWER_CACHE_MAX_ENTRIES", RUNTIME_LIMITS["answer_cache_max_entries"])
+RUNTIME_LIMITS["answer_cache_ttl_simple_seconds"] = _env_float("ANSWER_CACHE_TTL_SIMPLE_SECONDS", RUNTIME_LIMITS["answer_cache_ttl_simple_seconds"])
+RUNTIME_LIMITS["answer_cache_ttl_complex_seconds"] = _env_float("ANSWER_CACHE_TTL_COMPLEX_SECONDS", RUNTIME_LIMITS["answer_cache_ttl_complex_seconds"])
+RUNTIME_LIMITS["health_snapshot_enabled"] = _env_bool("HEALTH_SNAPSHOT_ENABLED", RUNTIME_LIMITS["health_snapshot_enabled"])
+RUNTIME_LIMITS["health_snapshot_interval_seconds"] = _env_float("HEALTH_SNAPSHOT_INTERVAL_SECONDS", RUNTIME_LIMITS["health_snapshot_interval_seconds"])
+RUNTIME_LIMITS["health_snapshot_max_age_seconds"] = _env_float("HEALTH_SNAPSHOT_MAX_AGE_SECONDS", RUNTIME_LIMITS["health_snapshot_max_age_seconds"])
+RUNTIME_LIMITS["health_snapshot_probe_timeout_seconds"] = _env_float("HEALTH_SNAPSHOT_PROBE_TIMEOUT_SECONDS", RUNTIME_LIMITS["health_snapshot_probe_timeout_seconds"])
+RUNTIME_LIMITS["health_snapshot_report_max_chars"] = _env_int("HEALTH_SNAPSHOT_REPORT_MAX_CHARS", RUNTIME_LIMITS["health_snapshot_report_max_chars"])
+RUNTIME_LIMITS["scheduler_enabled"] = _env_bool("SCHEDULER_ENABLED", RUNTIME_LIMITS["scheduler_enabled"])
+RUNTIME_LIMITS["scheduler_simple_max_concurrency"] = _env_int("SCHEDULER_SIMPLE_MAX_CONCURRENCY", RUNTIME_LIMITS["scheduler_simple_max_concurrency"])
+RUNTIME_LIMITS["scheduler_simple_max_queue"] = _env_int("SCHEDULER_SIMPLE_MAX_QUEUE", RUNTIME_LIMITS["scheduler_simple_max_queue"])
+RUNTIME_LIMITS["scheduler_complex_max_concurrency"] = _env_int("SCHEDULER_COMPLEX_MAX_CONCURRENCY", RUNTIME_LIMITS["scheduler_complex_max_concurrency"])
+RUNTIME_LIMITS["scheduler_complex_max_queue"] = _env_int("SCHEDULER_COMPLEX_MAX_QUEUE", RUNTIME_LIMITS["scheduler_complex_max_queue"])
+RUNTIME_LIMITS["websocket_max_inflight"] = _env_int("WEBSOCKET_MAX_INFLIGHT", RUNTIME_LIMITS["websocket_max_inflight"])
+RUNTIME_LIMITS["batch_max_questions"] = _env_int("BATCH_MAX_QUESTIONS", RUNTIME_LIMITS["batch_max_questions"])
+RUNTIME_LIMITS["batch_tool_cache_enabled"] = _env_bool("BATCH_TOOL_CACHE_ENABLED", RUNTIME_LIMITS["batch_tool_cache_enabled"])
+RUNTIME_LIMITS["conversation_enabled"] = _env_bool("CONVERSATION_ENABLED", RUNTIME_LIMITS["conversation_enabled"])
+RUNTIME_LIMITS["conversation_max_sessions"] = _env_int("CONVERSATION_MAX_SESSIONS", RUNTIME_LIMITS["conversation_max_sessions"])
+RUNTIME_LIMITS["conversation_ttl_seconds"] = _env_float("CONVERSATION_TTL_SECONDS", RUNTIME_LIMITS["conversation_ttl_seconds"])
+RUNTIME_LIMITS["conversation_sqlite_path"] = _env_str("CONVERSATION_SQLITE_PATH", RUNTIME_LIMITS["conversation_sqlite_path"])
+RUNTIME_LIMITS["conversation_history_max_tokens"] = _env_int("CONVERSATION_HISTORY_MAX_TOKENS", RUNTIME_LIMITS["conversation_history_max_tokens"])
+RUNTIME_LIMITS["conversation_keep_turns"] = _env_int("CONVERSATION_KEEP_TURNS", RUNTIME_LIMITS["conversation_keep_turns"])
+RUNTIME_LIMITS["conversation_evidence_max_tokens"] = _env_int("CONVERSATION_EVIDENCE_MAX_TOKENS", RUNTIME_LIMITS["conversation_evidence_max_tokens"])
+RUNTIME_LIMITS["conversation_summary_max_tokens"] = _env_int("CONVERSATION_SUMMARY_MAX_TOKENS", RUNTIME_LIMITS["conversation_summary_max_tokens"])
 
 logger.debug(f"Config Loaded - LLM Base URL: {INSTRUCT_CONFIG.get('base_url')}")
 logger.debug(
@@ -166,7 +346,9 @@ logger.debug(
     f"worker_summary_quota={RUNTIME_LIMITS['worker_summary_quota']}, "
     f"max_total_context={RUNTIME_LIMITS['max_total_context']}, "
     f"mcp_tool_max_output_chars={RUNTIME_LIMITS['mcp_tool_max_output_chars']}, "
-    f"worker_raw_result_max_chars={RUNTIME_LIMITS['worker_raw_result_max_chars']}"
+    f"worker_raw_result_max_chars={RUNTIME_LIMITS['worker_raw_result_max_chars']}, "
+    f"llm_fanout_max_concurrency={RUNTIME_LIMITS['llm_fanout_max_concurrency']}, "
+    f"chunked_summary_enabled={RUNTIME_LIMITS['chunked_summary_enabled']}"
 )
 
 # =================================================================
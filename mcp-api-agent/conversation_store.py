@@ -0,0 +1,387 @@
+import asyncio
+import pickle
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from typing import Dict, List, Optional, Tuple
+
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage
+from langgraph.checkpoint.memory import InMemorySaver
+
+from config import INSTRUCT_CONFIG, RUNTIME_LIMITS, logger
+from metrics import CONVERSATION_EVENTS, metrics_enabled
+
+# =================================================================
+# 멀티턴 대화 저장소 (LangGraph Checkpointer)
+# -----------------------------------------------------------------
+# /v1/chat/completions, /api/stream_chat 은 messages[-1]만 그래프에 넣고 체크포인터 없이 실행해서
+# 후속 질문("그럼 그 파드 로그는?")마다 도구 조회를 처음부터 다시 했습니다.
+# conversation_id(본문) 또는 X-Conversation-Id(헤더)가 있으면 그 대화의 그래프 상태(메시지, 이전 대화 요약,
+# 직전 Worker 보고서)를 체크포인터에 보관하고 다음 턴에서 이어 씁니다.
+#   - 대화마다 최신 체크포인트 하나만 보관 (노드 단계별 체크포인트와 이전 버전 값은 바로 정리)
+#   - 대화 수 상한(LRU) + 마지막 사용 후 TTL 만료 (진행 중인 턴이 있는 대화는 내보내지 않음)
+#   - conversation_sqlite_path를 지정하면 로컬 SQLite 파일에도 기록 (쓰기는 전용 스레드에서 대화별로 모아서 처리)
+#     LRU로 메모리에서 빠졌거나 재기동 전에 있던 대화는 다음 턴에 파일에서 다시 읽어 옵니다.
+# 대화 길이(토큰)는 그래프의 memory 노드가 오래된 턴/도구 결과를 요약으로 압축해 제한합니다. (agent_graph)
+# id 없이 messages에 이전 대화를 보내는 클라이언트(OpenWebUI 등)는 그 기록을 토큰 예산에 맞춰 함께 넘깁니다.
+# =================================================================
+
+ThreadPayload = Tuple[float, Optional[bytes]]
+
+
+class ConversationStore(InMemorySaver):
+    """대화(thread_id)별 최신 체크포인트만 보관하는 LRU + TTL 체크포인터 (선택적으로 SQLite 파일 기록)"""
+
+    def __init__(self, max_sessions: int, ttl_seconds: float, sqlite_path: str = ""):
+        super().__init__()
+        self.max_sessions = max_sessions
+        self.ttl_seconds = ttl_seconds
+        self.sqlite_path = sqlite_path
+        # thread_id -> 마지막 사용 시각 (오래된 순)
+        self._last_used: "OrderedDict[str, float]" = OrderedDict()
+        # thread_id -> 보관 중인 blob 키 (대화별 정리를 전체 blob 스캔 없이 하기 위함)
+        self._blob_keys: Dict[str, set] = {}
+        # thread_id -> [Lock, 대기/진행 중인 턴 수]
+        self._turn_locks: Dict[str, list] = {}
+        self.stats = {"loaded": 0, "evicted": 0, "expired": 0}
+        self._db: Optional[sqlite3.Connection] = None
+        self._db_lock = threading.Lock()
+        self._pending: Dict[str, ThreadPayload] = {}
+        self._executor: Optional[ThreadPoolExecutor] = None
+        if sqlite_path:
+            self._open_db(sqlite_path)
+
+    def _count(self, event: str) -> None:
+        self.stats[event] += 1
+        if metrics_enabled():
+            CONVERSATION_EVENTS.inc(event)
+
+    # --- 체크포인터 인터페이스 ---
+    def get_tuple(self, config):
+        thread_id = config["configurable"]["thread_id"]
+        if thread_id not in self.storage:
+            # 기본 구현은 defaultdict로 빈 항목을 만들기 때문에 먼저 확인
+            return None
+        if self._expired(self._last_used.get(thread_id, 0.0), time.time()):
+            self._drop(thread_id)
+            self._count("expired")
+            self._schedule_write(thread_id, None)
+            return None
+        self._touch(thread_id)
+        return super().get_tuple(config)
+
+    async def aget_tuple(self, config):
+        thread_id = config["configurable"]["thread_id"]
+        if thread_id not in self.storage and self._db is not None:
+            await self._load(thread_id)
+        return self.get_tuple(config)
+
+    def put(self, config, checkpoint, metadata, new_versions):
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"]["checkpoint_ns"]
+        self._blob_keys.setdefault(thread_id, set()).update(
+            (thread_id, checkpoint_ns, channel, version) for channel, version in new_versions.items()
+        )
+        saved = super().put(config, checkpoint, metadata, new_versions)
+        self._prune(thread_id, checkpoint_ns, checkpoint)
+        self._touch(thread_id)
+        self._evict()
+        if self._db is not None:
+            self._schedule_write(thread_id, self._dump_thread(thread_id))
+        return saved
+
+    def delete_thread(self, thread_id: str) -> None:
+        self._drop(thread_id)
+        self._schedule_write(thread_id, None)
+
+    # --- 메모리 정리 ---
+    def _prune(self, thread_id: str, checkpoint_ns: str, checkpoint) -> None:
+        """방금 저장한 체크포인트만 남기고 이전 체크포인트/쓰기 기록/더 이상 참조하지 않는 값(blob)을 지웁니다."""
+        checkpoints = self.storage[thread_id][checkpoint_ns]
+        for checkpoint_id in [cid for cid in checkpoints if cid != checkpoint["id"]]:
+            del checkpoints[checkpoint_id]
+            self.writes.pop((thread_id, checkpoint_ns, checkpoint_id), None)
+        live = {(thread_id, checkpoint_ns, channel, version)
+                for channel, version in checkpoint["channel_versions"].items()}
+        blob_keys = self._blob_keys[thread_id]
+        for key in [key for key in blob_keys if key[1] == checkpoint_ns and key not in live]:
+            blob_keys.discard(key)
+            self.blobs.pop(key, None)
+
+    def _drop(self, thread_id: str) -> None:
+        self.storage.pop(thread_id, None)
+        for key in [key for key in self.writes if key[0] == thread_id]:
+            del self.writes[key]
+        for key in self._blob_keys.pop(thread_id, ()):
+            self.blobs.pop(key, None)
+        self._last_used.pop(thread_id, None)
+
+    def _expired(self, last_used: float, now: float) -> bool:
+        return self.ttl_seconds > 0 and now - last_used > self.ttl_seconds
+
+    def _touch(self, thread_id: str) -> None:
+        self._last_used[thread_id] = time.time()
+        self._last_used.move_to_end(thread_id)
+
+    def _evict(self) -> None:
+        now = time.time()
+        for thread_id, last_used in list(self._last_used.items()):
+            if thread_id in self._turn_locks:
+                continue
+            if self._expired(last_used, now):
+                event = "expired"
+            elif len(self._last_used) > self.max_sessions:
+                # SQLite를 쓰면 파일에는 남아 있어 다음 턴에 다시 읽어 옴
+                event = "evicted"
+            else:
+                break
+            self._drop(thread_id)
+            self._count(event)
+            if event == "expired":
+                self._schedule_write(thread_id, None)
+
+    # --- SQLite 기록 ---
+    def _open_db(self, path: str) -> None:
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS conversations "
+            "(thread_id TEXT PRIMARY KEY, updated_at REAL NOT NULL, payload BLOB NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS conversations_updated_at ON conversations (updated_at)")
+        if self.ttl_seconds > 0:
+            expired = self._db.execute(
+                "DELETE FROM conversations WHERE updated_at < ?", (time.time() - self.ttl_seconds,)
+            ).rowcount
+            if expired:
+                logger.info(f"🧹 [Conversation] 만료된 대화 {expired}개 삭제 ({path})")
+        self._db.commit()
+        # 쓰기/읽기를 한 스레드에서 순서대로 처리 (같은 대화의 읽기는 앞선 쓰기 뒤에 실행)
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="conversation-sqlite")
+
+    def _dump_thread(self, thread_id: str) -> bytes:
+        storage = {ns: dict(checkpoints) for ns, checkpoints in self.storage[thread_id].items()}
+        writes = {
+            (thread_id, ns, checkpoint_id): dict(self.writes[(thread_id, ns, checkpoint_id)])
+            for ns, checkpoints in storage.items() for checkpoint_id in checkpoints
+            if (thread_id, ns, checkpoint_id) in self.writes
+        }
+        blobs = {key: self.blobs[key] for key in self._blob_keys.get(thread_id, ()) if key in self.blobs}
+        return pickle.dumps((storage, writes, blobs), protocol=pickle.HIGHEST_PROTOCOL)
+
+    def _schedule_write(self, thread_id: str, payload: Optional[bytes]) -> None:
+        """대화의 최신 상태를 파일에 기록하도록 예약합니다. (payload None이면 삭제, 아직 안 쓴 이전 상태는 덮어씀)"""
+        if self._executor is None:
+            return
+        with self._db_lock:
+            scheduled = thread_id in self._pending
+            self._pending[thread_id] = (time.time(), payload)
+        if not scheduled:
+            self._executor.submit(self._flush, thread_id)
+
+    def _flush(self, thread_id: str) -> None:
+        with self._db_lock:
+            updated_at, payload = self._pending.pop(thread_id)
+        try:
+            if payload is None:
+                self._db.execute("DELETE FROM conversations WHERE thread_id = ?", (thread_id,))
+            else:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO conversations (thread_id, updated_at, payload) VALUES (?, ?, ?)",
+                    (thread_id, updated_at, payload),
+                )
+            self._db.commit()
+        except sqlite3.Error as e:
+            logger.warning(f"⚠️ [Conversation] SQLite 기록 실패 ({thread_id}): {e}")
+
+    def _read_row(self, thread_id: str) -> Optional[Tuple[float, bytes]]:
+        try:
+            return self._db.execute(
+                "SELECT updated_at, payload FROM conversations WHERE thread_id = ?", (thread_id,)
+            ).fetchone()
+        except sqlite3.Error as e:
+            logger.warning(f"⚠️ [Conversation] SQLite 조회 실패 ({thread_id}): {e}")
+            return None
+
+    async def _read(self, thread_id: str) -> Optional[Tuple[float, bytes]]:
+        return await asyncio.get_running_loop().run_in_executor(self._executor, self._read_row, thread_id)
+
+    async def _load(self, thread_id: str) -> None:
+        row = await self._read(thread_id)
+        if row is None or thread_id in self.storage:
+            return
+        updated_at, payload = row
+        if self._expired(updated_at, time.time()):
+            self._schedule_write(thread_id, None)
+            return
+        storage, writes, blobs = pickle.loads(payload)
+        for checkpoint_ns, checkpoints in storage.items():
+            self.storage[thread_id][checkpoint_ns].update(checkpoints)
+        for key, value in writes.items():
+            self.writes[key].update(value)
+        self.blobs.update(blobs)
+        self._blob_keys[thread_id] = set(blobs)
+        self._touch(thread_id)
+        self._count("loaded")
+        self._evict()
+
+    # --- API에서 사용 ---
+    async def has_conversation(self, thread_id: str) -> bool:
+        if thread_id in self.storage:
+            return not self._expired(self._last_used.get(thread_id, 0.0), time.time())
+        if self._db is None:
+            return False
+        row = await self._read(thread_id)
+        return row is not None and not self._expired(row[0], time.time())
+
+    @asynccontextmanager
+    async def turn(self, thread_id: str):
+        """같은 대화의 턴은 한 번에 하나씩 실행합니다. (동시에 보내면 앞 턴이 끝난 뒤 이어서 실행)"""
+        entry = self._turn_locks.setdefault(thread_id, [asyncio.Lock(), 0])
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                yield
+        finally:
+            entry[1] -= 1
+            if not entry[1]:
+                del self._turn_locks[thread_id]
+
+    def close(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+    def to_dict(self) -> dict:
+        return {
+            "conversations": len(self._last_used),
+            "max_sessions": self.max_sessions,
+            "ttl_seconds": self.ttl_seconds,
+            "sqlite_path": self.sqlite_path or None,
+            "active_turns": sum(entry[1] for entry in self._turn_locks.values()),
+            **self.stats,
+        }
+
+
+_store: Optional[ConversationStore] = None
+
+
+def conversation_enabled() -> bool:
+    return RUNTIME_LIMITS["conversation_enabled"]
+
+
+def get_conversation_store() -> ConversationStore:
+    global _store
+    if _store is None:
+        _store = ConversationStore(
+            RUNTIME_LIMITS["conversation_max_sessions"],
+            RUNTIME_LIMITS["conversation_ttl_seconds"],
+            RUNTIME_LIMITS["conversation_sqlite_path"],
+        )
+    return _store
+
+
+def close_conversation_store() -> None:
+    global _store
+    if _store is not None:
+        _store.close()
+        _store = None
+
+
+# =================================================================
+# 요청의 대화 맥락
+# =================================================================
+def get_conversation_id(data: dict, headers=None) -> Optional[str]:
+    """본문 conversation_id(또는 session_id) / X-Conversation-Id 헤더. 기능이 꺼져 있으면 None"""
+    if not conversation_enabled():
+        return None
+    conversation_id = data.get("conversation_id") or data.get("session_id")
+    if not conversation_id and headers is not None:
+        conversation_id = headers.get("x-conversation-id")
+    return str(conversation_id)[:128] if conversation_id else None
+
+
+def message_text(content) -> str:
+    """OpenAI content(문자열 또는 [{"type": "text", "text": ...}] 목록)를 문자열로 변환"""
+    if isinstance(content, list):
+        return "\n".join(
+            part.get("text", "") for part in content if isinstance(part, dict) and part.get("type") == "text"
+        )
+    return content if isinstance(content, str) else ""
+
+
+def clean_assistant_text(text: str) -> str:
+    """이전 답변에서 진행 과정(<think> 블록, [과정] 줄)을 빼고 답변 본문만 남깁니다."""
+    from agent_graph import remove_thinking_tags
+    text = remove_thinking_tags(text)
+    return "\n".join(line for line in text.splitlines() if not line.startswith("[과정]")).strip()
+
+
+def client_history(messages: list) -> List[BaseMessage]:
+    """클라이언트가 보낸 이전 대화(마지막 질문 제외)를 그래프 메시지로 변환하고, 최근 턴부터 토큰 예산만큼 남깁니다."""
+    from agent_graph import count_messages_tokens, split_turns
+
+    history: List[BaseMessage] = []
+    for item in messages[:-1]:
+        if not isinstance(item, dict):
+            continue
+        role = item.get("role")
+        text = message_text(item.get("content"))
+        if role == "user" and text.strip():
+            history.append(HumanMessage(content=text))
+        elif role == "assistant":
+            text = clean_assistant_text(text)
+            if text:
+                history.append(AIMessage(content=text))
+    if not history:
+        return history
+
+    model_name = INSTRUCT_CONFIG["model_name"]
+    budget = RUNTIME_LIMITS["conversation_history_max_tokens"]
+    kept, used = [], 0
+    for turn in reversed(split_turns(history)):
+        used += count_messages_tokens(turn, model_name)
+        if used > budget:
+            break
+        kept[:0] = turn
+    return kept
+
+
+class ConversationRequest:
+    """요청 하나의 대화 맥락. conversation_id가 있으면 체크포인터의 대화를, 없으면 클라이언트가 보낸 이전 메시지를 씁니다."""
+
+    def __init__(self, conversation_id: Optional[str], history: List[BaseMessage]):
+        self.conversation_id = conversation_id
+        self.history = history
+
+    @property
+    def has_context(self) -> bool:
+        # 이전 대화에 따라 답이 달라지므로 답변 캐시 조회/저장을 건너뜀
+        return bool(self.conversation_id or self.history)
+
+    @asynccontextmanager
+    async def turn(self, inputs: dict):
+        """그래프 실행 범위. 체크포인터 config(없으면 None)를 돌려주고 inputs["messages"] 앞에 필요한 이전 메시지를 붙입니다."""
+        if not self.conversation_id:
+            inputs["messages"] = self.history + inputs["messages"]
+            yield None
+            return
+        store = get_conversation_store()
+        async with store.turn(self.conversation_id):
+            if self.history and not await store.has_conversation(self.conversation_id):
+                # 저장된 대화가 없으면(첫 턴, 만료, 재기동) 클라이언트가 보낸 이전 메시지로 시작
+                inputs["messages"] = self.history + inputs["messages"]
+            yield {"configurable": {"thread_id": self.conversation_id}}
+
+
+def parse_conversation(data: dict, headers=None) -> ConversationRequest:
+    if not conversation_enabled():
+        return ConversationRequest(None, [])
+    return ConversationRequest(get_conversation_id(data, headers), client_history(data.get("messages") or []))
@@ -0,0 +1,253 @@
+import asyncio
+import json
+import time
+from typing import Any, Callable, Dict, List, Optional, Set
+
+from config import RUNTIME_LIMITS, logger
+from mcp_client import tool_output_char_limit
+
+# =================================================================
+# 백그라운드 클러스터 헬스 스냅샷
+# -----------------------------------------------------------------
+# 가장 비싸고 잦은 요청은 "클러스터 전체 진단"이며, 매번 Worker들이 같은 조회(Warning 이벤트, Top 10 리소스,
+# 발생 중인 알림, 에러 로그 건수)를 MCP로 새로 가져옵니다.
+# API 서버 안에서 가벼운 Probe 도구 호출들을 주기적으로 돌려 최신 결과를 메모리에 보관하고,
+# 진단 요청의 Worker는 이 스냅샷에서 출발합니다. (같은 조회는 다시 호출하지 않고, 특정 대상 추가 조회만 실시간으로)
+#   - Probe들은 health_snapshot_interval_seconds 동안 고르게 나눠 실행 → MCP 부하가 일정한 배경 트래픽으로 평탄화
+#   - health_snapshot_max_age_seconds보다 오래된 결과는 쓰지 않음 (Probe 실패/서버 끊김 시 자연스럽게 실시간 조회로 복귀)
+# =================================================================
+
+# Probe 정의: name, server(MCP 서버 별칭), tool(서버 내 도구 이름), args, category(Worker 분류: k8s/metric/log)
+# RUNTIME_LIMITS["health_snapshot_probes"]에 같은 형식의 목록을 넣으면 이 기본값 대신 사용합니다.
+DEFAULT_PROBES: List[Dict[str, Any]] = [
+    {"name": "warning_events", "server": "k8s", "tool": "kubectl_get", "category": "k8s",
+     "args": {"resourceType": "events", "allNamespaces": True, "fieldSelector": "type=Warning"}},
+    {"name": "cpu_top10", "server": "vm", "tool": "query", "category": "metric",
+     "args": {"query": 'topk(10, sum(rate(container_cpu_usage_seconds_total{container!=""}[5m])) by (pod))'}},
+    {"name": "memory_top10", "server": "vm", "tool": "query", "category": "metric",
+     "args": {"query": 'topk(10, sum(container_memory_working_set_bytes{container!=""}) by (pod))'}},
+    {"name": "network_rx_top10", "server": "vm", "tool": "query", "category": "metric",
+     "args": {"query": "topk(10, sum(rate(container_network_receive_bytes_total[5m])) by (pod))"}},
+    {"name": "network_tx_top10", "server": "vm", "tool": "query", "category": "metric",
+     "args": {"query": "topk(10, sum(rate(container_network_transmit_bytes_total[5m])) by (pod))"}},
+    {"name": "firing_alerts", "server": "vm", "tool": "alerts", "category": "metric", "args": {}},
+    {"name": "error_log_counts", "server": "vlogs", "tool": "hits", "category": "log",
+     "args": {"query": "level:error OR level:warn", "start": "now-1h", "step": "10m"}},
+    {"name": "error_log_pods", "server": "vlogs", "tool": "facets", "category": "log",
+     "args": {"query": "level:error", "start": "now-1h"}},
+]
+
+# 구독자(WebSocket 연결)별 미전송 갱신 최대 개수. 넘치면 느린 구독자 몫은 버림 (다음 갱신으로 따라잡음)
+SUBSCRIBER_QUEUE_SIZE = 32
+
+# Worker 이름 -> Probe category
+WORKER_CATEGORIES = {
+    "K8sSpecialist": "k8s",
+    "MetricSpecialist": "metric",
+    "LogSpecialist": "log",
+}
+
+
+class ProbeResult:
+    __slots__ = ("name", "server", "tool", "args", "category", "output", "ok", "error", "fetched_at", "duration")
+
+    def __init__(self, probe: Dict[str, Any]):
+        self.name = probe["name"]
+        self.server = probe["server"]
+        self.tool = probe["tool"]
+        self.args = probe.get("args") or {}
+        self.category = probe.get("category", "k8s")
+        self.output = ""
+        self.ok = False
+        self.error: Optional[str] = None
+        self.fetched_at = 0.0
+        self.duration = 0.0
+
+    @property
+    def tool_name(self) -> str:
+        # Agent에 바인딩되는 도구 이름 ({server}_{tool})
+        return f"{self.server}_{self.tool}"
+
+    @property
+    def age(self) -> float:
+        return time.time() - self.fetched_at
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "tool": self.tool_name,
+            "args": self.args,
+            "category": self.category,
+            "ok": self.ok,
+            "error": self.error,
+            "age_s": round(self.age, 1) if self.fetched_at else None,
+            "duration_ms": round(self.duration * 1000, 1),
+            "output_chars": len(self.output),
+            "output": self.output,
+        }
+
+
+class HealthSnapshot:
+    """Probe별 최신 결과 (마지막 성공 결과만 유지)"""
+
+    def __init__(self):
+        self._results: Dict[str, ProbeResult] = {}
+        self._subscribers: Set[asyncio.Queue] = set()
+        self.rounds = 0
+
+    def update(self, result: ProbeResult) -> None:
+        if result.ok:
+            self._results[result.name] = result
+            self._publish(result)
+        elif result.name in self._results:
+            # 실패해도 직전 성공 결과는 max_age까지 그대로 사용
+            self._results[result.name].error = result.error
+
+    def subscribe(self) -> asyncio.Queue:
+        """Probe 결과가 갱신될 때마다 ProbeResult를 받는 큐 (서버 Push용, 끝나면 unsubscribe)"""
+        queue: asyncio.Queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        self._subscribers.add(queue)
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue) -> None:
+        self._subscribers.discard(queue)
+
+    def _publish(self, result: ProbeResult) -> None:
+        for queue in self._subscribers:
+            try:
+                queue.put_nowait(result)
+            except asyncio.QueueFull:
+                pass
+
+    def probes(self) -> List[ProbeResult]:
+        return list(self._results.values())
+
+    def fresh_results(self, category: str, max_age: Optional[float] = None) -> List[ProbeResult]:
+        max_age = RUNTIME_LIMITS["health_snapshot_max_age_seconds"] if max_age is None else max_age
+        return [r for r in self._results.values() if r.category == category and r.ok and r.age <= max_age]
+
+    def lookup(self, tool_name: str, args: dict, max_age: Optional[float] = None) -> Optional[ProbeResult]:
+        """Worker가 Probe와 똑같은 조회(도구+인자)를 요청하면 스냅샷 결과를 돌려줍니다."""
+        max_age = RUNTIME_LIMITS["health_snapshot_max_age_seconds"] if max_age is None else max_age
+        for r in self._results.values():
+            if r.tool_name == tool_name and r.args == args and r.ok and r.age <= max_age:
+                return r
+        return None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "enabled": health_snapshot_enabled(),
+            "rounds": self.rounds,
+            "subscribers": len(self._subscribers),
+            "max_age_s": RUNTIME_LIMITS["health_snapshot_max_age_seconds"],
+            "probes": [r.to_dict() for r in sorted(self._results.values(), key=lambda r: r.name)],
+        }
+
+
+health_snapshot = HealthSnapshot()
+
+
+def health_snapshot_enabled() -> bool:
+    return RUNTIME_LIMITS["health_snapshot_enabled"]
+
+
+def active_probes() -> List[Dict[str, Any]]:
+    return RUNTIME_LIMITS.get("health_snapshot_probes") or DEFAULT_PROBES
+
+
+def get_worker_snapshot(worker_name: str) -> List[ProbeResult]:
+    if not health_snapshot_enabled():
+        return []
+    category = WORKER_CATEGORIES.get(worker_name)
+    return health_snapshot.fresh_results(category) if category else []
+
+
+def lookup_snapshot(tool_name: str, args: dict) -> Optional[ProbeResult]:
+    if not health_snapshot_enabled():
+        return None
+    return health_snapshot.lookup(tool_name, args)
+
+
+def describe_snapshot_for_prompt(results: List[ProbeResult]) -> str:
+    """Worker 시스템 프롬프트에 넣을 사전 수집 목록 (결과 본문은 요약 단계에 raw_data로 전달)"""
+    lines = [
+        f"- {r.tool_name}({json.dumps(r.args, ensure_ascii=False)}) : {int(r.age)}초 전 조회"
+        for r in results
+    ]
+    return (
+        "[사전 수집 데이터 (백그라운드 헬스 스냅샷)]\n"
+        "다음 조회 결과는 이미 확보되어 보고서에 자동으로 포함됩니다. 같은 조회를 다시 호출하지 마세요.\n"
+        + "\n".join(lines) + "\n"
+        "이 데이터로 지시를 수행할 수 있으면 도구를 호출하지 말고 '스냅샷으로 충분'이라고만 답하세요. "
+        "특정 파드/네임스페이스 등 스냅샷에 없는 대상의 조회가 필요할 때만 도구를 호출하세요."
+    )
+
+
+def relevant_snapshot_results(results: List[ProbeResult], tool_calls: List[dict]) -> List[ProbeResult]:
+    """Worker 보고서에 넣을 스냅샷: 호출한 도구와 같은 도구의 Probe만. (도구 호출 없이 스냅샷으로 답했으면 전부)"""
+    if not tool_calls:
+        return results
+    called = {tc["name"] for tc in tool_calls}
+    return [r for r in results if r.tool_name in called]
+
+
+def render_snapshot_report(results: List[ProbeResult], postprocess: Callable[[str, str], str], max_chars: int) -> str:
+    """스냅샷 결과를 전용 한도(max_chars) 안에서 Probe별로 나눠 붙입니다. (Worker가 직접 조회한 결과 뒤에 배치)"""
+    if not results or max_chars <= 0:
+        return ""
+    share = max(max_chars // len(results), 1)
+    blocks = []
+    for r in results:
+        output = postprocess(r.tool_name, r.output)
+        if len(output) > share:
+            output = output[:share] + "\n... (스냅샷 길어짐, 이하 생략)"
+        blocks.append(f"Tool({r.tool_name}) Output ({int(r.age)}초 전 스냅샷): {output}")
+    return "\n\n".join(blocks)
+
+
+async def run_probe(client, probe: Dict[str, Any]) -> ProbeResult:
+    result = ProbeResult(probe)
+    start = time.perf_counter()
+    # Worker 경로와 같은 한도로 받음 (로컬 후처리/요약은 Worker가 사용할 때 적용)
+    token = tool_output_char_limit.set(RUNTIME_LIMITS["worker_tool_max_output_chars"])
+    try:
+        output = await asyncio.wait_for(
+            client.call_mcp_tool(result.tool, result.args),
+            timeout=RUNTIME_LIMITS["health_snapshot_probe_timeout_seconds"],
+        )
+        if output.startswith("Error executing") or output.startswith("❌"):
+            result.error = output[:300]
+        else:
+            result.output = output
+            result.ok = True
+    except asyncio.TimeoutError:
+        result.error = "timeout"
+    except Exception as e:
+        result.error = (str(e) or repr(e))[:300]
+    finally:
+        tool_output_char_limit.reset(token)
+    result.duration = time.perf_counter() - start
+    result.fetched_at = time.time()
+    return result
+
+
+async def run_health_snapshot_loop(get_clients: Callable[[], Dict[str, Any]]):
+    """Probe들을 interval 동안 고르게 나눠 반복 실행합니다. (API 서버 lifespan에서 Task로 기동)"""
+    logger.info(
+        f"🩺 [HealthSnapshot] 백그라운드 Probe 시작 ({len(active_probes())}개, "
+        f"주기 {RUNTIME_LIMITS['health_snapshot_interval_seconds']}초)"
+    )
+    while True:
+        probes = active_probes()
+        spacing = RUNTIME_LIMITS["health_snapshot_interval_seconds"] / max(len(probes), 1)
+        for probe in probes:
+            started = time.perf_counter()
+            client = get_clients().get(probe["server"])
+            if health_snapshot_enabled() and client is not None and client.session:
+                result = await run_probe(client, probe)
+                health_snapshot.update(result)
+                if not result.ok:
+                    logger.warning(f"⚠️ [HealthSnapshot] Probe 실패: {probe['name']} ({result.error})")
+            await asyncio.sleep(max(spacing - (time.perf_counter() - started), 0.1))
+        health_snapshot.rounds += 1
+        logger.debug(f"🩺 [HealthSnapshot] {health_snapshot.rounds}회차 갱신 완료")
@@ -0,0 +1,333 @@
+import json
+import re
+from typing import Dict, List, Optional, Tuple
+
+# =================================================================
+# kubectl 출력 구조화 파서
+# -----------------------------------------------------------------
+# K8sSpecialist의 k8s_kubectl_get/describe 결과는 대형 클러스터에서 수천 줄이 되지만,
+# 진단에 필요한 것은 비정상 리소스(Pending/CrashLoopBackOff, 높은 재시작 수, Warning 이벤트)뿐입니다.
+# table / JSON / describe 형식을 레코드로 바꾼 뒤 정상 리소스는 건수만 남기고 걸러냅니다.
+# =================================================================
+
+_HEALTHY_STATUSES = {"running", "completed", "succeeded", "ready", "active", "bound", "available"}
+
+# describe 출력에서 그대로 보존할 최상위 필드
+_DESCRIBE_KEEP_FIELDS = {
+    "name", "namespace", "node", "status", "reason", "message", "phase",
+    "replicas", "type", "controlled by", "ready", "restart count",
+}
+# describe 출력에서 통째로 버리는 장황한 섹션
+_DESCRIBE_DROP_SECTIONS = {
+    "labels", "annotations", "environment", "mounts", "volumes", "tolerations",
+    "node-selectors", "selector", "pod template", "args", "command", "ports",
+    "host ports", "limits", "requests", "liveness", "readiness", "startup",
+    "environment variables from", "qos class", "ips", "ip",
+}
+
+_RESTARTS_RE = re.compile(r"^(\d+)")
+_READY_RE = re.compile(r"^(\d+)/(\d+)$")
+
+
+class KubectlRecord:
+    __slots__ = ("kind", "namespace", "name", "status", "ready", "restarts", "details")
+
+    def __init__(self, kind: str = "", namespace: str = "", name: str = "", status: str = "",
+                 ready: str = "", restarts: int = 0, details: Optional[List[str]] = None):
+        self.kind = kind
+        self.namespace = namespace
+        self.name = name
+        self.status = status
+        self.ready = ready
+        self.restarts = restarts
+        self.details = details or []
+
+    @property
+    def display_name(self) -> str:
+        name = f"{self.kind.lower()}/{self.name}" if self.kind else self.name
+        return f"{self.namespace}/{name}" if self.namespace else name
+
+    def is_healthy(self, restart_threshold: int) -> bool:
+        if self.kind.lower() == "event":
+            return self.status.lower() != "warning"
+        if not self.status and not self.ready:
+            # 상태 신호가 없는 리소스(Service, ConfigMap 등)는 판단할 수 없으므로 보존
+            return False
+        if self.status and self.status.lower() not in _HEALTHY_STATUSES:
+            return False
+        if self.ready:
+            match = _READY_RE.match(self.ready)
+            # Completed 상태의 Job 파드는 0/1 이 정상
+            if match and match.group(1) != match.group(2) and self.status.lower() not in ("completed", "succeeded"):
+                return False
+        if self.restarts > restart_threshold:
+            return False
+        return not any(d.startswith("⚠️") for d in self.details)
+
+    def render(self) -> str:
+        parts = [self.display_name]
+        if self.status:
+            parts.append(f"status={self.status}")
+        if self.ready:
+            parts.append(f"ready={self.ready}")
+        if self.restarts:
+            parts.append(f"restarts={self.restarts}")
+        line = " | ".join(parts)
+        if self.details:
+            line += "\n" + "\n".join(f"   {d}" for d in self.details)
+        return line
+
+
+# -----------------------------------------------------------------
+# 1. JSON 형식 (-o json)
+# -----------------------------------------------------------------
+def _records_from_json_object(obj: dict) -> List[KubectlRecord]:
+    if isinstance(obj.get("items"), list):
+        records = []
+        for item in obj["items"]:
+            if isinstance(item, dict):
+                records.extend(_records_from_json_object(item))
+        return records
+
+    kind = obj.get("kind", "")
+    meta = obj.get("metadata", {}) or {}
+    status = obj.get("status", {}) or {}
+    spec = obj.get("spec", {}) or {}
+    record = KubectlRecord(kind=kind, namespace=meta.get("namespace", ""), name=meta.get("name", ""))
+
+    if kind == "Event":
+        involved = obj.get("involvedObject", {}) or {}
+        record.status = obj.get("type", "")
+        record.name = f"{involved.get('kind', '').lower()}/{involved.get('name', '')}"
+        record.kind = "Event"
+        record.details.append(f"{obj.get('reason', '')}: {obj.get('message', '')} (x{obj.get('count', 1)})")
+        return [record]
+
+    if kind == "Pod":
+        record.status = status.get("phase", "")
+        container_statuses = status.get("containerStatuses", []) or []
+        ready_count = sum(1 for c in container_statuses if c.get("ready"))
+        record.ready = f"{ready_count}/{len(container_statuses)}" if container_statuses else ""
+        record.restarts = sum(int(c.get("restartCount", 0)) for c in container_statuses)
+        for c in container_statuses:
+            state = c.get("state", {}) or {}
+            for state_name in ("waiting", "terminated"):
+                info = state.get(state_name)
+                if info and info.get("reason") not in (None, "Completed"):
+                    record.details.append(
+                        f"⚠️ container {c.get('name')}: {state_name} {info.get('reason')} {info.get('message', '')}".rstrip()
+                    )
+            last_terminated = (c.get("lastState", {}) or {}).get("terminated")
+            if last_terminated and record.restarts:
+                record.details.append(
+                    f"last terminated: {last_terminated.get('reason')} (exit {last_terminated.get('exitCode')})"
+                )
+        if status.get("reason"):
+            record.details.append(f"⚠️ reason: {status.get('reason')} {status.get('message', '')}".rstrip())
+        return [record]
+
+    if kind == "Node":
+        conditions = {c.get("type"): c.get("status") for c in status.get("conditions", []) or []}
+        record.status = "Ready" if conditions.get("Ready") == "True" else "NotReady"
+        for cond_type, cond_status in conditions.items():
+            if cond_type != "Ready" and cond_status == "True":
+                record.details.append(f"⚠️ condition {cond_type}=True")
+        return [record]
+
+    desired = spec.get("replicas")
+    if desired is not None:
+        ready = status.get("readyReplicas", 0) or 0
+        record.ready = f"{ready}/{desired}"
+        record.status = "Available" if ready >= desired else "Degraded"
+        return [record]
+
+    record.status = status.get("phase", "") if isinstance(status, dict) else ""
+    return [record]
+
+
+def _parse_json(text: str) -> Optional[List[KubectlRecord]]:
+    stripped = text.strip()
+    if not stripped.startswith("{"):
+        return None
+    try:
+        obj = json.loads(stripped)
+    except ValueError:
+        return None
+    if not isinstance(obj, dict) or not ("kind" in obj or "items" in obj):
+        return None
+    return _records_from_json_object(obj)
+
+
+# -----------------------------------------------------------------
+# 2. 표 형식 (기본 출력 / -o wide / get events)
+# -----------------------------------------------------------------
+def _column_spans(header: str) -> List[Tuple[str, int, int]]:
+    """헤더 줄의 컬럼 시작 위치를 기준으로 (이름, 시작, 끝) 구간을 계산합니다."""
+    starts = [m.start() for m in re.finditer(r"(?:^|(?<=\s{2}))\S", header)]
+    if not starts or starts[0] != 0:
+        starts = [0] + starts
+    spans = []
+    for i, start in enumerate(starts):
+        end = starts[i + 1] if i + 1 < len(starts) else None
+        spans.append((header[start:end].strip().upper(), start, end))
+    return spans
+
+
+def _parse_table(text: str) -> Optional[List[KubectlRecord]]:
+    lines = [line for line in text.splitlines() if line.strip()]
+    if len(lines) < 2:
+        return None
+    header = lines[0]
+    if "NAME" not in header and "OBJECT" not in header:
+        return None
+    if header != header.upper():
+        return None
+    spans = _column_spans(header)
+    names = [name for name, _, _ in spans]
+
+    records = []
+    for line in lines[1:]:
+        values: Dict[str, str] = {}
+        for name, start, end in spans:
+            values[name] = line[start:end].strip() if end is not None else line[start:].strip()
+
+        if "OBJECT" in values and "TYPE" in values:
+            record = KubectlRecord(kind="Event", namespace=values.get("NAMESPACE", ""),
+                                   name=values.get("OBJECT", ""), status=values.get("TYPE", ""))
+            record.details.append(f"{values.get('REASON', '')}: {values.get('MESSAGE', '')}".strip())
+            records.append(record)
+            continue
+
+        raw_name = values.get("NAME", "")
+        kind = ""
+        if "/" in raw_name:
+            kind, raw_name = raw_name.split("/", 1)
+        restarts_match = _RESTARTS_RE.match(values.get("RESTARTS", ""))
+        record = KubectlRecord(
+            kind=kind,
+            namespace=values.get("NAMESPACE", ""),
+            name=raw_name,
+            status=values.get("STATUS", ""),
+            ready=values.get("READY", ""),
+            restarts=int(restarts_match.group(1)) if restarts_match else 0,
+        )
+        if "STATUS" not in names and "AVAILABLE" in names and "READY" in names:
+            # deployment/statefulset 형식: READY x/y 로만 판단
+            record.status = "Available"
+        records.append(record)
+    return records
+
+
+# -----------------------------------------------------------------
+# 3. describe 형식
+# -----------------------------------------------------------------
+def _parse_describe(text: str) -> Optional[List[KubectlRecord]]:
+    if not re.search(r"^Name:\s", text, re.MULTILINE):
+        return None
+
+    blocks = re.split(r"\n(?=Name:\s)", text.strip())
+    records = []
+    for block in blocks:
+        record = KubectlRecord()
+        section = None
+        in_events = False
+        warnings_seen = 0
+        for line in block.splitlines():
+            if not line.strip():
+                continue
+            indent = len(line) - len(line.lstrip())
+            stripped = line.strip()
+            key, _, value = stripped.partition(":")
+            key_lower = key.strip().lower()
+
+            if indent == 0:
+                section = key_lower
+                in_events = section == "events"
+                value = value.strip()
+                if section == "name":
+                    record.name = value
+                elif section == "namespace":
+                    record.namespace = value
+                elif section == "status":
+                    record.status = value
+                elif section in _DESCRIBE_KEEP_FIELDS and value:
+                    record.details.append(f"{key.strip()}: {value}")
+                continue
+
+            if in_events:
+                # "Type Reason Age From Message" 헤더/구분선 제외, Warning 이벤트만 보존
+                if stripped.startswith("Warning"):
+                    warnings_seen += 1
+                    record.details.append(f"⚠️ event: {' '.join(stripped.split())}")
+                continue
+            if section in _DESCRIBE_DROP_SECTIONS:
+                continue
+
+            if key_lower in ("state", "last state", "reason", "exit code", "message") and value.strip():
+                detail = f"{key.strip()}: {value.strip()}"
+                if key_lower == "state" and value.strip() not in ("Running", "Terminated"):
+                    detail = "⚠️ " + detail
+                if key_lower == "reason" and value.strip() not in ("Completed",):
+                    detail = "⚠️ " + detail
+                record.details.append(detail)
+            elif key_lower == "restart count":
+                try:
+                    record.restarts += int(value.strip())
+                except ValueError:
+                    pass
+            elif key_lower == "ready" and value.strip() == "False":
+                record.details.append("⚠️ Ready: False")
+            elif section == "conditions" and stripped.split()[-1:] == ["False"] and len(stripped.split()) == 2:
+                record.details.append(f"⚠️ condition {stripped.split()[0]}=False")
+        if record.name:
+            records.append(record)
+    return records or None
+
+
+def summarize_kubectl_output(text: str, restart_threshold: int = 0, keep_healthy: bool = False,
+                             healthy_names_max: int = 30) -> Optional[str]:
+    """
+    kubectl 결과를 레코드로 파싱하고 정상 리소스를 걸러낸 요약을 돌려줍니다.
+    어떤 형식으로도 파싱되지 않으면(-o name 등) None을 돌려주어 호출자가 원문을 쓰도록 합니다.
+    """
+    records = _parse_json(text)
+    fmt = "json"
+    if records is None:
+        records = _parse_describe(text)
+        fmt = "describe"
+    if records is None:
+        records = _parse_table(text)
+        fmt = "table"
+    if records is None:
+        return None
+    if not records:
+        return "[kubectl 분석] 조회된 리소스 없음"
+
+    kept, dropped = [], []
+    for record in records:
+        if keep_healthy or not record.is_healthy(restart_threshold):
+            kept.append(record)
+        else:
+            dropped.append(record)
+
+    lines = [
+        f"[kubectl 분석] 형식={fmt}, 전체 {len(records)}개 중 주의 필요 {len(kept)}개"
+        + (f", 정상 {len(dropped)}개 생략" if dropped else "")
+    ]
+    for record in kept:
+        lines.append(record.render())
+    if dropped:
+        by_kind: Dict[str, int] = {}
+        for record in dropped:
+            kind = (record.kind or "resource").lower()
+            by_kind[kind] = by_kind.get(kind, 0) + 1
+        kind_summary = ", ".join(f"{kind} {count}개" for kind, count in by_kind.items())
+        lines.append(
+            f"✅ 정상으로 판단되어 생략된 리소스: {kind_summary} "
+            f"(Running/Ready, 재시작 {restart_threshold}회 이하, Normal 이벤트)"
+        )
+        names = [r.display_name for r in dropped if r.kind.lower() != "event"][:healthy_names_max]
+        if names:
+            more = len(dropped) - len(names)
+            lines.append("   이름: " + ", ".join(names) + (f" 외 {more}개" if more > 0 else ""))
+    return "\n".join(lines)
@@ -0,0 +1,201 @@
+import json
+import re
+from typing import Dict, List, Optional, Tuple
+
+# =================================================================
+# Drain 방식 로그 템플릿 마이너
+# -----------------------------------------------------------------
+# VictoriaLogs(vlogs_query) 결과는 숫자/ID만 다른 거의 같은 로그 줄이 대부분입니다.
+# LLM에 원문을 그대로 넘기면 토큰만 낭비되고 8,000자 절단에 걸려 뒤쪽 에러가 유실되므로,
+# 로컬에서 줄 단위로 스트리밍 처리하여 "템플릿 + 건수 + 최초/최종 시각 + 예시 1줄"로 압축합니다.
+# (참고: He et al., "Drain: An Online Log Parsing Approach with Fixed Depth Tree")
+# =================================================================
+
+WILDCARD = "<*>"
+
+# 변수 성격의 토큰을 미리 <*>로 치환 (collapse_nums와 같은 효과)
+_MASK_PATTERNS = [
+    re.compile(r"\b[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}\b"),  # UUID
+    re.compile(r"\b\d{1,3}(?:\.\d{1,3}){3}(?::\d+)?\b"),  # IPv4[:port]
+    re.compile(r"\b0x[0-9a-fA-F]+\b"),  # 16진수
+    re.compile(r"\b[0-9a-f]{12,}\b"),  # 해시/컨테이너 ID
+    re.compile(r"\b\d+(?:\.\d+)?(?:ms|s|m|h|Mi|Gi|Ki|MB|GB|KB|B|%)?\b"),  # 숫자(+단위)
+]
+
+_LEADING_TIMESTAMP = re.compile(
+    r"^\s*(\d{4}-\d{2}-\d{2}[T ]\d{2}:\d{2}:\d{2}(?:[.,]\d+)?(?:Z|[+-]\d{2}:?\d{2})?)\s*"
+)
+
+_TIME_FIELDS = ("_time", "time", "timestamp", "ts", "@timestamp")
+_MESSAGE_FIELDS = ("_msg", "msg", "message", "log")
+
+_SEVERITY_KEYWORDS = (
+    "error", "err", "fatal", "panic", "exception", "fail", "failed", "warn", "warning",
+    "cannot", "forbidden", "denied", "refused", "timeout", "oom", "killed", "crash",
+)
+
+
+class _LogCluster:
+    __slots__ = ("tokens", "count", "first_ts", "last_ts", "exemplar", "severe")
+
+    def __init__(self, tokens: List[str], timestamp: Optional[str], exemplar: str, severe: bool):
+        self.tokens = tokens
+        self.count = 1
+        self.first_ts = timestamp
+        self.last_ts = timestamp
+        self.exemplar = exemplar
+        self.severe = severe
+
+    @property
+    def template(self) -> str:
+        return " ".join(self.tokens)
+
+
+def _parse_log_line(line: str) -> Tuple[Optional[str], str]:
+    """로그 한 줄에서 (타임스탬프, 메시지 본문)을 추출합니다. JSON 라인과 일반 텍스트를 모두 지원합니다."""
+    stripped = line.strip()
+    if stripped.startswith("{") and stripped.endswith("}"):
+        try:
+            record = json.loads(stripped)
+        except ValueError:
+            record = None
+        if isinstance(record, dict):
+            timestamp = next((str(record[k]) for k in _TIME_FIELDS if record.get(k)), None)
+            message = next((str(record[k]) for k in _MESSAGE_FIELDS if record.get(k)), None)
+            if message is None:
+                message = stripped
+            level = record.get("level") or record.get("severity")
+            if level and str(level).lower() not in message.lower():
+                message = f"[{level}] {message}"
+            return timestamp, message
+
+    match = _LEADING_TIMESTAMP.match(stripped)
+    if match:
+        return match.group(1), stripped[match.end():]
+    return None, stripped
+
+
+def _mask(message: str) -> List[str]:
+    for pattern in _MASK_PATTERNS:
+        message = pattern.sub(WILDCARD, message)
+    return message.split()
+
+
+class LogTemplateMiner:
+    """
+    고정 깊이 트리(토큰 수 -> 앞쪽 토큰) 기반의 Drain 스타일 온라인 템플릿 클러스터러.
+    줄 단위로 add_line()을 호출하면 되며, 메모리는 클러스터 수(max_clusters)에만 비례합니다.
+    """
+
+    def __init__(self, similarity_threshold: float = 0.5, depth: int = 2, max_clusters: int = 1000,
+                 max_children: int = 100):
+        self.similarity_threshold = similarity_threshold
+        self.depth = max(depth, 1)
+        self.max_clusters = max_clusters
+        self.max_children = max_children
+        self._tree: Dict[tuple, List[_LogCluster]] = {}
+        self._prefix_counts: Dict[int, set] = {}
+        self.clusters: List[_LogCluster] = []
+        self.total_lines = 0
+        self.overflow_lines = 0
+
+    def _leaf_key(self, tokens: List[str]) -> tuple:
+        length = len(tokens)
+        prefix = []
+        seen = self._prefix_counts.setdefault(length, set())
+        for token in tokens[: self.depth]:
+            # 숫자가 섞인 토큰이나 자식 노드가 너무 많은 경우는 와일드카드 경로로 합칩니다.
+            if any(ch.isdigit() for ch in token) or (token not in seen and len(seen) >= self.max_children):
+                token = WILDCARD
+            else:
+                seen.add(token)
+            prefix.append(token)
+        return (length, *prefix)
+
+    @staticmethod
+    def _similarity(template: List[str], tokens: List[str]) -> float:
+        if not tokens:
+            return 1.0
+        same = sum(1 for a, b in zip(template, tokens) if a == b or a == WILDCARD)
+        return same / len(tokens)
+
+    def add_line(self, line: str) -> None:
+        if not line or not line.strip():
+            return
+        timestamp, message = _parse_log_line(line)
+        tokens = _mask(message)
+        if not tokens:
+            return
+        self.total_lines += 1
+
+        key = self._leaf_key(tokens)
+        bucket = self._tree.setdefault(key, [])
+
+        best, best_score = None, -1.0
+        for cluster in bucket:
+            score = self._similarity(cluster.tokens, tokens)
+            if score > best_score:
+                best, best_score = cluster, score
+
+        if best is not None and best_score >= self.similarity_threshold:
+            best.tokens = [a if a == b else WILDCARD for a, b in zip(best.tokens, tokens)]
+            best.count += 1
+            if timestamp:
+                if best.first_ts is None or timestamp < best.first_ts:
+                    best.first_ts = timestamp
+                if best.last_ts is None or timestamp > best.last_ts:
+                    best.last_ts = timestamp
+            return
+
+        if len(self.clusters) >= self.max_clusters:
+            self.overflow_lines += 1
+            return
+
+        lowered = message.lower()
+        severe = any(keyword in lowered for keyword in _SEVERITY_KEYWORDS)
+        cluster = _LogCluster(tokens, timestamp, line.strip(), severe)
+        bucket.append(cluster)
+        self.clusters.append(cluster)
+
+    def add_text(self, text: str) -> None:
+        for line in text.splitlines():
+            self.add_line(line)
+
+    def render(self, max_templates: int = 100, exemplar_max_chars: int = 300) -> str:
+        """에러/경고 성격의 템플릿을 우선으로, 건수가 많은 순서대로 요약 텍스트를 만듭니다."""
+        ordered = sorted(self.clusters, key=lambda c: (not c.severe, -c.count))
+        shown = ordered[:max_templates]
+
+        lines = [
+            f"[로그 패턴 요약] 총 {self.total_lines}줄 -> {len(self.clusters)}개 패턴"
+            + (f" (상위 {len(shown)}개 표시)" if len(shown) < len(ordered) else "")
+        ]
+        for i, cluster in enumerate(shown, 1):
+            exemplar = cluster.exemplar
+            if len(exemplar) > exemplar_max_chars:
+                exemplar = exemplar[:exemplar_max_chars] + "..."
+            time_range = ""
+            if cluster.first_ts:
+                time_range = f" first={cluster.first_ts} last={cluster.last_ts}"
+            lines.append(f"{i}. (x{cluster.count}){time_range} | {cluster.template}")
+            lines.append(f"   예시: {exemplar}")
+
+        hidden = ordered[len(shown):]
+        if hidden:
+            lines.append(f"... (기타 {len(hidden)}개 패턴, {sum(c.count for c in hidden)}줄 생략)")
+        if self.overflow_lines:
+            lines.append(f"... (패턴 한도 초과로 분류되지 않은 로그 {self.overflow_lines}줄)")
+        return "\n".join(lines)
+
+
+def mine_log_templates(text: str, similarity_threshold: float = 0.5, max_templates: int = 100,
+                       min_lines: int = 5) -> str:
+    """
+    로그 도구 결과 텍스트를 템플릿 요약으로 변환합니다.
+    줄 수가 min_lines 미만이면 압축 이득이 없으므로 원문을 그대로 돌려줍니다.
+    """
+    miner = LogTemplateMiner(similarity_threshold=similarity_threshold)
+    miner.add_text(text)
+    if miner.total_lines < min_lines:
+        return text
+    return miner.render(max_templates=max_templates)
@@ -6,9 +6,10 @@ import warnings
 # Pydantic 필드 이름 충돌 경고 무시 (예: 'validate' 필드)
 warnings.filterwarnings("ignore", category=UserWarning, module="pydantic")
 
-from config import MCP_SERVERS
+from config import MCP_SERVERS, RUNTIME_LIMITS
 from mcp_client import MCPClient
 from agent_graph import create_agent_app
+from tool_output_store import tool_output_scope
 
 async def main():
     print("\n🚀 [System] MCP Agent 기동 시작...")
@@ -48,40 +49,44 @@ async def main():
             print("--- 🔄 처리 중... ---")
             inputs = {"messages": [HumanMessage(content=user_input)]}
             
-            async for event in app.astream(inputs):
-                for key, value in event.items():
-                    # 새로 추가된 노드들의 출력을 처리합니다.
-                    if key == "router":
-                        mode = value.get("mode", "UNKNOWN")
-                        print(f"🔄 [Router] 모드 결정: {mode}")
+            with tool_output_scope():
+                async for event in app.astream(inputs):
+                    for key, value in event.items():
+                        # 새로 추가된 노드들의 출력을 처리합니다.
+                        if key == "router":
+                            mode = value.get("mode", "UNKNOWN")
+                            print(f"🔄 [Router] 모드 결정: {mode}")
                     
-                    elif key == "orchestrator":
-                        plans = value.get("worker_plans", {})
-                        import json
-                        print(f"📋 [Orchestrator] 작업 계획:\n{json.dumps(plans, ensure_ascii=False, indent=2)}")
+                        elif key == "orchestrator":
+                            plans = value.get("worker_plans", {})
+                            import json
+                            print(f"📋 [Orchestrator] 작업 계획:\n{json.dumps(plans, ensure_ascii=False, indent=2)}")
                     
-                    elif key == "workers":
-                        results = value.get("worker_results", [])
-                        # 결과 내용이 너무 길 수 있으므로 요약만 출력
-                        print(f"👷 [Workers] 총 {len(results)}개 작업 실행 완료.")
-                        for res in results:
-                            # 앞부분 일부만 출력
-                            preview = res.split('\n')[0]
-                            print(f"   └─ {preview}...")
+                        elif key == "workers":
+                            results = value.get("worker_results", [])
+                            # 결과 내용이 너무 길 수 있으므로 요약만 출력
+                            print(f"👷 [Workers] 총 {len(results)}개 작업 실행 완료.")
+                            for res in results:
+                                # 앞부분 일부만 출력
+                                preview = res.split('\n')[0]
+                                print(f"   └─ {preview}...")
 
-                    elif key == "synthesizer":
-                        # 스트리밍으로 이미 출력되었으므로 여기서는 줄바꿈만 처리
-                        print("\n✨ [Synthesizer] 답변 완료.")
+                        elif key == "synthesizer":
+                            # 스트리밍으로 이미 출력되었으므로 여기서는 줄바꿈만 처리
+                            print("\n✨ [Synthesizer] 답변 완료.")
 
-                    elif key == "simple_agent":
-                        msg = value["messages"][-1]
-                        if hasattr(msg, "tool_calls") and msg.tool_calls:
-                            print(f"🛠️  [Simple] 도구 호출: {msg.tool_calls[0]['name']}")
-                        else:
-                            print(f"💬 [Simple] 답변: {msg.content}")
+                        elif key == "simple_agent":
+                            msg = value["messages"][-1]
+                            if hasattr(msg, "tool_calls") and msg.tool_calls:
+                                print(f"🛠️  [Simple] 도구 호출: {msg.tool_calls[0]['name']}")
+                            elif msg.response_metadata.get("streamed_to_client") and RUNTIME_LIMITS["stream_console_mirror"]:
+                                # 답변 토큰이 이미 콘솔에 스트리밍됨
+                                print()
+                            else:
+                                print(f"💬 [Simple] 답변: {msg.content}")
                             
-                    elif key == "tools":
-                        print(f"   └─ [System] 도구 실행 완료")
+                        elif key == "tools":
+                            print(f"   └─ [System] 도구 실행 완료")
                         
         except KeyboardInterrupt:
             break
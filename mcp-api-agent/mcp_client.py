@@ -1,6 +1,9 @@
 import asyncio
+import json
+import time
 from contextlib import AsyncExitStack
-from typing import Any
+from contextvars import ContextVar
+from typing import Any, Optional
 
 from mcp import ClientSession
 from mcp.client.sse import sse_client
@@ -10,6 +13,43 @@ from langchain_core.tools import StructuredTool
 from pydantic import create_model
 
 from config import RUNTIME_LIMITS, logger
+from tool_output_store import FETCH_TOOL_NAME, spill_tool_output
+from metrics import CANCELLED_WORK, MCP_TOOL_DURATION, metrics_enabled
+from request_trace import annotate_span, is_cancellation, trace_span
+from session_recorder import record_tool_call
+from shared_tool_cache import get_shared_tool_cache, make_tool_key
+
+# Worker 파이프라인처럼 도구 결과를 로컬에서 후처리(청크 요약 등)하는 호출자는
+# 이 값을 설정하여 현재 Task 범위에서만 Truncation 한도를 늘릴 수 있습니다.
+tool_output_char_limit: ContextVar[Optional[int]] = ContextVar("tool_output_char_limit", default=None)
+
+def finalize_tool_output(server: str, name: str, final_output: str) -> str:
+    """도구 원본 결과를 LLM에 넘길 형태로 다듬습니다. (세션 재생 도구도 같은 경로를 탑니다)"""
+    # [최적화] Tool Output Truncation (토큰 폭탄 및 LLM 뻗음 방지)
+    # 50,000자는 너무 길어 LLM이 느려지거나 컨텍스트 한계로 에러(Crash)를 유발합니다.
+    # 속도 최적화 및 안정성을 위해 10,000자(약 3,000토큰)로 제한합니다.
+    max_output_length = tool_output_char_limit.get() or RUNTIME_LIMITS["mcp_tool_max_output_chars"]
+    if len(final_output) > max_output_length:
+        original_chars = len(final_output)
+        # [최적화] 잘리는 원문은 요청 단위 스크래치 저장소에 보관하고 ref를 남겨
+        # 모델이 fetch_tool_output으로 필요한 부분만 다시 조회할 수 있게 합니다.
+        ref = spill_tool_output(final_output, source=f"{server}_{name}")
+        if ref:
+            next_offset = len(final_output[:max_output_length].encode("utf-8"))
+            hint = (f'원문 보관됨: {FETCH_TOOL_NAME}(ref="{ref}", offset={next_offset}) 로 '
+                    f'이어 읽거나 grep 인자로 검색하세요.')
+        else:
+            hint = "Use specific filters to see more."
+        final_output = final_output[:max_output_length] + \
+            f"\n... (⚠️ Output truncated by {len(final_output) - max_output_length} chars. {hint})"
+        logger.warning(f"✂️ [{server}] Truncation: 결과가 너무 길어 잘랐습니다. ({len(final_output)} chars)")
+        annotate_span(truncated=True, original_chars=original_chars, spill_ref=ref)
+
+    # [변경] 디버깅을 위해 결과의 앞부분을 보여줌
+    preview = final_output[:200].replace("\n", " ") + "..." if len(final_output) > 200 else final_output.replace("\n", " ")
+    logger.debug(f"✅ [{server}] 성공 (Return: {preview})")
+    return final_output
+
 
 class MCPClient:
     def __init__(self, name: str, server_url: str):
@@ -151,7 +191,42 @@ class MCPClient:
         logger.debug(f"   └─ 🛠️  [{self.name}] 도구 {len(self.tools)}개 로드 완료")
 
     async def call_mcp_tool(self, name: str, arguments: dict) -> str:
-        """도구 실행"""
+        """도구 실행 (소요 시간은 /metrics의 agent_mcp_tool_duration_seconds와 요청 타임라인에 기록)"""
+        start = time.perf_counter()
+        status = "error"
+        args_bytes = len(json.dumps(arguments, ensure_ascii=False, default=str).encode("utf-8"))
+        with trace_span(f"mcp:{self.name}_{name}", "mcp", server=self.name, tool=name, args_bytes=args_bytes) as span:
+            try:
+                started = time.time()
+                shared_cache = get_shared_tool_cache()
+                if shared_cache is not None:
+                    # /api/batch: 같은 배치의 다른 질문이 받았거나 받는 중인 결과를 공유
+                    result, shared = await shared_cache.fetch(
+                        make_tool_key(self.name, name, arguments), lambda: self._call_mcp_tool(name, arguments)
+                    )
+                    if span is not None:
+                        span.attrs["shared"] = shared
+                else:
+                    result = await self._call_mcp_tool(name, arguments)
+                record_tool_call(self.name, name, arguments, result, started)
+                if not (result.startswith("Error executing") or result.startswith("❌")):
+                    status = "ok"
+                    result = finalize_tool_output(self.name, name, result)
+                if span is not None:
+                    span.attrs.update(status=status, output_chars=len(result))
+                return result
+            except BaseException as e:
+                if is_cancellation(e):
+                    # 요청이 취소되면 응답 대기를 즉시 포기 (늦게 온 응답은 세션이 버림)
+                    status = "cancelled"
+                    if metrics_enabled():
+                        CANCELLED_WORK.inc("mcp_call")
+                raise
+            finally:
+                if metrics_enabled():
+                    MCP_TOOL_DURATION.observe(self.name, name, status, value=time.perf_counter() - start)
+
+    async def _call_mcp_tool(self, name: str, arguments: dict) -> str:
         logger.debug(f"🚀 [{self.name}] Tool Call: {name} (Args: {arguments})")
         for attempt in range(2):
             try:
@@ -166,21 +241,8 @@ class MCPClient:
                         if content.type == "text":
                             output_text.append(content.text)
 
-                final_output = "\n".join(output_text)
-
-                # [최적화] Tool Output Truncation (토큰 폭탄 및 LLM 뻗음 방지)
-                # 50,000자는 너무 길어 LLM이 느려지거나 컨텍스트 한계로 에러(Crash)를 유발합니다.
-                # 속도 최적화 및 안정성을 위해 10,000자(약 3,000토큰)로 제한합니다.
-                max_output_length = RUNTIME_LIMITS["mcp_tool_max_output_chars"]
-                if len(final_output) > max_output_length:
-                    final_output = final_output[:max_output_length] + \
-                        f"\n... (⚠️ Output truncated by {len(final_output) - max_output_length} chars. Use specific filters to see more.)"
-                    logger.warning(f"✂️ [{self.name}] Truncation: 결과가 너무 길어 잘랐습니다. ({len(final_output)} chars)")
-
-                # [변경] 디버깅을 위해 결과의 앞부분을 보여줌
-                preview = final_output[:200].replace("\n", " ") + "..." if len(final_output) > 200 else final_output.replace("\n", " ")
-                logger.debug(f"✅ [{self.name}] 성공 (Return: {preview})")
-                return final_output
+                # 절단은 call_mcp_tool에서 (세션 녹화가 절단 전 원본을 남길 수 있도록)
+                return "\n".join(output_text)
             except Exception as e:
                 error_str = str(e) or repr(e)
                 if "ENOBUFS" in error_str:
@@ -0,0 +1,197 @@
+import json
+import math
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+# =================================================================
+# VictoriaMetrics(Prometheus) 쿼리 결과 로컬 분석기
+# -----------------------------------------------------------------
+# vm_query 결과(JSON)를 그대로 LLM에 넘기면 모델이 숫자를 "읽어야" 하므로 토큰 낭비가 크고
+# 수치 결론도 불안정합니다. instant/range vector를 NumPy 배열로 변환해 시계열별 통계
+# (min/max/mean/p95/변화율/z-score 이상치/top-k)를 로컬에서 계산하고 압축 표만 전달합니다.
+# =================================================================
+
+# 시계열 이름 표시 시 우선적으로 보여줄 라벨
+_PREFERRED_LABELS = ("namespace", "pod", "container", "node", "instance", "job", "service", "alertname")
+
+
+def _extract_payload(text: str) -> Optional[dict]:
+    """도구 결과 텍스트에서 Prometheus API 응답(JSON)을 찾아 data 부분을 돌려줍니다."""
+    stripped = text.strip()
+    start = stripped.find("{")
+    if start < 0:
+        return None
+    try:
+        payload = json.loads(stripped[start:])
+    except ValueError:
+        try:
+            payload, _ = json.JSONDecoder().raw_decode(stripped[start:])
+        except ValueError:
+            return None
+    if not isinstance(payload, dict):
+        return None
+    if isinstance(payload.get("data"), dict) and "resultType" in payload["data"]:
+        return payload["data"]
+    if "resultType" in payload:
+        return payload
+    return None
+
+
+def _series_label(metric: Dict[str, str]) -> str:
+    name = metric.get("__name__", "")
+    labels = [f"{k}={metric[k]}" for k in _PREFERRED_LABELS if metric.get(k)]
+    if not labels:
+        labels = [f"{k}={v}" for k, v in sorted(metric.items()) if k != "__name__"][:3]
+    label_str = ",".join(labels)
+    if name and label_str:
+        return f"{name}{{{label_str}}}"
+    return name or label_str or "{}"
+
+
+def _to_float(value) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return math.nan
+
+
+def format_number(value: float) -> str:
+    """큰 값은 SI 접두어(K/M/G/T)로, 작은 값은 유효숫자 3자리로 표시합니다."""
+    if value is None or math.isnan(value):
+        return "NaN"
+    if math.isinf(value):
+        return "Inf" if value > 0 else "-Inf"
+    magnitude = abs(value)
+    for threshold, suffix in ((1e12, "T"), (1e9, "G"), (1e6, "M"), (1e3, "K")):
+        if magnitude >= threshold:
+            return f"{value / threshold:.3g}{suffix}"
+    return f"{value:.3g}"
+
+
+def _downsample(values: np.ndarray, points: int) -> np.ndarray:
+    """시계열을 points개 구간의 평균값으로 축소합니다."""
+    if points <= 0 or values.size <= points:
+        return values
+    buckets = np.array_split(values, points)
+    return np.array([np.nanmean(b) if b.size else math.nan for b in buckets])
+
+
+def _parse_matrix(result: list) -> Tuple[List[str], List[np.ndarray], List[np.ndarray]]:
+    labels, timestamps, values = [], [], []
+    for series in result:
+        samples = series.get("values") or []
+        if not samples:
+            continue
+        arr = np.array([[_to_float(ts), _to_float(v)] for ts, v in samples], dtype=np.float64)
+        labels.append(_series_label(series.get("metric", {})))
+        timestamps.append(arr[:, 0])
+        values.append(arr[:, 1])
+    return labels, timestamps, values
+
+
+def _analyze_instant(result: list, top_k: int, z_threshold: float) -> str:
+    labels = [_series_label(s.get("metric", {})) for s in result]
+    values = np.array([_to_float((s.get("value") or [None, None])[1]) for s in result], dtype=np.float64)
+    finite = values[np.isfinite(values)]
+
+    lines = [f"[메트릭 분석] resultType=vector, 시계열 {len(values)}개"]
+    if finite.size:
+        mean, std = float(finite.mean()), float(finite.std())
+        lines.append(
+            f"전체 분포: min={format_number(finite.min())} max={format_number(finite.max())} "
+            f"mean={format_number(mean)} p95={format_number(float(np.percentile(finite, 95)))}"
+        )
+        z = (values - mean) / std if std > 0 else np.zeros_like(values)
+    else:
+        z = np.zeros_like(values)
+
+    order = np.argsort(np.nan_to_num(values, nan=-np.inf))[::-1][:top_k]
+    lines.append(f"상위 {len(order)}개 (값 내림차순):")
+    lines.append("series | value | z")
+    for idx in order:
+        lines.append(f"{labels[idx]} | {format_number(values[idx])} | {z[idx]:.1f}")
+
+    anomalies = [i for i in range(len(values)) if np.isfinite(z[i]) and abs(z[i]) >= z_threshold]
+    if anomalies:
+        names = ", ".join(f"{labels[i]}({format_number(values[i])}, z={z[i]:.1f})" for i in anomalies[:top_k])
+        lines.append(f"⚠️ 이상치(|z|>={z_threshold:g}) {len(anomalies)}개: {names}")
+    return "\n".join(lines)
+
+
+def _analyze_matrix(result: list, top_k: int, z_threshold: float, downsample_points: int) -> str:
+    labels, timestamps, values = _parse_matrix(result)
+    lines = [f"[메트릭 분석] resultType=matrix, 시계열 {len(values)}개"]
+    if not values:
+        return "\n".join(lines)
+
+    rows = []
+    for label, ts, vals in zip(labels, timestamps, values):
+        mask = np.isfinite(vals)
+        if not mask.any():
+            continue
+        v, t = vals[mask], ts[mask]
+        mean, std = float(v.mean()), float(v.std())
+        duration = float(t[-1] - t[0]) if t.size > 1 else 0.0
+        rate = (float(v[-1]) - float(v[0])) / duration if duration > 0 else 0.0
+        z = np.abs((v - mean) / std) if std > 0 else np.zeros_like(v)
+        anomaly_count = int((z >= z_threshold).sum())
+        rows.append({
+            "label": label,
+            "min": float(v.min()),
+            "max": float(v.max()),
+            "mean": mean,
+            "p95": float(np.percentile(v, 95)),
+            "last": float(v[-1]),
+            "rate": rate,
+            "anomalies": anomaly_count,
+            "max_z": float(z.max()) if z.size else 0.0,
+            "values": v,
+        })
+
+    # 피크가 큰 시계열 우선 (동률이면 평균)
+    rows.sort(key=lambda r: (r["max"], r["mean"]), reverse=True)
+    shown = rows[:top_k]
+    if len(rows) > len(shown):
+        lines[0] += f" (max 기준 상위 {len(shown)}개 표시)"
+    first_ts = min(float(t[0]) for t in timestamps)
+    last_ts = max(float(t[-1]) for t in timestamps)
+    lines.append(f"구간: {int(last_ts - first_ts)}초, 포인트 수(최대): {max(v.size for v in values)}")
+    lines.append(f"series | min | max | mean | p95 | last | rate/s | z>={z_threshold:g}")
+    for r in shown:
+        lines.append(
+            f"{r['label']} | {format_number(r['min'])} | {format_number(r['max'])} | {format_number(r['mean'])} | "
+            f"{format_number(r['p95'])} | {format_number(r['last'])} | {format_number(r['rate'])} | {r['anomalies']}"
+        )
+        if downsample_points > 0:
+            sampled = _downsample(r["values"], downsample_points)
+            lines.append("   추이: " + " ".join(format_number(float(x)) for x in sampled))
+
+    anomalous = [r for r in rows if r["anomalies"]]
+    if anomalous:
+        anomalous.sort(key=lambda r: r["max_z"], reverse=True)
+        names = ", ".join(f"{r['label']}(max z={r['max_z']:.1f})" for r in anomalous[:top_k])
+        lines.append(f"⚠️ 이상치 포함 시계열 {len(anomalous)}개: {names}")
+    return "\n".join(lines)
+
+
+def analyze_metric_output(text: str, top_k: int = 10, z_threshold: float = 3.0,
+                          downsample_points: int = 0) -> Optional[str]:
+    """
+    Prometheus 쿼리 결과 텍스트를 압축 통계 표로 변환합니다.
+    vector/matrix가 아니거나 파싱할 수 없으면 None을 돌려주어 호출자가 원문을 쓰도록 합니다.
+    """
+    data = _extract_payload(text)
+    if data is None:
+        return None
+    result_type = data.get("resultType")
+    result = data.get("result")
+    if not isinstance(result, list):
+        return None
+    if not result:
+        return f"[메트릭 분석] resultType={result_type}, 결과 없음 (조건에 해당하는 시계열 0개)"
+    if result_type == "vector":
+        return _analyze_instant(result, top_k, z_threshold)
+    if result_type == "matrix":
+        return _analyze_matrix(result, top_k, z_threshold, downsample_points)
+    return None
@@ -0,0 +1,322 @@
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+from config import RUNTIME_LIMITS, logger
+from request_trace import is_cancellation, trace_span
+from session_recorder import stage_scope
+
+# =================================================================
+# Prometheus 텍스트 포맷 메트릭 (/metrics)
+# -----------------------------------------------------------------
+# prometheus_client 의존성 없이 필요한 만큼만 구현합니다.
+# 수집 경로(observe/inc)는 라벨 튜플 dict 조회 + 정수 증가뿐이라 요청 처리에 부담이 없고,
+# 누적 버킷 계산/문자열 변환은 /metrics 스크레이프 시점에만 합니다.
+# 모든 수집은 이벤트 루프 스레드에서 일어나므로 별도 락을 두지 않습니다.
+# =================================================================
+
+CONTENT_TYPE_LATEST = "text/plain; version=0.0.4; charset=utf-8"
+
+# LLM/노드 처리 시간은 수 초~수 분, MCP 도구 호출은 수십 ms~수십 초 범위
+DURATION_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 600.0)
+TOOL_DURATION_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self._samples())
+        return lines
+
+    def _samples(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def _samples(self) -> List[str]:
+        return [
+            f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}"
+            for labels, value in sorted(self._values.items())
+        ]
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def set(self, *labels: str, value: float) -> None:
+        self._values[labels] = value
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def dec(self, *labels: str, amount: float = 1.0) -> None:
+        self._values[labels] = self._values.get(labels, 0.0) - amount
+
+    def _samples(self) -> List[str]:
+        return [
+            f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}"
+            for labels, value in sorted(self._values.items())
+        ]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DURATION_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # 라벨별 [버킷별 개수(비누적)..., +Inf 개수], 합계
+        self._counts: Dict[Tuple[str, ...], List[int]] = {}
+        self._sums: Dict[Tuple[str, ...], float] = {}
+
+    def observe(self, *labels: str, value: float) -> None:
+        counts = self._counts.get(labels)
+        if counts is None:
+            counts = self._counts[labels] = [0] * (len(self.buckets) + 1)
+            self._sums[labels] = 0.0
+        counts[bisect_left(self.buckets, value)] += 1
+        self._sums[labels] += value
+
+    def _samples(self) -> List[str]:
+        lines = []
+        for labels, counts in sorted(self._counts.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, labels, le)} {cumulative}")
+            label_str = _format_labels(self.labelnames, labels)
+            lines.append(f"{self.name}_sum{label_str} {_format_value(self._sums[labels])}")
+            lines.append(f"{self.name}_count{label_str} {cumulative}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+        self._collectors: List[Callable[[], None]] = []
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def add_collector(self, collector: Callable[[], None]) -> None:
+        """스크레이프 직전에 호출되어 게이지 값을 채우는 함수 (큐 길이, MCP 세션 상태 등)"""
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        for collector in self._collectors:
+            try:
+                collector()
+            except Exception as e:
+                logger.warning(f"⚠️ [Metrics] collector 실행 실패: {e}")
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+NODE_DURATION = REGISTRY.register(Histogram(
+    "agent_node_duration_seconds", "LangGraph node execution time", ["node"]))
+MCP_TOOL_DURATION = REGISTRY.register(Histogram(
+    "agent_mcp_tool_duration_seconds", "MCP tool call latency", ["server", "tool", "status"],
+    buckets=TOOL_DURATION_BUCKETS))
+LLM_DURATION = REGISTRY.register(Histogram(
+    "agent_llm_request_duration_seconds", "LLM request latency (including streaming)", ["model", "status"]))
+LLM_PROMPT_TOKENS = REGISTRY.register(Counter(
+    "agent_llm_prompt_tokens_total", "Prompt tokens sent to the LLM", ["model"]))
+LLM_COMPLETION_TOKENS = REGISTRY.register(Counter(
+    "agent_llm_completion_tokens_total", "Completion tokens generated by the LLM", ["model"]))
+LLM_INFLIGHT = REGISTRY.register(Gauge(
+    "agent_llm_inflight_requests", "LLM requests currently in flight", ["model"]))
+HTTP_INFLIGHT = REGISTRY.register(Gauge(
+    "agent_http_inflight_requests", "API requests currently being processed", ["endpoint"]))
+QUEUE_DEPTH = REGISTRY.register(Gauge(
+    "agent_queue_depth", "Messages waiting in internal queues", ["queue"]))
+MCP_SESSION_UP = REGISTRY.register(Gauge(
+    "agent_mcp_session_up", "1 if the MCP server session is connected", ["server"]))
+MCP_TOOLS_LOADED = REGISTRY.register(Gauge(
+    "agent_mcp_tools_loaded", "Number of tools loaded from the MCP server", ["server"]))
+ANSWER_CACHE_LOOKUPS = REGISTRY.register(Counter(
+    "agent_answer_cache_lookups_total", "Answer cache lookups by result (hit/miss/bypass)", ["result"]))
+SCHEDULER_QUEUE_WAIT = REGISTRY.register(Histogram(
+    "agent_scheduler_queue_wait_seconds", "Time a request waited in its scheduler lane before running", ["lane"]))
+SCHEDULER_REJECTIONS = REGISTRY.register(Counter(
+    "agent_scheduler_rejections_total", "Requests rejected with 429 because the lane queue was full", ["lane"]))
+SCHEDULER_LANE_ACTIVE = REGISTRY.register(Gauge(
+    "agent_scheduler_lane_active", "Requests currently running in each scheduler lane", ["lane"]))
+CANCELLED_WORK = REGISTRY.register(Counter(
+    "agent_cancelled_work_total", "Backend work aborted because the client disconnected",
+    ["kind"]))
+HEALTH_SNAPSHOT_AGE = REGISTRY.register(Gauge(
+    "agent_health_snapshot_age_seconds", "Age of the latest successful health snapshot probe result", ["probe"]))
+SHARED_TOOL_CACHE_LOOKUPS = REGISTRY.register(Counter(
+    "agent_shared_tool_cache_lookups_total", "Batch-scoped shared tool cache lookups by result (hit/joined/miss)",
+    ["result"]))
+CONVERSATION_EVENTS = REGISTRY.register(Counter(
+    "agent_conversation_events_total",
+    "Multi-turn conversation store events (loaded/evicted/expired/compacted/summarized)", ["event"]))
+
+
+def metrics_enabled() -> bool:
+    return RUNTIME_LIMITS["metrics_enabled"]
+
+
+def render_latest() -> str:
+    return REGISTRY.render()
+
+
+@contextmanager
+def observe_duration(histogram: Histogram, *labels: str):
+    if not metrics_enabled():
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        histogram.observe(*labels, value=time.perf_counter() - start)
+
+
+def timed_node(node_name: str, fn):
+    """그래프 노드 함수를 감싸 실행 시간을 agent_node_duration_seconds와 요청 타임라인(Span)에 기록합니다."""
+    async def wrapper(state):
+        with observe_duration(NODE_DURATION, node_name), trace_span(f"node:{node_name}", "node"), \
+                stage_scope(node_name):
+            return await fn(state)
+    wrapper.__name__ = getattr(fn, "__name__", node_name)
+    return wrapper
+
+
+@contextmanager
+def track_inflight(endpoint: str):
+    if not metrics_enabled():
+        yield
+        return
+    HTTP_INFLIGHT.inc(endpoint)
+    try:
+        yield
+    finally:
+        HTTP_INFLIGHT.dec(endpoint)
+
+
+class LLMMetricsCallback(BaseCallbackHandler):
+    """LLM 호출 시간/토큰 사용량 수집 콜백. (모델별 하나씩 공유)"""
+
+    # 스레드 풀로 넘기지 않고 이벤트 루프에서 바로 실행 (dict 갱신뿐이라 블로킹 없음)
+    run_inline = True
+
+    def __init__(self, model_name: str):
+        self.model_name = model_name
+        self._started: Dict[object, float] = {}
+        self._streamed_tokens: Dict[object, int] = {}
+
+    def _start(self, run_id) -> None:
+        self._started[run_id] = time.perf_counter()
+        LLM_INFLIGHT.inc(self.model_name)
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs) -> None:
+        self._start(run_id)
+
+    def on_llm_start(self, serialized, prompts, *, run_id, **kwargs) -> None:
+        self._start(run_id)
+
+    def on_llm_new_token(self, token: str, *, run_id, **kwargs) -> None:
+        self._streamed_tokens[run_id] = self._streamed_tokens.get(run_id, 0) + 1
+
+    def _finish(self, run_id, status: str) -> int:
+        streamed = self._streamed_tokens.pop(run_id, 0)
+        start = self._started.pop(run_id, None)
+        if start is not None:
+            LLM_INFLIGHT.dec(self.model_name)
+            LLM_DURATION.observe(self.model_name, status, value=time.perf_counter() - start)
+        return streamed
+
+    def on_llm_end(self, response, *, run_id, **kwargs) -> None:
+        streamed = self._finish(run_id, "ok")
+        prompt_tokens, completion_tokens = _extract_usage(response)
+        if completion_tokens is None:
+            # 스트리밍 응답에 usage가 없으면 수신한 청크 수로 근사
+            completion_tokens = streamed
+        if prompt_tokens:
+            LLM_PROMPT_TOKENS.inc(self.model_name, amount=prompt_tokens)
+        if completion_tokens:
+            LLM_COMPLETION_TOKENS.inc(self.model_name, amount=completion_tokens)
+
+    def on_llm_error(self, error, *, run_id, **kwargs) -> None:
+        if is_cancellation(error):
+            # 클라이언트가 떠나 업스트림 스트림/요청을 끊은 호출
+            self._finish(run_id, "cancelled")
+            CANCELLED_WORK.inc("llm_call")
+        else:
+            self._finish(run_id, "error")
+
+
+def _extract_usage(response) -> Tuple[Optional[int], Optional[int]]:
+    generations = getattr(response, "generations", None) or [[]]
+    message = getattr(generations[0][0], "message", None) if generations and generations[0] else None
+    usage = getattr(message, "usage_metadata", None)
+    if usage:
+        return usage.get("input_tokens"), usage.get("output_tokens")
+    token_usage = (getattr(response, "llm_output", None) or {}).get("token_usage") or {}
+    if token_usage:
+        return token_usage.get("prompt_tokens"), token_usage.get("completion_tokens")
+    return None, None
+
+
+_llm_callbacks: Dict[str, LLMMetricsCallback] = {}
+
+
+def get_llm_metrics_callbacks(model_name: str) -> list:
+    """모델 생성 시 callbacks에 덧붙일 수집 콜백 목록 (비활성화 시 빈 목록)"""
+    if not metrics_enabled():
+        return []
+    callback = _llm_callbacks.get(model_name)
+    if callback is None:
+        callback = _llm_callbacks[model_name] = LLMMetricsCallback(model_name)
+    return [callback]
@@ -0,0 +1,374 @@
+import asyncio
+import json
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+from config import RUNTIME_LIMITS, logger
+
+# =================================================================
+# 요청 단위 실행 타임라인 (Span 트리)
+# -----------------------------------------------------------------
+# /metrics가 전체 분포를 보여준다면, 여기서는 "이 요청은 왜 90초 걸렸나"를 봅니다.
+# 요청마다 노드 진입/종료, LLM 호출(토큰 수, 첫 토큰 시간), MCP 호출(인자/결과 크기, 절단 여부),
+# 세마포어 대기 시간을 Span 트리로 기록하고, 최근 N개만 메모리 링 버퍼에 보관합니다.
+# 현재 요청/현재 Span은 ContextVar로 전달되므로 gather/create_task로 만든 하위 Task에도 그대로 이어집니다.
+# =================================================================
+
+
+class Span:
+    __slots__ = ("span_id", "parent_id", "name", "kind", "start", "end", "attrs")
+
+    def __init__(self, span_id: str, parent_id: Optional[str], name: str, kind: str, attrs: Dict[str, Any]):
+        self.span_id = span_id
+        self.parent_id = parent_id
+        self.name = name
+        self.kind = kind
+        self.start = time.time()
+        self.end: Optional[float] = None
+        self.attrs = attrs
+
+
+class RequestTrace:
+    def __init__(self, request_id: str, endpoint: str, user_input: str = ""):
+        self.request_id = request_id
+        # OTLP traceId 형식(32 hex)에 맞춘 ID
+        self.trace_id = uuid.uuid4().hex
+        self.endpoint = endpoint
+        self.user_input = user_input[:200]
+        self.start = time.time()
+        self.end: Optional[float] = None
+        self.status = "running"
+        self.error: Optional[str] = None
+        self.spans: List[Span] = []
+        self.dropped_spans = 0
+        self.llm_runs: Dict[Any, Span] = {}
+        # 클라이언트 연결 끊김으로 취소된 경우 중단된 백엔드 작업 요약 (cancelled_work 참고)
+        self.cancelled_work: Optional[Dict[str, int]] = None
+        self._max_spans = RUNTIME_LIMITS["request_trace_max_spans"]
+
+    def start_span(self, name: str, kind: str, parent: Optional[Span], attrs: Dict[str, Any]) -> Optional[Span]:
+        if len(self.spans) >= self._max_spans:
+            self.dropped_spans += 1
+            return None
+        span = Span(uuid.uuid4().hex[:16], parent.span_id if parent else None, name, kind, attrs)
+        self.spans.append(span)
+        return span
+
+    @property
+    def duration_ms(self) -> float:
+        return round(((self.end or time.time()) - self.start) * 1000, 1)
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "request_id": self.request_id,
+            "endpoint": self.endpoint,
+            "input": self.user_input,
+            "started_at": self.start,
+            "duration_ms": self.duration_ms,
+            "status": self.status,
+            "spans": len(self.spans),
+        }
+
+    def waterfall(self) -> Dict[str, Any]:
+        """시작 시각 순으로 정렬하고 요청 시작 기준 오프셋/깊이를 붙인 Span 목록"""
+        depth: Dict[str, int] = {}
+        rows = []
+        for span in sorted(self.spans, key=lambda s: s.start):
+            level = depth.get(span.parent_id, -1) + 1 if span.parent_id else 0
+            depth[span.span_id] = level
+            end = span.end or time.time()
+            rows.append({
+                "span_id": span.span_id,
+                "parent_id": span.parent_id,
+                "depth": level,
+                "name": span.name,
+                "kind": span.kind,
+                "offset_ms": round((span.start - self.start) * 1000, 1),
+                "duration_ms": round((end - span.start) * 1000, 1),
+                "open": span.end is None,
+                "attrs": span.attrs,
+            })
+        result = self.summary()
+        result.update({"trace_id": self.trace_id, "error": self.error, "cancelled_work": self.cancelled_work,
+                       "dropped_spans": self.dropped_spans, "waterfall": rows})
+        return result
+
+
+# 최근 요청 링 버퍼 (request_id -> RequestTrace, 오래된 것부터 밀려남)
+_traces: "OrderedDict[str, RequestTrace]" = OrderedDict()
+
+_current_trace: ContextVar[Optional[RequestTrace]] = ContextVar("request_trace", default=None)
+_current_span: ContextVar[Optional[Span]] = ContextVar("request_trace_span", default=None)
+
+
+def new_request_id() -> str:
+    return uuid.uuid4().hex[:12]
+
+
+def get_current_trace() -> Optional[RequestTrace]:
+    return _current_trace.get()
+
+
+def is_cancellation(error: BaseException) -> bool:
+    return isinstance(error, (asyncio.CancelledError, GeneratorExit))
+
+
+def cancelled_work(trace: RequestTrace) -> Dict[str, int]:
+    """취소 시점에 진행 중이던(=중간에 끊은) LLM 호출/MCP 호출/Worker 수와 끊기 전까지 받은 스트림 청크 수
+    (LangGraph 노드 Task는 그래프보다 늦게 정리될 수 있으므로 아직 열린 Span도 중단된 것으로 셉니다)
+    """
+    cancelled = [span for span in trace.spans if span.attrs.get("cancelled") or span.end is None]
+    llm_spans = [span for span in cancelled if span.kind == "llm"]
+    return {
+        "llm_calls": len(llm_spans),
+        "llm_chunks_received": sum(span.attrs.get("stream_chunks", 0) for span in llm_spans),
+        "mcp_calls": sum(1 for span in cancelled if span.kind == "mcp"),
+        "workers": sum(1 for span in cancelled if span.name.startswith("node:worker_")),
+    }
+
+
+def _remember(trace: RequestTrace) -> None:
+    _traces[trace.request_id] = trace
+    limit = max(RUNTIME_LIMITS["request_trace_buffer_size"], 1)
+    while len(_traces) > limit:
+        _traces.popitem(last=False)
+
+
+@asynccontextmanager
+async def request_trace_scope(request_id: str, endpoint: str, user_input: str = ""):
+    """요청 하나의 Span 트리 기록 범위. 끝나면 링 버퍼에 남기고 (설정 시) OTLP 파일로 내보냅니다.
+    파일 쓰기는 이벤트 루프를 막지 않도록 스레드에서 합니다.
+    """
+    if not RUNTIME_LIMITS["request_trace_enabled"]:
+        yield None
+        return
+    trace = RequestTrace(request_id, endpoint, user_input)
+    _remember(trace)
+    trace_token = _current_trace.set(trace)
+    span_token = _current_span.set(None)
+    try:
+        yield trace
+        trace.status = "ok"
+    except BaseException as e:
+        trace.status = "cancelled" if is_cancellation(e) else "error"
+        trace.error = str(e)[:500] or repr(e)
+        if trace.status == "cancelled":
+            trace.cancelled_work = cancelled_work(trace)
+            logger.info(
+                f"🛑 [Cancel] 요청 {request_id} 취소 ({trace.duration_ms:.0f}ms 시점): "
+                f"LLM 호출 {trace.cancelled_work['llm_calls']}건 중단 "
+                f"(끊기 전 수신 청크 {trace.cancelled_work['llm_chunks_received']}개), "
+                f"MCP 호출 {trace.cancelled_work['mcp_calls']}건 / Worker {trace.cancelled_work['workers']}개 중단"
+            )
+        raise
+    finally:
+        trace.end = time.time()
+        _current_span.reset(span_token)
+        _current_trace.reset(trace_token)
+        export_path = RUNTIME_LIMITS.get("request_trace_otlp_path")
+        if export_path:
+            await asyncio.to_thread(export_otlp_json, trace, export_path)
+
+
+@contextmanager
+def trace_span(name: str, kind: str = "internal", **attrs):
+    """현재 요청 트리에 Span을 열고 하위 호출의 부모로 설정합니다. (요청 범위 밖이면 아무것도 하지 않음)"""
+    trace = _current_trace.get()
+    if trace is None:
+        yield None
+        return
+    span = trace.start_span(name, kind, _current_span.get(), attrs)
+    if span is None:
+        yield None
+        return
+    token = _current_span.set(span)
+    try:
+        yield span
+    except BaseException as e:
+        if is_cancellation(e):
+            span.attrs["cancelled"] = True
+        else:
+            span.attrs["error"] = (str(e) or repr(e))[:200]
+        raise
+    finally:
+        _current_span.reset(token)
+        span.end = time.time()
+
+
+def record_wait(name: str, started_at: float, **attrs) -> None:
+    """세마포어/큐 대기처럼 끝난 뒤에야 길이를 아는 구간을 완료된 Span으로 남깁니다."""
+    trace = _current_trace.get()
+    if trace is None:
+        return
+    span = trace.start_span(f"wait:{name}", "wait", _current_span.get(), attrs)
+    if span is not None:
+        span.start = started_at
+        span.end = time.time()
+
+
+def annotate_span(**attrs) -> None:
+    """현재 Span에 속성을 덧붙입니다. (절단 여부, 결과 크기 등 안쪽 코드에서 알게 되는 값)"""
+    span = _current_span.get()
+    if span is not None:
+        span.attrs.update(attrs)
+
+
+def list_traces() -> List[Dict[str, Any]]:
+    return [trace.summary() for trace in reversed(_traces.values())]
+
+
+def get_trace(request_id: str) -> Optional[RequestTrace]:
+    return _traces.get(request_id)
+
+
+# -----------------------------------------------------------------
+# LLM 호출 Span (토큰 수, 첫 토큰 시간)
+# -----------------------------------------------------------------
+class TraceLLMCallback(BaseCallbackHandler):
+    # 호출자 Task의 ContextVar(현재 요청/Span)를 봐야 하므로 이벤트 루프에서 바로 실행
+    run_inline = True
+
+    def __init__(self, model_name: str):
+        self.model_name = model_name
+
+    def _start(self, run_id, message_count: int) -> None:
+        trace = _current_trace.get()
+        if trace is None:
+            return
+        span = trace.start_span(f"llm:{self.model_name}", "llm", _current_span.get(),
+                                {"model": self.model_name, "input_messages": message_count})
+        if span is not None:
+            trace.llm_runs[run_id] = span
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs) -> None:
+        self._start(run_id, sum(len(batch) for batch in messages))
+
+    def on_llm_start(self, serialized, prompts, *, run_id, **kwargs) -> None:
+        self._start(run_id, len(prompts))
+
+    def on_llm_new_token(self, token: str, *, run_id, **kwargs) -> None:
+        trace = _current_trace.get()
+        span = trace.llm_runs.get(run_id) if trace else None
+        if span is None:
+            return
+        if "ttft_ms" not in span.attrs:
+            span.attrs["ttft_ms"] = round((time.time() - span.start) * 1000, 1)
+            span.attrs["stream_chunks"] = 0
+        span.attrs["stream_chunks"] += 1
+
+    def _finish(self, run_id, **attrs) -> None:
+        trace = _current_trace.get()
+        span = trace.llm_runs.pop(run_id, None) if trace else None
+        if span is None:
+            return
+        span.attrs.update(attrs)
+        span.end = time.time()
+
+    def on_llm_end(self, response, *, run_id, **kwargs) -> None:
+        generations = getattr(response, "generations", None) or [[]]
+        message = getattr(generations[0][0], "message", None) if generations and generations[0] else None
+        usage = getattr(message, "usage_metadata", None) or {}
+        attrs = {}
+        if usage:
+            attrs["prompt_tokens"] = usage.get("input_tokens")
+            attrs["completion_tokens"] = usage.get("output_tokens")
+        if getattr(message, "tool_calls", None):
+            attrs["tool_calls"] = [call["name"] for call in message.tool_calls]
+        self._finish(run_id, **attrs)
+
+    def on_llm_error(self, error, *, run_id, **kwargs) -> None:
+        if is_cancellation(error):
+            self._finish(run_id, cancelled=True)
+        else:
+            self._finish(run_id, error=(str(error) or repr(error))[:200])
+
+
+_llm_callbacks: Dict[str, TraceLLMCallback] = {}
+
+
+def get_llm_trace_callbacks(model_name: str) -> list:
+    if not RUNTIME_LIMITS["request_trace_enabled"]:
+        return []
+    callback = _llm_callbacks.get(model_name)
+    if callback is None:
+        callback = _llm_callbacks[model_name] = TraceLLMCallback(model_name)
+    return [callback]
+
+
+# -----------------------------------------------------------------
+# OTLP(JSON) 파일 내보내기
+# -----------------------------------------------------------------
+_OTLP_KIND = {"internal": 1, "server": 2, "client": 3, "llm": 3, "mcp": 3, "wait": 1, "node": 1}
+
+
+def _otlp_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    if isinstance(value, str):
+        return {"stringValue": value}
+    return {"stringValue": json.dumps(value, ensure_ascii=False, default=str)}
+
+
+def _otlp_attributes(attrs: Dict[str, Any]) -> List[Dict[str, Any]]:
+    return [{"key": key, "value": _otlp_value(value)} for key, value in attrs.items() if value is not None]
+
+
+def to_otlp(trace: RequestTrace) -> Dict[str, Any]:
+    """OTLP/JSON ExportTraceServiceRequest 형식 (otel-collector의 otlpjsonfile receiver 등으로 읽을 수 있음)"""
+    end = trace.end or time.time()
+    root_id = uuid.uuid4().hex[:16]
+    spans = [{
+        "traceId": trace.trace_id,
+        "spanId": root_id,
+        "name": trace.endpoint,
+        "kind": 2,
+        "startTimeUnixNano": str(int(trace.start * 1e9)),
+        "endTimeUnixNano": str(int(end * 1e9)),
+        "attributes": _otlp_attributes({"request.id": trace.request_id, "request.input": trace.user_input}),
+        "status": {"code": 2, "message": trace.error} if trace.status == "error" else {"code": 1},
+    }]
+    for span in trace.spans:
+        spans.append({
+            "traceId": trace.trace_id,
+            "spanId": span.span_id,
+            "parentSpanId": span.parent_id or root_id,
+            "name": span.name,
+            "kind": _OTLP_KIND.get(span.kind, 1),
+            "startTimeUnixNano": str(int(span.start * 1e9)),
+            "endTimeUnixNano": str(int((span.end or end) * 1e9)),
+            "attributes": _otlp_attributes(dict(span.attrs, **{"span.kind": span.kind})),
+            "status": {"code": 2, "message": str(span.attrs["error"])} if "error" in span.attrs else {"code": 0},
+        })
+    return {"resourceSpans": [{
+        "resource": {"attributes": _otlp_attributes({"service.name": "mcp-api-agent"})},
+        "scopeSpans": [{"scope": {"name": "request_trace"}, "spans": spans}],
+    }]}
+
+
+# 동시에 끝난 요청들이 스레드에서 같은 파일에 추가할 때 줄이 섞이지 않도록 직렬화
+_otlp_write_lock = threading.Lock()
+
+
+def export_otlp_json(trace: RequestTrace, path: str) -> None:
+    """요청 하나를 OTLP/JSON 한 줄로 파일 끝에 추가합니다. (블로킹 I/O, asyncio.to_thread로 호출)"""
+    try:
+        line = json.dumps(to_otlp(trace), ensure_ascii=False, default=str) + "\n"
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with _otlp_write_lock, open(path, "a", encoding="utf-8") as f:
+            f.write(line)
+    except OSError as e:
+        logger.warning(f"⚠️ [RequestTrace] OTLP 파일 내보내기 실패 ({path}): {e}")
@@ -0,0 +1,167 @@
+import asyncio
+import math
+import time
+from collections import deque
+from typing import Deque, Dict, Optional
+
+from config import RUNTIME_LIMITS, logger
+from metrics import SCHEDULER_QUEUE_WAIT, SCHEDULER_REJECTIONS, metrics_enabled
+from request_trace import record_wait
+
+# =================================================================
+# 요청 스케줄러 (SIMPLE / COMPLEX 우선순위 Lane)
+# -----------------------------------------------------------------
+# 장애 상황에 COMPLEX 진단 요청이 몰리면 LLM 백엔드와 MCP 세션을 점유해 빠른 SIMPLE 조회까지 뒤로 밀립니다.
+# 질문 문구로 추정한 경로(simple/complex, LLM 호출 없음)로 Lane을 고르고, Lane마다 동시 실행 수와 대기열 길이를 따로 제한합니다.
+#   - 동시 실행 한도 안이면 바로 실행, 넘으면 Lane 대기열(FIFO)에서 순서를 기다림
+#   - 대기열까지 가득 차면 기다리게 하지 않고 즉시 거절 → API는 429 + Retry-After로 응답
+#   - Lane별 대기 시간은 agent_scheduler_queue_wait_seconds, 거절 수는 agent_scheduler_rejections_total
+# SIMPLE Lane은 COMPLEX 폭주와 무관하게 자기 몫의 슬롯을 가지므로 p99가 평탄하게 유지됩니다.
+# =================================================================
+
+LANES = ("simple", "complex")
+
+# 처리 시간 이동 평균 가중치 (Retry-After 추정용)
+SERVICE_TIME_ALPHA = 0.2
+
+
+class LaneFullError(Exception):
+    """Lane 대기열이 가득 차서 요청을 받을 수 없음 (API에서 429로 변환)"""
+
+    def __init__(self, lane: str, retry_after: int):
+        super().__init__(f"{lane} lane 대기열이 가득 찼습니다. {retry_after}초 후 다시 시도하세요.")
+        self.lane = lane
+        self.retry_after = retry_after
+
+
+class Lane:
+    def __init__(self, name: str):
+        self.name = name
+        self.active = 0
+        self.waiters: Deque[asyncio.Future] = deque()
+        # 슬롯 점유 시간 이동 평균 (초). 첫 완료 전에는 1초로 가정
+        self.avg_service_time = 1.0
+
+    @property
+    def max_concurrency(self) -> int:
+        return max(RUNTIME_LIMITS[f"scheduler_{self.name}_max_concurrency"], 1)
+
+    @property
+    def max_queue(self) -> int:
+        return max(RUNTIME_LIMITS[f"scheduler_{self.name}_max_queue"], 0)
+
+    def retry_after(self) -> int:
+        """대기열이 한 번 빠질 때까지의 예상 시간 (초, 최소 1)"""
+        backlog = len(self.waiters) + 1
+        return max(1, math.ceil(self.avg_service_time * backlog / self.max_concurrency))
+
+    def observe_service_time(self, seconds: float) -> None:
+        self.avg_service_time += SERVICE_TIME_ALPHA * (seconds - self.avg_service_time)
+
+    def release_slot(self) -> None:
+        # 슬롯을 줄이지 않고 다음 대기자에게 그대로 넘김 (중간에 새 요청이 끼어들지 않도록)
+        while self.waiters:
+            waiter = self.waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.active -= 1
+
+    def to_dict(self) -> Dict[str, object]:
+        return {
+            "active": self.active,
+            "queued": len(self.waiters),
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+            "avg_service_s": round(self.avg_service_time, 2),
+        }
+
+
+class LaneTicket:
+    """reserve()로 받은 Lane 자리. wait()로 실행 슬롯을 기다리고, release()로 반납합니다. (release는 여러 번 불러도 안전)"""
+
+    def __init__(self, lane: Lane, waiter: Optional[asyncio.Future]):
+        self.lane = lane
+        self._waiter = waiter
+        self.enqueued_at = time.time()
+        self.granted_at: Optional[float] = None if waiter is not None else self.enqueued_at
+        self.released = False
+
+    async def wait(self) -> None:
+        if self._waiter is not None and self.granted_at is None:
+            try:
+                await self._waiter
+            except asyncio.CancelledError:
+                self.release()
+                raise
+            self.granted_at = time.time()
+        wait_seconds = self.granted_at - self.enqueued_at
+        if metrics_enabled():
+            SCHEDULER_QUEUE_WAIT.observe(self.lane.name, value=wait_seconds)
+        if self._waiter is not None:
+            record_wait(f"lane:{self.lane.name}", self.enqueued_at)
+
+    def release(self) -> None:
+        if self.released:
+            return
+        self.released = True
+        waiter = self._waiter
+        if self.granted_at is None and waiter is not None and not waiter.done():
+            # 슬롯을 받기 전에 취소됨 → 대기열에서만 빠짐
+            waiter.cancel()
+            try:
+                self.lane.waiters.remove(waiter)
+            except ValueError:
+                pass
+            return
+        if self.granted_at is not None:
+            self.lane.observe_service_time(time.time() - self.granted_at)
+        self.lane.release_slot()
+
+    async def __aenter__(self):
+        await self.wait()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.release()
+
+
+class RequestScheduler:
+    def __init__(self):
+        self.lanes = {name: Lane(name) for name in LANES}
+
+    def lane_for(self, route: Optional[str]) -> Lane:
+        return self.lanes.get(route or "complex", self.lanes["complex"])
+
+    def reserve(self, route: Optional[str]) -> LaneTicket:
+        """Lane에 자리를 잡습니다. 대기열이 가득 차면 LaneFullError (기다리지 않고 즉시 거절)"""
+        lane = self.lane_for(route)
+        if lane.active < lane.max_concurrency and not lane.waiters:
+            lane.active += 1
+            return LaneTicket(lane, None)
+        if len(lane.waiters) >= lane.max_queue:
+            retry_after = lane.retry_after()
+            if metrics_enabled():
+                SCHEDULER_REJECTIONS.inc(lane.name)
+            logger.warning(
+                f"🚦 [Scheduler] {lane.name} lane 포화 (실행 {lane.active}, 대기 {len(lane.waiters)}) "
+                f"→ 429 (Retry-After {retry_after}s)"
+            )
+            raise LaneFullError(lane.name, retry_after)
+        waiter = asyncio.get_running_loop().create_future()
+        lane.waiters.append(waiter)
+        logger.debug(f"🚦 [Scheduler] {lane.name} lane 대기열 진입 ({len(lane.waiters)}번째)")
+        return LaneTicket(lane, waiter)
+
+    def to_dict(self) -> Dict[str, object]:
+        return {
+            "enabled": scheduler_enabled(),
+            "lanes": {name: lane.to_dict() for name, lane in self.lanes.items()},
+        }
+
+
+request_scheduler = RequestScheduler()
+
+
+def scheduler_enabled() -> bool:
+    return RUNTIME_LIMITS["scheduler_enabled"]
@@ -0,0 +1,484 @@
+import asyncio
+import gzip
+import hashlib
+import json
+import os
+import random
+import time
+from collections import defaultdict, deque
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_core.tools import StructuredTool
+from pydantic import create_model
+
+from config import RUNTIME_LIMITS, logger
+
+# =================================================================
+# 에이전트 세션 녹화 / 재생 (성능 회귀 테스트용)
+# -----------------------------------------------------------------
+# 녹화: 요청 하나의 모든 LLM 요청/응답(첫 토큰 시간, 소요 시간, usage)과 MCP call_tool 인자/원본 결과(절단 전)를
+#       요청 단위 gzip JSON Lines 파일로 남깁니다.
+# 재생: create_agent_app에 녹화된 도구 목록을 대체 도구로 넘기고, 모델 생성 함수가 녹화 응답을 돌려주는
+#       ReplayChatModel을 쓰도록 바꿔 실제 백엔드 없이 같은 트래픽 모양을 재현합니다.
+#       도구 결과는 절단 전 원본을 다시 mcp_client의 절단 로직에 통과시키므로 절단/프롬프트/동시성 변경의 효과가 그대로 드러납니다.
+# 응답 매칭 순서: (1) 요청 메시지 지문 일치 → (2) 같은 노드(stage)+모델의 녹화 순서 → (3) 같은 모델의 녹화 순서
+# =================================================================
+
+RECORDING_VERSION = 1
+
+# 현재 실행 중인 그래프 노드 이름 (timed_node/timed_worker가 설정, 재생 시 응답 매칭에 사용)
+_current_stage: ContextVar[str] = ContextVar("session_stage", default="")
+_current_recorder: ContextVar[Optional["SessionRecorder"]] = ContextVar("session_recorder", default=None)
+_current_replay: ContextVar[Optional["ReplayState"]] = ContextVar("session_replay", default=None)
+
+
+@contextmanager
+def stage_scope(stage: str):
+    token = _current_stage.set(stage)
+    try:
+        yield
+    finally:
+        _current_stage.reset(token)
+
+
+def _serialize_message(message: BaseMessage) -> Dict[str, Any]:
+    data = {"role": message.type, "content": message.content}
+    tool_calls = getattr(message, "tool_calls", None)
+    if tool_calls:
+        data["tool_calls"] = [{"name": c["name"], "args": c["args"], "id": c.get("id")} for c in tool_calls]
+    tool_call_id = getattr(message, "tool_call_id", None)
+    if tool_call_id:
+        data["tool_call_id"] = tool_call_id
+    return data
+
+
+def _fingerprint(model: str, messages: List[Dict[str, Any]]) -> str:
+    # tool_call id는 실행마다 달라지므로 지문에서 제외
+    normalized = [
+        {"role": m["role"], "content": m["content"],
+         "tool_calls": [(c["name"], c["args"]) for c in m.get("tool_calls", [])]}
+        for m in messages
+    ]
+    raw = json.dumps([model, normalized], ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()[:16]
+
+
+def _args_key(tool: str, arguments: dict) -> str:
+    return tool + ":" + json.dumps(arguments, ensure_ascii=False, sort_keys=True, default=str)
+
+
+# -----------------------------------------------------------------
+# 녹화
+# -----------------------------------------------------------------
+class SessionRecorder:
+    def __init__(self, request_id: str, endpoint: str, user_input: str, inputs: Dict[str, Any], tools: list):
+        self.request_id = request_id
+        self.started = time.time()
+        self._seq = 0
+        self.header = {
+            "type": "session",
+            "version": RECORDING_VERSION,
+            "request_id": request_id,
+            "endpoint": endpoint,
+            "input": user_input,
+            "thinking_budget": inputs.get("thinking_budget"),
+            "started_at": self.started,
+            "tools": [_describe_tool(tool) for tool in tools],
+        }
+        self.events: List[Dict[str, Any]] = []
+
+    def _next_seq(self) -> int:
+        self._seq += 1
+        return self._seq
+
+    def offset(self) -> float:
+        return round(time.time() - self.started, 4)
+
+    def add_llm(self, event: Dict[str, Any]) -> None:
+        event.update({"type": "llm", "seq": self._next_seq()})
+        self.events.append(event)
+
+    def add_tool(self, server: str, tool: str, arguments: dict, raw: str, duration: float, started: float) -> None:
+        self.events.append({
+            "type": "tool", "seq": self._next_seq(), "stage": _current_stage.get(),
+            "server": server, "tool": tool, "args": arguments, "raw": raw,
+            "t_start": round(started - self.started, 4), "duration": round(duration, 4),
+        })
+
+    def write(self, directory: str, status: str) -> str:
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"{time.strftime('%Y%m%d-%H%M%S', time.localtime(self.started))}-{self.request_id}.jsonl.gz")
+        with gzip.open(path, "wt", encoding="utf-8") as f:
+            f.write(json.dumps(self.header, ensure_ascii=False, default=str) + "\n")
+            for event in self.events:
+                f.write(json.dumps(event, ensure_ascii=False, default=str) + "\n")
+            f.write(json.dumps({"type": "end", "status": status, "duration": self.offset()}) + "\n")
+        return path
+
+
+def _describe_tool(tool) -> Dict[str, Any]:
+    schema = {}
+    args_schema = getattr(tool, "args_schema", None)
+    if args_schema is not None:
+        try:
+            schema = args_schema.model_json_schema()
+        except AttributeError:
+            schema = args_schema.schema()
+    return {"name": tool.name, "description": tool.description, "schema": schema}
+
+
+@asynccontextmanager
+async def session_recording_scope(request_id: str, endpoint: str, user_input: str, inputs: Dict[str, Any],
+                                  get_tools: Callable[[], list]):
+    """session_record_dir가 설정되어 있으면 (표본 비율에 따라) 이 요청을 녹화합니다.
+    도구 목록은 녹화할 요청에서만 get_tools로 모으고, gzip 저장은 이벤트 루프를 막지 않도록 스레드에서 합니다.
+    """
+    directory = RUNTIME_LIMITS.get("session_record_dir")
+    if not directory or random.random() >= RUNTIME_LIMITS["session_record_sample_rate"]:
+        yield None
+        return
+    recorder = SessionRecorder(request_id, endpoint, user_input, inputs, get_tools())
+    token = _current_recorder.set(recorder)
+    status = "ok"
+    try:
+        yield recorder
+    except BaseException:
+        status = "error"
+        raise
+    finally:
+        _current_recorder.reset(token)
+        try:
+            path = await asyncio.to_thread(recorder.write, directory, status)
+            logger.info(f"📼 [SessionRecorder] 세션 녹화 저장: {path} (이벤트 {len(recorder.events)}건)")
+        except OSError as e:
+            logger.warning(f"⚠️ [SessionRecorder] 녹화 저장 실패: {e}")
+
+
+def record_tool_call(server: str, tool: str, arguments: dict, raw: str, started: float) -> None:
+    """mcp_client가 절단 전 원본 결과를 넘겨 녹화합니다. (녹화 중이 아니면 무시)"""
+    recorder = _current_recorder.get()
+    if recorder is not None:
+        recorder.add_tool(server, tool, arguments, raw, time.time() - started, started)
+
+
+class RecordingCallback(BaseCallbackHandler):
+    """LLM 요청 메시지/응답/타이밍 녹화 콜백 (모델 생성 시 녹화 중일 때만 붙음)"""
+
+    run_inline = True
+
+    def __init__(self, recorder: SessionRecorder, model_name: str):
+        self.recorder = recorder
+        self.model_name = model_name
+        self._runs: Dict[Any, Dict[str, Any]] = {}
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs) -> None:
+        request = [_serialize_message(m) for m in (messages[0] if messages else [])]
+        self._runs[run_id] = {
+            "stage": _current_stage.get(),
+            "model": self.model_name,
+            "request": request,
+            "fingerprint": _fingerprint(self.model_name, request),
+            "t_start": self.recorder.offset(),
+            "_start": time.time(),
+        }
+
+    def on_llm_new_token(self, token: str, *, run_id, **kwargs) -> None:
+        run = self._runs.get(run_id)
+        if run is not None and "ttft" not in run:
+            run["ttft"] = round(time.time() - run["_start"], 4)
+
+    def on_llm_end(self, response, *, run_id, **kwargs) -> None:
+        run = self._runs.pop(run_id, None)
+        if run is None:
+            return
+        generations = getattr(response, "generations", None) or [[]]
+        message = getattr(generations[0][0], "message", None) if generations and generations[0] else None
+        start = run.pop("_start")
+        run["duration"] = round(time.time() - start, 4)
+        run["streamed"] = "ttft" in run
+        run.setdefault("ttft", run["duration"])
+        run["response"] = {
+            "content": getattr(message, "content", ""),
+            "tool_calls": [{"name": c["name"], "args": c["args"]} for c in getattr(message, "tool_calls", None) or []],
+            "usage": dict(getattr(message, "usage_metadata", None) or {}),
+        }
+        self.recorder.add_llm(run)
+
+    def on_llm_error(self, error, *, run_id, **kwargs) -> None:
+        run = self._runs.pop(run_id, None)
+        if run is None:
+            return
+        run["duration"] = round(time.time() - run.pop("_start"), 4)
+        run["error"] = (str(error) or repr(error))[:500]
+        run["response"] = {"content": "", "tool_calls": [], "usage": {}}
+        self.recorder.add_llm(run)
+
+
+def get_recording_callbacks(model_name: str) -> list:
+    recorder = _current_recorder.get()
+    if recorder is None:
+        return []
+    return [RecordingCallback(recorder, model_name)]
+
+
+# -----------------------------------------------------------------
+# 재생
+# -----------------------------------------------------------------
+def load_recording(path: str) -> Dict[str, Any]:
+    opener = gzip.open if path.endswith(".gz") else open
+    header, events, end = None, [], None
+    with opener(path, "rt", encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            if record["type"] == "session":
+                header = record
+            elif record["type"] == "end":
+                end = record
+            else:
+                events.append(record)
+    if header is None:
+        raise ValueError(f"세션 헤더가 없는 녹화 파일: {path}")
+    return {"header": header, "events": events, "end": end or {}}
+
+
+class ReplayState:
+    """녹화 응답 저장소 + 재생 중 사용량 집계"""
+
+    def __init__(self, recording: Dict[str, Any], timing: str = "fast"):
+        if timing not in ("fast", "recorded"):
+            raise ValueError("timing은 fast 또는 recorded")
+        self.timing = timing
+        self.recording = recording
+        self._by_fingerprint: Dict[str, deque] = defaultdict(deque)
+        self._by_stage: Dict[tuple, deque] = defaultdict(deque)
+        self._by_model: Dict[str, deque] = defaultdict(deque)
+        self._tools_by_args: Dict[str, deque] = defaultdict(deque)
+        self._tools_by_name: Dict[str, deque] = defaultdict(deque)
+        self._used: set = set()
+        for event in recording["events"]:
+            if event["type"] == "llm":
+                self._by_fingerprint[event["fingerprint"]].append(event)
+                self._by_stage[(event["stage"], event["model"])].append(event)
+                self._by_model[event["model"]].append(event)
+            elif event["type"] == "tool":
+                name = f"{event['server']}_{event['tool']}"
+                self._tools_by_args[_args_key(name, event["args"])].append(event)
+                self._tools_by_name[name].append(event)
+        self.stats = {
+            "llm_calls": 0, "llm_exact": 0, "llm_stage": 0, "llm_model": 0, "llm_miss": 0,
+            "tool_calls": 0, "tool_exact": 0, "tool_name": 0, "tool_miss": 0,
+            "prompt_tokens_est": 0, "completion_tokens": 0,
+        }
+
+    def _pop_unused(self, queue: deque) -> Optional[Dict[str, Any]]:
+        while queue:
+            event = queue.popleft()
+            if id(event) not in self._used:
+                self._used.add(id(event))
+                return event
+        return None
+
+    def take_llm(self, model: str, messages: List[BaseMessage]) -> Optional[Dict[str, Any]]:
+        from agent_graph import estimate_token_count
+
+        request = [_serialize_message(m) for m in messages]
+        self.stats["llm_calls"] += 1
+        self.stats["prompt_tokens_est"] += sum(
+            estimate_token_count(str(m["content"]), model) for m in request
+        )
+        candidates = (
+            ("llm_exact", self._by_fingerprint.get(_fingerprint(model, request))),
+            ("llm_stage", self._by_stage.get((_current_stage.get(), model))),
+            ("llm_model", self._by_model.get(model)),
+        )
+        for kind, queue in candidates:
+            event = self._pop_unused(queue) if queue else None
+            if event is not None:
+                self.stats[kind] += 1
+                usage = event["response"].get("usage") or {}
+                self.stats["completion_tokens"] += usage.get("output_tokens") or estimate_token_count(
+                    str(event["response"]["content"]), model)
+                return event
+        self.stats["llm_miss"] += 1
+        logger.warning(f"📼 [Replay] 녹화 응답 없음: model={model}, stage={_current_stage.get()}")
+        return None
+
+    def take_tool(self, name: str, arguments: dict) -> Optional[Dict[str, Any]]:
+        self.stats["tool_calls"] += 1
+        for kind, queue in (("tool_exact", self._tools_by_args.get(_args_key(name, arguments))),
+                            ("tool_name", self._tools_by_name.get(name))):
+            event = self._pop_unused(queue) if queue else None
+            if event is not None:
+                self.stats[kind] += 1
+                return event
+        self.stats["tool_miss"] += 1
+        return None
+
+    async def wait(self, seconds: float) -> None:
+        if self.timing == "recorded" and seconds > 0:
+            await asyncio.sleep(seconds)
+
+
+def get_replay_state() -> Optional[ReplayState]:
+    return _current_replay.get()
+
+
+class ReplayChatModel(BaseChatModel):
+    """녹화된 응답을 돌려주는 채팅 모델 (get_instruct_model/get_thinking_model이 재생 중에 대신 생성)"""
+
+    model_name: str
+    streaming: bool = False
+
+    @property
+    def _llm_type(self) -> str:
+        return "session-replay"
+
+    def bind_tools(self, tools, **kwargs):
+        # 도구 호출 여부는 녹화 응답이 결정하므로 스키마 바인딩은 생략
+        return self
+
+    def _should_stream(self, *, async_api: bool, **kwargs) -> bool:
+        # 동기 호출은 _stream 없이 _generate로 한 번에 돌려줌
+        return self.streaming and async_api
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        # 녹화 응답 매칭은 비동기와 같고, 동기 호출에서는 녹화 지연(timing=recorded)만 재현하지 않습니다.
+        state = get_replay_state()
+        event = state.take_llm(self.model_name, messages) if state else None
+        return ChatResult(generations=[ChatGeneration(message=self._build_message(event))])
+
+    def _build_message(self, event: Optional[Dict[str, Any]]) -> AIMessage:
+        if event is None:
+            return AIMessage(content="")
+        response = event["response"]
+        tool_calls = [
+            {"name": c["name"], "args": c["args"], "id": f"replay_{event['seq']}_{i}"}
+            for i, c in enumerate(response.get("tool_calls", []))
+        ]
+        usage = response.get("usage") or None
+        return AIMessage(content=response.get("content", ""), tool_calls=tool_calls,
+                         usage_metadata=usage if usage and "input_tokens" in usage else None)
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        state = get_replay_state()
+        event = state.take_llm(self.model_name, messages) if state else None
+        if state and event:
+            await state.wait(event.get("duration", 0))
+        return ChatResult(generations=[ChatGeneration(message=self._build_message(event))])
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs) -> AsyncIterator[ChatGenerationChunk]:
+        state = get_replay_state()
+        event = state.take_llm(self.model_name, messages) if state else None
+        message = self._build_message(event)
+        if state and event:
+            await state.wait(event.get("ttft", 0))
+        if message.tool_calls:
+            chunk = AIMessageChunk(content="", tool_call_chunks=[
+                {"name": c["name"], "args": json.dumps(c["args"], ensure_ascii=False), "id": c["id"], "index": i}
+                for i, c in enumerate(message.tool_calls)
+            ])
+            yield ChatGenerationChunk(message=chunk)
+        pieces = _split_tokens(str(message.content))
+        per_token = 0.0
+        if state and event and pieces:
+            per_token = max(event.get("duration", 0) - event.get("ttft", 0), 0) / len(pieces)
+        for piece in pieces:
+            if per_token:
+                await state.wait(per_token)
+            # (on_llm_new_token 콜백은 BaseChatModel이 청크마다 호출)
+            yield ChatGenerationChunk(message=AIMessageChunk(content=piece))
+        if message.usage_metadata:
+            yield ChatGenerationChunk(message=AIMessageChunk(content="", usage_metadata=message.usage_metadata))
+
+
+def _split_tokens(text: str, size: int = 4) -> List[str]:
+    # 녹화에는 토큰 경계가 없으므로 몇 글자 단위로 나눠 스트리밍
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+
+_SCHEMA_TYPES = {"string": str, "integer": int, "number": float, "boolean": bool}
+
+
+def build_replay_tools(recording: Dict[str, Any]) -> list:
+    """녹화된 도구 목록과 같은 이름/스키마의 대체 도구. 원본 결과를 mcp_client의 절단 로직에 다시 통과시킵니다."""
+    from mcp_client import finalize_tool_output
+
+    tools = []
+    for spec in recording["header"]["tools"]:
+        name = spec["name"]
+        if "_" not in name:
+            continue
+        properties = (spec.get("schema") or {}).get("properties", {})
+        required = set((spec.get("schema") or {}).get("required", []))
+        fields = {
+            prop: ((_SCHEMA_TYPES.get(prop_schema.get("type"), Any)), ... if prop in required else None)
+            for prop, prop_schema in properties.items()
+        }
+        InputModel = create_model(f"{name}_replay_input", **fields)
+
+        async def _run(tool_name=name, **kwargs):
+            state = get_replay_state()
+            clean_args = {k: v for k, v in kwargs.items() if v is not None}
+            event = state.take_tool(tool_name, clean_args) if state else None
+            if event is None:
+                return f"Error executing {tool_name}: 녹화된 결과 없음 (replay)"
+            await state.wait(event.get("duration", 0))
+            return finalize_tool_output(event["server"], event["tool"], event["raw"])
+
+        tools.append(StructuredTool.from_function(
+            func=None, coroutine=_run, name=name, description=spec.get("description", ""), args_schema=InputModel,
+        ))
+    return tools
+
+
+async def replay_session(recording: Dict[str, Any], timing: str = "fast") -> Dict[str, Any]:
+    """녹화 세션을 현재 코드(create_agent_app)로 다시 실행하고 소요 시간/토큰 사용량 리포트를 돌려줍니다."""
+    from langchain_core.messages import HumanMessage
+
+    from agent_graph import create_agent_app
+    from stream_channel import stream_queue_scope
+    from tool_output_store import tool_output_scope
+
+    header = recording["header"]
+    state = ReplayState(recording, timing=timing)
+    app = create_agent_app(build_replay_tools(recording))
+    inputs = {"messages": [HumanMessage(content=header["input"])], "thinking_budget": header.get("thinking_budget")}
+
+    token = _current_replay.set(state)
+    start = time.perf_counter()
+    try:
+        # 스트리밍 소비자가 없으므로 진행 이벤트는 버리는 큐로 받음
+        with tool_output_scope(header["request_id"]), stream_queue_scope():
+            result = await app.ainvoke(inputs)
+    finally:
+        _current_replay.reset(token)
+    wall = time.perf_counter() - start
+
+    recorded_llm = [e for e in recording["events"] if e["type"] == "llm"]
+    from agent_graph import estimate_token_count
+    recorded_prompt_tokens = sum(
+        estimate_token_count(str(m["content"]), e["model"]) for e in recorded_llm for m in e["request"]
+    )
+    final = result["messages"][-1].content if result.get("messages") else ""
+    return {
+        "request_id": header["request_id"],
+        "input": header["input"],
+        "timing": timing,
+        "wall_s": round(wall, 4),
+        "final_answer_chars": len(str(final)),
+        **state.stats,
+        "recorded": {
+            "wall_s": recording["end"].get("duration"),
+            "llm_calls": len(recorded_llm),
+            "tool_calls": sum(1 for e in recording["events"] if e["type"] == "tool"),
+            "prompt_tokens_est": recorded_prompt_tokens,
+        },
+    }
@@ -0,0 +1,92 @@
+import asyncio
+import json
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+
+from config import RUNTIME_LIMITS, logger
+from metrics import SHARED_TOOL_CACHE_LOOKUPS, metrics_enabled
+
+# =================================================================
+# 배치 범위 공유 도구 결과 캐시 (/api/batch)
+# -----------------------------------------------------------------
+# 자동화가 네임스페이스별 질문 N개를 한 번에 보내면 질문마다 같은 클러스터 전체 조회(Warning 이벤트, Top 10 등)를
+# MCP로 다시 호출합니다. 배치 하나 동안만 (서버, 도구, 인자)를 키로 원본 결과를 공유합니다.
+#   - hit    : 이미 받아 둔 결과를 재사용
+#   - joined : 같은 호출이 진행 중이면 새로 보내지 않고 그 결과를 함께 기다림 (in-flight dedupe)
+#   - miss   : 처음 호출 → 결과를 배치 캐시에 보관 (오류 결과는 보관하지 않고 다음 호출이 다시 시도)
+# 보관하는 것은 절단/후처리 전 원본이며, 출력 한도/spill(ref)은 질문별로 따로 적용됩니다.
+# 배치가 끝나면 캐시와 아직 진행 중인 공유 호출을 함께 정리합니다.
+# =================================================================
+
+ToolKey = Tuple[str, str, str]
+
+
+def make_tool_key(server: str, tool: str, arguments: dict) -> ToolKey:
+    return server, tool, json.dumps(arguments, sort_keys=True, ensure_ascii=False, default=str)
+
+
+def is_error_output(output: str) -> bool:
+    return output.startswith("Error executing") or output.startswith("❌")
+
+
+class SharedToolCache:
+    def __init__(self, name: str = ""):
+        self.name = name
+        # 배치 시작 시각 (공유 결과로 만든 답변의 데이터 나이 기준)
+        self.started_at = time.time()
+        self._entries: Dict[ToolKey, asyncio.Task] = {}
+        self.stats = {"hit": 0, "joined": 0, "miss": 0}
+
+    def _count(self, result: str) -> None:
+        self.stats[result] += 1
+        if metrics_enabled():
+            SHARED_TOOL_CACHE_LOOKUPS.inc(result)
+
+    async def fetch(self, key: ToolKey, call: Callable[[], Awaitable[str]]) -> Tuple[str, str]:
+        """(결과, hit/joined/miss)를 돌려줍니다. 공유 호출은 별도 Task라 한 질문이 취소돼도 다른 질문은 계속 기다립니다."""
+        task = self._entries.get(key)
+        if task is None:
+            result = "miss"
+            task = asyncio.create_task(call())
+            task.add_done_callback(lambda t, key=key: self._forget_failed(key, t))
+            self._entries[key] = task
+        else:
+            result = "hit" if task.done() else "joined"
+        self._count(result)
+        return await asyncio.shield(task), result
+
+    def _forget_failed(self, key: ToolKey, task: asyncio.Task) -> None:
+        if task.cancelled() or task.exception() is not None or is_error_output(task.result()):
+            if self._entries.get(key) is task:
+                del self._entries[key]
+
+    def close(self) -> None:
+        pending = [task for task in self._entries.values() if not task.done()]
+        for task in pending:
+            task.cancel()
+        self._entries.clear()
+        logger.debug(f"🔁 [SharedToolCache] {self.name} 정리 (hit {self.stats['hit']}, "
+                     f"joined {self.stats['joined']}, miss {self.stats['miss']}, 진행 중 취소 {len(pending)})")
+
+
+# 현재 배치의 공유 캐시 (질문을 처리하는 Task 범위에서 설정)
+_current_cache: ContextVar[Optional[SharedToolCache]] = ContextVar("shared_tool_cache", default=None)
+
+
+def get_shared_tool_cache() -> Optional[SharedToolCache]:
+    return _current_cache.get()
+
+
+@contextmanager
+def shared_tool_cache_scope(cache: Optional[SharedToolCache]):
+    """질문 하나를 처리하는 동안 배치 공유 캐시를 사용합니다. (None이거나 꺼져 있으면 캐시 없이 실행)"""
+    if cache is None or not RUNTIME_LIMITS["batch_tool_cache_enabled"]:
+        yield None
+        return
+    token = _current_cache.set(cache)
+    try:
+        yield cache
+    finally:
+        _current_cache.reset(token)
@@ -0,0 +1,114 @@
+import json
+import time
+import uuid
+from functools import lru_cache
+from json.encoder import encode_basestring
+from typing import List, Optional
+
+try:
+    import orjson
+except ImportError:  # orjson이 없으면 표준 json의 C 문자열 이스케이프로 동작
+    orjson = None
+
+# =================================================================
+# 스트리밍 Chunk 인코딩 (/api/stream_chat, /v1/chat/completions)
+# -----------------------------------------------------------------
+# 토큰 묶음을 Flush할 때마다 dict를 새로 만들고 json.dumps로 전체(id/object/model/choices)를 다시 직렬화하던 부분입니다.
+#   - 스트림마다 변하지 않는 envelope는 앞/뒤 bytes로 한 번만 만들어 두고, 바뀌는 delta 문자열만 이스케이프
+#   - 문자열 이스케이프는 orjson(langsmith 의존성으로 보통 함께 설치됨), 없으면 json.encoder.encode_basestring(C 구현)
+#   - 노드 상태(8:) Chunk는 (nodeId, status) 조합이 몇 개 안 되므로 완성된 bytes를 캐시
+# 모든 함수는 bytes를 반환하며 StreamingResponse에 그대로 넘깁니다. (str → bytes 재인코딩 없음)
+# =================================================================
+
+STREAM_NODE_IDS = [
+    "start",
+    "router",
+    "simple_agent",
+    "orchestrator",
+    "worker_k8s",
+    "worker_metric",
+    "worker_log",
+    "synthesizer",
+    "agent",
+    "end",
+]
+
+# Vercel AI SDK Data Stream 종료 / OpenAI SSE 종료
+FINISH_STOP_CHUNK = b'd:{"finishReason":"stop"}\n'
+OPENAI_DONE_CHUNK = b"data: [DONE]\n\n"
+
+
+def _encode_json_string_fallback(text: str) -> bytes:
+    try:
+        return encode_basestring(text).encode("utf-8")
+    except UnicodeEncodeError:
+        # 짝이 맞지 않는 surrogate 등은 \uXXXX로 이스케이프
+        return json.dumps(text).encode("ascii")
+
+
+def encode_json_string(text: str) -> bytes:
+    """문자열 하나를 JSON 문자열 리터럴(따옴표 포함, 비 ASCII는 그대로 UTF-8) bytes로 변환"""
+    if orjson is not None:
+        try:
+            return orjson.dumps(text)
+        except orjson.JSONEncodeError:
+            pass
+    return _encode_json_string_fallback(text)
+
+
+def _dumps_compact(obj) -> str:
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":"))
+
+
+# Vercel AI SDK 호환 Data Stream Chunk 생성 함수 (/api/stream_chat)
+def make_text_chunk(text: str) -> bytes:
+    return b"0:" + encode_json_string(text) + b"\n"
+
+
+@lru_cache(maxsize=256)
+def _status_chunk(node_id: str, status: str, node_type: str) -> bytes:
+    data_obj = {
+        "type": "data-node-execution-status",
+        "data": {"nodeId": node_id, "nodeType": node_type, "status": status},
+    }
+    return f"8:[{_dumps_compact(data_obj)}]\n".encode("utf-8")
+
+
+def make_data_status(node_id: str, status: str, node_type: str = "agent", error: str = None) -> bytes:
+    if not error:
+        return _status_chunk(node_id, status, node_type)
+    data_obj = {
+        "type": "data-node-execution-status",
+        "data": {"nodeId": node_id, "nodeType": node_type, "status": status, "error": error},
+    }
+    return f"8:[{_dumps_compact(data_obj)}]\n".encode("utf-8")
+
+
+def make_all_idle_chunks() -> List[bytes]:
+    return [make_data_status(node_id, "idle") for node_id in STREAM_NODE_IDS if node_id != "start"]
+
+
+# OpenAI 호환 SSE Chunk 생성 (/v1/chat/completions)
+def new_completion_id(request_id: Optional[str] = None) -> str:
+    """chat.completion id (요청 ID가 있으면 그대로 사용해 로그/트레이스와 맞춤)"""
+    return f"chatcmpl-{request_id or uuid.uuid4().hex[:24]}"
+
+
+class OpenAIStreamEncoder:
+    """스트림(요청) 하나의 chat.completion.chunk 인코더. id/created/model envelope는 생성 시 한 번만 직렬화합니다."""
+
+    def __init__(self, model_name: str, completion_id: Optional[str] = None):
+        self.completion_id = completion_id or new_completion_id()
+        self.created = int(time.time())
+        envelope = _dumps_compact({
+            "id": self.completion_id,
+            "object": "chat.completion.chunk",
+            "created": self.created,
+            "model": model_name,
+        })[:-1]
+        self._prefix = f'data: {envelope},"choices":[{{"index":0,"delta":{{"content":'.encode("utf-8")
+        self._suffix = b'},"finish_reason":null}]}\n\n'
+        self.stop_chunk = f'data: {envelope},"choices":[{{"index":0,"delta":{{}},"finish_reason":"stop"}}]}}\n\n'.encode("utf-8")
+
+    def chunk(self, text: str) -> bytes:
+        return self._prefix + encode_json_string(text) + self._suffix
@@ -0,0 +1,47 @@
+import asyncio
+import weakref
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+
+# =================================================================
+# 요청별 진행 이벤트 큐
+# -----------------------------------------------------------------
+# Worker/콜백이 넣는 진행 이벤트(TOKEN:/EVENT:/STATUS:/FINAL:)는 원래 config.stream_queue 하나를 모든 요청이 같이 썼습니다.
+# 동시에 여러 스트림이 돌면 이벤트가 섞이고, 한 스트림이 다른 스트림의 EOF를 가져가 먼저 끊기기도 합니다.
+# (WebSocket 하나로 여러 질문을 동시에 흘리려면 요청마다 큐가 따로 있어야 합니다)
+# 요청을 처리하는 Task에서 stream_queue_scope()로 큐를 열면, 같은 Context에서 도는 노드/Worker/LLM 콜백은
+# get_stream_queue()로 그 요청의 큐에 넣습니다. scope 밖(CLI, 세션 재생)에서는 기존 config.stream_queue를 사용합니다.
+# =================================================================
+
+_current_queue: ContextVar[Optional[asyncio.Queue]] = ContextVar("stream_queue", default=None)
+
+# /metrics의 큐 적재량 게이지용 (열려 있는 요청별 큐)
+_active_queues: "weakref.WeakSet[asyncio.Queue]" = weakref.WeakSet()
+
+
+def get_stream_queue() -> asyncio.Queue:
+    queue = _current_queue.get()
+    if queue is None:
+        from config import stream_queue
+        return stream_queue
+    return queue
+
+
+@contextmanager
+def stream_queue_scope(queue: Optional[asyncio.Queue] = None):
+    """요청 하나의 진행 이벤트를 받을 큐를 현재 Context에 설정합니다. (생략하면 새 큐)"""
+    queue = queue if queue is not None else asyncio.Queue()
+    token = _current_queue.set(queue)
+    _active_queues.add(queue)
+    try:
+        yield queue
+    finally:
+        _current_queue.reset(token)
+        _active_queues.discard(queue)
+
+
+def pending_stream_events() -> int:
+    """아직 소비되지 않은 진행 이벤트 수 (공용 큐 + 요청별 큐)"""
+    from config import stream_queue
+    return stream_queue.qsize() + sum(queue.qsize() for queue in list(_active_queues))
@@ -0,0 +1,160 @@
+import re
+from typing import Dict, List, Optional
+
+from config import RUNTIME_LIMITS, logger
+
+# =================================================================
+# Synthesizer 모델 등급(Tier) 선택 정책
+# -----------------------------------------------------------------
+# Thinking 모델(NPU) 용량이 가장 부족한 자원이므로, Worker 보고서에 에러 징후가 없고
+# 결과가 작거나 단순 목록 요청이면 Thinking 모델 대신 Instruct 모델이나 고정 템플릿으로 답변합니다.
+#   - template : LLM 호출 없이 Worker 보고서를 정리해 바로 반환
+#   - instruct : 빠른 Instruct 모델로 종합 (추론 과정 없음)
+#   - thinking : 기존 Thinking 모델 종합 (에러/장애 진단)
+# =================================================================
+
+TIER_TEMPLATE = "template"
+TIER_INSTRUCT = "instruct"
+TIER_THINKING = "thinking"
+
+# 장애/에러 징후로 보는 표현
+_MARKER_PATTERN = (
+    r"(?:error|fail|crashloop|backoff|oomkill|evict|pending|unauthorized|forbidden|refused|timeout|timed out|"
+    r"panic|exception|denied|unhealthy|notready|warning|⚠️|에러|오류|실패|경고|이상치|장애|재시작)"
+)
+_ERROR_MARKERS = re.compile(_MARKER_PATTERN, re.IGNORECASE)
+# 부정 표현은 징후 표현에 직접 붙어 있을 때만 인정합니다. (주변 아무 곳의 "no"/"0"은 무시)
+#   - 앞: "no errors", "0 warnings", "without failures"
+#   - 뒤: "에러 없음", "에러나 경고 징후는 발견되지 않았습니다", "Warning 이벤트 0건", "errors: none"
+# 소수("0.5%")는 0건으로 보지 않습니다.
+_NEGATION_BEFORE = re.compile(
+    r"(?:\bno|\bzero|\bwithout|(?<![\d.,])\b0)\s+(?:(?:new|recent|active|other|more)\s+)?$",
+    re.IGNORECASE,
+)
+_NEGATION_AFTER = re.compile(
+    r"\w*"
+    r"(?:[\s/]*(?:(?:및|또는|or|and)\s+)?(?:" + _MARKER_PATTERN +
+    r"|로그|이벤트|징후|내역|메시지|파드|노드|컨테이너|logs?|events?|messages?|pods?|nodes?|containers?|count)\w*){0,3}"
+    r"[\s:=]*"
+    r"(?:없|않|(?:발견|확인|관찰)되지\s*않|none\b|0(?!\d|[.,]\d)\s*(?:건|개|회|times\b)?)",
+    re.IGNORECASE,
+)
+# 시스템이 붙인 절단 안내문은 징후에서 제외
+_SYSTEM_NOTICES = ("절단됨", "Output truncated", "데이터 길어짐", "이하 생략")
+
+_WORKER_HEADER = re.compile(r"^\[(\w+)\] 집중 분석 결과:\s*(\(도구 호출 없이 답변\))?\s*")
+
+_WORKER_TITLES = {
+    "k8s": "Kubernetes",
+    "metric": "Metric / Trace",
+    "log": "Log",
+}
+
+
+class SynthesisDecision:
+    __slots__ = ("tier", "reason", "error_lines", "result_tokens")
+
+    def __init__(self, tier: str, reason: str, error_lines: int = 0, result_tokens: int = 0):
+        self.tier = tier
+        self.reason = reason
+        self.error_lines = error_lines
+        self.result_tokens = result_tokens
+
+
+def find_error_lines(text: str) -> List[str]:
+    """부정 표현/시스템 안내문을 제외하고 에러 징후가 있는 줄을 돌려줍니다."""
+    hits = []
+    for line in text.splitlines():
+        if any(notice in line for notice in _SYSTEM_NOTICES):
+            continue
+        for match in _ERROR_MARKERS.finditer(line):
+            negated = (
+                _NEGATION_BEFORE.search(line, 0, match.start())
+                or _NEGATION_AFTER.match(line, match.end())
+            )
+            if not negated:
+                hits.append(line.strip())
+                break
+    return hits
+
+
+def choose_synthesis_tier(worker_results: Dict[str, str], result_tokens: int, listing: bool) -> SynthesisDecision:
+    """Worker 보고서(에러 징후, 크기)와 목록 요청 여부로 Synthesizer 등급을 고릅니다."""
+    if not RUNTIME_LIMITS["adaptive_synthesis_enabled"]:
+        return SynthesisDecision(TIER_THINKING, "adaptive_synthesis 비활성화", result_tokens=result_tokens)
+
+    error_lines = sum(len(find_error_lines(text)) for text in worker_results.values())
+
+    if not worker_results:
+        return SynthesisDecision(TIER_TEMPLATE, "Worker 보고서 없음", error_lines, result_tokens)
+
+    if error_lines == 0:
+        if listing:
+            return SynthesisDecision(TIER_TEMPLATE, "단순 목록 요청 + 에러 징후 없음", error_lines, result_tokens)
+        if result_tokens <= RUNTIME_LIMITS["synthesis_template_max_tokens"]:
+            return SynthesisDecision(TIER_TEMPLATE, f"에러 징후 없음 + 보고서 {result_tokens} 토큰", error_lines, result_tokens)
+
+    if (
+        error_lines <= RUNTIME_LIMITS["synthesis_instruct_max_error_lines"]
+        and result_tokens <= RUNTIME_LIMITS["synthesis_instruct_max_tokens"]
+    ):
+        return SynthesisDecision(
+            TIER_INSTRUCT, f"에러 징후 {error_lines}줄 + 보고서 {result_tokens} 토큰", error_lines, result_tokens
+        )
+
+    return SynthesisDecision(
+        TIER_THINKING, f"에러 징후 {error_lines}줄 / 보고서 {result_tokens} 토큰", error_lines, result_tokens
+    )
+
+
+def render_template_answer(worker_results: Dict[str, str], order: List[str], listing: bool) -> str:
+    """LLM 없이 Worker 보고서를 정리한 답변을 만듭니다."""
+    # 징후 판정은 정규식 휴리스틱이므로 "이상 없음" 같은 판정 문구 없이 보고서 내용만 전달합니다.
+    if listing:
+        lines = ["요청하신 조회 결과입니다."]
+    else:
+        lines = ["각 전문가의 점검 보고서를 정리했습니다. (모델 종합 없이 보고서 내용을 그대로 전달합니다)"]
+
+    for key in order:
+        if key not in worker_results:
+            continue
+        body = _WORKER_HEADER.sub("", worker_results[key].strip(), count=1).strip()
+        if "[빈 결과 반환" in body:
+            body = "조건에 해당하는 리소스가 없습니다. (필터에 걸리는 이상 리소스 없음)"
+        lines.append(f"\n### {_WORKER_TITLES.get(key, key)}\n{body or '(보고 내용 없음)'}")
+    return "\n".join(lines)
+
+
+# -----------------------------------------------------------------
+# Thinking 종합 소요 시간 EWMA (절약 시간 추정용)
+# -----------------------------------------------------------------
+_thinking_latency_ewma: Optional[float] = None
+_EWMA_ALPHA = 0.3
+
+
+def record_thinking_latency(seconds: float) -> None:
+    global _thinking_latency_ewma
+    if _thinking_latency_ewma is None:
+        _thinking_latency_ewma = seconds
+    else:
+        _thinking_latency_ewma = _EWMA_ALPHA * seconds + (1 - _EWMA_ALPHA) * _thinking_latency_ewma
+
+
+def estimated_thinking_latency() -> Optional[float]:
+    return _thinking_latency_ewma
+
+
+def log_synthesis_result(decision: SynthesisDecision, elapsed: float) -> str:
+    """선택된 등급과 (Thinking 대비) 절약 시간을 기록하고, 사용자에게 보여줄 한 줄 요약을 돌려줍니다."""
+    if decision.tier == TIER_THINKING:
+        record_thinking_latency(elapsed)
+        msg = f"🧭 [Synthesizer] tier=thinking ({decision.reason}) {elapsed:.1f}초 소요"
+    else:
+        baseline = estimated_thinking_latency()
+        if baseline is None:
+            saved = "Thinking 소요 시간 측정 전"
+        else:
+            saved = f"Thinking 대비 약 {max(baseline - elapsed, 0):.1f}초 절약 (EWMA {baseline:.1f}초)"
+        msg = f"🧭 [Synthesizer] tier={decision.tier} ({decision.reason}) {elapsed:.1f}초 소요, {saved}"
+    logger.info(msg)
+    return msg
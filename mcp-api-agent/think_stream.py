@@ -0,0 +1,93 @@
+import sys
+from typing import List, Tuple
+
+# =================================================================
+# 스트리밍 <think> 태그 감지기
+# -----------------------------------------------------------------
+# 예전 콜백은 토큰마다 전체 버퍼에 이어 붙인 뒤 "</think>"를 처음부터 다시 검색했기 때문에
+# 수천 토큰짜리 추론 단계에서 O(n^2)이 되었습니다. 여기서는 태그 일부일 수 있는 꼬리(최대 태그 길이-1)만
+# 들고 다니며 새 토큰만 검사하므로 토큰당 O(토큰 길이)입니다. 여러 개의 think 블록이 번갈아 나와도 처리합니다.
+# =================================================================
+
+OPEN_TAG = "<think>"
+CLOSE_TAG = "</think>"
+
+
+def _partial_tag_suffix(text: str, tag: str) -> int:
+    """text 끝부분이 tag의 접두어와 겹치는 길이 (다음 토큰과 합쳐져 태그가 될 수 있는 부분)"""
+    for length in range(min(len(tag) - 1, len(text)), 0, -1):
+        if text.endswith(tag[:length]):
+            return length
+    return 0
+
+
+class ThinkTagParser:
+    """토큰 스트림을 (추론 여부, 텍스트) 조각으로 나눕니다. 태그 자체는 출력하지 않습니다."""
+
+    __slots__ = ("in_thinking", "_pending")
+
+    def __init__(self, in_thinking: bool = True):
+        # Qwen 계열 chat template은 프롬프트에 <think>를 미리 넣으므로 기본값은 "추론 중"
+        self.in_thinking = in_thinking
+        self._pending = ""
+
+    def feed(self, token: str) -> List[Tuple[bool, str]]:
+        # 빠른 경로: 두 태그 모두 "<"로 시작하므로 "<"가 없으면 태그도, 태그의 앞부분도 있을 수 없음
+        if not self._pending and "<" not in token:
+            return [(self.in_thinking, token)] if token else []
+        text = self._pending + token if self._pending else token
+        self._pending = ""
+        segments = []
+        while text:
+            tag = CLOSE_TAG if self.in_thinking else OPEN_TAG
+            idx = text.find(tag)
+            if idx >= 0:
+                if idx:
+                    segments.append((self.in_thinking, text[:idx]))
+                self.in_thinking = not self.in_thinking
+                text = text[idx + len(tag):]
+                continue
+            keep = _partial_tag_suffix(text, tag)
+            if keep:
+                self._pending = text[-keep:]
+                text = text[:-keep]
+            if text:
+                segments.append((self.in_thinking, text))
+            break
+        return segments
+
+    def flush(self) -> List[Tuple[bool, str]]:
+        """스트림 종료 시 태그가 되지 못한 꼬리를 내보냅니다."""
+        if not self._pending:
+            return []
+        segments = [(self.in_thinking, self._pending)]
+        self._pending = ""
+        return segments
+
+
+class ConsoleMirror:
+    """답변 토큰을 콘솔에 모아서 출력합니다. (토큰마다 write/flush 하지 않음)"""
+
+    __slots__ = ("enabled", "flush_chars", "_parts", "_size")
+
+    def __init__(self, enabled: bool = True, flush_chars: int = 256):
+        self.enabled = enabled
+        self.flush_chars = flush_chars
+        self._parts: List[str] = []
+        self._size = 0
+
+    def write(self, text: str) -> None:
+        if not self.enabled or not text:
+            return
+        self._parts.append(text)
+        self._size += len(text)
+        if self._size >= self.flush_chars or "\n" in text:
+            self.flush()
+
+    def flush(self) -> None:
+        if not self._parts:
+            return
+        sys.stdout.write("".join(self._parts))
+        sys.stdout.flush()
+        self._parts.clear()
+        self._size = 0
@@ -0,0 +1,222 @@
+import mmap
+import re
+import tempfile
+import threading
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Optional, Tuple
+
+from langchain_core.tools import StructuredTool
+from pydantic import BaseModel, Field
+
+from config import RUNTIME_LIMITS, logger
+
+# =================================================================
+# 대용량 도구 결과 Spill-to-Disk 저장소
+# -----------------------------------------------------------------
+# mcp_tool_max_output_chars를 넘는 결과를 버리지 않고 요청 단위 임시 파일에 보관합니다.
+# 본문은 디스크(mmap)에 있고 Python 쪽에는 (offset, length) 인덱스만 남기므로 메모리가 일정하게 유지되며,
+# 모델은 fetch_tool_output(ref, offset, length, grep) 도구로 필요한 부분만 페이지 단위/grep으로 꺼내 봅니다.
+# ref에는 요청 ID가 들어갑니다("out-<요청 ID>-N"). 멀티턴 대화로 이전 턴의 도구 결과(ref 안내 포함)가 남아 있어도
+# 그 ref는 이번 요청 저장소의 다른 결과로 풀리지 않고 만료로 거절됩니다.
+# =================================================================
+
+FETCH_TOOL_NAME = "fetch_tool_output"
+
+
+class ToolOutputStore:
+    """요청 하나의 도구 결과를 담는 크기 제한 스크래치 저장소."""
+
+    def __init__(self, request_id: Optional[str] = None, max_bytes: Optional[int] = None,
+                 directory: Optional[str] = None):
+        self.request_id = request_id or uuid.uuid4().hex[:12]
+        self.max_bytes = max_bytes if max_bytes is not None else RUNTIME_LIMITS["tool_output_store_max_bytes"]
+        self._directory = directory or RUNTIME_LIMITS.get("tool_output_spill_dir") or None
+        self._file = None
+        self._size = 0
+        self._index: Dict[str, Tuple[int, int, str]] = {}  # ref -> (byte offset, byte length, source)
+        self._lock = threading.Lock()
+
+    @property
+    def size(self) -> int:
+        return self._size
+
+    @property
+    def ref_prefix(self) -> str:
+        return f"out-{self.request_id}-"
+
+    def is_stale_ref(self, ref: str) -> bool:
+        """다른 요청(이전 턴)에서 발급된 ref인지 (이번 요청 저장소에는 없음)"""
+        return ref.startswith("out-") and not ref.startswith(self.ref_prefix)
+
+    def _ensure_file(self):
+        if self._file is None:
+            self._file = tempfile.NamedTemporaryFile(
+                prefix=f"tool-output-{self.request_id}-", suffix=".bin", dir=self._directory, delete=True
+            )
+        return self._file
+
+    def put(self, text: str, source: str = "") -> Optional[str]:
+        """결과를 저장하고 참조 ID를 돌려줍니다. 용량 한도를 넘으면 저장하지 않고 None을 돌려줍니다."""
+        data = text.encode("utf-8")
+        with self._lock:
+            if self._size + len(data) > self.max_bytes:
+                logger.warning(
+                    f"💾 [ToolOutputStore] 요청 {self.request_id} 용량 한도 초과로 저장 생략 "
+                    f"({self._size + len(data)} > {self.max_bytes} bytes)"
+                )
+                return None
+            f = self._ensure_file()
+            f.seek(self._size)
+            f.write(data)
+            f.flush()
+            ref = f"{self.ref_prefix}{len(self._index) + 1}"
+            self._index[ref] = (self._size, len(data), source)
+            self._size += len(data)
+        logger.debug(f"💾 [ToolOutputStore] {ref} 저장 ({source}, {len(data)} bytes)")
+        return ref
+
+    def describe(self, ref: str) -> Optional[Tuple[int, str]]:
+        entry = self._index.get(ref)
+        if entry is None:
+            return None
+        return entry[1], entry[2]
+
+    def _view(self):
+        return mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def read(self, ref: str, offset: int = 0, length: int = 4000) -> str:
+        entry = self._index.get(ref)
+        if entry is None:
+            raise KeyError(ref)
+        base, size, _ = entry
+        offset = max(0, min(offset, size))
+        length = max(0, min(length, size - offset))
+        with self._view() as mm:
+            chunk = mm[base + offset: base + offset + length]
+        return chunk.decode("utf-8", errors="ignore")
+
+    def grep(self, ref: str, pattern: str, max_matches: int = 50, offset: int = 0) -> Tuple[str, int]:
+        """정규식에 걸리는 줄을 (바이트 오프셋 포함) 모아 돌려줍니다. 반환값: (결과 텍스트, 전체 매치 줄 수)"""
+        entry = self._index.get(ref)
+        if entry is None:
+            raise KeyError(ref)
+        base, size, _ = entry
+        try:
+            regex = re.compile(pattern.encode("utf-8"), re.IGNORECASE)
+        except re.error:
+            regex = re.compile(re.escape(pattern.encode("utf-8")), re.IGNORECASE)
+
+        lines = []
+        total = 0
+        last_line_start = -1
+        with self._view() as mm:
+            start, end = base + max(0, offset), base + size
+            for match in regex.finditer(mm, start, end):
+                line_start = mm.rfind(b"\n", base, match.start()) + 1
+                if line_start < base:
+                    line_start = base
+                if line_start == last_line_start:
+                    continue
+                last_line_start = line_start
+                total += 1
+                if len(lines) < max_matches:
+                    line_end = mm.find(b"\n", match.end(), end)
+                    if line_end < 0:
+                        line_end = end
+                    line = mm[line_start:min(line_end, line_start + 1000)].decode("utf-8", errors="ignore")
+                    lines.append(f"@{line_start - base}: {line}")
+        return "\n".join(lines), total
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                try:
+                    self._file.close()
+                except OSError as e:
+                    logger.warning(f"⚠️ [ToolOutputStore] 임시 파일 정리 실패: {e}")
+                self._file = None
+            self._index.clear()
+            self._size = 0
+
+
+# 현재 요청의 저장소 (요청을 처리하는 Task 범위에서 설정)
+_current_store: ContextVar[Optional[ToolOutputStore]] = ContextVar("tool_output_store", default=None)
+
+
+def get_current_store() -> Optional[ToolOutputStore]:
+    return _current_store.get()
+
+
+@contextmanager
+def tool_output_scope(request_id: Optional[str] = None):
+    """요청 하나를 처리하는 동안 사용할 저장소를 열고, 끝나면 임시 파일까지 정리합니다."""
+    if not RUNTIME_LIMITS["tool_output_spill_enabled"]:
+        yield None
+        return
+    store = ToolOutputStore(request_id=request_id)
+    token = _current_store.set(store)
+    try:
+        yield store
+    finally:
+        _current_store.reset(token)
+        store.close()
+
+
+def spill_tool_output(text: str, source: str) -> Optional[str]:
+    """현재 요청 저장소에 결과를 보관하고 ref를 돌려줍니다. (저장소가 없거나 가득 찼으면 None)"""
+    store = get_current_store()
+    if store is None:
+        return None
+    return store.put(text, source=source)
+
+
+# -----------------------------------------------------------------
+# fetch_tool_output 합성 도구
+# -----------------------------------------------------------------
+class FetchToolOutputInput(BaseModel):
+    ref: str = Field(description='잘린 도구 결과에 표시된 참조 ID (예: "out-3f9c2a1b7d4e-1")')
+    offset: int = Field(default=0, description="읽기 시작 위치 (바이트)")
+    length: int = Field(default=4000, description="읽을 길이 (바이트, 최대 8000)")
+    grep: Optional[str] = Field(default=None, description="지정하면 이 정규식/키워드가 포함된 줄만 반환 (예: error|fail)")
+
+
+async def fetch_tool_output(ref: str, offset: int = 0, length: int = 4000, grep: Optional[str] = None) -> str:
+    store = get_current_store()
+    if store is None:
+        return "Error: 현재 요청에 보관된 도구 결과가 없습니다."
+    info = store.describe(ref)
+    if info is None:
+        if store.is_stale_ref(ref):
+            return (f"Error: ref={ref}는 이전 요청(대화 턴)의 결과라 더 이상 조회할 수 없습니다. "
+                    f"필요하면 원래 도구를 다시 호출하세요.")
+        return f"Error: 알 수 없는 ref={ref}"
+    size, source = info
+    offset = max(0, min(offset, size))
+    length = max(1, min(length, 8000))
+
+    if grep:
+        text, total = store.grep(ref, grep, offset=offset)
+        if not text:
+            return f"[{ref} ({source}), 전체 {size} bytes] '{grep}' 일치 줄 없음"
+        shown = text.count("\n") + 1
+        return f"[{ref} ({source}), 전체 {size} bytes] '{grep}' 일치 {total}줄 중 {shown}줄 (@바이트 오프셋):\n{text}"
+
+    chunk = store.read(ref, offset=offset, length=length)
+    end = min(offset + length, size)
+    more = f" 다음 페이지: offset={end}" if end < size else " (끝)"
+    return f"[{ref} ({source}) bytes {offset}-{end} / {size}]{more}\n{chunk}"
+
+
+def build_fetch_tool() -> StructuredTool:
+    return StructuredTool.from_function(
+        func=None,
+        coroutine=fetch_tool_output,
+        name=FETCH_TOOL_NAME,
+        description=(
+            "[system] 길이 제한으로 잘린 도구 결과의 원본을 조회합니다. "
+            "결과에 표시된 ref로 offset/length 페이지 단위로 읽거나, grep으로 필요한 줄만 검색하세요."
+        ),
+        args_schema=FetchToolOutputInput,
+    )
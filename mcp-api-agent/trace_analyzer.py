@@ -0,0 +1,323 @@
+import json
+from typing import Dict, List, Optional, Tuple
+
+# =================================================================
+# 분산 트레이스 Critical Path 분석기
+# -----------------------------------------------------------------
+# vtraces_traces 결과(Jaeger/OTLP JSON)는 스팬 덤프라 수천 토큰이 되고 절단되기 쉽습니다.
+# 로컬에서 스팬 트리를 만들어 트레이스별 critical path, 서비스별 self time, 에러 전파 경로를 계산하고
+# 트레이스 전체를 집계해 "가장 느린 구간 / 실패 발원 구간" 리포트만 LLM에 전달합니다.
+# =================================================================
+
+
+class Span:
+    __slots__ = ("trace_id", "span_id", "parent_id", "service", "operation", "start", "duration", "error")
+
+    def __init__(self, trace_id: str, span_id: str, parent_id: Optional[str], service: str,
+                 operation: str, start: float, duration: float, error: bool):
+        self.trace_id = trace_id
+        self.span_id = span_id
+        self.parent_id = parent_id
+        self.service = service
+        self.operation = operation
+        self.start = start  # microseconds
+        self.duration = duration  # microseconds
+        self.error = error
+
+    @property
+    def end(self) -> float:
+        return self.start + self.duration
+
+    @property
+    def hop(self) -> str:
+        return f"{self.service}:{self.operation}"
+
+
+def format_duration(us: float) -> str:
+    if us >= 1_000_000:
+        return f"{us / 1_000_000:.2f}s"
+    if us >= 1_000:
+        return f"{us / 1_000:.1f}ms"
+    return f"{us:.0f}µs"
+
+
+# -----------------------------------------------------------------
+# 1. 입력 파싱 (Jaeger / OTLP)
+# -----------------------------------------------------------------
+def _jaeger_is_error(span: dict) -> bool:
+    for tag in span.get("tags", []) or []:
+        key = tag.get("key")
+        value = tag.get("value")
+        if key == "error" and value in (True, "true", "True"):
+            return True
+        if key == "otel.status_code" and str(value).upper() == "ERROR":
+            return True
+        if key == "http.status_code":
+            try:
+                if int(value) >= 500:
+                    return True
+            except (TypeError, ValueError):
+                pass
+    return False
+
+
+def _parse_jaeger(traces: list) -> List[Span]:
+    spans = []
+    for trace in traces:
+        if not isinstance(trace, dict):
+            continue
+        processes = trace.get("processes", {}) or {}
+        for raw in trace.get("spans", []) or []:
+            parent_id = None
+            for ref in raw.get("references", []) or []:
+                if ref.get("refType", "CHILD_OF") == "CHILD_OF":
+                    parent_id = ref.get("spanID")
+                    break
+            process = processes.get(raw.get("processID"), {}) or raw.get("process", {}) or {}
+            spans.append(Span(
+                trace_id=raw.get("traceID") or trace.get("traceID", ""),
+                span_id=raw.get("spanID", ""),
+                parent_id=parent_id,
+                service=process.get("serviceName", "unknown"),
+                operation=raw.get("operationName", ""),
+                start=float(raw.get("startTime", 0)),
+                duration=float(raw.get("duration", 0)),
+                error=_jaeger_is_error(raw),
+            ))
+    return spans
+
+
+def _parse_otlp(resource_spans: list) -> List[Span]:
+    spans = []
+    for resource_span in resource_spans:
+        service = "unknown"
+        for attr in (resource_span.get("resource", {}) or {}).get("attributes", []) or []:
+            if attr.get("key") == "service.name":
+                service = (attr.get("value") or {}).get("stringValue", service)
+        scope_spans = resource_span.get("scopeSpans") or resource_span.get("instrumentationLibrarySpans") or []
+        for scope_span in scope_spans:
+            for raw in scope_span.get("spans", []) or []:
+                start_ns = float(raw.get("startTimeUnixNano", 0))
+                end_ns = float(raw.get("endTimeUnixNano", start_ns))
+                status_code = (raw.get("status") or {}).get("code")
+                spans.append(Span(
+                    trace_id=raw.get("traceId", ""),
+                    span_id=raw.get("spanId", ""),
+                    parent_id=raw.get("parentSpanId") or None,
+                    service=service,
+                    operation=raw.get("name", ""),
+                    start=start_ns / 1000,
+                    duration=(end_ns - start_ns) / 1000,
+                    error=status_code in (2, "STATUS_CODE_ERROR"),
+                ))
+    return spans
+
+
+def _load_json(text: str):
+    stripped = text.strip()
+    start = min([i for i in (stripped.find("{"), stripped.find("[")) if i >= 0], default=-1)
+    if start < 0:
+        return None
+    try:
+        return json.loads(stripped[start:])
+    except ValueError:
+        try:
+            return json.JSONDecoder().raw_decode(stripped[start:])[0]
+        except ValueError:
+            return None
+
+
+# -----------------------------------------------------------------
+# 2. 트레이스별 분석
+# -----------------------------------------------------------------
+def _critical_path(root: Span, children: Dict[str, List[Span]]) -> List[Tuple[Span, float]]:
+    """
+    루트에서 시작해 "끝나는 시각이 가장 늦은 자식"을 역순으로 따라가며 critical path를 구합니다.
+    반환값은 (스팬, 해당 스팬이 critical path에 기여한 자체 시간) 목록입니다. (Jaeger UI와 같은 방식)
+    """
+    result = []
+    stack = [root]
+    visited = set()
+    while stack:
+        span = stack.pop()
+        if span.span_id in visited:
+            continue
+        visited.add(span.span_id)
+        cursor = span.end
+        on_path_time = 0.0
+        for child in sorted(children.get(span.span_id, []), key=lambda c: c.end, reverse=True):
+            child_end = min(child.end, cursor)
+            child_start = max(child.start, span.start)
+            if child_end <= child_start:
+                continue
+            on_path_time += child_end - child_start
+            stack.append(child)
+            cursor = child.start
+        result.append((span, max(span.duration - on_path_time, 0.0)))
+    return result
+
+
+def _self_time(span: Span, children: Dict[str, List[Span]]) -> float:
+    """자식 스팬 구간의 합집합을 뺀 순수 자체 소요 시간."""
+    intervals = sorted(
+        (max(c.start, span.start), min(c.end, span.end)) for c in children.get(span.span_id, [])
+    )
+    covered, cur_start, cur_end = 0.0, None, None
+    for start, end in intervals:
+        if end <= start:
+            continue
+        if cur_end is None or start > cur_end:
+            if cur_end is not None:
+                covered += cur_end - cur_start
+            cur_start, cur_end = start, end
+        else:
+            cur_end = max(cur_end, end)
+    if cur_end is not None:
+        covered += cur_end - cur_start
+    return max(span.duration - covered, 0.0)
+
+
+def _error_origins(spans: List[Span], by_id: Dict[str, Span], children: Dict[str, List[Span]]) -> List[List[Span]]:
+    """에러 자식이 없는 에러 스팬(발원지)마다 에러가 전파된 조상 체인을 [발원지, ..., 최상위] 순서로 돌려줍니다."""
+    chains = []
+    for span in spans:
+        if not span.error or any(c.error for c in children.get(span.span_id, [])):
+            continue
+        chain = [span]
+        parent = by_id.get(span.parent_id) if span.parent_id else None
+        while parent is not None and parent.error and parent not in chain:
+            chain.append(parent)
+            parent = by_id.get(parent.parent_id) if parent.parent_id else None
+        chains.append(chain)
+    return chains
+
+
+def analyze_spans(spans: List[Span], top_n: int = 5) -> str:
+    traces: Dict[str, List[Span]] = {}
+    for span in spans:
+        traces.setdefault(span.trace_id, []).append(span)
+
+    hop_cp_time: Dict[str, List[float]] = {}
+    service_stats: Dict[str, List[float]] = {}  # service -> [self_time, span_count, error_count]
+    origin_counts: Dict[str, int] = {}
+    origin_chains: Dict[str, str] = {}
+    trace_durations = []
+    slowest: Optional[Tuple[float, str, List[Tuple[Span, float]]]] = None
+    error_traces = 0
+
+    for trace_id, trace_spans in traces.items():
+        by_id = {s.span_id: s for s in trace_spans}
+        children: Dict[str, List[Span]] = {}
+        roots = []
+        for s in trace_spans:
+            if s.parent_id and s.parent_id in by_id:
+                children.setdefault(s.parent_id, []).append(s)
+            else:
+                roots.append(s)
+        if not roots:
+            continue
+        root = max(roots, key=lambda s: s.duration)
+        trace_start = min(s.start for s in trace_spans)
+        trace_end = max(s.end for s in trace_spans)
+        trace_duration = trace_end - trace_start
+        trace_durations.append(trace_duration)
+
+        path = _critical_path(root, children)
+        for span, contribution in path:
+            hop_cp_time.setdefault(span.hop, []).append(contribution)
+        if slowest is None or trace_duration > slowest[0]:
+            slowest = (trace_duration, trace_id, path)
+
+        for s in trace_spans:
+            stats = service_stats.setdefault(s.service, [0.0, 0, 0])
+            stats[0] += _self_time(s, children)
+            stats[1] += 1
+            stats[2] += 1 if s.error else 0
+
+        chains = _error_origins(trace_spans, by_id, children)
+        if chains:
+            error_traces += 1
+        for chain in chains:
+            origin = chain[0].hop
+            origin_counts[origin] = origin_counts.get(origin, 0) + 1
+            origin_chains.setdefault(origin, " → ".join(s.service for s in reversed(chain)))
+
+    if not trace_durations:
+        return "[트레이스 분석] 분석 가능한 트레이스 없음"
+
+    durations = sorted(trace_durations)
+
+    def pct(p: float) -> float:
+        return durations[min(int(len(durations) * p), len(durations) - 1)]
+
+    lines = [
+        f"[트레이스 분석] 트레이스 {len(durations)}개, 스팬 {len(spans)}개, "
+        f"소요시간 p50={format_duration(pct(0.5))} p95={format_duration(pct(0.95))} "
+        f"max={format_duration(durations[-1])}, 에러 트레이스 {error_traces}개"
+    ]
+
+    ranked_hops = sorted(hop_cp_time.items(), key=lambda kv: sum(kv[1]), reverse=True)[:top_n]
+    lines.append("🐢 Critical path 기여 상위 (service:operation | 총 기여 | 트레이스 수 | 평균):")
+    for i, (hop, times) in enumerate(ranked_hops, 1):
+        lines.append(
+            f" {i}. {hop} | {format_duration(sum(times))} | {len(times)} | {format_duration(sum(times) / len(times))}"
+        )
+
+    if origin_counts:
+        lines.append("🔥 에러 발원지 (가장 깊은 에러 스팬 | 건수 | 전파 경로):")
+        for i, (hop, count) in enumerate(sorted(origin_counts.items(), key=lambda kv: kv[1], reverse=True)[:top_n], 1):
+            lines.append(f" {i}. {hop} | x{count} | {origin_chains[hop]}")
+    else:
+        lines.append("✅ 에러 스팬 없음")
+
+    lines.append("서비스별 self time (service | self 합계 | 스팬 수 | 에러 수):")
+    for service, (self_time, count, errors) in sorted(service_stats.items(), key=lambda kv: kv[1][0], reverse=True)[:top_n]:
+        lines.append(f" - {service} | {format_duration(self_time)} | {int(count)} | {int(errors)}")
+
+    if slowest is not None:
+        duration, trace_id, path = slowest
+        path = sorted(path, key=lambda item: item[0].start)
+        hops = " → ".join(f"{span.hop}({format_duration(contribution)})" for span, contribution in path[:8])
+        if len(path) > 8:
+            hops += f" → ... ({len(path) - 8}개 더)"
+        lines.append(f"가장 느린 트레이스 {trace_id} ({format_duration(duration)}) critical path: {hops}")
+    return "\n".join(lines)
+
+
+def _analyze_dependencies(edges: list, top_n: int) -> str:
+    parsed = []
+    for edge in edges:
+        if isinstance(edge, dict) and "parent" in edge and "child" in edge:
+            parsed.append((edge["parent"], edge["child"], int(edge.get("callCount", 0) or 0)))
+    parsed.sort(key=lambda e: e[2], reverse=True)
+    services = {p for p, _, _ in parsed} | {c for _, c, _ in parsed}
+    lines = [f"[서비스 의존성] 서비스 {len(services)}개, 호출 관계 {len(parsed)}개 (호출 수 상위 {min(top_n, len(parsed))}개)"]
+    for parent, child, calls in parsed[:top_n]:
+        lines.append(f" - {parent} → {child} ({calls}회)")
+    return "\n".join(lines)
+
+
+def analyze_trace_output(text: str, top_n: int = 5) -> Optional[str]:
+    """
+    트레이스/의존성 도구 결과 텍스트를 압축 리포트로 변환합니다.
+    인식할 수 없는 형식이면 None을 돌려주어 호출자가 원문을 쓰도록 합니다.
+    """
+    payload = _load_json(text)
+    if payload is None:
+        return None
+
+    data = payload.get("data") if isinstance(payload, dict) else payload
+    if isinstance(payload, dict) and "resourceSpans" in payload:
+        spans = _parse_otlp(payload["resourceSpans"])
+    elif isinstance(data, list) and data and isinstance(data[0], dict) and "spans" in data[0]:
+        spans = _parse_jaeger(data)
+    elif isinstance(data, dict) and "spans" in data:
+        spans = _parse_jaeger([data])
+    elif isinstance(data, list) and data and isinstance(data[0], dict) and "parent" in data[0]:
+        return _analyze_dependencies(data, top_n=max(top_n * 4, 20))
+    else:
+        return None
+
+    if not spans:
+        return "[트레이스 분석] 조회된 스팬 없음"
+    return analyze_spans(spans, top_n=top_n)